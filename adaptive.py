@@ -18,15 +18,22 @@
 
 
 from pox.core import core
-from pox.lib.recoco import Timer
 import pox.openflow.libopenflow_01 as of
-from pox.openflow.of_json import flow_stats_to_list
+
+from portstats import PortStats
+from scheduler import StatsScheduler
+from uplinks import UplinkSelector
+from pathloads import PathLoads, load_capacities
+from ecmp import HashUplinkSelector
+from elephants import ElephantDetector
+from controller import Clos_Controller, FabricServices
+from topology import HOST, UPLINK, DOWNLINK
 
 
 log = core.getLogger()
 
 
-class Adaptive_Controller(object):
+class Adaptive_Controller(Clos_Controller):
     """Controller handling the network with an adaptive routing policy. 
 
     A Adaptive_Controller object is created for each switch that connects.
@@ -34,30 +41,58 @@ class Adaptive_Controller(object):
     Is supposed to be used with a Clos Topology.
 
     In this controller, the switch will send a flow to the link which is the
-    least loaded.
+    least loaded. Alternatively, flows can be spread over the links by
+    hashing their headers, which needs no port statistics.
+
+    With the loads of the paths, the switch sends a flow to the uplink whose
+    path to the destination is the least utilized: the uplink and the links
+    down from the core switch it leads to are scored together, relative to
+    their capacity.
+
+    Edge switches can also periodically request the statistics of their
+    flows to find the elephant flows, which are moved from loaded uplinks
+    to lighter ones by rewriting the output of their flow entry.
+
+    In a fat-tree, the aggregation switches select the uplink of the flows
+    coming from below the same way, so that both hops up to the core
+    switches are balanced.
+
+    The attributes common to the controllers are described in
+    Clos_Controller.
 
     Arguments
     ----------
-    switch_id : int
-        ID used to uniquely identify the switch in a topology
-    coreSwitchIDs : list of int
-        IDs of core switches in the topology
-    edgeSwitchIDs : list of int
-        IDs of edge switches in the topology
-    mac_to_port : dict of str: int
-        Dictionnary mapping MAC addresses of type pox.lib.addresses.EthAddr to ports
-    time_interval : int
-        Time interval between two PortStatsRequests
-    current_port_throughput : dict of int: float
-        Dictionnary storing the throughput of links connected to switch ports
-    
-    Notes
-    ----------
-    A pox.lib.recoco.Timer thread is launched at initialization.
-    This timer will call `_sendPortStatsRequests` every `time_interval` seconds.
+    port_stats : PortStats object
+        Fabric-wide service polling the switches for port statistics.
+        None when hashing the flows over the uplinks.
+    current_port_throughput : dict of int: ThroughputEstimator
+        Dictionnary storing the throughput estimators of links connected to
+        switch ports. It is this switch's view of `port_stats` and is updated
+        by the service.
+    uplinks : UplinkSelector or HashUplinkSelector object
+        Selector of the uplink to the tier above of a new flow.
+        None for core switches.
+    uplink_policy : str
+        "adaptive" or "ecmp", how `uplinks` selects the uplinks
+    hash_fields : str
+        Headers hashed to select the uplink with "ecmp"
+    flow_reservation : float
+        Load in Kbps reserved on an uplink for each new flow placed on it
+    path_loads : PathLoads object
+        Fabric-wide view of the load of the links along the paths of the
+        flows. None to only score the uplinks of the switch.
+    elephants : ElephantDetector object
+        Detector of the elephant flows of the switch. None for core switches
+        or if elephant flows are not rerouted.
+    elephant_interval : float
+        Time interval in seconds between two flow statistics requests
     """
 
-    def __init__(self, connection, nCore, nEdge, nHosts):
+    def __init__(self, connection, nCore, nEdge, nHosts, port_stats, hosts,
+                 flow_tables, flow_reservation=1000.0, uplink="adaptive",
+                 hash_fields="5tuple", elephant_interval=0,
+                 elephant_threshold=1000.0, metrics=None, trace=None,
+                 topology=None, checkpoint=None, path_loads=None):
         """Initializes the Adaptive_Controller object.
 
         Parameters
@@ -70,73 +105,135 @@ class Adaptive_Controller(object):
             Number of edge switches in the Clos Topology 
         nHosts : int
             Number of hosts per edge switch in the Clos Topology 
+        port_stats : PortStats object
+            Fabric-wide service polling the switches for port statistics,
+            unused and possibly None when `uplink` is "ecmp"
+        hosts : HostDirectory object
+            Fabric-wide directory of the location of the hosts
+        flow_tables : FlowTables object
+            Fabric-wide service tracking the flows installed in the switches
+        flow_reservation : float
+            Load in Kbps reserved on an uplink for each new flow placed on it
+            until the next port statistics are received
+        uplink : str
+            "adaptive" to select the least loaded uplink, "ecmp" to hash
+            the flows over the uplinks
+        hash_fields : str
+            Headers hashed to select the uplink with "ecmp", "5tuple" or "mac"
+        elephant_interval : float
+            Time interval in seconds between two flow statistics requests of
+            an edge switch, 0 to never reroute elephant flows. Only available
+            with the "adaptive" uplink policy, whose statistics scheduler
+            sends the requests.
+        elephant_threshold : float
+            Rate in Kbps above which a flow is an elephant
+        metrics : Metrics object
+            Fabric-wide service exporting the counters of the controllers,
+            None to not record them
+        trace : Trace object
+            Fabric-wide ring buffer recording the decisions of the
+            controllers, None to not record them
+        topology : ClosTopology or FatTreeTopology object
+            Layout of the fabric, the two-tier Clos topology by default
+        checkpoint : Checkpoint object
+            Fabric-wide checkpoint of the state of the controllers, None to
+            not save it
+        path_loads : PathLoads object
+            Fabric-wide view of the load of the links along the paths of the
+            flows, used with the "adaptive" uplink policy. None to only score
+            the uplinks of the switch.
         """
-        self.connection = connection
-        self.nCore = nCore
-        self.nEdge = nEdge
-        self.nHosts = nHosts
-
-        self.switch_id = connection.dpid
-        self.coreSwitchIDs = list(range(1, self.nCore+1))
-        self.edgeSwitchIDs = list(
-            range(self.nCore + 1, self.nCore + 1 + self.nEdge))
-
-        # This binds our PacketIn event listener
-        connection.addListeners(self)
-
-        self.time_interval = 1
+        super(Adaptive_Controller, self).__init__(
+            connection, nCore, nEdge, nHosts, hosts, flow_tables,
+            metrics=metrics, trace=trace, topology=topology,
+            checkpoint=checkpoint)
+
+        self.uplink_policy = uplink
+        self.hash_fields = hash_fields
+        self.flow_reservation = flow_reservation
+        self.path_loads = path_loads if uplink == "adaptive" else None
+        self._build_uplinks()
+
+        self.port_stats = None
         self.current_port_throughput = {}
-        core.openflow.addListenerByName(
-            "PortStatsReceived", self._handle_portstats_received)
-        Timer(timeToWake=self.time_interval,
-              callback=self._sendPortStatsRequests, recurring=True)
-
-        self.mac_to_port = {}
-
-    def is_core(self):
-        """Determines whether the switch is a core switch.
-
-        The switch IDs in a Clos Network are deterministic, i.e. a core
-        switch will have IDs ranging from [1, nCore + 1]
-        Parameters
-        ----------
-        None
+        if uplink == "adaptive":
+            self.port_stats = port_stats
+            self.current_port_throughput = port_stats.register(
+                connection, listener=self._handle_port_stats)
+            if self.current_port_throughput:
+                # Loads known before the switch reconnected, or restored
+                # from a checkpoint
+                self._handle_port_stats(self.current_port_throughput)
+
+        self.elephants = None
+        self.elephant_interval = elephant_interval
+        if elephant_interval and not self.ports.core:
+            if self.port_stats is None:
+                raise ValueError("Rerouting elephant flows needs the "
+                                 "adaptive uplink policy")
+            self.elephants = ElephantDetector(threshold=elephant_threshold)
+            self.port_stats.scheduler.add(
+                ("elephants", self.switch_id), self._send_flow_stats_request,
+                elephant_interval)
+
+    def _build_uplinks(self):
+        """Creates the selector of the uplinks of the switch.
 
         Returns
         -------
-        True if the switch is a core switch.
-        False otherwise.
+        None
         """
-        if self.switch_id in self.coreSwitchIDs:
-            return True
-        return False
 
-    def sent_from_core(self, port):
-        """Determines whether or not the packet was sent from a core switch.
+        self.uplinks = None
+        if self.ports.core:
+            pass
+        elif self.uplink_policy == "ecmp":
+            self.uplinks = HashUplinkSelector(list(self.core_ports),
+                                              self.hash_fields)
+        elif self.uplink_policy == "adaptive":
+            capacities = None
+            if self.path_loads is not None:
+                capacities = dict(
+                    (port, self.path_loads.link_capacity(self.switch_id, port))
+                    for port in self.core_ports)
+            self.uplinks = UplinkSelector(
+                list(self.core_ports), flow_reservation=self.flow_reservation,
+                capacities=capacities)
+        else:
+            raise ValueError("Unknown uplink policy: {}".format(
+                self.uplink_policy))
+        return
 
-        The ports in a Clos Network are deterministic, i.e. an edge
-        switch will receive a packet on port `port` from core switch
-        with ID `port`.
+    def _ports_changed(self, ports):
+        """Uses new roles for the ports and selects among the new uplinks.
+
+        The loads of the uplinks are known again with the next port
+        statistics.
 
         Parameters
         ----------
-        port : int
-            The receiving port of a given switch
+        ports : SwitchPorts object
+            New roles of the ports of the switch
 
         Returns
         -------
-        True if the port is associated with a core switch.
-        False otherwise.
+        None
         """
-        return port in self.coreSwitchIDs
 
-    def get_throughput_at_port(self, port):
+        super(Adaptive_Controller, self)._ports_changed(ports)
+        self._build_uplinks()
+        return
+
+    def get_throughput_at_port(self, port, kind="ewma"):
         """Gives the current throughput of a link going out of `port`.
 
         Parameters
         ----------
         port : int
             The outgoing port of a switch
+        kind : str
+            Estimate to return, one of "instantaneous", "ewma" or "peak".
+            The EWMA is the least noisy load signal.
 
         Returns
         -------
@@ -144,274 +241,432 @@ class Adaptive_Controller(object):
             Link throughput in Kbps
         """
 
-        return self.current_port_throughput[(self.switch_id, port)]
+        estimator = self.current_port_throughput.get(port)
+        if estimator is None:
+            return 0.0
+        return estimator.estimate(kind)
 
-    def resend_packet(self, packet_in, out_port):
-        """Instructs the switch to resend a packet that it had sent to us.
+    def _handle_port_stats(self, view):
+        """Updates the uplink loads when new port statistics are received.
+
+        With the loads of the paths, the load of an uplink is also measured
+        by the core switch receiving it.
 
         Parameters
         ----------
-        packet_in : ofp_packet_in object
-            Packet which the switch had sent to the controller due to a table-miss
-        out_port : int
-            Port to send the packet out of
+        view : dict of int: ThroughputEstimator
+            Throughput estimators of the ports of the switch
 
         Returns
         -------
         None
         """
-        msg = of.ofp_packet_out()
-        msg.data = packet_in
-
-        # Add an action to send to the specified port
-        action = of.ofp_action_output(port=out_port)
-        msg.actions.append(action)
-
-        # Send message to switch
-        self.connection.send(msg)
 
+        if self.uplinks is None:
+            return
+        if self.path_loads is not None:
+            self.uplinks.update(dict(
+                (port, self.path_loads.link_load(self.switch_id, port))
+                for port in self.core_ports))
+        else:
+            self.uplinks.update(dict((port, self.get_throughput_at_port(port))
+                                     for port in self.core_ports))
         return
 
-    def act_like_switch(self, packet, packet_in):
-        """Implement switch like behavior.
+    def select_uplink(self, packet, dest):
+        """Selects the uplink of a new flow and reserves the flow on it.
 
-        Sends a packet out to a port depending on specific conditions and
-        installs rules in the flow table of the corresponding switch
-        via OpenFlow messages.
+        With the loads of the paths, the uplink whose path to the edge
+        switch of the destination is the least utilized is selected, and
+        the flow is reserved on the links of that path.
 
-        When it comes to transferring unknown packets,
-        there are multiple cases depending on the nature of the switch:
+        Parameters
+        ----------
+        packet : pox.lib.packet.ethernet
+            Packet of the new flow
+        dest : str
+            MAC address of the destination
 
-        1. The switch is a core switch:
+        Returns
+        -------
+        int
+            Uplink port of the flow, None if no uplink is left
+        """
 
-            - IF the destination is already in the dictionnary, add port
-              to dictionnary and entry to flow table and forward the packet
-              out to the port specified by the flow table
+        location = None
+        if self.path_loads is not None:
+            location = self.hosts.locate(dest)
+        if location is None:
+            return self.uplinks.select(packet)
 
-            OR
+        edge_id = location[0]
+        port = self.uplinks.select(packet, self.path_loads.beyond(
+            self.switch_id, self.uplinks.measured, edge_id))
+        if port is not None:
+            self.path_loads.reserve(self.switch_id, port, edge_id)
+        return port
 
-            - IF the destination is not present in the dictionnary, flood
-             the packet out to the edge switch ports
+    def _send_flow_stats_request(self):
+        """Requests the flow statistics of the switch, to find elephants.
 
-        2. Switch is an edge switch and gets a packet from a core:
+        Parameters
+        ----------
+        None
 
-            - IF the destination is already in the dictionnary forward the packet
-            out to the port specified by the flow table.
+        Returns
+        -------
+        None
+        """
 
-            - IF the destination is not present in the dictionnary,
-            flood the packet towards the hosts.
+        self.connection.send(of.ofp_stats_request(
+            body=of.ofp_flow_stats_request()))
+        return
 
-        3. Switch is an edge switch and gets a packet from a host:
-            - Add host address to port mapping to the dictionnary and
-            select optimal output port using adaptive routing, install
-            that flow in the switch flow table and forward the packet out
-            that port.
+    def _handle_FlowStatsReceived(self, event):
+        """Moves the elephant flows of congested uplinks to lighter ones.
+
+        The flows kept by the switch across a restart are adopted first.
+        Only the flows installed by the controller and sent to a core
+        switch are considered. A flow is moved by modifying the output of
+        its entry, and its rate is moved from the load of its old uplink to
+        the new one until the next port statistics show the move.
 
         Parameters
         ----------
-        packet : pox.lib.packet
-            Packet that the switch sent up to the controller
-        packet_in : ofp_packet_in object
-            OpenFlow message
+        event : FlowStatsReceived
+            Event raised when the switch replies to a FlowStatsRequest
 
         Returns
         -------
         None
         """
-        # Learn the port for the source MAC
-        source = str(packet.src)
-        dest = str(packet.dst)
 
-        if self.is_core():
-            self.mac_to_port[source] = packet_in.in_port
-            # Add port to dictionnary and entry to flow table if it is present
-            if dest in self.mac_to_port:
-                out_port = self._install_flow(packet.src, packet.dst, packet_in)
-                self.resend_packet(packet_in, out_port)
-            else:
-                # Flood the packet out to the edge switch ports
-                self.resend_packet(packet_in, of.OFPP_FLOOD)
-                log.debug("  S{} - Flooding packet from {} {} to edge switch ports".format(
-                    self.switch_id, source, packet_in.in_port))
+        super(Adaptive_Controller, self)._handle_FlowStatsReceived(event)
+        if self.elephants is None:
+            return
 
-        # Switch is an edge switch and gets a packet from a core switch
-        elif self.sent_from_core(packet_in.in_port):
-            # Add port to dictionnary and entry to flow table if it is present
-            if dest in self.mac_to_port:
-                out_port = self._install_flow(packet.src, packet.dst, packet_in)
-                self.resend_packet(packet_in, out_port)
+        byte_counts = {}
+        ports = {}
+        for stat in event.stats:
+            if stat.cookie not in self.flow_table.flows:
+                # Not installed by the controller, e.g. a proactive rule,
+                # whose cookie 0 all the untracked flows share
+                continue
+            outputs = [action.port for action in stat.actions
+                       if isinstance(action, of.ofp_action_output)]
+            if (len(outputs) == 1
+                    and self.ports.role_of(outputs[0]) == UPLINK):
+                byte_counts[stat.cookie] = stat.byte_count
+                ports[stat.cookie] = outputs[0]
+
+        now = self.port_stats.clock()
+        self.elephants.update(now, byte_counts)
+        loads = dict((port, self.uplinks.load(port))
+                     for port in self.uplinks.measured)
+        for cookie, old_port, new_port, rate in self.elephants.rebalance(
+                now, ports, loads):
+            actions = [of.ofp_action_output(port=new_port)]
+            if not self.flow_table.modify(cookie, actions):
+                continue
+            self.uplinks.shift(old_port, new_port, rate)
+            log.info("S{} - Elephant flow {} of {:.0f} Kbps moved from "
+                     "uplink {} to {}".format(self.switch_id, cookie, rate,
+                                              old_port, new_port))
+        return
 
-            else:
-                # Flood the packet out to the hosts only
-                ports = [port for port in range(
-                    1, self.nCore + self.nHosts + 1) if port not in self.coreSwitchIDs]
-                for p in ports:
-                    self.resend_packet(packet_in, out_port=p)
-                log.debug("  S{} - Flooding packet from {} {} to host ports :{}".format(
-                    self.switch_id, source, packet_in.in_port, ports))
+    def _handle_ConnectionDown(self, event):
+        """Stops requesting the flow statistics of a disconnected switch.
 
-        # Switch is an edge switch and gets a packet from a host
-        else:
+        Parameters
+        ----------
+        event : ConnectionDown
+            Event raised when the switch disconnects
 
-            # Add host address to port mapping to the dictionnary
-            self.mac_to_port[source] = packet_in.in_port
+        Returns
+        -------
+        None
+        """
 
-            # Select optimal output port (adaptive routing)
-            min_throughput = float("inf")
-            for port in self.coreSwitchIDs:
-                throughput = self.get_throughput_at_port(port)
-                if(throughput < min_throughput):
-                    min_throughput = throughput
-                    out_port_to_core = port
-            self._install_flow(packet.src, packet.dst, packet_in,
-                               specific_out_port=out_port_to_core)
-            self.resend_packet(packet_in, out_port=out_port_to_core)
-            log.debug("  S{} - Forwarding packet from {} {} out to port {}".format(
-                self.switch_id, source, packet_in.in_port, out_port_to_core))
+        super(Adaptive_Controller, self)._handle_ConnectionDown(event)
+        if self.elephants is not None:
+            self.port_stats.scheduler.remove(("elephants", self.switch_id))
         return
 
-    def _handle_PacketIn(self, event):
-        """Handles packet in messages from the switch.
+    def _handle_PortStatus(self, event):
+        """Stops using the uplink to a core switch while its port is down.
 
         Parameters
         ----------
-        event : pox.lib.revent
-            Event that the controller handles from the connected switch
+        event : PortStatus
+            Event raised when a port of the switch is added, removed or
+            modified
 
         Returns
         -------
         None
         """
-        packet = event.parsed
-        if not packet.parsed:
-            log.warning("Ignoring incomplete packet")
+
+        super(Adaptive_Controller, self)._handle_PortStatus(event)
+        if (self.uplinks is None
+                or self.ports.role_of(event.port) != UPLINK):
             return
 
-        packet_in = event.ofp
-        self.act_like_switch(packet, packet_in)
+        desc = event.ofp.desc
+        down = (desc.config & of.OFPPC_PORT_DOWN
+                or desc.state & of.OFPPS_LINK_DOWN)
+        if event.deleted or down:
+            log.info("S{} - Uplink {} down".format(self.switch_id, event.port))
+            self.uplinks.remove_port(event.port)
+        elif self.path_loads is not None:
+            self.uplinks.add_port(event.port, self.path_loads.link_capacity(
+                self.switch_id, event.port))
+        else:
+            self.uplinks.add_port(event.port)
+        return
 
-    def _install_flow(self, source,  destination, packet_in, specific_out_port=None):
-        """Installs a flow in a switch table.
+    def flow_match(self, packet, packet_in, out_port, uplink=False):
+        """Gives the match and priority of the flow forwarding a packet.
 
         A flow is discriminated with regards to protocol,
         source/destination ports and MAC_Address
 
         Parameters
         ----------
-        source : EhtAddr
-            Source of the packet
-        destination : EhtAddr
-            Destination of the packet
+        packet : pox.lib.packet
+            Packet that the switch sent up to the controller
         packet_in : ofp_packet_in object
             OpenFlow message
-        specific_out_port: int
-            Port out of which to send the packet.
-            Overrides the port from the dictionnary
+        out_port : int
+            Port out of which the flow sends the packets
+        uplink : bool
+            Whether the port was chosen among the uplinks
 
-        Returns:
-        int
-            Port out of which to send the packet
+        Returns
+        -------
+        (ofp_match object, int)
+            Match and priority of the flow
         """
 
-        # Add to dictionnary
-        # Send packet out the associated port
-        if specific_out_port == None:
-            out_port = self.mac_to_port[str(destination)]
-        else:
-            out_port = specific_out_port
+        # Set fields to match received packet, removing information we don't want to keep
+        match = of.ofp_match.from_packet(packet_in)
+        match.in_port = None
+        match.dl_vlan = None
+        match.dl_vlan_pcp = None
+        match.nw_tos = None
+        return match, of.OFP_DEFAULT_PRIORITY
+
+    def act_like_switch(self, packet, packet_in, role):
+        """Implement switch like behavior.
 
-        log.debug(" S{} - Installing flow: {} Port {} -> {} Port {}".format(self.switch_id, str(source),
-                                                                            packet_in.in_port, str(destination), out_port))
+        Sends a packet out to a port depending on specific conditions and
+        installs rules in the flow table of the corresponding switch
+        via OpenFlow messages.
 
-        # Set fields to match received packet, removing information we don't want to keep
-        msg = of.ofp_flow_mod()
-        msg.match = of.ofp_match.from_packet(packet_in)
-        msg.match.in_port = None
-        msg.match.dl_vlan = None
-        msg.match.dl_vlan_pcp = None
-        msg.match.nw_tos = None
-        msg.idle_timeout = 100
-        msg.hard_timeout = 1000
-        msg.actions.append(of.ofp_action_output(port=out_port))
-        self.connection.send(msg)
-
-        return out_port
-
-    def _sendPortStatsRequests(self):
-        """Sending a PortStatsRequest to the switch.
+        When it comes to transferring unknown packets,
+        there are multiple cases depending on the nature of the switch:
 
-        Parameters
-        ----------
-        None
+        1. The switch is a core switch:
 
-        Returns
-        -------
-        None
-        """
-        self.connection.send(of.ofp_stats_request(
-            body=of.ofp_port_stats_request()))
-        log.debug(" S{} - Sent one port stats request".format(self.switch_id))
-        return
+            - IF the destination is already in the dictionnary, add port
+              to dictionnary and entry to flow table and forward the packet
+              out to the port specified by the flow table
 
-    def _handle_portstats_received(self, event):
-        """Handles a PortStatsRequest at the switch and computes throughput.
+            OR
+
+            - IF the destination is not present in the dictionnary, flood
+             the packet out to the edge switch ports
+
+        2. Switch is an edge or aggregation switch and gets a packet from
+           the tier above:
+
+            - IF the destination is already in the dictionnary forward the packet
+            out to the port specified by the flow table.
+
+            - IF the destination is not present in the dictionnary,
+            flood the packet down towards the hosts.
 
-        Fills or updates the dictionnary `self.current_port_throughput` with throughputs
-        of each link of the switch in Kbps.
-        The throughput is calculated every `self.time_interval` seconds.
+        3. Switch is an edge switch and gets a packet from a host:
+            - IF the destination is a host of the same switch, forward
+            the packet out to its port.
+
+            - Otherwise, add host address to port mapping to the dictionnary and
+            select optimal output port using adaptive routing, install
+            that flow in the switch flow table and forward the packet out
+            that port. The load of the uplinks, and of the links down from
+            the core switches with the loads of the paths, accounts for the
+            flows placed since the last port statistics.
+
+        4. Switch is an aggregation switch and gets a packet from below:
+            - Like an edge switch with a packet from a host, but a
+            destination unknown in the fabric is also flooded to the other
+            edge switches of the pod.
 
-        BUG: The switch receives the PortStatsReceived object of all the switches 
-        controlled by this controller.
+        A destination unknown to the switch but learnt by another edge switch
+        is found in the fabric-wide host directory and is not flooded.
 
         Parameters
         ----------
-        event: PortStatsReceived
-            Event listening to PortStatsReceived from openflow
+        packet : pox.lib.packet
+            Packet that the switch sent up to the controller
+        packet_in : ofp_packet_in object
+            OpenFlow message
+        role : int
+            Role of the input port of the packet
 
         Returns
         -------
         None
         """
+        source = str(packet.src)
+        dest = str(packet.dst)
+
+        # Switch gets a packet from the tier above
+        if role == UPLINK:
+            # Add entry to flow table if the destination is present
+            out_port = self.lookup_port(dest)
+            if out_port is not None:
+                self.install_flow(packet, packet_in, out_port)
+            else:
+                # Flood the packet down to the hosts only
+                self.flood(packet, packet_in, self.flood_down)
+
+        # Switch is an edge switch and gets a packet from a host
+        elif role == HOST:
 
-        log.debug(
-            " S{} - PortStatsReceived from switch S{}".format(self.switch_id, event.connection.dpid))
-        for stat in flow_stats_to_list(event.stats):
-            current_bytes = stat['tx_bytes']
-            key = (event.dpid, stat['port_no'])
-            if key in self.current_port_throughput:
-                throughput = (
-                    current_bytes - self.current_port_throughput[key])/self.time_interval/10**3
-                self.current_port_throughput[key] = throughput
-            else:  # Initilisation
-                self.current_port_throughput[key] = current_bytes
+            # Add host address to port mapping to the dictionnary
+            self.mac_to_port[source] = packet_in.in_port
+            self.hosts.learn(source, self.switch_id, packet_in.in_port)
+
+            out_port = self.lookup_port(dest)
+            if out_port is not None:
+                # The destination is a host of this switch
+                self.install_flow(packet, packet_in, out_port)
+                return
+
+            # Select optimal output port (adaptive routing or hashing)
+            out_port_to_core = self.select_uplink(packet, dest)
+            if out_port_to_core is None:
+                # Every uplink is down, the destination can only be below
+                self.flood(packet, packet_in, self.flood_down)
+                return
+            self.install_flow(packet, packet_in, out_port_to_core, uplink=True)
+
+        # Switch is an aggregation switch and gets a packet from below
+        elif role == DOWNLINK and self.uplinks is not None:
+            self.mac_to_port[source] = packet_in.in_port
+
+            out_port = self.lookup_port(dest)
+            if out_port is not None:
+                # The destination is in the pod
+                self.install_flow(packet, packet_in, out_port)
+                return
+
+            out_port_to_core = self.select_uplink(packet, dest)
+            if out_port_to_core is None:
+                # Every uplink is down, the destination can only be below
+                self.flood(packet, packet_in, self.flood_down)
+            elif self.hosts.locate(dest) is None:
+                self.flood_pod(packet, packet_in, out_port_to_core)
+            else:
+                self.install_flow(packet, packet_in, out_port_to_core,
+                                  uplink=True)
+
+        # The switch is a core switch
+        else:
+            # Learn the port for the source MAC
+            self.mac_to_port[source] = packet_in.in_port
+            # Add port to dictionnary and entry to flow table if it is present
+            out_port = self.lookup_port(dest)
+            if out_port is not None:
+                self.install_flow(packet, packet_in, out_port)
+            else:
+                # Flood the packet out to the edge switch ports
+                self.flood(packet, packet_in, self.flood_to_all)
         return
 
 
-def launch(nCore, nEdge, nHosts):
+def launch(reservation=1000, idle_timeout=100, hard_timeout=1000,
+           uplink="adaptive", hash_fields="5tuple", elephant_interval=0,
+           elephant_threshold=1000, stats_interval=1, stats_budget=0,
+           link_bw=10, link_bw_file=None, **options):
     """Starts the component when calling from the command line.
 
     Parameters
     ----------
-    nCore : int
-        Number of core switches in the Clos Topology
-    nEdge : int
-        Number of edge switches in the Clos Topology
-    nHosts : int
-        Number of hosts per edge switch in the Clos Topology
+    reservation : float
+        Load in Kbps reserved on an uplink for each new flow until the next
+        port statistics are received
+    idle_timeout : int
+        Idle timeout of the flows in seconds, 0 for none
+    hard_timeout : int
+        Hard timeout of the flows in seconds, 0 for none
+    uplink : str
+        "adaptive" to send new flows to the least loaded uplink, "ecmp" to
+        hash them over the uplinks with a consistent-hash ring. ECMP does
+        not poll the switches for port statistics.
+    hash_fields : str
+        Headers hashed with "ecmp": "5tuple" for the IP addresses, protocol
+        and transport ports, "mac" for the MAC addresses
+    elephant_interval : float
+        Time interval in seconds between two flow statistics requests of the
+        edge switches, used to move the elephant flows of congested uplinks
+        to lighter ones. 0 to never move them.
+    elephant_threshold : float
+        Rate in Kbps above which a flow is an elephant
+    stats_interval : float
+        Initial time interval in seconds between two port statistics
+        requests of a switch. It adapts to the activity of the switch,
+        between half and four times this interval.
+    stats_budget : float
+        Maximum number of statistics requests sent per second to the whole
+        fabric, 0 for no limit
+    link_bw : float
+        Capacity in Mbps of the links, as the bw of ClosTopo, with which
+        the "adaptive" uplink policy compares the utilization of the links
+        along the paths
+    link_bw_file : str
+        Path of a text file giving the capacity of links of other speeds,
+        one "DPID PORT MBPS" line per link direction
+    options : dict
+        Options common to the policies, e.g. nCore, nEdge and nHosts, see
+        controller.FabricServices. The checkpoint also saves the throughput
+        of the ports.
 
     Returns
     -------
     None    
     """
 
-    log.debug("Controller started with the following arguments:")
-    log.debug("nCore={}, nEdge={}, nHosts ={}".format(nCore, nEdge, nHosts))
-
-    controller = None
-
-    def start_switch(event):
-        log.debug("Controlling %s" % (event.connection,))
-        controller = Adaptive_Controller(
-            event.connection, int(nCore), int(nEdge), int(nHosts))
-
-    core.openflow.addListenerByName("ConnectionUp", start_switch)
+    fabric = FabricServices("adaptive", idle_timeout=idle_timeout,
+                            hard_timeout=hard_timeout, **options)
+    topology = fabric.topology
+
+    # A single statistics scheduler, statistics service and view of the
+    # paths are shared by all the switches
+    scheduler = StatsScheduler(budget=float(stats_budget))
+    port_stats = None
+    path_loads = None
+    if uplink == "adaptive":
+        port_stats = PortStats(time_interval=float(stats_interval),
+                               scheduler=scheduler)
+        capacities = None
+        if link_bw_file is not None:
+            capacities = load_capacities(link_bw_file)
+        path_loads = PathLoads(port_stats, topology,
+                               capacity=float(link_bw) * 1000,
+                               capacities=capacities,
+                               flow_reservation=float(reservation))
+
+    def make(connection):
+        Adaptive_Controller(connection, topology.nCore, topology.nEdge,
+                            topology.nHosts, port_stats, fabric.hosts,
+                            fabric.flow_tables,
+                            flow_reservation=float(reservation),
+                            uplink=uplink, hash_fields=hash_fields,
+                            elephant_interval=float(elephant_interval),
+                            elephant_threshold=float(elephant_threshold),
+                            metrics=fabric.metrics, trace=fabric.trace,
+                            topology=topology, checkpoint=fabric.checkpoint,
+                            path_loads=path_loads)
+
+    fabric.start(make, scheduler=scheduler, port_stats=port_stats)
@@ -0,0 +1,374 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to record the events the controllers see, so that
+# they can be replayed offline
+
+
+import atexit
+import gzip
+import struct
+import time
+
+from pox.core import core
+from pox.lib.recoco import Timer
+import pox.openflow.libopenflow_01 as of
+
+
+log = core.getLogger()
+
+MAGIC = b"CLOSCAP1"
+
+# Kinds of events recorded
+CONNECTION_UP = 1
+CONNECTION_DOWN = 2
+PACKET_IN = 3
+PORT_STATS = 4
+PORT_STATUS = 5
+
+# Time, kind, switch ID and length of the payload of a record
+HEADER = struct.Struct("!dBQH")
+# Port number of a switch connecting
+PORT = struct.Struct("!H")
+# Input port and buffer ID of a PacketIn, followed by the packet
+PACKET_IN_HEADER = struct.Struct("!HI")
+# Port number, received bytes and transmitted bytes of a port
+PORT_STATS_ENTRY = struct.Struct("!HQQ")
+# Port number, reason, config and state of a port status
+PORT_STATUS_ENTRY = struct.Struct("!HBII")
+
+
+def _open(path, mode):
+    """Opens a capture file, compressed if its name ends with .gz.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file
+    mode : str
+        "rb" or "wb"
+
+    Returns
+    -------
+    file object
+        Binary file
+    """
+
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _read(f, size):
+    """Reads bytes of a capture file, fewer at its end.
+
+    A compressed file flushed but not closed has no end of stream, which is
+    read as the end of the file.
+
+    Parameters
+    ----------
+    f : file object
+        Binary file
+    size : int
+        Number of bytes to read
+
+    Returns
+    -------
+    bytes
+        Bytes read
+    """
+
+    try:
+        return f.read(size)
+    except EOFError:
+        return b""
+
+
+def read_capture(path):
+    """Reads the events of a capture file, in the order they were recorded.
+
+    A record truncated at the end of the file, e.g. because the controller
+    was killed while writing it, is ignored.
+
+    Parameters
+    ----------
+    path : str
+        Path of the capture file
+
+    Returns
+    -------
+    generator of (float, int, int, object)
+        Time, kind, switch ID and content of each event:
+        the port numbers for CONNECTION_UP, None for CONNECTION_DOWN,
+        (in_port, buffer_id, data) for PACKET_IN, a list of
+        (port_no, rx_bytes, tx_bytes) for PORT_STATS and
+        (port_no, reason, config, state) for PORT_STATUS
+    """
+
+    with _open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a capture file".format(path))
+        while True:
+            header = _read(f, HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            when, kind, dpid, length = HEADER.unpack(header)
+            payload = _read(f, length)
+            if len(payload) < length:
+                return
+
+            if kind == CONNECTION_UP:
+                content = [port for (port,) in PORT.iter_unpack(payload)]
+            elif kind == PACKET_IN:
+                in_port, buffer_id = PACKET_IN_HEADER.unpack_from(payload)
+                content = (in_port, buffer_id,
+                           payload[PACKET_IN_HEADER.size:])
+            elif kind == PORT_STATS:
+                content = list(PORT_STATS_ENTRY.iter_unpack(payload))
+            elif kind == PORT_STATUS:
+                content = PORT_STATUS_ENTRY.unpack(payload)
+            else:
+                content = None
+            yield when, kind, dpid, content
+
+
+class Capture(object):
+    """Fabric-wide recorder of the events the controllers handle.
+
+    The switches connecting and disconnecting, the PacketIns, the port
+    statistics and the port status changes are appended to a binary file as
+    they are raised, each as a fixed header followed by a small payload.
+    Records are self-delimited, so the file can be read while it is being
+    written and a capture cut short stays readable.
+
+    Arguments
+    ----------
+    path : str
+        Path of the capture file, compressed with gzip if it ends with .gz
+    clock : callable
+        Function giving the time of the events in seconds
+    counters : dict of int: int
+        Number of events recorded, by kind
+
+    Notes
+    ----------
+    If `interval` is not 0 and `start_timer` is True, a
+    pox.lib.recoco.Timer thread is launched at initialization, calling
+    `flush` every `interval` seconds, so that at most the last `interval`
+    seconds of events are lost if the controller is killed.
+    """
+
+    def __init__(self, path, clock=time.time, interval=1, start_timer=True):
+        """Initializes the Capture object.
+
+        Parameters
+        ----------
+        path : str
+            Path of the capture file, compressed with gzip if it ends with
+            .gz
+        clock : callable
+            Function giving the time of the events in seconds
+        interval : int
+            Time interval in seconds between two flushes of the file, 0 to
+            only flush when `flush` or `close` is called
+        start_timer : bool
+            If False, no timer is started and `flush` must be called by the
+            owner of the object
+        """
+
+        self.path = path
+        self.clock = clock
+        self.counters = dict.fromkeys(
+            (CONNECTION_UP, CONNECTION_DOWN, PACKET_IN, PORT_STATS,
+             PORT_STATUS), 0)
+        self._file = _open(path, "wb")
+        self._file.write(MAGIC)
+
+        self._listeners = [
+            core.openflow.addListenerByName(name, handler)
+            for name, handler in (
+                ("ConnectionUp", self._handle_ConnectionUp),
+                ("ConnectionDown", self._handle_ConnectionDown),
+                ("PacketIn", self._handle_PacketIn),
+                ("PortStatsReceived", self._handle_PortStatsReceived),
+                ("PortStatus", self._handle_PortStatus))]
+        self._timer = None
+        if interval and start_timer:
+            self._timer = Timer(timeToWake=interval, callback=self.flush,
+                                recurring=True)
+
+    def flush(self):
+        """Writes the records buffered to the capture file.
+
+        Returns
+        -------
+        None
+        """
+
+        if not self._file.closed:
+            self._file.flush()
+        return
+
+    def close(self, event=None):
+        """Stops recording and closes the capture file.
+
+        Closing it again has no effect.
+
+        Parameters
+        ----------
+        event : GoingDownEvent
+            Event raised when POX shuts down, if called for it
+
+        Returns
+        -------
+        None
+        """
+
+        if self._file.closed:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for listener in self._listeners:
+            core.openflow.removeListener(listener)
+        self._listeners = []
+        self._file.close()
+        log.info("Captured {} events to {}".format(
+            sum(self.counters.values()), self.path))
+        return
+
+    def _write(self, kind, dpid, payload):
+        """Appends a record to the capture file.
+
+        Parameters
+        ----------
+        kind : int
+            Kind of the event
+        dpid : int
+            ID of the switch which raised the event
+        payload : bytes
+            Content of the event
+
+        Returns
+        -------
+        None
+        """
+
+        self._file.write(HEADER.pack(self.clock(), kind, dpid, len(payload)))
+        self._file.write(payload)
+        self.counters[kind] += 1
+        return
+
+    def _handle_ConnectionUp(self, event):
+        """Records the ports of a switch connecting.
+
+        Parameters
+        ----------
+        event : ConnectionUp
+            Event raised when a switch connects
+
+        Returns
+        -------
+        None
+        """
+
+        ports = sorted(p for p in event.connection.ports.keys()
+                       if p < of.OFPP_MAX)
+        self._write(CONNECTION_UP, event.dpid,
+                    b"".join(PORT.pack(p) for p in ports))
+        return
+
+    def _handle_ConnectionDown(self, event):
+        """Records a switch disconnecting.
+
+        Parameters
+        ----------
+        event : ConnectionDown
+            Event raised when a switch disconnects
+
+        Returns
+        -------
+        None
+        """
+
+        self._write(CONNECTION_DOWN, event.dpid, b"")
+        return
+
+    def _handle_PacketIn(self, event):
+        """Records a packet sent to the controller.
+
+        Parameters
+        ----------
+        event : PacketIn
+            Event raised when a switch sends a packet to the controller
+
+        Returns
+        -------
+        None
+        """
+
+        packet_in = event.ofp
+        buffer_id = packet_in.buffer_id
+        if buffer_id is None:
+            buffer_id = of.NO_BUFFER
+        self._write(PACKET_IN, event.dpid,
+                    PACKET_IN_HEADER.pack(packet_in.in_port, buffer_id)
+                    + packet_in.data)
+        return
+
+    def _handle_PortStatsReceived(self, event):
+        """Records the port statistics of a switch.
+
+        Parameters
+        ----------
+        event : PortStatsReceived
+            Event raised when a switch replies to a port statistics request
+
+        Returns
+        -------
+        None
+        """
+
+        self._write(PORT_STATS, event.dpid, b"".join(
+            PORT_STATS_ENTRY.pack(stat.port_no, stat.rx_bytes, stat.tx_bytes)
+            for stat in event.stats))
+        return
+
+    def _handle_PortStatus(self, event):
+        """Records a port of a switch being added, removed or modified.
+
+        Parameters
+        ----------
+        event : PortStatus
+            Event raised when the status of a port changes
+
+        Returns
+        -------
+        None
+        """
+
+        desc = event.ofp.desc
+        self._write(PORT_STATUS, event.dpid, PORT_STATUS_ENTRY.pack(
+            desc.port_no, event.ofp.reason, desc.config, desc.state))
+        return
+
+
+def launch(path="capture.bin"):
+    """Records the events the controllers handle, for clos-test/replay.py.
+
+    Launched next to a controller, e.g.
+    ./pox.py adaptive --nCore=4 --nEdge=4 --nHosts=4 capture --path=run.bin
+
+    Parameters
+    ----------
+    path : str
+        Path of the capture file, compressed with gzip if it ends with .gz
+
+    Returns
+    -------
+    None
+    """
+
+    capture = Capture(path)
+    core.addListenerByName("GoingDownEvent", capture.close)
+    # Also when the interpreter exits without POX going down
+    atexit.register(capture.close)
+    return
@@ -0,0 +1,474 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to keep the state learnt by the controllers across
+# restarts
+
+
+import mmap
+import os
+import struct
+
+from pox.core import core
+import pox.openflow.libopenflow_01 as of
+from pox.lib.recoco import Timer
+
+from tenants import mac_to_int
+from throughput import ThroughputEstimator
+
+
+log = core.getLogger()
+
+
+# Kinds of records
+MAC = 1        # Port of a host in the MAC table of a switch
+HOST = 2       # Location of a host in the host directory
+TENANT = 3     # VLAN of a host
+PORT = 4       # Last sample of the byte counter of a port of a switch
+NEXT_VLAN = 5  # VLAN assigned to the next new host
+CORE = 6       # Core switch of a VLAN moved away from its default one
+
+# Flag of the records of entries that no longer exist
+REMOVED = 0x80
+
+
+def int_to_mac(value):
+    """Formats a MAC address stored as an integer.
+
+    Parameters
+    ----------
+    value : int
+        The 48 bits of the address
+
+    Returns
+    -------
+    str
+        Address in the colon notation of pox.lib.addresses.EthAddr
+    """
+
+    return ":".join("{:02x}".format((value >> shift) & 0xff)
+                    for shift in range(40, -8, -8))
+
+
+class Checkpoint(object):
+    """Fabric-wide checkpoint of the state learnt by the switch controllers.
+
+    A single Checkpoint object is created for the whole controller. It saves
+    the MAC tables of the switches, the host directory, the tenant
+    assignments and the last sample of the byte counters of the ports to a
+    memory-mapped file, so that a controller restarting resumes from that
+    state instead of flooding until every host is learnt again.
+
+    The file is a header followed by fixed-size records, each setting or
+    removing one entry. Saving only appends the records of the entries that
+    changed since the previous save, then updates the number of records in
+    the header. The log is compacted into one record per entry when the
+    controller starts and when the file is full.
+
+    After a restart, the switches keep their flows when they connect again,
+    and each controller adopts them from the flow statistics of its switch,
+    see Clos_Controller.reconcile.
+
+    Arguments
+    ----------
+    path : str
+        Path of the file
+    hosts : HostDirectory object
+        Fabric-wide directory of the location of the hosts
+    tenants : Tenants object
+        Fabric-wide tenant assignments, None if not saved
+    port_stats : PortStats object
+        Fabric-wide port statistics service, None if not saved
+    mac_tables : dict of int: dict of str: int
+        MAC table of every switch, indexed by switch ID. The controller of
+        a switch uses the table registered for it.
+    generation : int
+        Number of times the controller restarted from the file, which
+        keeps the cookies of the flows of two runs apart
+    restored : bool
+        Whether the state was restored from the file
+    capacity : int
+        Number of records the file holds
+    count : int
+        Number of records written in the file
+
+    Notes
+    ----------
+    If `interval` is not 0 and `start_timer` is True, a
+    pox.lib.recoco.Timer thread is launched at initialization, calling
+    `save` every `interval` seconds.
+    """
+
+    MAGIC = b"CKP1"
+    # Magic, generation and number of records
+    HEADER = struct.Struct("!4sIQ")
+    # Kind, switch ID, address or port, two integer values and two floats
+    RECORD = struct.Struct("!BQQQQdd")
+
+    def __init__(self, path, hosts, tenants=None, port_stats=None,
+                 interval=10, capacity=1 << 16, start_timer=True):
+        """Initializes the Checkpoint object.
+
+        The state saved in `path` is restored if the file exists.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file
+        hosts : HostDirectory object
+            Fabric-wide directory of the location of the hosts
+        tenants : Tenants object
+            Fabric-wide tenant assignments, None to not save them
+        port_stats : PortStats object
+            Fabric-wide port statistics service, None to not save the
+            samples of the ports
+        interval : int
+            Time interval in seconds between two saves, 0 to only save
+            when `save` is called
+        capacity : int
+            Minimum number of records the file holds
+        start_timer : bool
+            If False, no timer is started and `save` must be called by the
+            owner of the object
+        """
+
+        self.path = path
+        self.hosts = hosts
+        self.tenants = tenants
+        self.port_stats = port_stats
+        self.mac_tables = {}
+        self.generation = 0
+        self.restored = False
+        self.capacity = capacity
+        self.count = 0
+        self._saved = {}
+        self._file = None
+        self._map = None
+
+        if os.path.exists(path):
+            self.restore()
+            self.restored = True
+            self.generation += 1
+            # Keep the flows of the switches, which are adopted instead
+            core.openflow.clear_flows_on_connect = False
+            log.info("Restored {} hosts and the MAC tables of {} switches "
+                     "from {}".format(len(hosts), len(self.mac_tables), path))
+        self._compact()
+
+        core.openflow.addListenerByName(
+            "ConnectionUp", self._handle_ConnectionUp)
+        self._timer = None
+        if interval and start_timer:
+            self._timer = Timer(timeToWake=interval, callback=self.save,
+                                recurring=True)
+
+    def register(self, connection):
+        """Gives the MAC table of a switch, with the entries restored.
+
+        Entries towards ports the switch no longer has are dropped.
+
+        Parameters
+        ----------
+        connection : pox.lib.revent.connection
+            Connection from the controller to the switch
+
+        Returns
+        -------
+        dict of str: int
+            MAC table of the switch, saved with the rest of the state
+        """
+
+        table = self.mac_tables.setdefault(connection.dpid, {})
+        for address, port in list(table.items()):
+            if port not in connection.ports:
+                del table[address]
+        return table
+
+    def _state(self):
+        """Gives the entries of the current state.
+
+        Returns
+        -------
+        generator of (tuple, object)
+            Key and value of every entry
+        """
+
+        for switch_id, table in self.mac_tables.items():
+            for address, port in table.items():
+                yield (MAC, switch_id, address), port
+        for address, location in self.hosts.locations.items():
+            yield (HOST, address), location
+        if self.tenants is not None:
+            for address, vlan_id in self.tenants.items():
+                yield (TENANT, address), vlan_id
+            yield (NEXT_VLAN,), self.tenants.next_vlan
+            for vlan_id, core_id in self.tenants.placement.items():
+                yield (CORE, vlan_id), core_id
+        if self.port_stats is not None:
+            for switch_id, view in self.port_stats.port_throughput.items():
+                for port, estimator in view.items():
+                    if estimator.count:
+                        yield (PORT, switch_id, port), (
+                            estimator.last_update(),
+                            estimator.counters[estimator.head],
+                            estimator.ewma)
+
+    def _pack_into(self, offset, key, value):
+        """Writes the record of an entry.
+
+        Parameters
+        ----------
+        offset : int
+            Offset of the record in the file
+        key : tuple
+            Kind of the entry followed by its identifiers
+        value : object
+            Value of the entry, None if it was removed
+
+        Returns
+        -------
+        None
+        """
+
+        kind = key[0]
+        switch_id = 0
+        c = d = 0
+        x = y = 0.0
+        if kind == MAC:
+            switch_id, b = key[1], mac_to_int(key[2])
+            if value is not None:
+                c = value
+        elif kind == HOST:
+            b = mac_to_int(key[1])
+            if value is not None:
+                c, d = value
+        elif kind == TENANT:
+            b = key[1]
+            if value is not None:
+                c = value
+        elif kind == NEXT_VLAN:
+            b = 0
+            if value is not None:
+                c = value
+        elif kind == CORE:
+            b = key[1]
+            if value is not None:
+                c = value
+        else:
+            switch_id, b = key[1], key[2]
+            if value is not None:
+                x, c, y = value
+        if value is None:
+            kind |= REMOVED
+        self.RECORD.pack_into(self._map, offset, kind, switch_id, b, c, d, x,
+                              y)
+        return
+
+    def _unpack(self, kind, switch_id, b, c, d, x, y):
+        """Reads the entry of a record.
+
+        Parameters
+        ----------
+        kind, switch_id, b, c, d, x, y : int or float
+            Fields of the record, see `RECORD`
+
+        Returns
+        -------
+        (tuple, object)
+            Key of the entry and its value, None if it was removed
+        """
+
+        removed = kind & REMOVED
+        kind &= ~REMOVED
+        if kind == MAC:
+            key, value = (MAC, switch_id, int_to_mac(b)), c
+        elif kind == HOST:
+            key, value = (HOST, int_to_mac(b)), (c, d)
+        elif kind == TENANT:
+            key, value = (TENANT, b), c
+        elif kind == PORT:
+            key, value = (PORT, switch_id, b), (x, c, y)
+        elif kind == NEXT_VLAN:
+            key, value = (NEXT_VLAN,), c
+        elif kind == CORE:
+            key, value = (CORE, b), c
+        else:
+            raise ValueError("{} has a record of unknown kind {}".format(
+                self.path, kind))
+        return key, None if removed else value
+
+    def restore(self):
+        """Restores the state saved in the file.
+
+        Returns
+        -------
+        None
+        """
+
+        with open(self.path, "rb") as f:
+            data = f.read()
+        magic, generation, count = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC:
+            raise ValueError("{} is not a checkpoint".format(self.path))
+        # Records past the end of a file cut short are lost
+        count = min(count, (len(data) - self.HEADER.size) // self.RECORD.size)
+
+        state = {}
+        for i in range(count):
+            key, value = self._unpack(*self.RECORD.unpack_from(
+                data, self.HEADER.size + i * self.RECORD.size))
+            if value is None:
+                state.pop(key, None)
+            else:
+                state[key] = value
+
+        for key, value in state.items():
+            kind = key[0]
+            if kind == MAC:
+                self.mac_tables.setdefault(key[1], {})[key[2]] = value
+            elif kind == HOST:
+                self.hosts.learn(key[1], *value)
+            elif kind == TENANT and self.tenants is not None:
+                self.tenants.addToVLAN(key[1], value)
+            elif kind == NEXT_VLAN and self.tenants is not None:
+                self.tenants.next_vlan = (value - 1) % self.tenants.n_vlans + 1
+            elif (kind == CORE and self.tenants is not None
+                  and 1 <= value <= self.tenants.n_cores):
+                self.tenants.place(key[1], value)
+            elif kind == PORT and self.port_stats is not None:
+                estimator = ThroughputEstimator(
+                    tau=2*self.port_stats.time_interval)
+                estimator.resume(*value)
+                self.port_stats.port_throughput.setdefault(
+                    key[1], {})[key[2]] = estimator
+        self.generation = generation
+        return
+
+    def _open(self):
+        """Maps the file in memory.
+
+        Returns
+        -------
+        None
+        """
+
+        self.close()
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self.capacity = ((len(self._map) - self.HEADER.size)
+                         // self.RECORD.size)
+        return
+
+    def _compact(self):
+        """Rewrites the file with a single record per entry.
+
+        The file is written next to `path` then renamed, so that an existing
+        checkpoint is never left half written.
+
+        Returns
+        -------
+        None
+        """
+
+        state = dict(self._state())
+        capacity = max(self.capacity, 2 * len(state))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.generation, 0))
+            f.truncate(self.HEADER.size + capacity * self.RECORD.size)
+        os.rename(tmp_path, self.path)
+        self._open()
+
+        self.count = 0
+        self._saved = {}
+        self._append(list(state.items()))
+        return
+
+    def _append(self, changes):
+        """Appends records to the file and makes them valid.
+
+        Parameters
+        ----------
+        changes : list of (tuple, object)
+            Key of each entry and its value, None if it was removed
+
+        Returns
+        -------
+        None
+        """
+
+        offset = self.HEADER.size + self.count * self.RECORD.size
+        for key, value in changes:
+            self._pack_into(offset, key, value)
+            offset += self.RECORD.size
+            if value is None:
+                self._saved.pop(key, None)
+            else:
+                self._saved[key] = value
+        # The records reach the file before the header counts them
+        self._map.flush()
+        self.count += len(changes)
+        self.HEADER.pack_into(self._map, 0, self.MAGIC, self.generation,
+                              self.count)
+        self._map.flush()
+        return
+
+    def save(self, event=None):
+        """Writes the entries which changed since the previous save.
+
+        Parameters
+        ----------
+        event : GoingDownEvent
+            Event raised when POX shuts down, if called for it
+
+        Returns
+        -------
+        int
+            Number of records written
+        """
+
+        state = dict(self._state())
+        changes = [(key, value) for key, value in state.items()
+                   if self._saved.get(key) != value]
+        changes.extend((key, None) for key in self._saved
+                       if key not in state)
+        if not changes:
+            return 0
+
+        if self.count + len(changes) > self.capacity:
+            self._compact()
+            return len(state)
+        self._append(changes)
+        return len(changes)
+
+    def close(self):
+        """Unmaps the file.
+
+        Returns
+        -------
+        None
+        """
+
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+        return
+
+    def _handle_ConnectionUp(self, event):
+        """Requests the flows a switch kept across a restart.
+
+        The controller of the switch adopts them from the reply.
+
+        Parameters
+        ----------
+        event : ConnectionUp
+            Event raised when a switch connects
+
+        Returns
+        -------
+        None
+        """
+
+        if self.restored:
+            event.connection.send(of.ofp_stats_request(
+                body=of.ofp_flow_stats_request()))
+        return
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+"""Microbenchmark of the PacketIn hot path of the controllers.
+
+Synthetic, pre-parsed PacketIn events are fed to `_handle_PacketIn` of a
+controller bound to a connection that drops every message, so only the
+controller's decision code is measured. Results are appended to a JSON
+lines file, tagged with the current git commit, to compare across commits.
+
+POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python clos-test/bench.py --policy vlan
+    PYTHONPATH=~/pox python clos-test/bench.py --compare HEAD~1
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import standins
+
+
+SCENARIOS = ("known", "flood", "uplink", "cardinality")
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "bench_results.jsonl")
+
+
+def mac(n):
+    from proactive import host_mac
+    return host_mac(n)
+
+
+def git_commit():
+    """Return the short hash of the checked out commit, or "unknown"."""
+    try:
+        out = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.STDOUT)
+        return out.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def resolve_commit(ref):
+    try:
+        out = subprocess.check_output(
+            ["git", "rev-parse", "--short", ref],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.STDOUT)
+        return out.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ref
+
+
+class Scenario(object):
+    """A switch controller and the events to feed it.
+
+    Args:
+        policy: "tree", "vlan" or "adaptive"
+        name: one of SCENARIOS
+        n_events: number of events to generate
+        nCore, nEdge, nHosts: as in ClosTopo
+        cardinality: number of hosts known by the fabric in "cardinality"
+        metrics: record the counters of the controller
+        trace: number of decisions of the controller recorded, 0 for none
+    """
+
+    def __init__(self, policy, name, n_events, nCore, nEdge, nHosts,
+                 cardinality, metrics=False, trace=0):
+        standins.init_pox().reset()
+        make, self.services = standins.controller_factory(
+            policy, nCore, nEdge, nHosts, metrics=metrics,
+            trace=trace)
+        edge = nCore + 1
+        host_port = nCore + 1
+        rnd = random.Random(0)
+
+        if name == "flood":
+            # Core switch, destination never seen anywhere
+            connection = standins.NullConnection(1, range(1, nEdge + 1))
+            self.controller = make(connection)
+            frames = [(standins.make_packet(mac(1), mac(0xfffffe)), 1)]
+        elif name == "known":
+            # Edge switch, both hosts are local and already learnt
+            connection = standins.NullConnection(
+                edge, range(1, nCore + nHosts + 1))
+            self.controller = make(connection)
+            self._learn(host_port, 1)
+            self._learn(host_port + 1, 2)
+            frames = [(standins.make_packet(mac(1), mac(2), "10.0.0.1",
+                                            "10.0.0.2"), host_port)]
+        elif name == "uplink":
+            # Edge switch, new hosts talking to remote hosts
+            connection = standins.NullConnection(
+                edge, range(1, nCore + nHosts + 1))
+            self.controller = make(connection)
+            remote = nHosts + 1
+            frames = [(standins.make_packet(mac(0x10000 + i), mac(remote),
+                                            "10.1.0.1", "10.0.0.5",
+                                            tp_src=10000 + i % 50000),
+                       host_port + i % nHosts)
+                      for i in range(min(n_events, 4096))]
+        elif name == "cardinality":
+            # Core switch in a fabric knowing many hosts
+            connection = standins.NullConnection(1, range(1, nEdge + 1))
+            self.controller = make(connection)
+            directory = self.services["hosts"]
+            for h in range(1, cardinality + 1):
+                directory.learn(mac(h), nCore + 1 + h % nEdge,
+                                nCore + 1 + h % nHosts)
+            frames = [(standins.make_packet(mac(rnd.randint(1, cardinality)),
+                                            mac(rnd.randint(1, cardinality))),
+                       1 + rnd.randrange(nEdge))
+                      for _ in range(min(n_events, 4096))]
+        else:
+            raise ValueError("Unknown scenario: {}".format(name))
+
+        # Pre-parse every event so that only the controller is measured
+        events = [standins.packet_in_event(connection, frame.pack(), port,
+                                           buffer_id=i + 1)
+                  for i, (frame, port) in enumerate(frames)]
+        self.events = [events[i % len(events)] for i in range(n_events)]
+        self.connection = connection
+
+    def _learn(self, port, host):
+        """Make the controller learn a host through a first packet."""
+        frame = standins.make_packet(mac(host), mac(0xfffffd))
+        event = standins.packet_in_event(self.controller.connection,
+                                         frame.pack(), port)
+        self.controller._handle_PacketIn(event)
+
+
+def percentile(sorted_values, p):
+    index = min(len(sorted_values) - 1, int(p / 100.0 * len(sorted_values)))
+    return sorted_values[index]
+
+
+def run(scenario, repeat):
+    """Feed the events `repeat` times, return throughput and latencies."""
+    handler = scenario.controller._handle_PacketIn
+    clock = time.perf_counter if hasattr(time, "perf_counter") else time.time
+    latencies = []
+    best = 0.0
+    for _ in range(repeat):
+        started = clock()
+        for event in scenario.events:
+            before = clock()
+            handler(event)
+            latencies.append(clock() - before)
+        elapsed = clock() - started
+        best = max(best, len(scenario.events) / elapsed)
+    latencies.sort()
+    return {
+        "events_per_sec": best,
+        "p50_us": percentile(latencies, 50) * 1e6,
+        "p90_us": percentile(latencies, 90) * 1e6,
+        "p99_us": percentile(latencies, 99) * 1e6,
+        "max_us": latencies[-1] * 1e6,
+        "messages_per_event": (scenario.connection.n_sent
+                               / float(repeat * len(scenario.events))),
+    }
+
+
+def load_results(path, commit):
+    """Return the last results recorded for a commit, by (policy, scenario).
+
+    Runs recording metrics or decisions are skipped, so that comparing a
+    run with --metrics or --trace to its own commit gives their overhead.
+    """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["commit"] == commit and not entry.get("metrics") \
+                    and not entry.get("trace"):
+                results[(entry["policy"], entry["scenario"])] = entry
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--policy", action="append",
+                        choices=("tree", "vlan", "adaptive"),
+                        help="policy to benchmark, may be repeated "
+                        "(default: all)")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="scenario to run, may be repeated (default: all)")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--nCore", type=int, default=4)
+    parser.add_argument("--nEdge", type=int, default=16)
+    parser.add_argument("--nHosts", type=int, default=8)
+    parser.add_argument("--cardinality", type=int, default=100000,
+                        help="number of known hosts in 'cardinality'")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT,
+                        help="JSON lines file the results are appended to")
+    parser.add_argument("--compare", metavar="REF",
+                        help="compare with the results recorded for a commit")
+    parser.add_argument("--metrics", action="store_true",
+                        help="record the counters of the controllers")
+    parser.add_argument("--trace", type=int, default=0, metavar="N",
+                        help="record the last N decisions of the controllers")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+
+    commit = git_commit()
+    baseline = {}
+    if args.compare:
+        baseline = load_results(args.output, resolve_commit(args.compare))
+        if not baseline:
+            print("No results recorded for {}".format(args.compare),
+                  file=sys.stderr)
+
+    print("{:<9} {:<12} {:>12} {:>9} {:>9} {:>9} {:>6}  {}".format(
+        "policy", "scenario", "events/s", "p50 us", "p90 us", "p99 us",
+        "msgs", "vs " + args.compare if args.compare else ""))
+    with open(args.output, "a") as out:
+        for policy in args.policy or ("tree", "vlan", "adaptive"):
+            for name in args.scenario or SCENARIOS:
+                scenario = Scenario(policy, name, args.events, args.nCore,
+                                    args.nEdge, args.nHosts, args.cardinality,
+                                    args.metrics, args.trace)
+                result = run(scenario, args.repeat)
+
+                delta = ""
+                previous = baseline.get((policy, name))
+                if previous:
+                    delta = "{:+.1f}%".format(
+                        100.0 * (result["events_per_sec"]
+                                 / previous["events_per_sec"] - 1))
+                print("{:<9} {:<12} {:>12.0f} {:>9.1f} {:>9.1f} {:>9.1f} "
+                      "{:>6.2f}  {}".format(
+                          policy, name, result["events_per_sec"],
+                          result["p50_us"], result["p90_us"], result["p99_us"],
+                          result["messages_per_event"], delta))
+
+                result.update(commit=commit, policy=policy, scenario=name,
+                              timestamp=time.time(), host=platform.node(),
+                              python=platform.python_version(),
+                              events=args.events, nCore=args.nCore,
+                              nEdge=args.nEdge, nHosts=args.nHosts,
+                              metrics=args.metrics, trace=args.trace)
+                out.write(json.dumps(result, sort_keys=True) + "\n")
@@ -63,7 +63,65 @@ class ClosTopo(Topo):
         """Returns true if node is an edge switch."""
         return self.isSwitch(node) and not self.isCoreSwitch(node)
 
+
+
+class FatTreeTopo(ClosTopo):
+    """Topology for a three-tier k-ary fat-tree.
+
+    The topology has k pods of k/2 aggregation switches and k/2 edge
+    switches, each edge switch having k/2 hosts, and (k/2)^2 core switches.
+    Switches and ports are numbered like topology.FatTreeTopology, which
+    the controllers use with their k option: cores first, then the
+    aggregation switches and the edge switches of each pod in turn.
+
+    Args:
+        k: number of ports of the switches, even
+        bw: bandwidth in Mbps
+    """
+
+    def build(self, k=4, bw=10):
+        half = k // 2
+        nCore = half * half
+        coreSwitches = ["s%d" % i for i in range(1, nCore + 1)]
+        for core in coreSwitches:
+            self.addSwitch(core, isCoreSwitch=True)
+
+        hostNo = 1
+        for pod in range(k):
+            base = nCore + pod * k
+            aggregations = [self.addSwitch("s%d" % (base + a + 1),
+                                           isAggregationSwitch=True)
+                            for a in range(half)]
+            edges = [self.addSwitch("s%d" % (base + half + e + 1))
+                     for e in range(half)]
+            for a, aggregation in enumerate(aggregations):
+                # Aggregation switch a reaches core switches a*k/2+1 to
+                # (a+1)*k/2, each through the port of its pod
+                for u in range(1, half + 1):
+                    self.addLink(aggregation, coreSwitches[a * half + u - 1],
+                                 port1=u, port2=pod + 1, bw=bw)
+                for e, edge in enumerate(edges):
+                    self.addLink(edge, aggregation, port1=a + 1,
+                                 port2=half + 1 + e, bw=bw)
+            for edge in edges:
+                for port in range(half + 1, k + 1):
+                    host = self.addHost("h%d" % hostNo)
+                    self.addLink(host, edge, port2=port, bw=bw)
+                    hostNo += 1
+
+
+    def isAggregationSwitch(self, node):
+        """Returns true if node is an aggregation switch."""
+        return self.g.node[node].get("isAggregationSwitch", False)
+
+
+    def isEdgeSwitch(self, node):
+        """Returns true if node is an edge switch."""
+        return (super(FatTreeTopo, self).isEdgeSwitch(node)
+                and not self.isAggregationSwitch(node))
+
 topos = {
     'clostopo': (lambda nCore=2, nEdge=3, nHosts=3, bw=10:
-                 ClosTopo(nCore=nCore, nEdge=nEdge, nHosts=nHosts, bw=bw))
+                 ClosTopo(nCore=nCore, nEdge=nEdge, nHosts=nHosts, bw=bw)),
+    'fattree': (lambda k=4, bw=10: FatTreeTopo(k=k, bw=bw))
 }
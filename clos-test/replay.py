@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+"""Replay of a capture against the controllers, offline.
+
+The events recorded by the capture component (see capture.py) are fed to
+the real Tree_Controller, VLAN_Controller or Adaptive_Controller objects
+through stand-in connections, in the order they were recorded. The clock of
+the controllers follows the timestamps of the capture, so a replay takes
+the same decisions whatever its pacing. The throughput of the controllers
+and the messages they sent are reported, and the flow_mods can be written
+to a file to diff two replays, e.g. before and after a change.
+
+POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python clos-test/replay.py run.bin --policy adaptive \\
+        --nCore 4 --nEdge 4 --nHosts 4 --flow-mods after.txt
+"""
+
+from __future__ import print_function
+
+import argparse
+import time
+
+import standins
+
+
+MATCH_FIELDS = ("in_port", "dl_src", "dl_dst", "dl_vlan", "dl_vlan_pcp",
+                "dl_type", "nw_tos", "nw_proto", "tp_src", "tp_dst")
+
+
+def describe_flow_mod(dpid, msg):
+    """Return a flow_mod as a line of text, stable across runs."""
+    import pox.openflow.libopenflow_01 as of
+
+    commands = {of.OFPFC_ADD: "add", of.OFPFC_MODIFY: "modify",
+                of.OFPFC_MODIFY_STRICT: "modify_strict",
+                of.OFPFC_DELETE: "delete",
+                of.OFPFC_DELETE_STRICT: "delete_strict"}
+    match = msg.match
+    fields = ["{}={}".format(f, getattr(match, f)) for f in MATCH_FIELDS
+              if getattr(match, f) is not None]
+    for field in ("nw_src", "nw_dst"):
+        addr, bits = getattr(match, "get_" + field)()
+        if addr is not None:
+            fields.append("{}={}/{}".format(field, addr, bits))
+    actions = ["output:{}".format(a.port) for a in msg.actions
+               if isinstance(a, of.ofp_action_output)]
+    return "s{} {} priority={} cookie={} {} actions={}".format(
+        dpid, commands.get(msg.command, msg.command), msg.priority,
+        msg.cookie, " ".join(fields), ",".join(actions) or "drop")
+
+
+class Replay(object):
+    """The controllers of a policy and the capture to feed them.
+
+    Args:
+        policy: "tree", "vlan" or "adaptive"
+        nCore, nEdge, nHosts: as in ClosTopo, for the captured fabric
+        speed: 1 to replay at the original pacing, 2 twice as fast, etc.,
+            0 as fast as possible
+        options: keyword arguments of standins.controller_factory
+    """
+
+    def __init__(self, policy, nCore, nEdge, nHosts, speed=0, **options):
+        self.nexus = standins.init_pox()
+        self.nexus.reset()
+        self.now = 0.0
+        self.speed = speed
+        self.controller_time = 0.0
+        self.events = {}
+        self.messages = {}
+        self.flow_mods = []
+        self.make, self.services = standins.controller_factory(
+            policy, nCore, nEdge, nHosts, clock=lambda: self.now, **options)
+
+    def run(self, path):
+        """Feed the events of a capture file to the controllers."""
+        import capture
+
+        handlers = {capture.CONNECTION_UP: self._connection_up,
+                    capture.CONNECTION_DOWN: self._connection_down,
+                    capture.PACKET_IN: self._packet_in,
+                    capture.PORT_STATS: self._port_stats,
+                    capture.PORT_STATUS: self._port_status}
+        names = {capture.CONNECTION_UP: "ConnectionUp",
+                 capture.CONNECTION_DOWN: "ConnectionDown",
+                 capture.PACKET_IN: "PacketIn",
+                 capture.PORT_STATS: "PortStatsReceived",
+                 capture.PORT_STATUS: "PortStatus"}
+        scheduler = self.services["scheduler"]
+        first = started = None
+        for when, kind, dpid, content in capture.read_capture(path):
+            if first is None:
+                first, started = when, time.time()
+            if self.speed:
+                delay = (started + (when - first) / self.speed) - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            self.now = when
+            scheduler.run(when)
+
+            connection = self.nexus.connections.get(dpid)
+            if connection is None and kind != capture.CONNECTION_UP:
+                continue
+            name = names.get(kind)
+            if name is None:
+                continue
+            self.events[name] = self.events.get(name, 0) + 1
+            handlers[kind](connection, dpid, content)
+
+    def _raise(self, connection, name, event):
+        before = time.time()
+        self.nexus.raise_event(name, event)
+        connection.dispatch(name, event)
+        self.controller_time += time.time() - before
+
+    def _sink(self, connection, msg):
+        import pox.openflow.libopenflow_01 as of
+
+        name = type(msg).__name__
+        self.messages[name] = self.messages.get(name, 0) + 1
+        if isinstance(msg, of.ofp_flow_mod):
+            self.flow_mods.append(describe_flow_mod(connection.dpid, msg))
+
+    def _connection_up(self, _, dpid, ports):
+        connection = standins.StandInConnection(dpid, ports, sink=self._sink)
+        self.nexus.connections[dpid] = connection
+        before = time.time()
+        self.make(connection)
+        self.controller_time += time.time() - before
+        self._raise(connection, "ConnectionUp", standins.StandInEvent(
+            connection=connection, dpid=dpid))
+
+    def _connection_down(self, connection, dpid, _):
+        self._raise(connection, "ConnectionDown", standins.StandInEvent(
+            connection=connection, dpid=dpid))
+        del self.nexus.connections[dpid]
+
+    def _packet_in(self, connection, dpid, content):
+        in_port, buffer_id, data = content
+        event = standins.packet_in_event(connection, data, in_port, buffer_id)
+        self.nexus.raise_event("PacketIn", event)
+        before = time.time()
+        connection.dispatch("PacketIn", event)
+        self.controller_time += time.time() - before
+
+    def _port_stats(self, connection, dpid, content):
+        import pox.openflow.libopenflow_01 as of
+
+        stats = [of.ofp_port_stats(port_no=port_no, rx_bytes=rx_bytes,
+                                   tx_bytes=tx_bytes)
+                 for port_no, rx_bytes, tx_bytes in content]
+        self._raise(connection, "PortStatsReceived", standins.StandInEvent(
+            connection=connection, dpid=dpid, stats=stats, ofp=None))
+
+    def _port_status(self, connection, dpid, content):
+        import pox.openflow.libopenflow_01 as of
+
+        port_no, reason, config, state = content
+        desc = of.ofp_phy_port(port_no=port_no)
+        desc.config, desc.state = config, state
+        self._raise(connection, "PortStatus", standins.StandInEvent(
+            connection=connection, dpid=dpid, port=port_no,
+            ofp=of.ofp_port_status(reason=reason, desc=desc),
+            added=reason == of.OFPPR_ADD, deleted=reason == of.OFPPR_DELETE,
+            modified=reason == of.OFPPR_MODIFY))
+
+
+def report(replay, wall):
+    """Print the events replayed and the messages of the controllers."""
+    print("*** Events")
+    for name in sorted(replay.events):
+        print("{:<18} {}".format(name, replay.events[name]))
+    print("*** Messages sent")
+    for name in sorted(replay.messages):
+        print("{:<18} {}".format(name, replay.messages[name]))
+    total = sum(replay.events.values())
+    print("*** Replayed {} events in {:.2f}s ({:.2f}s in controllers, "
+          "{:.0f} events/s)".format(
+              total, wall, replay.controller_time,
+              total / replay.controller_time if replay.controller_time
+              else 0.0))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("capture", help="capture file written by capture.py")
+    parser.add_argument("--policy", choices=("tree", "vlan", "adaptive"),
+                        default="adaptive")
+    parser.add_argument("--nCore", type=int, default=2)
+    parser.add_argument("--nEdge", type=int, default=3)
+    parser.add_argument("--nHosts", type=int, default=4)
+    parser.add_argument("--k", type=int, default=0,
+                        help="the capture is of a k-ary fat-tree")
+    parser.add_argument("--topology-file", metavar="FILE",
+                        help="layout saved by a controller discovering the "
+                        "links, instead of the numbering of the topology")
+    parser.add_argument("--aggregate", action="store_true",
+                        help="install flows per destination (tree and vlan)")
+    parser.add_argument("--uplink", choices=("adaptive", "ecmp"),
+                        default="adaptive",
+                        help="uplink selection of the adaptive policy")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="1 for the original pacing, 0 (default) for as "
+                        "fast as possible")
+    parser.add_argument("--flow-mods", metavar="FILE",
+                        help="write the flow_mods sent, one per line")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from topology import build_topology
+    if args.topology_file:
+        from linkdiscovery import DiscoveredTopology
+        topology = DiscoveredTopology(args.topology_file)
+    else:
+        topology = build_topology(args.nCore, args.nEdge, args.nHosts, args.k)
+    replay = Replay(args.policy, args.nCore, args.nEdge, args.nHosts,
+                    speed=args.speed, aggregate=args.aggregate,
+                    uplink=args.uplink, topology=topology)
+    started = time.time()
+    replay.run(args.capture)
+    report(replay, time.time() - started)
+    if args.flow_mods:
+        with open(args.flow_mods, "w") as f:
+            for line in replay.flow_mods:
+                f.write(line + "\n")
@@ -0,0 +1,854 @@
+#!/usr/bin/env python
+"""Fluid-flow simulator of the controllers on a Clos-like topology.
+
+The simulator builds the same layout as ClosTopo, or as FatTreeTopo with
+--k, and drives the real
+Tree_Controller, VLAN_Controller and Adaptive_Controller objects through
+stand-in connections. The first packets of each flow go through simulated
+flow tables, which send PacketIns to the controller on a table-miss and
+apply the flow_mods and packet_outs the controller sends back. Once routed,
+flows are fluids sharing the links with max-min fairness, and the switches
+report byte counters in their port statistics.
+
+POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python clos-test/simulator.py --policy adaptive
+"""
+
+from __future__ import print_function
+
+import argparse
+import heapq
+import random
+import time
+
+import standins
+
+
+PORT_FIELDS = ("in_port", "dl_src", "dl_dst", "dl_vlan", "dl_vlan_pcp",
+               "dl_type", "nw_tos", "nw_proto", "tp_src", "tp_dst")
+
+MAX_HOPS = 8
+
+# Packets exchanged to route a flow: the first packet, its reply and the
+# next packet, as in a TCP handshake
+HANDSHAKE = (False, True, False)
+
+
+def host_mac(h):
+    from proactive import host_mac
+    return host_mac(h)
+
+
+def host_ip(h):
+    return "10.{}.{}.{}".format((h >> 16) & 0xff, (h >> 8) & 0xff, h & 0xff)
+
+
+def _prefix_matches(rule, packet, getter):
+    addr, bits = getattr(rule, getter)()
+    if addr is None or not bits:
+        return True
+    other = getattr(packet, getter)()[0]
+    if other is None:
+        return False
+    mask = (0xffffffff << (32 - bits)) & 0xffffffff
+    return other.toUnsigned() & mask == addr.toUnsigned() & mask
+
+
+def rule_matches(rule, packet):
+    """Return True if ofp_match `rule` matches the exact match `packet`."""
+    for field in PORT_FIELDS:
+        value = getattr(rule, field)
+        if value is not None and value != getattr(packet, field):
+            return False
+    return (_prefix_matches(rule, packet, "get_nw_src")
+            and _prefix_matches(rule, packet, "get_nw_dst"))
+
+
+class Flow(object):
+    """A fluid flow between two hosts.
+
+    Args:
+        src, dst: host numbers
+        demand: rate the source tries to send at, in Mbps
+        start, duration: in seconds of simulated time
+    """
+
+    def __init__(self, src, dst, demand, start, duration, tp_src):
+        self.src = src
+        self.dst = dst
+        self.demand = demand
+        self.start = start
+        self.duration = duration
+        self.tp_src = tp_src
+        self.path = None
+        self.rules = []
+        self.slow_path = False
+        self.rate = 0.0
+        self.sent = 0.0
+
+    def __str__(self):
+        return "h{}->h{}:{}".format(self.src, self.dst, self.tp_src)
+
+
+class SimSwitch(object):
+    """A simulated OpenFlow switch."""
+
+    def __init__(self, fabric, dpid, peers, capacity=0):
+        self.fabric = fabric
+        self.dpid = dpid
+        # Port number -> ("switch", dpid, port) or ("host", number)
+        self.peers = peers
+        self.capacity = capacity
+        self.table = []
+        self.no_flood = set()
+        self.buffers = {}
+        self.next_buffer = 1
+        self.tx_bytes = dict((p, 0.0) for p in peers)
+        self.rx_bytes = dict((p, 0.0) for p in peers)
+        self.counters = dict(packet_in=0, flow_mod=0, packet_out=0,
+                             port_mod=0, stats_request=0, table_full=0)
+        self.connection = standins.StandInConnection(
+            dpid, sorted(peers), sink=fabric.handle_message)
+
+    def lookup(self, packet, in_port):
+        import pox.openflow.libopenflow_01 as of
+        exact = of.ofp_match.from_packet(packet, in_port)
+        for rule in self.table:
+            if rule_matches(rule.match, exact):
+                return rule
+        return None
+
+    def clear(self):
+        """Delete every rule, as POX does when a switch connects."""
+        for rule in self.table:
+            rule.removed = True
+            self.fabric._stale = True
+        self.table = []
+
+    def install(self, msg):
+        """Apply a flow_mod. Return False if the table is full."""
+        import pox.openflow.libopenflow_01 as of
+        key = msg.match.pack()
+        if msg.command in (of.OFPFC_DELETE, of.OFPFC_DELETE_STRICT):
+            kept = []
+            for rule in self.table:
+                if rule.match.pack() == key:
+                    self.fabric.flow_removed(self, rule, of.OFPRR_DELETE)
+                else:
+                    kept.append(rule)
+            self.table = kept
+            return True
+        for i, rule in enumerate(self.table):
+            if rule.match.pack() == key and rule.priority == msg.priority:
+                if msg.command == of.OFPFC_ADD:
+                    rule.removed = True
+                    self.table[i] = msg
+                else:
+                    rule.actions = msg.actions
+                    # Flows using the rule now take another path
+                    rule.modified = True
+                    self.fabric._stale = True
+                return True
+        if msg.command in (of.OFPFC_MODIFY, of.OFPFC_MODIFY_STRICT):
+            return True
+        if self.capacity and len(self.table) >= self.capacity:
+            self.counters["table_full"] += 1
+            return False
+        self.table.append(msg)
+        self.table.sort(key=lambda r: -r.priority)
+        return True
+
+    def output_ports(self, port, in_port):
+        import pox.openflow.libopenflow_01 as of
+        if port == of.OFPP_FLOOD:
+            return [p for p in self.peers
+                    if p != in_port and p not in self.no_flood]
+        if port == of.OFPP_ALL:
+            return [p for p in self.peers if p != in_port]
+        if port == of.OFPP_IN_PORT:
+            return [in_port]
+        if port in self.peers and port != in_port:
+            # Like OpenFlow switches, never send back out of the input port
+            return [port]
+        return []
+
+
+class Fabric(object):
+    """Simulated Clos fabric driven by a controller policy.
+
+    Args:
+        policy: "tree", "vlan" or "adaptive"
+        nCore, nEdge, nHosts: as in ClosTopo
+        k: number of ports of the switches of a three-tier fat-tree, as in
+            FatTreeTopo, replacing nCore, nEdge and nHosts. 0 for ClosTopo.
+        bw: capacity of every link in Mbps
+        core_bw: capacity in Mbps of the links of each core switch, in the
+            order of their IDs, replacing bw for those links. None for bw.
+        stats_interval: port statistics polling interval in seconds
+        aggregate: install flows per destination, for tree and vlan
+        table_size: number of flows each switch holds, 0 for no limit
+        flow_options: keyword arguments of the FlowTables service and of
+            the statistics scheduler (stats_budget)
+        uplink: uplink selection of adaptive, "adaptive" or "ecmp"
+        elephants: keyword arguments rerouting the elephant flows of
+            adaptive, elephant_interval and elephant_threshold
+        placement: keyword arguments placing the VLANs of vlan, e.g.
+            vlans, placement and rebalance_interval, see controller_factory
+        metrics: record the counters of the controllers
+        trace: number of decisions of the controllers recorded, 0 for none
+        capture: path of a file the events seen by the controllers are
+            recorded to, for replay.py, None for none
+        discover: give the controllers the layout learnt from the links of
+            the fabric, as LLDP discovery would, instead of its numbering.
+            The layout learnt must match the numbering.
+        spare_ports: number of unwired ports added to every switch, with
+            no carrier like on real cabling
+        checkpoint: path of the file the state of the controllers is saved
+            to when they restart, see restart(). None for none.
+    """
+
+    def __init__(self, policy, nCore, nEdge, nHosts, bw=10.0,
+                 stats_interval=1.0, aggregate=False, table_size=0,
+                 flow_options=None, uplink="adaptive", elephants=None,
+                 metrics=False, trace=0, capture=None, k=0, discover=False,
+                 checkpoint=None, core_bw=None, placement=None,
+                 spare_ports=0):
+        from topology import build_topology
+
+        self.nexus = standins.init_pox()
+        self.nexus.reset()
+
+        self.policy = policy
+        self.topology = build_topology(nCore, nEdge, nHosts, k)
+        self.nCore = self.topology.nCore
+        self.nEdge = self.topology.nEdge
+        self.nHosts = self.topology.nHosts
+        self.bw = float(bw)
+        self.core_bw = core_bw or []
+        self.spare_ports = spare_ports
+        # Capacity of the links of other speeds, by (dpid, port) sending
+        self.link_bw = {}
+        self.stats_interval = stats_interval
+        self.aggregate = aggregate
+        self.table_size = table_size
+        self.flow_options = flow_options or {}
+        self.uplink = uplink
+        self.elephants = elephants or {}
+        self.placement = placement or {}
+        self.metrics = metrics
+        self.trace = trace
+        self.checkpoint = checkpoint
+        self.capture = None
+        if capture is not None:
+            from capture import Capture
+            self.capture = Capture(capture, clock=lambda: self.now,
+                                   start_timer=False)
+        self.now = 0.0
+        self.reroutes = 0
+        self._stale = False
+        self.controller_time = 0.0
+        self._queue = []
+        self._delivered = None
+        self._pending_path = ()
+
+        self.switches = {}
+        self.host_port = {}
+        self._build()
+        self.controller_topology = self.topology
+        if discover:
+            self.controller_topology = self._discover()
+        self._start_controllers()
+
+    def _build(self):
+        topology = self.topology
+        dpids = (topology.coreSwitchIDs
+                 + getattr(topology, "aggregationSwitchIDs", [])
+                 + topology.edgeSwitchIDs)
+        peers = dict((d, {}) for d in dpids)
+        for lower, lower_port, upper, upper_port in topology.links():
+            peers[lower][lower_port] = ("switch", upper, upper_port)
+            peers[upper][upper_port] = ("switch", lower, lower_port)
+            if topology.is_core(upper) and upper <= len(self.core_bw):
+                bw = float(self.core_bw[upper - 1])
+                self.link_bw[(lower, lower_port)] = bw
+                self.link_bw[(upper, upper_port)] = bw
+        for host in range(1, self.nEdge * self.nHosts + 1):
+            edge, port = topology.host_location(host)
+            peers[edge][port] = ("host", host)
+            self.host_port[host] = (edge, port)
+        import pox.openflow.libopenflow_01 as of
+        for dpid, p in peers.items():
+            self.switches[dpid] = SimSwitch(self, dpid, p, self.table_size)
+            ports = self.switches[dpid].connection.ports
+            for port in range(max(p) + 1, max(p) + 1 + self.spare_ports):
+                ports[port] = of.ofp_phy_port(port_no=port,
+                                              state=of.OFPPS_LINK_DOWN)
+
+    def _discover(self):
+        from linkdiscovery import DiscoveredTopology, live_ports
+
+        discovered = DiscoveredTopology()
+        for dpid in sorted(self.switches):
+            discovered.add_switch(dpid, live_ports(
+                self.switches[dpid].connection.ports.values()))
+        for link in self.topology.links():
+            discovered.add_link(*link)
+        for tier in ("coreSwitchIDs", "edgeSwitchIDs"):
+            if (sorted(getattr(discovered, tier))
+                    != sorted(getattr(self.topology, tier))):
+                raise RuntimeError("Discovered {} {} instead of {}".format(
+                    tier, getattr(discovered, tier),
+                    getattr(self.topology, tier)))
+        return discovered
+
+    def _start_controllers(self):
+        make, self.services = standins.controller_factory(
+            self.policy, self.nCore, self.nEdge, self.nHosts,
+            clock=lambda: self.now, stats_interval=self.stats_interval,
+            aggregate=self.aggregate, uplink=self.uplink, metrics=self.metrics,
+            trace=self.trace, topology=self.controller_topology,
+            checkpoint=self.checkpoint, link_bw=self.bw,
+            capacities=dict((link, bw * 1000)
+                            for link, bw in self.link_bw.items()),
+            **dict(self.flow_options, **dict(self.elephants,
+                                             **self.placement)))
+        for dpid in sorted(self.switches):
+            if self.nexus.clear_flows_on_connect:
+                self.switches[dpid].clear()
+            connection = self.switches[dpid].connection
+            self.nexus.connections[dpid] = connection
+            make(connection)
+            self.nexus.raise_event("ConnectionUp", standins.StandInEvent(
+                connection=connection, dpid=dpid))
+
+    def restart(self):
+        """Restart the controllers, e.g. to upgrade them.
+
+        The state of the controllers is saved to the checkpoint, if any,
+        and the new controllers resume from it: the switches keep their
+        flows. Otherwise, the switches start with empty flow tables and
+        the new controllers learn everything again.
+        """
+        checkpoint = self.services["checkpoint"]
+        if checkpoint is not None:
+            checkpoint.save()
+            checkpoint.close()
+        self.nexus.reset()
+        for switch in self.switches.values():
+            switch.connection.listeners = []
+        self._start_controllers()
+
+    # Control plane
+
+    def handle_message(self, connection, msg):
+        """Apply a message sent by the controller to a switch."""
+        import pox.openflow.libopenflow_01 as of
+
+        switch = self.switches[connection.dpid]
+        if isinstance(msg, of.ofp_flow_mod):
+            switch.counters["flow_mod"] += 1
+            installed = switch.install(msg)
+            if msg.buffer_id not in (None, of.NO_BUFFER):
+                # The buffered packet goes through the updated table
+                packet, in_port, path = switch.buffers.pop(msg.buffer_id)
+                if installed:
+                    self._enqueue(switch, packet, in_port, path)
+            if not installed:
+                error = of.ofp_error(type=of.OFPET_FLOW_MOD_FAILED,
+                                     code=of.OFPFMFC_ALL_TABLES_FULL)
+                error.xid = msg.xid
+                self._raise(switch, "ErrorIn", ofp=error)
+        elif isinstance(msg, of.ofp_packet_out):
+            switch.counters["packet_out"] += 1
+            if msg.buffer_id not in (None, of.NO_BUFFER):
+                packet, _, path = switch.buffers.pop(msg.buffer_id)
+            else:
+                from pox.lib.packet.ethernet import ethernet
+                packet, path = ethernet(msg.data), self._pending_path
+            self._apply(switch, msg.actions, packet, msg.in_port, path)
+        elif isinstance(msg, of.ofp_port_mod):
+            switch.counters["port_mod"] += 1
+            if msg.mask & of.OFPPC_NO_FLOOD:
+                if msg.config & of.OFPPC_NO_FLOOD:
+                    switch.no_flood.add(msg.port_no)
+                else:
+                    switch.no_flood.discard(msg.port_no)
+        elif isinstance(msg, of.ofp_stats_request):
+            switch.counters["stats_request"] += 1
+            self._reply_stats(switch, msg)
+
+    def _raise(self, switch, name, **attributes):
+        event = standins.StandInEvent(connection=switch.connection,
+                                      dpid=switch.dpid, **attributes)
+        self.nexus.raise_event(name, event)
+        switch.connection.dispatch(name, event)
+
+    def _reply_stats(self, switch, msg):
+        import pox.openflow.libopenflow_01 as of
+
+        if isinstance(msg.body, of.ofp_port_stats_request):
+            stats = [of.ofp_port_stats(port_no=p,
+                                       tx_bytes=int(switch.tx_bytes[p]),
+                                       rx_bytes=int(switch.rx_bytes[p]))
+                     for p in sorted(switch.peers)]
+            self._raise(switch, "PortStatsReceived", stats=stats, ofp=msg)
+        elif isinstance(msg.body, of.ofp_flow_stats_request):
+            stats = [of.ofp_flow_stats(match=r.match, priority=r.priority,
+                                       cookie=r.cookie, actions=r.actions,
+                                       byte_count=int(getattr(r, "bytes", 0)))
+                     for r in switch.table]
+            self._raise(switch, "FlowStatsReceived", stats=stats, ofp=msg)
+
+    def flow_removed(self, switch, rule, reason):
+        """A rule left the table of a switch: flows using it are rerouted."""
+        import pox.openflow.libopenflow_01 as of
+
+        rule.removed = True
+        self._stale = True
+        if rule.flags & of.OFPFF_SEND_FLOW_REM:
+            removed = of.ofp_flow_removed(
+                match=rule.match, priority=rule.priority, cookie=rule.cookie,
+                reason=reason, byte_count=int(getattr(rule, "bytes", 0)))
+            self._raise(switch, "FlowRemoved", ofp=removed)
+
+    # Data plane
+
+    def probe(self, src, dst, packet):
+        """Send a packet from host src and return the path reaching dst."""
+        self._delivered = None
+        self._queue = []
+        edge, port = self.host_port[src]
+        self._enqueue(self.switches[edge], packet, port, (("host", src),))
+        while self._queue:
+            switch, packet, in_port, path = self._queue.pop(0)
+            self._process(switch, packet, in_port, path)
+        return self._delivered
+
+    def _enqueue(self, switch, packet, in_port, path):
+        if len(path) <= MAX_HOPS:
+            self._queue.append((switch, packet, in_port, path))
+
+    def _process(self, switch, packet, in_port, path):
+        rule = switch.lookup(packet, in_port)
+        if rule is not None:
+            self._apply(switch, rule.actions, packet, in_port, path)
+            return
+
+        # Table-miss: send the packet to the controller
+        buffer_id = switch.next_buffer
+        switch.next_buffer += 1
+        switch.buffers[buffer_id] = (packet, in_port, path)
+        switch.counters["packet_in"] += 1
+        event = standins.packet_in_event(switch.connection, packet.pack(),
+                                         in_port, buffer_id)
+        self._pending_path = path
+        self.nexus.raise_event("PacketIn", event)
+        started = time.time()
+        switch.connection.dispatch("PacketIn", event)
+        self.controller_time += time.time() - started
+        switch.buffers.pop(buffer_id, None)
+
+    def _apply(self, switch, actions, packet, in_port, path):
+        import pox.openflow.libopenflow_01 as of
+
+        for action in actions:
+            if not isinstance(action, of.ofp_action_output):
+                continue
+            if action.port == of.OFPP_TABLE:
+                rule = switch.lookup(packet, in_port)
+                if rule is not None:
+                    self._apply(switch, rule.actions, packet, in_port, path)
+                continue
+            for port in switch.output_ports(action.port, in_port):
+                hop = path + (("switch", switch.dpid, port),)
+                peer = switch.peers[port]
+                if peer[0] == "host":
+                    if (self._delivered is None
+                            and str(packet.dst) == host_mac(peer[1])):
+                        self._delivered = hop
+                else:
+                    self._enqueue(self.switches[peer[1]], packet, peer[2],
+                                  hop)
+
+    def table_path(self, flow, packet):
+        """Follow the flow tables only. Return None on a table-miss.
+
+        The rules followed are kept in flow.rules to count their bytes.
+        """
+        edge, in_port = self.host_port[flow.src]
+        switch = self.switches[edge]
+        path = (("host", flow.src),)
+        flow.rules = []
+        for _ in range(MAX_HOPS):
+            rule = switch.lookup(packet, in_port)
+            if rule is None:
+                return None
+            ports = [a.port for a in rule.actions if hasattr(a, "port")]
+            if len(ports) != 1 or ports[0] not in switch.peers:
+                return None
+            flow.rules.append(rule)
+            path += (("switch", switch.dpid, ports[0]),)
+            peer = switch.peers[ports[0]]
+            if peer[0] == "host":
+                return path if peer[1] == flow.dst else None
+            switch, in_port = self.switches[peer[1]], peer[2]
+        return None
+
+    def route(self, flow):
+        """Route the first packets of a flow through the fabric."""
+        forward = standins.make_packet(
+            host_mac(flow.src), host_mac(flow.dst), host_ip(flow.src),
+            host_ip(flow.dst), tp_src=flow.tp_src, tp_dst=5001)
+        reply = standins.make_packet(
+            host_mac(flow.dst), host_mac(flow.src), host_ip(flow.dst),
+            host_ip(flow.src), tp_src=5001, tp_dst=flow.tp_src)
+        from pox.lib.packet.ethernet import ethernet
+        forward = ethernet(forward.pack())
+        reply = ethernet(reply.pack())
+
+        probed = None
+        for is_reply in HANDSHAKE:
+            if is_reply:
+                self.probe(flow.dst, flow.src, reply)
+            else:
+                probed = self.probe(flow.src, flow.dst, forward)
+
+        flow.path = self.table_path(flow, forward)
+        flow.slow_path = flow.path is None
+        if flow.slow_path:
+            flow.path = probed
+
+    # Fluid model
+
+    def links(self, flow):
+        """Directed links of a flow path, as (dpid, port) or ("host", h)."""
+        if flow.path is None:
+            return []
+        links = [("host", flow.src)]
+        links += [(hop[1], hop[2]) for hop in flow.path[1:]]
+        return links
+
+    def allocate(self, flows):
+        """Max-min fair allocation of the link capacities to the flows."""
+        active = [f for f in flows if f.path is not None]
+        for f in flows:
+            f.rate = 0.0
+        remaining = {}
+        users = {}
+        for f in active:
+            for link in self.links(f):
+                remaining[link] = self.link_bw.get(link, self.bw)
+                users.setdefault(link, set()).add(f)
+
+        unfrozen = set(active)
+        while unfrozen:
+            share = min(remaining[l] / len(u & unfrozen)
+                        for l, u in users.items() if u & unfrozen)
+            increment = min(share, min(f.demand - f.rate for f in unfrozen))
+            saturated = set()
+            for f in unfrozen:
+                f.rate += increment
+                for link in self.links(f):
+                    remaining[link] -= increment
+            for l, u in users.items():
+                if remaining[l] <= 1e-9:
+                    saturated |= u
+            unfrozen = set(f for f in unfrozen
+                           if f not in saturated and f.demand - f.rate > 1e-9)
+
+    def advance(self, flows, until):
+        """Move the byte counters forward to time `until`."""
+        elapsed = until - self.now
+        if elapsed <= 0:
+            return
+        for f in flows:
+            if f.path is None or f.rate == 0:
+                continue
+            sent = f.rate * 1e6 / 8 * elapsed
+            f.sent += sent
+            for rule in f.rules:
+                rule.bytes = getattr(rule, "bytes", 0) + sent
+            for hop in f.path[1:]:
+                _, dpid, port = hop
+                switch = self.switches[dpid]
+                switch.tx_bytes[port] += sent
+                peer = switch.peers[port]
+                if peer[0] == "switch":
+                    self.switches[peer[1]].rx_bytes[peer[2]] += sent
+            edge, port = self.host_port[f.src]
+            self.switches[edge].rx_bytes[port] += sent
+        self.now = until
+
+    def run(self, flows, restart=None):
+        """Simulate the given flows until they all finished.
+
+        The controllers are restarted at time `restart`, if given.
+        """
+        events = []
+        if restart is not None:
+            heapq.heappush(events, (restart, 3, -1, "restart", None))
+        for i, f in enumerate(flows):
+            heapq.heappush(events, (f.start, 1, i, "start", f))
+            heapq.heappush(events, (f.start + f.duration, 0, i, "stop", f))
+        end = max(f.start + f.duration for f in flows) if flows else 0
+        scheduler = self.services["scheduler"]
+        if scheduler.jobs:
+            # The statistics requests are sent by the scheduler, run on
+            # every tick like its timer would
+            for tick in range(1, int(end / scheduler.tick) + 1):
+                heapq.heappush(events, (tick * scheduler.tick, 2, -1, "poll",
+                                        None))
+        placement = self.services.get("placement")
+        if placement is not None and placement.interval:
+            for n in range(1, int(end / placement.interval) + 1):
+                heapq.heappush(events, (n * placement.interval, 4, -1,
+                                        "rebalance", None))
+
+        active = []
+        while events:
+            when, _, _, kind, f = heapq.heappop(events)
+            self.advance(active, when)
+            if kind == "start":
+                self.route(f)
+                active.append(f)
+                self.allocate(active)
+            elif kind == "stop":
+                active.remove(f)
+                self.allocate(active)
+            elif kind == "poll":
+                started = time.time()
+                scheduler.run(self.now)
+                self.controller_time += time.time() - started
+            elif kind == "rebalance":
+                started = time.time()
+                self.services["placement"].rebalance()
+                self.controller_time += time.time() - started
+            elif kind == "restart":
+                started = time.time()
+                self.restart()
+                self.controller_time += time.time() - started
+                scheduler = self.services["scheduler"]
+            if self._stale:
+                self._reroute(active)
+        return flows
+
+    def _reroute(self, active):
+        """Route again the flows whose rules were removed or modified."""
+        self._stale = False
+        stale = [f for f in active
+                 if any(getattr(r, "removed", False)
+                        or getattr(r, "modified", False) for r in f.rules)]
+        for f in stale:
+            self.reroutes += 1
+            self.route(f)
+        for f in stale:
+            for r in f.rules:
+                r.modified = False
+        if stale:
+            self.allocate(active)
+
+
+def clos_test_flows(duration=60):
+    """Traffic of clos-test/test.py: two big and two small clients."""
+    flows = []
+    pairs = [(1, 5, 4, 3), (2, 10, 4, 3), (3, 7, 1, 0), (4, 12, 1, 0)]
+    for src, dst, n_flows, delay in pairs:
+        for i in range(n_flows):
+            flows.append(Flow(src, dst, 2.0, i * delay, duration - i * delay,
+                              tp_src=10000 + i))
+    return flows
+
+
+def random_flows(n_hosts, n_flows, demand, duration, seed=0):
+    """Random flows between hosts, starting over the first half."""
+    rnd = random.Random(seed)
+    flows = []
+    for i in range(n_flows):
+        src, dst = rnd.sample(range(1, n_hosts + 1), 2)
+        start = rnd.uniform(0, duration / 2.0)
+        flows.append(Flow(src, dst, demand, start, duration - start,
+                          tp_src=10000 + i))
+    return flows
+
+
+def load_flows(path):
+    """Read flows from a file with lines "START DURATION SRC DST MBPS"."""
+    flows = []
+    with open(path) as f:
+        for i, line in enumerate(f):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            start, duration, src, dst, demand = line.split()
+            flows.append(Flow(int(src), int(dst), float(demand), float(start),
+                              float(duration), tp_src=10000 + i))
+    return flows
+
+
+def report(fabric, flows, wall):
+    """Print per-flow throughput, link loads and controller counters."""
+    print("*** Flows")
+    total = 0.0
+    for f in flows:
+        mbps = f.sent * 8 / 1e6 / f.duration if f.duration else 0.0
+        total += mbps
+        path = ("-".join("s{}".format(h[1]) for h in f.path[1:])
+                if f.path else "unrouted")
+        print("{:>14} {:6.2f} Mbps  {}{}".format(
+            str(f), mbps, path, " (slow path)" if f.slow_path else ""))
+    print("Aggregate throughput: {:.2f} Mbps".format(total))
+
+    print("*** Switches")
+    for dpid in sorted(fabric.switches):
+        s = fabric.switches[dpid]
+        busiest = max(s.tx_bytes.values()) * 8 / 1e6 / max(fabric.now, 1e-9)
+        print("s{:<4} table={:<5} {} max-link={:.2f} Mbps".format(
+            dpid, len(s.table),
+            " ".join("{}={}".format(k, v) for k, v in sorted(s.counters.items())),
+            busiest))
+
+    tables = fabric.services["flow_tables"].tables
+    print("*** Flow tables")
+    for dpid in sorted(tables):
+        counters = tables[dpid].counters
+        print("s{:<4} tracked={:<5} {}".format(
+            dpid, len(tables[dpid]),
+            " ".join("{}={}".format(k, v) for k, v in sorted(counters.items()))))
+    scheduler = fabric.services["scheduler"]
+    print("Statistics requests: sent={} delayed={}".format(
+        scheduler.counters["sent"], scheduler.counters["delayed"]))
+    if fabric.reroutes:
+        print("Flows rerouted after a rule change: {}".format(fabric.reroutes))
+    placement = fabric.services.get("placement")
+    if placement is not None:
+        print("VLANs moved to another core switch: {}".format(
+            placement.moves))
+
+    print("*** Simulated {:.1f}s in {:.2f}s ({:.2f}s in controllers)".format(
+        fabric.now, wall, fabric.controller_time))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--policy", choices=("tree", "vlan", "adaptive"),
+                        default="adaptive")
+    parser.add_argument("--nCore", type=int, default=2)
+    parser.add_argument("--nEdge", type=int, default=3)
+    parser.add_argument("--nHosts", type=int, default=4)
+    parser.add_argument("--k", type=int, default=0,
+                        help="simulate a k-ary fat-tree instead of the "
+                        "two-tier topology")
+    parser.add_argument("--discover", action="store_true",
+                        help="give the controllers the layout learnt from "
+                        "the links instead of the numbering of the topology")
+    parser.add_argument("--bw", type=float, default=10,
+                        help="link bandwidth in Mbps")
+    parser.add_argument("--spare-ports", type=int, default=0,
+                        help="unwired ports added to every switch, which "
+                        "--discover must not take for host ports")
+    parser.add_argument("--core-bw", metavar="MBPS,...",
+                        type=lambda v: [float(bw) for bw in v.split(",")],
+                        help="bandwidth of the links of each core switch, "
+                        "e.g. 10,40 for links of two speeds")
+    parser.add_argument("--duration", type=int, default=60,
+                        help="duration in seconds")
+    parser.add_argument("--flows", help="traffic file, one flow per line: "
+                        "START DURATION SRC DST MBPS")
+    parser.add_argument("--random", type=int, metavar="N",
+                        help="simulate N random flows instead of test.py's")
+    parser.add_argument("--demand", type=float, default=2,
+                        help="demand of random flows in Mbps")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--aggregate", action="store_true",
+                        help="install flows per destination (tree and vlan)")
+    parser.add_argument("--table-size", type=int, default=0,
+                        help="number of flows each switch holds")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="flow budget of the controller per switch")
+    parser.add_argument("--eviction", choices=("lru", "bytes"), default="lru")
+    parser.add_argument("--flow-stats", type=float,
+                        help="flow statistics interval in seconds, 1 by "
+                        "default with --capacity and the lru eviction, 0 "
+                        "otherwise")
+    parser.add_argument("--uplink", choices=("adaptive", "ecmp"),
+                        default="adaptive",
+                        help="uplink selection of the adaptive policy")
+    parser.add_argument("--elephants", type=float, metavar="T", default=0,
+                        help="move the elephant flows of adaptive using flow "
+                        "statistics requested every T seconds")
+    parser.add_argument("--elephant-threshold", type=float, default=1000,
+                        help="rate in Kbps above which a flow is an elephant")
+    parser.add_argument("--stats-budget", type=float, default=0,
+                        help="statistics requests per second, 0 for no limit")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write the counters of the controllers to FILE "
+                        "in the Prometheus text format")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write the decisions of the controllers to FILE")
+    parser.add_argument("--trace-records", type=int, default=65536,
+                        help="number of decisions kept for --trace")
+    parser.add_argument("--capture", metavar="FILE",
+                        help="record the events seen by the controllers to "
+                        "FILE, for replay.py")
+    parser.add_argument("--restart", type=float, metavar="T",
+                        help="restart the controllers at time T")
+    parser.add_argument("--checkpoint", metavar="FILE",
+                        help="save the state of the controllers to FILE and "
+                        "resume from it when they restart")
+    parser.add_argument("--vlans", type=int, default=0,
+                        help="number of VLANs of vlan, 0 for one per core "
+                        "switch")
+    parser.add_argument("--placement", choices=("roundrobin", "traffic"),
+                        default="roundrobin",
+                        help="placement of the hosts and VLANs of vlan")
+    parser.add_argument("--rebalance", type=float, metavar="T", default=30,
+                        help="move VLANs between core switches every T "
+                        "seconds with --placement traffic, 0 for never")
+    parser.add_argument("--rebalance-moves", type=int, default=1,
+                        help="VLANs moved at most at each rebalancing")
+    args = parser.parse_args()
+    if args.restart is not None and args.capture:
+        parser.error("a capture stops with the controllers, --restart and "
+                     "--capture cannot be combined")
+    if args.flow_stats is None:
+        args.flow_stats = 1 if args.capacity and args.eviction == "lru" else 0
+    elif args.capacity and args.eviction == "lru" and not args.flow_stats:
+        parser.error("the lru eviction ranks the flows by their statistics, "
+                     "--capacity needs --flow-stats or --eviction bytes")
+
+    fabric = Fabric(args.policy, args.nCore, args.nEdge, args.nHosts,
+                    bw=args.bw, aggregate=args.aggregate,
+                    table_size=args.table_size,
+                    flow_options=dict(table_capacity=args.capacity,
+                                      eviction=args.eviction,
+                                      flow_stats_interval=args.flow_stats,
+                                      stats_budget=args.stats_budget),
+                    uplink=args.uplink,
+                    elephants=dict(elephant_interval=args.elephants,
+                                   elephant_threshold=args.elephant_threshold),
+                    metrics=args.metrics is not None,
+                    trace=args.trace_records if args.trace else 0,
+                    capture=args.capture, k=args.k, discover=args.discover,
+                    checkpoint=args.checkpoint, core_bw=args.core_bw,
+                    spare_ports=args.spare_ports,
+                    placement=dict(vlans=args.vlans, placement=args.placement,
+                                   rebalance_interval=args.rebalance,
+                                   rebalance_moves=args.rebalance_moves))
+    if args.flows:
+        flows = load_flows(args.flows)
+    elif args.random:
+        flows = random_flows(fabric.nEdge * fabric.nHosts, args.random,
+                             args.demand, args.duration, args.seed)
+    else:
+        flows = clos_test_flows(args.duration)
+
+    started = time.time()
+    fabric.run(flows, restart=args.restart)
+    report(fabric, flows, time.time() - started)
+    if args.metrics:
+        fabric.services["metrics"].write(args.metrics)
+    if args.trace:
+        fabric.services["trace"].dump(args.trace)
+    if args.capture:
+        fabric.capture.close()
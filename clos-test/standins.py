@@ -0,0 +1,366 @@
+"""Stand-ins for the POX objects the controllers talk to.
+
+They allow driving the controllers of this repository offline, without
+Mininet, Open vSwitch or a running POX instance. POX itself must still be
+importable, e.g. by adding the POX directory to PYTHONPATH.
+"""
+
+import os
+import sys
+import unittest
+
+# The controllers live in the parent directory, like in POX's ext/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+import pox.core
+
+
+def init_pox():
+    """Initialize the POX core object the controllers import.
+
+    Must be called before importing any controller module. The stand-in
+    OpenFlow nexus is registered as core.openflow and returned.
+    """
+    if pox.core.core is None:
+        pox.core.initialize()
+    core = pox.core.core
+    if not core.hasComponent("openflow"):
+        core.register("openflow", StandInOpenFlow())
+    return core.openflow
+
+
+class StandInEvent(object):
+    """Event carrying the given attributes."""
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+        self.halt = False
+
+
+def mac(n):
+    """MAC address of host n, as Mininet assigns them."""
+    return "00:00:00:00:{:02x}:{:02x}".format(n >> 8, n & 0xff)
+
+
+class Clock(object):
+    """Clock set by the tests."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def port_stats_event(dpid, counters):
+    """Build a PortStatsReceived event from {port: (tx_bytes, rx_bytes)}."""
+    stats = [StandInEvent(port_no=port, tx_bytes=tx, rx_bytes=rx)
+             for port, (tx, rx) in sorted(counters.items())]
+    return StandInEvent(dpid=dpid, stats=stats)
+
+
+class ServiceTest(unittest.TestCase):
+    """Starts every test from a fresh core.openflow and a scratch directory."""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        pox.core.core.openflow.reset()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+
+class StandInOpenFlow(object):
+    """Stand-in for the OpenFlow nexus registered as core.openflow.
+
+    Handlers registered by name are called synchronously by raise_event.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+        self.connections = {}
+        self.clear_flows_on_connect = True
+
+    def addListenerByName(self, name, handler, **kw):
+        self.handlers.setdefault(name, []).append(handler)
+        return (name, handler)
+
+    def removeListener(self, listener):
+        name, handler = listener
+        self.handlers.get(name, []).remove(handler)
+
+    def raise_event(self, name, event):
+        for handler in list(self.handlers.get(name, [])):
+            handler(event)
+
+    def reset(self):
+        """Drop every handler, e.g. between two runs in the same process."""
+        self.handlers = {}
+        self.connections = {}
+        self.clear_flows_on_connect = True
+
+
+class StandInConnection(object):
+    """Stand-in for a connection from the controller to a switch.
+
+    Args:
+        dpid: datapath ID of the switch
+        ports: list of port numbers of the switch
+        sink: function called with (connection, message) for every message
+              the controller sends. If None, messages are kept in `sent`.
+    """
+
+    def __init__(self, dpid, ports, sink=None):
+        import pox.openflow.libopenflow_01 as of
+        from pox.lib.addresses import EthAddr
+
+        self.dpid = dpid
+        self.ports = dict(
+            (p, of.ofp_phy_port(port_no=p,
+                                hw_addr=EthAddr("02:00:00:{:02x}:{:02x}:{:02x}"
+                                                .format((dpid >> 8) & 0xff,
+                                                        dpid & 0xff, p & 0xff))))
+            for p in ports)
+        self.sink = sink
+        self.sent = []
+        self.listeners = []
+
+    def send(self, msg):
+        if self.sink is None:
+            self.sent.append(msg)
+        else:
+            self.sink(self, msg)
+
+    def addListeners(self, obj, **kw):
+        self.listeners.append(obj)
+
+    def dispatch(self, name, event):
+        """Call the `_handle_<name>` method of every bound listener."""
+        for listener in self.listeners:
+            handler = getattr(listener, "_handle_" + name, None)
+            if handler is not None:
+                handler(event)
+
+    def __str__(self):
+        return "[standin {}]".format(self.dpid)
+
+
+class NullConnection(StandInConnection):
+    """Connection dropping every message, only counting them."""
+
+    def __init__(self, dpid, ports):
+        super(NullConnection, self).__init__(dpid, ports)
+        self.n_sent = 0
+
+    def send(self, msg):
+        self.n_sent += 1
+
+
+def controller_factory(policy, nCore, nEdge, nHosts, clock=None,
+                       stats_interval=1.0, aggregate=False, table_capacity=0,
+                       eviction="lru", flow_stats_interval=0,
+                       uplink="adaptive", elephant_interval=0,
+                       elephant_threshold=1000.0, stats_budget=0,
+                       metrics=False, trace=0, topology=None,
+                       checkpoint=None, link_bw=10.0,
+                       capacities=None, vlans=0, placement="roundrobin",
+                       rebalance_interval=0, rebalance_moves=1,
+                       rebalance_threshold=0.1):
+    """Build the services shared by the switches of a policy.
+
+    Args:
+        policy: "tree", "vlan" or "adaptive"
+        nCore, nEdge, nHosts: as in ClosTopo
+        clock: function giving the current time, for the statistics
+        stats_interval: port statistics polling interval in seconds
+        aggregate: install flows per destination, for tree and vlan
+        table_capacity, eviction: flow budget per switch and eviction order
+        flow_stats_interval: flow statistics interval in seconds
+        uplink: "adaptive" or "ecmp", uplink selection of adaptive. There
+            are no port statistics with "ecmp".
+        elephant_interval, elephant_threshold: rerouting of the elephant
+            flows of adaptive, see Adaptive_Controller
+        stats_budget: statistics requests per second, 0 for no limit
+        metrics: record the counters of the controllers in
+            services["metrics"], rendered with its render() method
+        trace: number of decisions of the controllers recorded in
+            services["trace"], 0 for none
+        topology: ClosTopology or FatTreeTopology of the fabric, whose
+            sizes replace nCore, nEdge and nHosts. None for ClosTopo.
+        checkpoint: path of the file the state of the controllers is saved
+            to and restored from, in services["checkpoint"]. It is only
+            saved when its save() method is called. None for none.
+        link_bw: capacity of the links in Mbps, with which adaptive scores
+            the paths of the flows in services["path_loads"]
+        capacities: capacity in Kbps of the links of other speeds, by
+            (dpid, port) of the port sending
+        vlans: number of VLANs of vlan, 0 for one per core switch
+        placement: "roundrobin" or "traffic", how vlan places the hosts and
+            the VLANs, see TenantPlacement in services["placement"]. Its
+            rebalance() method is not called automatically.
+        rebalance_interval, rebalance_moves, rebalance_threshold: bounds
+            of the rebalancing of the VLANs, see TenantPlacement
+
+    Returns:
+        (make, services): make(connection) builds the controller of a switch
+        and services maps names to the shared objects. Statistics are not
+        requested automatically: services["scheduler"].run() sends the
+        requests that are due.
+    """
+    import time
+    from hosts import HostDirectory
+    from flowtable import FlowTables
+    from scheduler import StatsScheduler
+
+    args = (nCore, nEdge, nHosts)
+    if topology is not None:
+        args = (topology.nCore, topology.nEdge, topology.nHosts)
+    clock = clock or time.time
+    services = {"hosts": HostDirectory()}
+    services["scheduler"] = StatsScheduler(budget=stats_budget, clock=clock,
+                                           start_timer=False)
+    if policy == "vlan":
+        from tenants import Tenants
+        services["tenants"] = Tenants(n_vlans=vlans or args[0],
+                                      n_cores=args[0])
+    services["placement"] = None
+    if policy == "vlan" and placement == "traffic":
+        from portstats import PortStats
+        from placement import TenantPlacement
+        services["port_stats"] = PortStats(
+            time_interval=stats_interval, clock=clock,
+            scheduler=services["scheduler"])
+        services["placement"] = TenantPlacement(
+            services["tenants"], services["hosts"], services["port_stats"],
+            interval=rebalance_interval, max_moves=rebalance_moves,
+            threshold=rebalance_threshold, start_timer=False)
+    if policy == "adaptive" and uplink == "adaptive":
+        from portstats import PortStats
+        services["port_stats"] = PortStats(
+            time_interval=stats_interval, clock=clock,
+            scheduler=services["scheduler"])
+        from pathloads import PathLoads
+        from topology import build_topology
+        services["path_loads"] = PathLoads(
+            services["port_stats"], topology or build_topology(*args),
+            capacity=link_bw * 1000, capacities=capacities)
+
+    services["checkpoint"] = None
+    generation = 0
+    if checkpoint is not None:
+        from checkpoint import Checkpoint
+        services["checkpoint"] = Checkpoint(
+            checkpoint, services["hosts"], services.get("tenants"),
+            services.get("port_stats"), interval=0)
+        generation = services["checkpoint"].generation
+
+    timeouts = (100, 1000) if policy == "adaptive" else (0, 0)
+    services["flow_tables"] = FlowTables(table_capacity, eviction, *timeouts,
+                                         stats_interval=flow_stats_interval,
+                                         scheduler=services["scheduler"],
+                                         generation=generation)
+    services["metrics"] = None
+    if metrics:
+        from metrics import Metrics
+        services["metrics"] = Metrics(policy, services["flow_tables"],
+                                      start_timer=False)
+        services["metrics"].gauge("hosts", "Hosts in the host directory",
+                                  lambda: len(services["hosts"]))
+
+    services["trace"] = None
+    if trace:
+        from tracing import Trace
+        services["trace"] = Trace(trace)
+
+    if policy == "tree":
+        from tree import Tree_Controller
+
+        def make(connection):
+            return Tree_Controller(connection, *args, hosts=services["hosts"],
+                                   flow_tables=services["flow_tables"],
+                                   aggregate=aggregate,
+                                   metrics=services["metrics"],
+                                   trace=services["trace"],
+                                   topology=topology,
+                                   checkpoint=services["checkpoint"])
+    elif policy == "vlan":
+        from vlan import VLAN_Controller
+        if metrics:
+            services["metrics"].gauge("tenants", "Hosts assigned to a tenant",
+                                      lambda: len(services["tenants"]))
+
+        def make(connection):
+            return VLAN_Controller(connection, *args, hosts=services["hosts"],
+                                   tenants=services["tenants"],
+                                   flow_tables=services["flow_tables"],
+                                   aggregate=aggregate,
+                                   metrics=services["metrics"],
+                                   trace=services["trace"],
+                                   topology=topology,
+                                   checkpoint=services["checkpoint"],
+                                   placement=services["placement"])
+    elif policy == "adaptive":
+        from adaptive import Adaptive_Controller
+
+        def make(connection):
+            return Adaptive_Controller(connection, *args,
+                                       port_stats=services.get("port_stats"),
+                                       hosts=services["hosts"],
+                                       flow_tables=services["flow_tables"],
+                                       uplink=uplink,
+                                       elephant_interval=elephant_interval,
+                                       elephant_threshold=elephant_threshold,
+                                       metrics=services["metrics"],
+                                       trace=services["trace"],
+                                       topology=topology,
+                                       checkpoint=services["checkpoint"],
+                                       path_loads=services.get("path_loads"))
+    else:
+        raise ValueError("Unknown policy: {}".format(policy))
+    return make, services
+
+
+def make_packet(src_mac, dst_mac, src_ip=None, dst_ip=None,
+                tp_src=10000, tp_dst=5001):
+    """Build an Ethernet frame, carrying a TCP SYN if IPs are given."""
+    from pox.lib.addresses import EthAddr, IPAddr
+    from pox.lib.packet.ethernet import ethernet
+    from pox.lib.packet.ipv4 import ipv4
+    from pox.lib.packet.tcp import tcp
+
+    eth = ethernet(src=EthAddr(src_mac), dst=EthAddr(dst_mac))
+    if src_ip is None:
+        eth.type = 0x88b5  # Local experimental ethertype
+        eth.payload = b"\x00" * 46
+        return eth
+
+    segment = tcp(srcport=tp_src, dstport=tp_dst)
+    segment.SYN = True
+    ip = ipv4(srcip=IPAddr(src_ip), dstip=IPAddr(dst_ip),
+              protocol=ipv4.TCP_PROTOCOL)
+    ip.payload = segment
+    eth.type = ethernet.IP_TYPE
+    eth.payload = ip
+    return eth
+
+
+def make_packet_in(raw, in_port, buffer_id=None):
+    """Build the ofp_packet_in a switch sends for a table-miss."""
+    import pox.openflow.libopenflow_01 as of
+
+    packet_in = of.ofp_packet_in(in_port=in_port, reason=of.OFPR_NO_MATCH,
+                                 data=raw)
+    packet_in.buffer_id = of.NO_BUFFER if buffer_id is None else buffer_id
+    return packet_in
+
+
+def packet_in_event(connection, raw, in_port, buffer_id=None):
+    """Build a PacketIn event as raised by POX."""
+    from pox.lib.packet.ethernet import ethernet
+
+    return StandInEvent(connection=connection, dpid=connection.dpid,
+                        port=in_port, ofp=make_packet_in(raw, in_port,
+                                                         buffer_id),
+                        parsed=ethernet(raw))
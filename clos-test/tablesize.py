@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""Report the flow table sizes of the policies on a Clos topology.
+
+For each policy, the number of rules of every switch is given for the
+pre-installed state of proactive mode, computed from the topology, and for
+the state the reactive controllers build while the simulator routes traffic
+between hosts. Both are given with and without aggregation.
+
+POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python clos-test/tablesize.py --nEdge 32 --nHosts 16
+"""
+
+from __future__ import print_function
+
+import argparse
+
+import standins
+from simulator import Fabric, Flow, random_flows
+
+
+def reactive_sizes(policy, nCore, nEdge, nHosts, flows, aggregate):
+    """Route the flows and return the number of rules of every switch."""
+    fabric = Fabric(policy, nCore, nEdge, nHosts, aggregate=aggregate)
+    for flow in flows:
+        fabric.route(flow)
+    slow = sum(1 for f in flows if f.slow_path)
+    sizes = dict((dpid, len(s.table)) for dpid, s in fabric.switches.items())
+    return sizes, slow
+
+
+def all_pairs(n_hosts):
+    """One flow from every host to every other host."""
+    return [Flow(src, dst, 1.0, 0, 1, tp_src=10000)
+            for src in range(1, n_hosts + 1)
+            for dst in range(1, n_hosts + 1) if src != dst]
+
+
+def summary(sizes, nCore, limit):
+    """Largest core and edge tables, total and number of tables over limit."""
+    cores = [n for dpid, n in sizes.items() if dpid <= nCore]
+    edges = [n for dpid, n in sizes.items() if dpid > nCore]
+    over = sum(1 for n in sizes.values() if limit and n > limit)
+    return "{:>7} {:>7} {:>9} {:>5}".format(
+        max(cores), max(edges), sum(sizes.values()),
+        over if limit else "-")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--policy", action="append",
+                        choices=("tree", "vlan", "adaptive"),
+                        help="policy to report, may be repeated "
+                        "(default: all)")
+    parser.add_argument("--nCore", type=int, default=4)
+    parser.add_argument("--nEdge", type=int, default=8)
+    parser.add_argument("--nHosts", type=int, default=8)
+    parser.add_argument("--flows", type=int, metavar="N", default=1000,
+                        help="number of random flows routed in reactive mode")
+    parser.add_argument("--all-pairs", action="store_true",
+                        help="route a flow between every pair of hosts "
+                        "instead of random flows")
+    parser.add_argument("--limit", type=int, default=0,
+                        help="flow table capacity of the switches, to count "
+                        "the switches going over it")
+    parser.add_argument("--per-switch", action="store_true",
+                        help="print the size of every table")
+    args = parser.parse_args()
+
+    standins.init_pox()
+    from proactive import table_sizes
+
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+
+    n_hosts = args.nEdge * args.nHosts
+    if args.all_pairs:
+        flows = all_pairs(n_hosts)
+    else:
+        flows = random_flows(n_hosts, args.flows, 1.0, 1)
+    print("{} hosts, {} flows routed in reactive mode".format(
+        n_hosts, len(flows)))
+
+    print("{:<9} {:<9} {:<10} {:>7} {:>7} {:>9} {:>5}".format(
+        "policy", "mode", "flows", "core", "edge", "total", "over"))
+    for policy in args.policy or ("tree", "vlan", "adaptive"):
+        for aggregate in (False, True):
+            if aggregate and policy == "adaptive":
+                # Adaptive flows depend on the load, not only on the hosts
+                continue
+            label = "aggregated" if aggregate else "default"
+
+            proactive = table_sizes(policy, args.nCore, args.nEdge,
+                                    args.nHosts, aggregate)
+            print("{:<9} {:<9} {:<10} {}".format(
+                policy, "proactive", label,
+                summary(proactive, args.nCore, args.limit)))
+
+            reactive, slow = reactive_sizes(policy, args.nCore, args.nEdge,
+                                            args.nHosts, flows, aggregate)
+            print("{:<9} {:<9} {:<10} {}{}".format(
+                policy, "reactive", label,
+                summary(reactive, args.nCore, args.limit),
+                "  ({} flows on the slow path)".format(slow) if slow else ""))
+
+            if args.per_switch:
+                for dpid in sorted(reactive):
+                    print("    s{:<4} proactive={:<6} reactive={}".format(
+                        dpid, proactive[dpid], reactive[dpid]))
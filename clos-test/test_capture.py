@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""Unit tests of the capture of the events the controllers see.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_capture.py
+"""
+
+import os
+import unittest
+
+import standins
+from standins import Clock, ServiceTest, StandInEvent, port_stats_event
+
+standins.init_pox()
+
+import pox.core
+
+import capture
+from capture import Capture, read_capture
+from replay import Replay
+
+
+class TestCapture(ServiceTest):
+
+    def setUp(self):
+        ServiceTest.setUp(self)
+        self.clock = Clock()
+        self.nexus = pox.core.core.openflow
+
+    def connection_up(self, dpid, ports):
+        connection = StandInEvent(ports=dict.fromkeys(ports))
+        self.nexus.raise_event("ConnectionUp", StandInEvent(
+            connection=connection, dpid=dpid))
+
+    def record(self, path):
+        """Captures one event of each kind, a second apart."""
+        self.clock.now = 0.0
+        recorder = Capture(path, clock=self.clock, start_timer=False)
+        self.connection_up(3, [1, 2, 0xfffe])
+        self.clock.now = 1.0
+        self.nexus.raise_event("PacketIn", StandInEvent(
+            dpid=3, ofp=StandInEvent(in_port=2, buffer_id=None,
+                                     data=b"\x01\x02\x03")))
+        self.clock.now = 2.0
+        self.nexus.raise_event("PortStatsReceived",
+                               port_stats_event(3, {1: (100, 200)}))
+        self.clock.now = 3.0
+        self.nexus.raise_event("PortStatus", StandInEvent(
+            dpid=3, ofp=StandInEvent(reason=2, desc=StandInEvent(
+                port_no=1, config=1, state=0))))
+        self.clock.now = 4.0
+        self.nexus.raise_event("ConnectionDown", StandInEvent(dpid=3))
+        return recorder
+
+    def assertRecorded(self, path):
+        self.assertEqual(list(read_capture(path)), [
+            (0.0, capture.CONNECTION_UP, 3, [1, 2]),
+            (1.0, capture.PACKET_IN, 3, (2, 0xffffffff, b"\x01\x02\x03")),
+            (2.0, capture.PORT_STATS, 3, [(1, 200, 100)]),
+            (3.0, capture.PORT_STATUS, 3, (1, 2, 1, 0)),
+            (4.0, capture.CONNECTION_DOWN, 3, None)])
+
+    def test_round_trip(self):
+        path = os.path.join(self.directory, "run.bin")
+        recorder = self.record(path)
+        recorder.close()
+        self.assertRecorded(path)
+        self.assertEqual(sum(recorder.counters.values()), 5)
+        self.assertEqual(self.nexus.handlers,
+                         dict((name, []) for name in self.nexus.handlers))
+        # Closing again, e.g. at exit after POX went down
+        recorder.close()
+
+    def test_compressed(self):
+        path = os.path.join(self.directory, "run.bin.gz")
+        self.record(path).close()
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(2), b"\x1f\x8b")
+        self.assertRecorded(path)
+
+    def test_flushed_before_close(self):
+        for name in ("run.bin", "run.bin.gz"):
+            path = os.path.join(self.directory, name)
+            recorder = self.record(path)
+            recorder.flush()
+            # Readable as is if the controller is killed
+            self.assertRecorded(path)
+            recorder.close()
+
+    def test_truncated_record(self):
+        path = os.path.join(self.directory, "run.bin")
+        self.record(path).close()
+        with open(path, "rb+") as f:
+            f.truncate(os.path.getsize(path) - 1)
+        self.assertEqual(len(list(read_capture(path))), 4)
+
+    def test_not_a_capture(self):
+        path = os.path.join(self.directory, "run.bin")
+        with open(path, "wb") as f:
+            f.write(b"CKP1")
+        with self.assertRaises(ValueError):
+            list(read_capture(path))
+
+
+class TestReplay(ServiceTest):
+
+    def test_replay(self):
+        path = os.path.join(self.directory, "run.bin")
+        clock = Clock()
+        recorder = Capture(path, clock=clock, start_timer=False)
+        nexus = pox.core.core.openflow
+        # Core switches 1 and 2 and edge switches 3 to 5 with one host each,
+        # all with three ports
+        for dpid in range(1, 6):
+            nexus.raise_event("ConnectionUp", StandInEvent(
+                connection=StandInEvent(ports=dict.fromkeys(range(1, 4))),
+                dpid=dpid))
+            clock.now += 1.0
+        nexus.raise_event("ConnectionDown", StandInEvent(dpid=5))
+        recorder.close()
+
+        replay = Replay("tree", 2, 3, 1)
+        replay.run(path)
+        self.assertEqual(replay.events,
+                         {"ConnectionUp": 5, "ConnectionDown": 1})
+        self.assertEqual(replay.now, 5.0)
+        self.assertEqual(sorted(replay.nexus.connections), [1, 2, 3, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
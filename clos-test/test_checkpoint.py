@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""Unit tests of the checkpoint of the state of the controllers.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_checkpoint.py
+"""
+
+import os
+import unittest
+
+import standins
+from standins import Clock, ServiceTest, mac
+
+standins.init_pox()
+
+from pox.core import core
+
+from checkpoint import Checkpoint
+from hosts import HostDirectory
+from portstats import PortStats
+from tenants import Tenants
+from throughput import ThroughputEstimator
+
+
+class TestCheckpoint(ServiceTest):
+
+    def state(self, path):
+        hosts = HostDirectory()
+        tenants = Tenants(4, n_cores=2)
+        port_stats = PortStats(start_timer=False, clock=Clock())
+        checkpoint = Checkpoint(path, hosts, tenants, port_stats,
+                                start_timer=False)
+        return checkpoint, hosts, tenants, port_stats
+
+    def test_round_trip(self):
+        path = os.path.join(self.directory, "checkpoint.bin")
+        checkpoint, hosts, tenants, port_stats = self.state(path)
+        self.assertFalse(checkpoint.restored)
+        connection = standins.StandInConnection(3, [1, 2, 3])
+        mac_table = checkpoint.register(connection)
+        mac_table[mac(1)] = 1
+        mac_table[mac(2)] = 3
+        hosts.learn(mac(1), 3, 1)
+        hosts.learn(mac(2), 4, 2)
+        tenants.assign(mac(1))
+        tenants.assign(mac(2))
+        tenants.place(2, 1)
+        view = port_stats.register(connection)
+        estimator = ThroughputEstimator()
+        estimator.add_sample(1.0, 1000)
+        estimator.add_sample(2.0, 126000)
+        view[1] = estimator
+        self.assertGreater(checkpoint.save(), 0)
+        self.assertEqual(checkpoint.save(), 0)
+
+        # Changes since the first save are appended
+        del mac_table[mac(2)]
+        hosts.learn(mac(2), 4, 3)
+        self.assertEqual(checkpoint.save(), 2)
+        checkpoint.close()
+
+        core.openflow.reset()
+        restored, hosts2, tenants2, port_stats2 = self.state(path)
+        self.assertTrue(restored.restored)
+        self.assertEqual(restored.generation, 1)
+        self.assertFalse(core.openflow.clear_flows_on_connect)
+        self.assertEqual(restored.register(connection), {mac(1): 1})
+        self.assertEqual(hosts2.locations, hosts.locations)
+        self.assertEqual(sorted(tenants2.items()), sorted(tenants.items()))
+        self.assertEqual(tenants2.next_vlan, tenants.next_vlan)
+        self.assertEqual(tenants2.core_of(2), 1)
+        resumed = port_stats2.port_throughput[3][1]
+        self.assertEqual(resumed.last_update(), 2.0)
+        self.assertAlmostEqual(resumed.smoothed(), 1000.0)
+        restored.close()
+
+    def test_compaction(self):
+        path = os.path.join(self.directory, "checkpoint.bin")
+        hosts = HostDirectory()
+        checkpoint = Checkpoint(path, hosts, capacity=8, start_timer=False)
+        for port in range(1, 21):
+            hosts.learn(mac(1), 1, port)
+            checkpoint.save()
+        self.assertLessEqual(checkpoint.count, checkpoint.capacity)
+        checkpoint.close()
+
+        core.openflow.reset()
+        hosts2 = HostDirectory()
+        Checkpoint(path, hosts2, start_timer=False).close()
+        self.assertEqual(hosts2.locations, {mac(1): (1, 20)})
+
+    def test_not_a_checkpoint(self):
+        path = os.path.join(self.directory, "checkpoint.bin")
+        with open(path, "wb") as f:
+            f.write(b"\x00" * 64)
+        with self.assertRaises(ValueError):
+            Checkpoint(path, HostDirectory(), start_timer=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+"""Unit tests of the base class of the controllers and of their policies.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_controller.py
+"""
+
+import unittest
+
+import standins
+from standins import (ServiceTest, StandInConnection, StandInEvent,
+                      controller_factory, mac, make_packet, packet_in_event)
+
+standins.init_pox()
+
+import pox.openflow.libopenflow_01 as of
+
+from controller import Clos_Controller
+from proactive import AGGREGATE_PRIORITY
+from topology import DOWNLINK, HOST, UPLINK
+import tracing
+
+
+def outputs(msg):
+    """Gives the output ports of the actions of a message."""
+    return [action.port for action in msg.actions]
+
+
+class PolicyTest(ServiceTest):
+    """Two core switches 1 and 2, edge switches 3 to 5 with two hosts each.
+
+    Core switch c is on port c of every edge switch, and edge switch e on
+    port e - 2 of every core switch. Host h is on port 3 or 4 of edge
+    switch (h - 1) // 2 + 3.
+    """
+
+    policy = None
+
+    def fabric(self, nCore=2, nEdge=3, nHosts=2, **options):
+        self.nCore, self.nEdge, self.nHosts = nCore, nEdge, nHosts
+        self.make, self.services = controller_factory(
+            self.policy, nCore, nEdge, nHosts, **options)
+        self.hosts = self.services["hosts"]
+
+    def switch(self, dpid, extra_ports=()):
+        """Connects a switch and gives its connection and controller."""
+        if dpid <= self.nCore:
+            ports = list(range(1, self.nEdge + 1))
+        else:
+            ports = list(range(1, self.nCore + self.nHosts + 1))
+        connection = StandInConnection(dpid, ports + list(extra_ports))
+        controller = self.make(connection)
+        del connection.sent[:]
+        return connection, controller
+
+    def packet_in(self, connection, src, dst, in_port, buffer_id=None,
+                  ip=False):
+        """Sends a packet from host `src` to host `dst` to the controller."""
+        if ip:
+            packet = make_packet(mac(src), mac(dst), "10.0.0.{}".format(src),
+                                 "10.0.0.{}".format(dst))
+        else:
+            packet = make_packet(mac(src), mac(dst))
+        connection.dispatch("PacketIn", packet_in_event(
+            connection, packet.pack(), in_port, buffer_id))
+        sent = list(connection.sent)
+        del connection.sent[:]
+        return sent
+
+    def assertFlood(self, sent, ports):
+        self.assertEqual(len(sent), 1)
+        self.assertIsInstance(sent[0], of.ofp_packet_out)
+        self.assertEqual(outputs(sent[0]), ports)
+
+    def assertFlow(self, sent, out_port):
+        flow_mods = [msg for msg in sent if isinstance(msg, of.ofp_flow_mod)]
+        self.assertEqual(len(flow_mods), 1)
+        self.assertEqual(flow_mods[0].command, of.OFPFC_ADD)
+        self.assertEqual(outputs(flow_mods[0]), [out_port])
+        return flow_mods[0]
+
+
+class TestClosController(PolicyTest):
+
+    policy = "tree"
+
+    def test_policy_is_abstract(self):
+
+        class NoPolicy(Clos_Controller):
+            pass
+
+        with self.assertRaises(TypeError):
+            NoPolicy(None, 2, 3, 2, None, None)
+
+    def test_unknown_port_dropped(self):
+        self.fabric(trace=4)
+        connection, controller = self.switch(3, extra_ports=[7])
+        self.assertEqual(self.packet_in(connection, 1, 2, 7), [])
+        self.assertEqual(controller.mac_to_port, {})
+        self.assertIsNone(self.hosts.locate(mac(1)))
+        record = list(self.services["trace"].records())[-1]
+        self.assertEqual(record[5:], (of.OFPP_NONE, tracing.DROP))
+
+    def test_port_roles(self):
+        self.fabric()
+        _, edge = self.switch(3)
+        self.assertEqual([edge.ports.role_of(p) for p in range(1, 5)],
+                         [UPLINK, UPLINK, HOST, HOST])
+        _, core = self.switch(1)
+        self.assertEqual([core.ports.role_of(p) for p in range(1, 4)],
+                         [DOWNLINK] * 3)
+
+    def test_flood_actions(self):
+        self.fabric()
+        _, edge = self.switch(3)
+        self.assertEqual([a.port for a in edge.flood_down], [3, 4])
+        self.assertEqual([a.port for a in edge.flood_to_all], [of.OFPP_FLOOD])
+        _, core = self.switch(1)
+        self.assertEqual([a.port for a in core.flood_down], [1, 2, 3])
+
+    def test_lookup_port(self):
+        self.fabric()
+        _, edge = self.switch(3)
+        _, other_edge = self.switch(4)
+        _, core = self.switch(1)
+        self.assertIsNone(edge.lookup_port(mac(1)))
+
+        self.hosts.learn(mac(1), 3, 3)
+        # The edge switch of the host reaches it directly
+        self.assertEqual(edge.lookup_port(mac(1)), 3)
+        # A core switch through the downlink to its edge switch
+        self.assertEqual(core.lookup_port(mac(1)), 1)
+        # Another edge switch through its way up, the root of the tree
+        self.assertEqual(other_edge.lookup_port(mac(1)),
+                         other_edge.REMOTE_PORT)
+        self.assertEqual(other_edge.REMOTE_PORT, 1)
+        # The ports learnt by the switch come first
+        other_edge.mac_to_port[mac(1)] = 2
+        self.assertEqual(other_edge.lookup_port(mac(1)), 2)
+
+    def test_buffered_packet_released_by_the_flow_mod(self):
+        self.fabric()
+        connection, _ = self.switch(3)
+        self.hosts.learn(mac(2), 3, 4)
+        sent = self.packet_in(connection, 1, 2, 3, buffer_id=42)
+        self.assertEqual(len(sent), 1)
+        self.assertFlow(sent, 4)
+        self.assertEqual(sent[0].buffer_id, 42)
+
+    def test_unbuffered_packet_sent_back_through_the_table(self):
+        self.fabric()
+        connection, _ = self.switch(3)
+        self.hosts.learn(mac(2), 3, 4)
+        sent = self.packet_in(connection, 1, 2, 3)
+        self.assertEqual(len(sent), 2)
+        flow_mod, packet_out = sent
+        self.assertFlow([flow_mod], 4)
+        self.assertIn(flow_mod.buffer_id, (None, of.NO_BUFFER))
+        self.assertIsInstance(packet_out, of.ofp_packet_out)
+        self.assertEqual(outputs(packet_out), [of.OFPP_TABLE])
+        self.assertEqual(packet_out.data,
+                         make_packet(mac(1), mac(2)).pack())
+
+    def test_metrics(self):
+        self.fabric(metrics=True)
+        connection, _ = self.switch(3)
+        self.packet_in(connection, 1, 9, 3)
+        self.hosts.learn(mac(2), 3, 4)
+        self.packet_in(connection, 1, 2, 3)
+        switch = self.services["metrics"].switches[3]
+        self.assertEqual((switch.packet_in, switch.flood, switch.flow_mod,
+                          switch.packet_out), (2, 1, 1, 2))
+
+
+class TestTreeController(PolicyTest):
+
+    policy = "tree"
+
+    def test_uplinks_blocked_but_the_root(self):
+        self.fabric()
+        connection = StandInConnection(3, [1, 2, 3, 4])
+        controller = self.make(connection)
+        port_mods = [msg for msg in connection.sent
+                     if isinstance(msg, of.ofp_port_mod)]
+        self.assertEqual([(msg.port_no, msg.mask, msg.config)
+                          for msg in port_mods],
+                         [(2, of.OFPPC_NO_FLOOD, of.OFPPC_NO_FLOOD)])
+        self.assertEqual(controller.blocked, set([2]))
+
+    def test_host_to_unknown_host(self):
+        self.fabric()
+        connection, edge = self.switch(3)
+        self.assertFlood(self.packet_in(connection, 1, 5, 3),
+                         [of.OFPP_FLOOD])
+        self.assertEqual(edge.mac_to_port, {mac(1): 3})
+        self.assertEqual(self.hosts.locate(mac(1)), (3, 3))
+
+    def test_host_to_host_of_another_edge_switch(self):
+        self.fabric()
+        connection, _ = self.switch(3)
+        self.hosts.learn(mac(5), 5, 3)
+        flow_mod = self.assertFlow(self.packet_in(connection, 1, 5, 3), 1)
+        self.assertEqual((str(flow_mod.match.dl_src),
+                          str(flow_mod.match.dl_dst)), (mac(1), mac(5)))
+
+    def test_uplink_to_local_host(self):
+        self.fabric()
+        connection, edge = self.switch(3)
+        self.hosts.learn(mac(2), 3, 4)
+        self.assertFlow(self.packet_in(connection, 5, 2, 1), 4)
+        # Hosts behind an uplink are not in the directory
+        self.assertEqual(edge.mac_to_port[mac(5)], 1)
+        self.assertIsNone(self.hosts.locate(mac(5)))
+
+    def test_core_switch(self):
+        self.fabric()
+        connection, core = self.switch(1)
+        self.assertFlood(self.packet_in(connection, 1, 5, 1),
+                         [of.OFPP_FLOOD])
+        # Found in the directory, not flooded
+        self.hosts.learn(mac(5), 5, 3)
+        self.assertFlow(self.packet_in(connection, 1, 5, 1), 3)
+
+    def test_aggregate(self):
+        self.fabric(aggregate=True)
+        connection, _ = self.switch(3)
+        sent = self.packet_in(connection, 1, 5, 3)
+        # The flow towards the source is removed, so that its answer
+        # comes to the controller
+        self.assertEqual(len(sent), 2)
+        self.assertFlood(sent[:1], [of.OFPP_FLOOD])
+        self.assertEqual(sent[1].command, of.OFPFC_DELETE_STRICT)
+        self.assertEqual(str(sent[1].match.dl_dst), mac(1))
+
+        self.hosts.learn(mac(5), 5, 3)
+        flow_mod = self.assertFlow(self.packet_in(connection, 1, 5, 3), 1)
+        self.assertIsNone(flow_mod.match.dl_src)
+        self.assertEqual(str(flow_mod.match.dl_dst), mac(5))
+
+    def test_core_aggregates_the_hosts_of_an_edge_switch(self):
+        self.fabric(2, 2, 16, aggregate=True)
+        connection, _ = self.switch(1)
+        self.hosts.learn(mac(12), 3, 14)
+        flow_mod = self.assertFlow(
+            self.packet_in(connection, 17, 12, 2, ip=True), 1)
+        self.assertEqual(flow_mod.priority, AGGREGATE_PRIORITY)
+        address, bits = flow_mod.match.get_nw_dst()
+        self.assertEqual("{}/{}".format(address, bits), "10.0.0.8/29")
+
+
+class TestVLANController(PolicyTest):
+
+    policy = "vlan"
+
+    def test_host_to_unknown_host(self):
+        self.fabric()
+        connection, _ = self.switch(3)
+        # Host 1 joins VLAN 1 of core switch 1, host 2 VLAN 2 of core
+        # switch 2, and the packets go up to the core switch of their VLAN
+        sent = self.packet_in(connection, 1, 5, 3)
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(outputs(sent[0]), [1])
+        self.assertEqual(outputs(self.packet_in(connection, 2, 5, 4)[0]), [2])
+        self.assertEqual(self.services["tenants"].getVLAN(mac(2)), 2)
+
+    def test_host_to_host_of_another_edge_switch(self):
+        self.fabric()
+        connection, _ = self.switch(3)
+        self.packet_in(connection, 1, 9, 3)
+        self.hosts.learn(mac(5), 5, 3)
+        # Up to the core switch of the VLAN of the source
+        self.assertFlow(self.packet_in(connection, 2, 5, 4), 2)
+        self.assertFlow(self.packet_in(connection, 1, 5, 3), 1)
+
+    def test_uplink_to_unknown_host(self):
+        self.fabric()
+        connection, _ = self.switch(3)
+        # One packet_out to every host port
+        self.assertFlood(self.packet_in(connection, 5, 1, 2), [3, 4])
+
+    def test_uplink_to_local_host(self):
+        self.fabric()
+        connection, _ = self.switch(3)
+        self.packet_in(connection, 1, 9, 3)
+        self.assertFlow(self.packet_in(connection, 5, 1, 2), 3)
+
+    def test_core_switch(self):
+        self.fabric()
+        connection, _ = self.switch(2)
+        self.assertFlood(self.packet_in(connection, 1, 5, 1),
+                         [of.OFPP_FLOOD])
+        self.hosts.learn(mac(5), 5, 3)
+        self.assertFlow(self.packet_in(connection, 1, 5, 1), 3)
+
+
+class TestAdaptiveController(PolicyTest):
+
+    policy = "adaptive"
+
+    def test_host_to_host_of_another_edge_switch(self):
+        self.fabric()
+        connection, _ = self.switch(3)
+        self.hosts.learn(mac(5), 5, 3)
+        flow_mod = self.assertFlow(self.packet_in(connection, 1, 5, 3,
+                                                  ip=True), 1)
+        self.assertIsNone(flow_mod.match.in_port)
+        self.assertEqual(flow_mod.match.tp_dst, 5001)
+        # The flow reserved load on the first uplink
+        self.assertFlow(self.packet_in(connection, 2, 5, 4, ip=True), 2)
+
+    def test_host_to_unknown_host(self):
+        self.fabric()
+        connection, _ = self.switch(3)
+        self.assertEqual(len(self.assertFlow(
+            self.packet_in(connection, 1, 5, 3), 1).actions), 1)
+        self.assertEqual(self.hosts.locate(mac(1)), (3, 3))
+
+    def test_host_to_local_host(self):
+        self.fabric()
+        connection, _ = self.switch(3)
+        self.packet_in(connection, 2, 9, 4)
+        self.assertFlow(self.packet_in(connection, 1, 2, 3), 4)
+
+    def test_uplink(self):
+        self.fabric()
+        connection, _ = self.switch(3)
+        self.assertFlood(self.packet_in(connection, 5, 1, 1), [3, 4])
+        self.packet_in(connection, 1, 9, 3)
+        self.assertFlow(self.packet_in(connection, 5, 1, 2), 3)
+
+    def test_core_switch(self):
+        self.fabric()
+        connection, _ = self.switch(1)
+        self.assertFlood(self.packet_in(connection, 1, 5, 1),
+                         [of.OFPP_FLOOD])
+        self.hosts.learn(mac(5), 5, 3)
+        self.assertFlow(self.packet_in(connection, 1, 5, 1), 3)
+
+    def test_untracked_flows_are_not_elephants(self):
+        self.fabric(elephant_interval=1)
+        connection, controller = self.switch(3)
+        self.hosts.learn(mac(5), 5, 3)
+        flow_mod = self.assertFlow(self.packet_in(connection, 1, 5, 3,
+                                                  ip=True), 1)
+        # Proactive rules have cookie 0, as do all the untracked flows
+        stats = [StandInEvent(cookie=cookie, byte_count=10**6,
+                              actions=[of.ofp_action_output(port=port)])
+                 for cookie, port in ((flow_mod.cookie, 1), (0, 1), (0, 2),
+                                      (flow_mod.cookie + 1, 2))]
+        connection.dispatch("FlowStatsReceived",
+                            StandInEvent(dpid=3, stats=stats))
+        self.assertEqual(list(controller.elephants.flows), [flow_mod.cookie])
+
+    def test_ecmp(self):
+        self.fabric(uplink="ecmp")
+        connection, _ = self.switch(3)
+        self.hosts.learn(mac(5), 5, 3)
+        first = self.packet_in(connection, 1, 5, 3, ip=True)[0]
+        self.assertIn(outputs(first), ([1], [2]))
+        # The same flow hashes to the same uplink
+        self.assertFlow(self.packet_in(connection, 1, 5, 3, ip=True),
+                        outputs(first)[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
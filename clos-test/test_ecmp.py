@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""Unit tests of the hash-based selection of the uplinks.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_ecmp.py
+"""
+
+import unittest
+
+import standins
+from standins import mac
+
+standins.init_pox()
+
+from ecmp import HashUplinkSelector
+
+
+def flow(src, dst, tp_src=10000):
+    """TCP SYN from host src to host dst."""
+    return standins.make_packet(mac(src), mac(dst),
+                                "10.0.0.{}".format(src),
+                                "10.0.0.{}".format(dst), tp_src=tp_src)
+
+
+class TestHashUplinkSelector(unittest.TestCase):
+
+    def test_same_flow_same_uplink(self):
+        selector = HashUplinkSelector([1, 2, 3, 4])
+        # Same ring whatever the order in which the uplinks are given
+        other = HashUplinkSelector([4, 3, 2, 1])
+        uplinks = set()
+        for tp_src in range(10000, 10200):
+            uplink = selector.select(flow(1, 2, tp_src))
+            self.assertEqual(selector.select(flow(1, 2, tp_src)), uplink)
+            self.assertEqual(other.select(flow(1, 2, tp_src)), uplink)
+            uplinks.add(uplink)
+        # The transport ports spread the flows of a pair of hosts
+        self.assertEqual(uplinks, set([1, 2, 3, 4]))
+
+    def test_mac_pair(self):
+        selector = HashUplinkSelector([1, 2, 3, 4], fields="mac")
+        for src, dst in [(1, 2), (2, 1), (3, 9), (17, 5)]:
+            uplink = selector.select(flow(src, dst))
+            for tp_src in range(10001, 10050):
+                self.assertEqual(selector.select(flow(src, dst, tp_src)),
+                                 uplink)
+            # Packets other than IPv4 of the same hosts
+            self.assertEqual(
+                selector.select(standins.make_packet(mac(src), mac(dst))),
+                uplink)
+
+    def test_removal_moves_one_nth(self):
+        selector = HashUplinkSelector([1, 2, 3, 4])
+        before = list(selector.table)
+        selector.remove_port(3)
+        moved = [bucket for bucket, port in enumerate(selector.table)
+                 if port != before[bucket]]
+        # Only the buckets of the removed uplink move, about 1/4 of them
+        self.assertTrue(all(before[bucket] == 3 for bucket in moved))
+        self.assertEqual(len(moved), before.count(3))
+        self.assertAlmostEqual(len(moved) / float(len(before)), 0.25,
+                               delta=0.1)
+        self.assertNotIn(3, selector.table)
+
+        selector.add_port(3)
+        self.assertEqual(list(selector.table), before)
+
+    def test_last_uplink_removed(self):
+        selector = HashUplinkSelector([1])
+        selector.remove_port(1)
+        self.assertIsNone(selector.select(flow(1, 2)))
+        selector.add_port(2)
+        self.assertEqual(selector.select(flow(1, 2)), 2)
+
+    def test_unknown_fields(self):
+        with self.assertRaises(ValueError):
+            HashUplinkSelector([1, 2], fields="vlan")
+
+
+if __name__ == "__main__":
+    unittest.main()
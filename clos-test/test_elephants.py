@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""Unit tests of the detection and rerouting of the elephant flows.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_elephants.py
+"""
+
+import unittest
+
+import standins
+
+standins.init_pox()
+
+from elephants import ElephantDetector
+
+
+class TestElephantDetector(unittest.TestCase):
+
+    def measure(self, detector, now, rates):
+        """Gives flows the rates in Kbps of the second before `now`."""
+        counts = dict((cookie, flow.byte_count)
+                      for cookie, flow in detector.flows.items())
+        detector.update(now, dict(
+            (cookie, counts.get(cookie, 0) + int(rate * 125))
+            for cookie, rate in rates.items()))
+        return
+
+    def elephant(self, detector, rates, now=1.0):
+        """Makes flows elephants with the given rates in Kbps."""
+        detector.update(now - 1.0, dict((cookie, 0) for cookie in rates))
+        self.measure(detector, now, rates)
+        return
+
+    def test_first_statistics(self):
+        detector = ElephantDetector(threshold=1000.0)
+        detector.update(0.0, {1: 10 ** 9})
+        self.assertEqual(detector.flows[1].rate, 0.0)
+        self.assertEqual(detector.elephants(), [])
+
+    def test_hysteresis(self):
+        detector = ElephantDetector(threshold=1000.0, release=0.5)
+        states = []
+        detector.update(0.0, {1: 0})
+        for second, rate in enumerate([1200, 800, 600, 400, 800, 1001], 1):
+            self.measure(detector, float(second), {1: rate})
+            states.append(detector.flows[1].elephant)
+        # Elephant above 1000 Kbps until it goes below 500 Kbps
+        self.assertEqual(states, [True, True, True, False, False, True])
+
+    def test_forgotten_flows(self):
+        detector = ElephantDetector(threshold=1000.0)
+        self.elephant(detector, {1: 3000, 2: 5000, 3: 100})
+        self.assertEqual(detector.elephants(), [(2, 5000.0), (1, 3000.0)])
+        self.measure(detector, 2.0, {1: 3000})
+        self.assertEqual(list(detector.flows), [1])
+        self.assertEqual(detector.elephants(), [(1, 3000.0)])
+
+    def test_margin(self):
+        detector = ElephantDetector(threshold=1000.0, margin=0.5)
+        self.elephant(detector, {1: 2000})
+        # 3000 Kbps more on port 1, but not more than 1.5 times the rate
+        self.assertEqual(detector.rebalance(1.0, {1: 1}, {1: 5000, 2: 2000}),
+                         [])
+        self.assertEqual(detector.rebalance(1.0, {1: 1}, {1: 5100, 2: 2000}),
+                         [(1, 1, 2, 2000.0)])
+
+        detector = ElephantDetector(threshold=1000.0, margin=0.0)
+        self.elephant(detector, {1: 2000})
+        self.assertEqual(detector.rebalance(1.0, {1: 1}, {1: 4001, 2: 2000}),
+                         [(1, 1, 2, 2000.0)])
+
+    def test_moves_update_the_loads(self):
+        detector = ElephantDetector(threshold=1000.0, margin=0.5)
+        self.elephant(detector, {1: 2500, 2: 2000, 3: 1500})
+        moves = detector.rebalance(1.0, {1: 1, 2: 1, 3: 1},
+                                   {1: 9000, 2: 1000, 3: 0})
+        # The third would make port 3 busier than port 1 within the margin
+        self.assertEqual(moves, [(1, 1, 3, 2500.0), (2, 1, 2, 2000.0)])
+
+    def test_hold_time(self):
+        detector = ElephantDetector(threshold=1000.0, hold_time=10.0)
+        self.elephant(detector, {1: 2000}, now=2.0)
+        loads = {1: 8000, 2: 0}
+        self.assertEqual(len(detector.rebalance(2.0, {1: 1}, loads)), 1)
+        self.assertEqual(detector.flows[1].moved_at, 2.0)
+        # Still on a loaded uplink, but moved too recently
+        self.assertEqual(detector.rebalance(11.9, {1: 2}, {1: 0, 2: 8000}),
+                         [])
+        self.assertEqual(detector.rebalance(12.0, {1: 2}, {1: 0, 2: 8000}),
+                         [(1, 2, 1, 2000.0)])
+
+    def test_unknown_uplink(self):
+        detector = ElephantDetector(threshold=1000.0)
+        self.elephant(detector, {1: 2000, 2: 2000})
+        self.assertEqual(detector.rebalance(1.0, {1: 5}, {1: 8000, 2: 0}),
+                         [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""Unit tests of the flow tables kept within their capacity.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_flowtable.py
+"""
+
+import unittest
+
+import standins
+from standins import ServiceTest, mac
+
+standins.init_pox()
+
+import pox.openflow.libopenflow_01 as of
+from pox.core import core
+
+from flowtable import FlowTables
+
+
+class TestFlowTables(ServiceTest):
+
+    def install(self, table, host):
+        msg = of.ofp_flow_mod(match=of.ofp_match(dl_dst=mac(host)))
+        msg.actions.append(of.ofp_action_output(port=1))
+        table.install(msg)
+        return msg
+
+    def deleted(self, connection):
+        return [str(msg.match.dl_dst) for msg in connection.sent
+                if msg.command == of.OFPFC_DELETE_STRICT]
+
+    def test_lru_needs_flow_statistics(self):
+        with self.assertRaises(ValueError):
+            FlowTables(capacity=10, eviction="lru")
+
+    def test_no_capacity(self):
+        tables = FlowTables()
+        connection = standins.StandInConnection(1, [1, 2])
+        table = tables.register(connection)
+        for host in range(1, 101):
+            self.install(table, host)
+        self.assertEqual(len(table), 100)
+        self.assertEqual(self.deleted(connection), [])
+
+    def test_lru_eviction(self):
+        tables = FlowTables(capacity=20, eviction="lru", stats_interval=1)
+        connection = standins.StandInConnection(1, [1, 2])
+        table = tables.register(connection)
+        msgs = [self.install(table, host) for host in range(1, 21)]
+        self.assertTrue(msgs[0].flags & of.OFPFF_SEND_FLOW_REM)
+
+        # The first flow carried traffic since the last statistics
+        core.openflow.raise_event("FlowStatsReceived", standins.StandInEvent(
+            dpid=1, stats=[standins.StandInEvent(cookie=msgs[0].cookie,
+                                                 byte_count=1500)]))
+        self.install(table, 21)
+        self.assertEqual(self.deleted(connection), [mac(2)])
+        self.assertEqual(len(table), 20)
+        self.assertEqual(table.counters["evicted"], 1)
+
+    def test_bytes_eviction(self):
+        tables = FlowTables(capacity=20, eviction="bytes")
+        connection = standins.StandInConnection(1, [1, 2])
+        table = tables.register(connection)
+        msgs = [self.install(table, host) for host in range(1, 21)]
+        table.update_usage([
+            standins.StandInEvent(cookie=msg.cookie, byte_count=1000 * (i + 1))
+            for i, msg in enumerate(msgs) if i != 7])
+        self.install(table, 21)
+        self.assertEqual(self.deleted(connection), [mac(8)])
+
+    def test_install_again(self):
+        tables = FlowTables(capacity=2, eviction="bytes")
+        connection = standins.StandInConnection(1, [1, 2])
+        table = tables.register(connection)
+        self.install(table, 1)
+        self.install(table, 2)
+        msg = self.install(table, 1)
+        # The switch replaces the flow, nothing is evicted
+        self.assertEqual(self.deleted(connection), [])
+        self.assertEqual(len(table), 2)
+        self.assertIn(msg.cookie, table.flows)
+
+    def test_flow_removed(self):
+        tables = FlowTables()
+        connection = standins.StandInConnection(1, [1, 2])
+        table = tables.register(connection)
+        msg = self.install(table, 1)
+        core.openflow.raise_event("FlowRemoved", standins.StandInEvent(
+            dpid=1, ofp=standins.StandInEvent(cookie=msg.cookie)))
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.counters["removed"], 1)
+
+    def test_table_full(self):
+        tables = FlowTables(capacity=100, eviction="bytes")
+        connection = standins.StandInConnection(1, [1, 2])
+        table = tables.register(connection)
+        msgs = [self.install(table, host) for host in range(1, 41)]
+        core.openflow.raise_event("ErrorIn", standins.StandInEvent(
+            dpid=1, ofp=standins.StandInEvent(
+                type=of.OFPET_FLOW_MOD_FAILED,
+                code=of.OFPFMFC_ALL_TABLES_FULL, xid=msgs[-1].xid)))
+        # The refused flow is forgotten and one flow evicted
+        self.assertEqual(table.capacity, 39)
+        self.assertEqual(len(table), 38)
+        self.assertEqual(table.counters["table_full"], 1)
+
+    def test_generation(self):
+        table = FlowTables(generation=3).register(
+            standins.StandInConnection(1, [1, 2]))
+        msg = self.install(table, 1)
+        self.assertEqual(msg.cookie >> 32, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
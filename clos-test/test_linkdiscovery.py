@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""Unit tests of the layout learnt from the links between the switches.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_linkdiscovery.py
+"""
+
+import os
+import random
+import unittest
+
+import standins
+from standins import ServiceTest
+
+standins.init_pox()
+
+import pox.openflow.libopenflow_01 as of
+
+from linkdiscovery import DiscoveredTopology, live_ports
+from topology import UNKNOWN, ClosTopology, FatTreeTopology
+
+
+def roles(ports):
+    """Gives the roles of a SwitchPorts table, but the two-tier edge_below."""
+    return (ports.core, ports.host_ports, ports.uplinks, ports.downlinks,
+            ports.down, ports.to_core)
+
+
+def discover(topology, switch_ports, seed=0):
+    """Learns the links of a topology in a random order.
+
+    Parameters
+    ----------
+    topology : ClosTopology or FatTreeTopology
+        Layout whose links are discovered
+    switch_ports : dict of int: list of int
+        Ports up of each switch
+
+    Returns
+    -------
+    DiscoveredTopology
+        Layout learnt
+    """
+
+    discovered = DiscoveredTopology()
+    for switch_id in sorted(switch_ports):
+        discovered.add_switch(switch_id, switch_ports[switch_id])
+    links = topology.links()
+    random.Random(seed).shuffle(links)
+    for link in links:
+        discovered.add_link(*link)
+    return discovered
+
+
+def clos_ports(topology, extra=()):
+    """Gives the ports of the switches of a two-tier Clos topology."""
+    ports = dict((c, list(range(1, topology.nEdge + 1)))
+                 for c in topology.coreSwitchIDs)
+    ports.update((e, list(range(1, topology.nCore + topology.nHosts + 1)))
+                 for e in topology.edgeSwitchIDs)
+    for switch_id, port in extra:
+        ports[switch_id].append(port)
+    return ports
+
+
+class TestDiscoveredTopology(ServiceTest):
+
+    def assertSameLayout(self, discovered, topology):
+        for tier in ("coreSwitchIDs", "edgeSwitchIDs"):
+            self.assertEqual(getattr(discovered, tier),
+                             getattr(topology, tier))
+        for switch_id in topology.coreSwitchIDs + topology.edgeSwitchIDs:
+            self.assertEqual(roles(discovered.switch(switch_id)),
+                             roles(topology.switch(switch_id)))
+
+    def test_clos(self):
+        topology = ClosTopology(3, 4, 2)
+        discovered = discover(topology, clos_ports(topology))
+        self.assertSameLayout(discovered, topology)
+        self.assertEqual((discovered.nCore, discovered.nEdge,
+                          discovered.nHosts), (3, 4, 2))
+        self.assertEqual(discovered.aggregationSwitchIDs, [])
+        self.assertEqual(len(discovered), 12)
+
+    def test_fat_tree(self):
+        topology = FatTreeTopology(4)
+        ports = dict((s, list(range(1, 5))) for s in range(1, 21))
+        discovered = discover(topology, ports, seed=1)
+        self.assertSameLayout(discovered, topology)
+        self.assertEqual(discovered.aggregationSwitchIDs,
+                         topology.aggregationSwitchIDs)
+        for switch_id in topology.aggregationSwitchIDs:
+            self.assertEqual(roles(discovered.switch(switch_id)),
+                             roles(topology.switch(switch_id)))
+
+    def test_ports_down_are_ignored(self):
+        ports = [of.ofp_phy_port(port_no=1),
+                 of.ofp_phy_port(port_no=2, state=of.OFPPS_LINK_DOWN),
+                 of.ofp_phy_port(port_no=3, config=of.OFPPC_PORT_DOWN),
+                 of.ofp_phy_port(port_no=4)]
+        self.assertEqual(live_ports(ports), [1, 4])
+
+    def test_spare_port_up_on_a_core_switch(self):
+        topology = ClosTopology(2, 3, 2)
+        # Port 9 of core switch 1 is up and leads to no other switch
+        discovered = discover(topology, clos_ports(topology, [(1, 9)]))
+        self.assertIn(1, discovered.edgeSwitchIDs)
+
+        # A host is seen on edge switch 3, linked to core switch 1
+        discovered.add_host(3, 3)
+        self.assertSameLayout(discovered, topology)
+        self.assertEqual(discovered.switch(1).role_of(9), UNKNOWN)
+
+    def test_hosts_seen_on_links(self):
+        topology = ClosTopology(2, 2, 1)
+        discovered = DiscoveredTopology()
+        for switch_id, ports in clos_ports(topology).items():
+            discovered.add_switch(switch_id, ports)
+        # Flooded by core switch 1 before the link was discovered
+        discovered.add_host(3, 1)
+        discovered.add_host(3, 9)
+        self.assertEqual(discovered.hosts_seen, {3: set([1])})
+        for link in topology.links():
+            discovered.add_link(*link)
+        self.assertEqual(discovered.hosts_seen, {3: set()})
+        discovered.add_host(3, 1)
+        self.assertEqual(discovered.hosts_seen, {3: set()})
+        self.assertSameLayout(discovered, topology)
+
+    def test_link_removed(self):
+        topology = ClosTopology(2, 2, 1)
+        discovered = discover(topology, clos_ports(topology))
+        discovered.add_host(3, 3)
+        discovered.add_host(4, 3)
+        changes = []
+        discovered.add_listener(lambda: changes.append(len(discovered)))
+        # Port 1 of core switch 1 stays up but leads nowhere
+        discovered.remove_link(3, 1, 1, 1)
+        self.assertEqual(changes, [3])
+        self.assertEqual(discovered.switch(3).to_core, {2: 2})
+        self.assertEqual(discovered.switch(1).down, {4: 2})
+        # Already removed
+        discovered.remove_link(1, 1, 3, 1)
+        self.assertEqual(changes, [3])
+
+    def test_save_and_load(self):
+        path = os.path.join(self.directory, "fabric.txt")
+        topology = FatTreeTopology(4)
+        ports = dict((s, list(range(1, 5))) for s in range(1, 21))
+        discovered = discover(topology, ports)
+        discovered.save(path)
+        self.assertFalse(os.path.exists(path + ".tmp"))
+        with open(path, "a") as f:
+            f.write("\nlink 1 2\n# comment\n")
+
+        loaded = DiscoveredTopology(path)
+        self.assertEqual(loaded.links(), discovered.links())
+        self.assertEqual(loaded.switch_ports, discovered.switch_ports)
+        self.assertSameLayout(loaded, topology)
+
+        # Links not discovered again are dropped
+        for link in topology.links():
+            if link[0] != 7:
+                loaded.add_link(*link)
+        loaded.expire_unconfirmed()
+        self.assertEqual(len(loaded), len(discovered) - 2)
+        self.assertEqual(loaded.switch(7).uplinks, [])
+
+    def test_saved_on_change(self):
+        path = os.path.join(self.directory, "fabric.txt")
+        discovered = DiscoveredTopology(path)
+        discovered.add_switch(1, [1])
+        discovered.add_switch(2, [1, 2])
+        discovered.add_link(2, 1, 1, 1)
+        self.assertEqual(DiscoveredTopology(path).links(), [(1, 1, 2, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
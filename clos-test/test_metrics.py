@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""Unit tests of the counters exported in the Prometheus text format.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_metrics.py
+"""
+
+import os
+import socket
+import unittest
+from urllib.request import urlopen
+
+import standins
+from standins import ServiceTest, StandInEvent, mac
+
+standins.init_pox()
+
+import pox.openflow.libopenflow_01 as of
+from pox.core import core
+
+from flowtable import FlowTables
+from metrics import Histogram, Metrics
+from proactive import compute_rules, install_rules
+
+
+class TestMetrics(ServiceTest):
+
+    def test_histogram(self):
+        histogram = Histogram((1.0, 2.0))
+        for value in (0.5, 1.0, 1.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.counts), [2, 1, 1])
+        self.assertEqual(histogram.total, 6.0)
+
+    def test_render(self):
+        metrics = Metrics("tree")
+        mac_table = {mac(1): 3, mac(2): 4}
+        switch = metrics.register(StandInEvent(dpid=3),
+                                  tables={"mac": mac_table})
+        switch.handled(2e-5)
+        switch.handled(1.0)
+        switch.flood += 1
+        switch.flow_mod += 2
+        switch.packet_out += 3
+        metrics.gauge("hosts", "Hosts in the host directory", lambda: 7)
+        core.openflow.raise_event("PortStatsReceived", StandInEvent(dpid=3))
+        core.openflow.raise_event("FlowStatsReceived", StandInEvent(dpid=9))
+
+        lines = metrics.render().splitlines()
+        for line in (
+                '# TYPE clos_packet_in_total counter',
+                'clos_packet_in_total{policy="tree",dpid="3"} 2',
+                'clos_flood_total{policy="tree",dpid="3"} 1',
+                '# HELP clos_flow_mod_total Flow_mods sent',
+                'clos_flow_mod_total{policy="tree",dpid="3"} 2',
+                'clos_packet_out_total{policy="tree",dpid="3"} 3',
+                'clos_stats_reply_total{policy="tree",dpid="3"} 1',
+                'clos_packet_in_seconds_bucket{policy="tree",dpid="3",'
+                'le="1e-05"} 0',
+                'clos_packet_in_seconds_bucket{policy="tree",dpid="3",'
+                'le="2.5e-05"} 1',
+                'clos_packet_in_seconds_bucket{policy="tree",dpid="3",'
+                'le="+Inf"} 2',
+                'clos_packet_in_seconds_count{policy="tree",dpid="3"} 2',
+                'clos_table_entries{policy="tree",dpid="3",table="mac"} 2',
+                'clos_hosts{policy="tree"} 7'):
+            self.assertIn(line, lines)
+
+        # The tables are read when rendering
+        mac_table[mac(3)] = 5
+        self.assertIn('clos_table_entries{policy="tree",dpid="3",'
+                      'table="mac"} 3', metrics.render().splitlines())
+
+        core.openflow.raise_event("ConnectionDown", StandInEvent(dpid=3))
+        self.assertNotIn('dpid="3"', metrics.render())
+
+    def test_registered_again(self):
+        metrics = Metrics("tree")
+        connection = StandInEvent(dpid=3)
+        # By the proactive mode, then by the controller of the switch
+        metrics.register(connection).flow_mod += 4
+        switch = metrics.register(connection, tables={"mac": {}})
+        self.assertEqual(switch.flow_mod, 4)
+        self.assertEqual(switch.tables, {"mac": {}})
+
+    def test_flow_mods_of_the_flow_table(self):
+        metrics = Metrics("vlan", FlowTables())
+        connection = standins.StandInConnection(3, [1, 2])
+        switch = metrics.register(connection)
+        table = metrics.flow_tables.register(connection, switch)
+        msg = of.ofp_flow_mod(match=of.ofp_match(dl_dst=mac(1)))
+        msg.actions.append(of.ofp_action_output(port=1))
+        table.install(msg)
+        # The flow_mod installing a flow is counted by the controller
+        self.assertEqual(switch.flow_mod, 0)
+
+        self.assertTrue(table.modify(msg.cookie,
+                                     [of.ofp_action_output(port=2)]))
+        table.delete(msg.match)
+        self.assertEqual(switch.flow_mod, 2)
+        text = metrics.render()
+        self.assertIn('clos_flow_mod_total{policy="vlan",dpid="3"} 2', text)
+        self.assertIn('clos_flows_installed_total{policy="vlan",dpid="3"} 1',
+                      text)
+        self.assertIn('clos_flows{policy="vlan",dpid="3"} 0', text)
+
+    def test_proactive_flow_mods(self):
+        metrics = Metrics("tree")
+        connection = standins.StandInConnection(3, [1, 2, 3, 4])
+        switch = metrics.register(connection)
+        rules = compute_rules("tree", 3, 2, 2, 2)
+        install_rules(connection, rules, switch)
+        self.assertEqual(switch.flow_mod, len(rules))
+        self.assertEqual(len(connection.sent), len(rules))
+
+    def test_write(self):
+        path = os.path.join(self.directory, "metrics.prom")
+        metrics = Metrics("adaptive", path=path, start_timer=False)
+        metrics.register(StandInEvent(dpid=1)).flow_mod += 1
+        metrics.refresh()
+        with open(path) as f:
+            self.assertEqual(f.read(), metrics.rendered)
+        self.assertIn('clos_flow_mod_total{policy="adaptive",dpid="1"} 1',
+                      metrics.rendered)
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+    def test_served_on_the_loopback_interface(self):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        metrics = Metrics("tree", port=port, start_timer=False)
+        self.addCleanup(metrics._server.server_close)
+        self.addCleanup(metrics._server.shutdown)
+        self.assertEqual(metrics._server.server_address, ("127.0.0.1", port))
+        body = urlopen("http://127.0.0.1:{}/metrics".format(port)).read()
+        self.assertEqual(body.decode(), metrics.rendered)
+
+
+if __name__ == "__main__":
+    unittest.main()
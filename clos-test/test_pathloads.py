@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""Unit tests of the scoring of the paths through the core switches.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_pathloads.py
+"""
+
+import os
+import unittest
+
+import standins
+from standins import ServiceTest
+
+standins.init_pox()
+
+from pathloads import PathLoads, UNKNOWN_UTILIZATION, load_capacities
+from topology import ClosTopology, FatTreeTopology
+from uplinks import UplinkSelector
+
+
+class Loads(object):
+    """Port statistics set by the tests, in Kbps."""
+
+    def __init__(self):
+        self.tx = {}
+        self.rx = {}
+        self.updated = {}
+
+    def get_throughput(self, switch_id, port, kind="ewma", received=False):
+        return (self.rx if received else self.tx).get((switch_id, port), 0.0)
+
+    def last_update(self, switch_id, port):
+        return self.updated.get((switch_id, port))
+
+
+class PartialClos(ClosTopology):
+    """Two-tier Clos topology whose link from core 1 to edge 4 is unknown."""
+
+    def links(self):
+        return [link for link in super(PartialClos, self).links()
+                if link[:2] != (4, 1)]
+
+
+class TestPathLoads(ServiceTest):
+    """Two core switches 1 and 2, edge switches 3 and 4.
+
+    Port c of an edge switch leads to core switch c, port e - 2 of a core
+    switch to edge switch e.
+    """
+
+    def setUp(self):
+        super(TestPathLoads, self).setUp()
+        self.loads = Loads()
+        self.topology = ClosTopology(2, 2, 1)
+
+    def select(self, path_loads, beyond=True):
+        """Uplink edge switch 3 selects for a flow towards edge switch 4."""
+        selector = UplinkSelector(
+            [1, 2], flow_reservation=0.0,
+            capacities=dict((port, path_loads.link_capacity(3, port))
+                            for port in (1, 2)))
+        selector.update(dict((port, path_loads.link_load(3, port))
+                             for port in (1, 2)))
+        if not beyond:
+            return selector.select()
+        return selector.select(beyond=path_loads.beyond(3, [1, 2], 4))
+
+    def test_link_load_of_both_ends(self):
+        path_loads = PathLoads(self.loads, self.topology)
+        self.loads.tx[(3, 1)] = 100.0
+        # Core switch 1 receives more from edge switch 3 than it sent
+        self.loads.rx[(1, 1)] = 300.0
+        self.assertEqual(path_loads.link_load(3, 1), 300.0)
+        self.loads.tx[(3, 1)] = 500.0
+        self.assertEqual(path_loads.link_load(3, 1), 500.0)
+        # The receive counter of the sending port is another link
+        self.loads.rx[(3, 2)] = 900.0
+        self.assertEqual(path_loads.link_load(3, 2), 0.0)
+
+    def test_load_capacities(self):
+        path = os.path.join(self.directory, "capacities.txt")
+        with open(path, "w") as f:
+            f.write("# dpid port Mbps\n\n1 2 40\n3 1 1\nnot a link\n")
+        self.assertEqual(load_capacities(path),
+                         {(1, 2): 40000.0, (3, 1): 1000.0})
+
+    def test_heterogeneous_capacities(self):
+        path_loads = PathLoads(self.loads, self.topology, capacity=10000.0,
+                               capacities={(2, 2): 40000.0})
+        self.assertEqual(path_loads.link_capacity(2, 2), 40000.0)
+        self.assertEqual(path_loads.link_capacity(1, 2), 10000.0)
+        self.loads.tx[(1, 2)] = 8000.0
+        self.loads.tx[(2, 2)] = 20000.0
+        self.assertEqual(path_loads.beyond(3, [1, 2], 4), {1: 0.8, 2: 0.5})
+        # More load on core switch 2, but on a faster link
+        self.assertEqual(self.select(path_loads), 2)
+
+    def test_saturated_downlink_flips_the_choice(self):
+        path_loads = PathLoads(self.loads, self.topology)
+        self.loads.tx[(3, 1)] = 1000.0
+        self.loads.tx[(3, 2)] = 3000.0
+        self.assertEqual(self.select(path_loads, beyond=False), 1)
+        self.assertEqual(self.select(path_loads), 1)
+
+        # Incast: edge switch 4 receives from core switch 1 at full speed
+        self.loads.rx[(4, 1)] = 9500.0
+        self.assertAlmostEqual(path_loads.utilization(1, 2), 0.95)
+        self.assertEqual(self.select(path_loads), 2)
+
+    def test_reservations_decay_once_per_update(self):
+        path_loads = PathLoads(self.loads, self.topology,
+                               flow_reservation=1000.0, decay=0.5)
+        self.loads.updated[(1, 2)] = 1.0
+        path_loads.reserve(3, 1, 4)
+        path_loads.reserve(3, 1, 4)
+        self.assertAlmostEqual(path_loads.utilization(1, 2), 0.2)
+        # Only the link down from core switch 1 is reserved
+        self.assertEqual(path_loads.utilization(2, 2), 0.0)
+        self.assertEqual(path_loads.utilization(3, 1), 0.0)
+
+        self.loads.updated[(1, 2)] = 2.0
+        self.assertAlmostEqual(path_loads.utilization(1, 2), 0.1)
+        self.assertAlmostEqual(path_loads.utilization(1, 2), 0.1)
+        self.assertEqual(path_loads.beyond(3, [1, 2], 4), {1: 0.1, 2: 0.0})
+        path_loads.reserve(3, 1, 4)
+        self.assertAlmostEqual(path_loads.utilization(1, 2), 0.2)
+
+        self.loads.updated[(1, 2)] = 3.0
+        self.assertAlmostEqual(path_loads.utilization(1, 2), 0.1)
+
+    def test_unknown_links_are_pessimistic(self):
+        path_loads = PathLoads(self.loads, PartialClos(2, 2, 1))
+        self.loads.tx[(2, 2)] = 6000.0
+        # Port 5 of edge switch 3 leads nowhere known
+        self.assertEqual(path_loads.beyond(3, [1, 2, 5], 4),
+                         {1: UNKNOWN_UTILIZATION, 2: 0.6,
+                          5: UNKNOWN_UTILIZATION})
+        self.assertEqual(self.select(path_loads), 2)
+
+    def test_overloaded_path_before_unknown(self):
+        path_loads = PathLoads(self.loads, PartialClos(2, 2, 1))
+        # The link from core 2 down to edge 4 carries more than it can
+        self.loads.tx[(2, 2)] = 15000.0
+        self.assertEqual(path_loads.beyond(3, [1, 2], 4),
+                         {1: UNKNOWN_UTILIZATION, 2: 1.5})
+        self.assertEqual(self.select(path_loads), 2)
+
+    def test_all_paths_unknown(self):
+        path_loads = PathLoads(self.loads, PartialClos(2, 2, 1))
+        self.assertEqual(path_loads.beyond(3, [1], 4),
+                         {1: UNKNOWN_UTILIZATION})
+        selector = UplinkSelector([1, 2], flow_reservation=100.0)
+        beyond = {1: UNKNOWN_UTILIZATION, 2: UNKNOWN_UTILIZATION}
+        # The least utilized uplink breaks the tie
+        self.assertEqual([selector.select(beyond=beyond) for _ in range(4)],
+                         [1, 2, 1, 2])
+
+    def test_fat_tree(self):
+        topology = FatTreeTopology(4)
+        path_loads = PathLoads(self.loads, topology)
+        # Edge switch 7 of pod 0 to edge switch 11 of pod 1. Aggregation
+        # switch 5 leads to cores 1 and 2, aggregation switch 6 to 3 and 4
+        self.assertEqual(topology.switch(7).to_core, {1: 1, 2: 1, 3: 2, 4: 2})
+        self.loads.tx[(1, 2)] = 9000.0
+        self.loads.tx[(2, 2)] = 7000.0
+        self.loads.tx[(3, 2)] = 2000.0
+        self.loads.tx[(6, 1)] = 5000.0
+        self.loads.tx[(6, 2)] = 6000.0
+        # Best path through 5 goes up to core 2, through 6 up to core 3
+        self.assertEqual(path_loads.beyond(7, [1, 2], 11), {1: 0.7, 2: 0.5})
+        # Within the pod, only the links down from the aggregation switch
+        self.loads.tx[(5, 4)] = 1000.0
+        self.assertEqual(path_loads.beyond(7, [1, 2], 8), {1: 0.1, 2: 0.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
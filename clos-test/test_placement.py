@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""Unit tests of the traffic-aware placement of the VLANs.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_placement.py
+"""
+
+import unittest
+
+import standins
+from standins import Clock, ServiceTest, mac, port_stats_event
+
+standins.init_pox()
+
+from pox.core import core
+
+from hosts import HostDirectory
+from placement import TenantPlacement
+from portstats import PortStats
+from tenants import Tenants
+
+
+class TestTenantPlacement(ServiceTest):
+
+    def setUp(self):
+        super(TestTenantPlacement, self).setUp()
+        self.clock = Clock()
+        self.hosts = HostDirectory()
+        self.tenants = Tenants(6, n_cores=2)
+        self.port_stats = PortStats(clock=self.clock, start_timer=False)
+        for dpid in (3, 4):
+            self.port_stats.register(
+                standins.StandInConnection(dpid, [1, 2, 3]))
+
+    def measure(self, loads):
+        """Gives each host a transmit rate in Kbps for one second.
+
+        Parameters
+        ----------
+        loads : dict of int: (int, int, int, float)
+            VLAN ID, edge switch, port and rate of each host
+        """
+
+        for host, (vlan_id, dpid, port, _) in loads.items():
+            self.tenants.addToVLAN(mac(host), vlan_id)
+            self.hosts.learn(mac(host), dpid, port)
+        for dpid in (3, 4):
+            for second in (0, 1):
+                self.clock.now = 10.0 + second
+                counters = dict(
+                    (port, (int(rate * 125 * second), 0))
+                    for (_, switch, port, rate) in loads.values()
+                    if switch == dpid)
+                core.openflow.raise_event("PortStatsReceived",
+                                          port_stats_event(dpid, counters))
+        return
+
+    def test_rebalance(self):
+        placement = TenantPlacement(self.tenants, self.hosts,
+                                    self.port_stats, start_timer=False)
+        moves = []
+        placement.add_listener(moves.append)
+        # VLANs 1, 3 and 5 go through core switch 1, the others through 2
+        self.measure({1: (1, 3, 1, 8000.0), 2: (3, 3, 2, 3000.0),
+                      3: (5, 4, 1, 1000.0)})
+        self.assertEqual(placement.core_loads(placement.vlan_loads()),
+                         {1: 12000.0, 2: 0.0})
+
+        moved = placement.rebalance()
+        self.assertEqual(moved, {1: (1, 2)})
+        self.assertEqual(moves, [moved])
+        self.assertEqual(self.tenants.core_of(1), 2)
+        self.assertEqual(placement.moves, 1)
+        # Moving any other VLAN would not lower the busiest load enough
+        self.assertEqual(placement.rebalance(), {})
+
+    def test_small_gain(self):
+        placement = TenantPlacement(self.tenants, self.hosts,
+                                    self.port_stats, min_gain=1000.0,
+                                    start_timer=False)
+        self.measure({1: (1, 3, 1, 600.0), 2: (3, 3, 2, 600.0)})
+        self.assertEqual(placement.rebalance(), {})
+        self.assertEqual(self.tenants.placement, {})
+
+    def test_assign_to_the_quietest_core(self):
+        placement = TenantPlacement(self.tenants, self.hosts,
+                                    self.port_stats, start_timer=False)
+        self.measure({1: (1, 3, 1, 8000.0), 2: (2, 3, 2, 3000.0)})
+        self.hosts.learn(mac(9), 4, 3)
+        self.assertEqual(placement.assign(mac(9)), 4)
+        self.assertEqual(placement.assign(mac(9)), 4)
+        self.assertIn(mac(9), placement.pending)
+
+
+if __name__ == "__main__":
+    unittest.main()
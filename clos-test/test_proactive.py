@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""Unit tests of the forwarding state pre-installed by the proactive mode.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_proactive.py
+"""
+
+import unittest
+
+import standins
+
+standins.init_pox()
+
+from controller import FabricServices
+from proactive import (AGGREGATE_PRIORITY, ARP_TYPE, BROADCAST, IP_TYPE,
+                       compute_rules, edge_prefix_for, edge_prefixes,
+                       host_mac, table_sizes, worth_aggregating)
+
+
+def unicast(rules):
+    """Gives the output ports of the unicast rules, by match."""
+    return dict((tuple(sorted(fields.items())), ports)
+                for fields, ports in rules
+                if fields.get("dl_dst") != BROADCAST)
+
+
+def to_host(host, in_port=None):
+    """Gives the match of a rule towards a host."""
+    fields = {"dl_dst": host_mac(host)}
+    if in_port is not None:
+        fields["in_port"] = in_port
+    return tuple(sorted(fields.items()))
+
+
+class TestComputeRules(unittest.TestCase):
+    """Two core switches 1 and 2, edge switches 3 and 4 with two hosts each.
+
+    Hosts 1 and 2 are on ports 3 and 4 of edge switch 3, hosts 3 and 4 on
+    the same ports of edge switch 4.
+    """
+
+    def test_tree(self):
+        self.assertEqual(unicast(compute_rules("tree", 3, 2, 2, 2)), {
+            to_host(1): [3], to_host(2): [4],
+            to_host(3): [1], to_host(4): [1]})
+        self.assertEqual(unicast(compute_rules("tree", 2, 2, 2, 2)), {
+            to_host(1): [1], to_host(2): [1],
+            to_host(3): [2], to_host(4): [2]})
+
+    def test_vlan(self):
+        # Hosts 1 and 3 are in VLAN 1, hosts 2 and 4 in VLAN 2
+        self.assertEqual(unicast(compute_rules("vlan", 3, 2, 2, 2)), {
+            to_host(1): [3], to_host(2): [4],
+            to_host(3, 3): [1], to_host(3, 4): [2],
+            to_host(4, 3): [1], to_host(4, 4): [2]})
+
+    def test_adaptive(self):
+        # Uplink (src + dst) % nCore + 1
+        self.assertEqual(unicast(compute_rules("adaptive", 3, 2, 2, 2)), {
+            to_host(1): [3], to_host(2): [4],
+            to_host(3, 3): [1], to_host(3, 4): [2],
+            to_host(4, 3): [2], to_host(4, 4): [1]})
+        # Three core switches, hosts 1 and 2 on ports 4 and 5
+        rules = unicast(compute_rules("adaptive", 4, 3, 2, 2))
+        self.assertEqual(rules[to_host(3, 4)], [2])
+        self.assertEqual(rules[to_host(3, 5)], [3])
+        self.assertEqual(rules[to_host(4, 5)], [1])
+
+    def test_broadcast_tree(self):
+        rules = compute_rules("adaptive", 1, 2, 2, 2)
+        self.assertIn(({"in_port": 1, "dl_dst": BROADCAST}, [2]), rules)
+        self.assertIn(({"in_port": 2, "dl_dst": BROADCAST}, [1]), rules)
+        # Only the root of the tree forwards broadcasts
+        self.assertEqual([r for r in compute_rules("adaptive", 2, 2, 2, 2)
+                          if r[0].get("dl_dst") == BROADCAST], [])
+
+        rules = compute_rules("vlan", 3, 2, 2, 2)
+        self.assertIn(({"in_port": 3, "dl_dst": BROADCAST}, [4, 1]), rules)
+        self.assertIn(({"in_port": 1, "dl_dst": BROADCAST}, [3, 4]), rules)
+
+    def test_switch_outside_the_topology(self):
+        self.assertEqual(compute_rules("tree", 9, 2, 2, 2), [])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            compute_rules("random", 3, 2, 2, 2)
+
+
+class TestAggregation(unittest.TestCase):
+
+    def test_worth_aggregating(self):
+        # 10.0.0.1 to 10.0.0.8 need 4 prefixes, so 8 rules for 8 hosts
+        self.assertEqual(len(edge_prefixes(3, 2, 8)), 4)
+        self.assertFalse(worth_aggregating(3, 2, 8))
+        # 10.0.0.1 to 10.0.0.16 need 5 prefixes, so 10 rules for 16 hosts
+        self.assertEqual(len(edge_prefixes(3, 2, 16)), 5)
+        self.assertTrue(worth_aggregating(3, 2, 16))
+
+    def test_edge_prefix_for(self):
+        base = 10 << 24
+        self.assertEqual(edge_prefix_for(base + 12, 3, 2, 16), "10.0.0.8/29")
+        self.assertEqual(edge_prefix_for(base + 16, 3, 2, 16),
+                         "10.0.0.16/32")
+        self.assertEqual(edge_prefix_for(base + 20, 4, 2, 16),
+                         "10.0.0.20/30")
+        self.assertIsNone(edge_prefix_for(base + 40, 3, 2, 16))
+        self.assertIsNone(edge_prefix_for(base + 2, 3, 2, 8))
+
+    def test_core_prefixes(self):
+        rules = compute_rules("tree", 2, 2, 2, 16, aggregate=True)
+        self.assertEqual(unicast(rules)[(
+            ("dl_type", IP_TYPE), ("nw_dst", "10.0.0.8/29"),
+            ("priority", AGGREGATE_PRIORITY))], [1])
+        self.assertEqual(unicast(rules)[(
+            ("dl_type", ARP_TYPE), ("nw_dst", "10.0.0.24/29"),
+            ("priority", AGGREGATE_PRIORITY))], [2])
+        # 5 prefixes, for IP and ARP, per edge switch instead of 32 hosts
+        self.assertEqual(len(rules), 20)
+        self.assertEqual(len(compute_rules("tree", 2, 2, 2, 8,
+                                           aggregate=True)), 16)
+
+    def test_edge_prefixes(self):
+        rules = unicast(compute_rules("vlan", 3, 2, 2, 16, aggregate=True))
+        # The local hosts are still matched one by one
+        self.assertEqual(rules[to_host(1)], [3])
+        self.assertNotIn(to_host(17, 3), rules)
+        self.assertEqual(rules[(
+            ("dl_type", IP_TYPE), ("in_port", 4), ("nw_dst", "10.0.0.24/29"),
+            ("priority", AGGREGATE_PRIORITY))], [2])
+
+        # The uplink of adaptive depends on the destination
+        rules = unicast(compute_rules("adaptive", 3, 2, 2, 16,
+                                      aggregate=True))
+        self.assertEqual(rules[to_host(17, 3)], [1])
+
+    def test_table_sizes(self):
+        self.assertEqual(table_sizes("tree", 2, 2, 16),
+                         {1: 34, 2: 32, 3: 49, 4: 49})
+        self.assertEqual(table_sizes("tree", 2, 2, 16, aggregate=True),
+                         {1: 22, 2: 20, 3: 43, 4: 43})
+
+
+class TestProactiveOptions(unittest.TestCase):
+
+    def test_no_table_capacity(self):
+        with self.assertRaises(ValueError):
+            FabricServices("tree", 2, 2, 2, proactive=True,
+                           table_capacity=100)
+
+
+if __name__ == "__main__":
+    unittest.main()
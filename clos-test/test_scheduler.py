@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""Unit tests of the scheduler of the statistics requests.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_scheduler.py
+"""
+
+import unittest
+
+import standins
+from standins import Clock
+
+standins.init_pox()
+
+from scheduler import StatsScheduler
+
+
+class TestStatsScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.sent = []
+
+    def scheduler(self, **options):
+        return StatsScheduler(clock=self.clock, start_timer=False, **options)
+
+    def add(self, scheduler, key, period, min_period=None, max_period=None):
+        scheduler.add(key, lambda: self.sent.append(key), period, min_period,
+                      max_period)
+
+    def run_until(self, scheduler, end, step=0.05):
+        """Runs the scheduler every `step` seconds up to `end`."""
+        while self.clock.now < end - 1e-9:
+            self.clock.now = round(self.clock.now + step, 6)
+            scheduler.run()
+
+    def test_golden_ratio_phases(self):
+        scheduler = self.scheduler()
+        for key in "abcd":
+            self.add(scheduler, key, 10.0)
+        dues = [scheduler.jobs[key].due for key in "abcd"]
+        for due, phase in zip(dues, [0.0, 0.618, 0.236, 0.854]):
+            self.assertAlmostEqual(due, 10.0 * phase, places=2)
+
+        self.run_until(scheduler, 10.0, step=0.5)
+        # Every job once, in the order of its phase
+        self.assertEqual(self.sent, ["a", "c", "b", "d"])
+        self.run_until(scheduler, 20.0, step=0.5)
+        self.assertEqual(self.sent, ["a", "c", "b", "d"] * 2)
+        self.assertEqual(scheduler.counters["sent"], 8)
+
+    def test_halved_when_busy(self):
+        scheduler = self.scheduler()
+        self.add(scheduler, "a", 4.0, min_period=1.0, max_period=8.0)
+        scheduler.run(0.0)
+        self.assertEqual(self.sent, ["a"])
+
+        scheduler.report("a", True)
+        job = scheduler.jobs["a"]
+        self.assertEqual((job.period, job.due), (2.0, 2.0))
+        scheduler.report("a", True)
+        scheduler.report("a", True)
+        self.assertEqual((job.period, job.due), (1.0, 1.0))
+        scheduler.run(0.9)
+        self.assertEqual(self.sent, ["a"])
+        scheduler.run(1.0)
+        self.assertEqual(self.sent, ["a", "a"])
+
+    def test_grows_when_quiet(self):
+        scheduler = self.scheduler()
+        self.add(scheduler, "a", 2.0, min_period=1.0, max_period=5.0)
+        scheduler.run(0.0)
+        periods = []
+        for _ in range(4):
+            scheduler.report("a", False)
+            periods.append(scheduler.jobs["a"].period)
+        self.assertEqual(periods, [3.0, 4.5, 5.0, 5.0])
+        scheduler.run(4.9)
+        self.assertEqual(self.sent, ["a"])
+        scheduler.run(5.0)
+        self.assertEqual(self.sent, ["a", "a"])
+
+    def test_report_before_the_first_request(self):
+        scheduler = self.scheduler()
+        self.add(scheduler, "a", 1.0)
+        self.add(scheduler, "b", 4.0, min_period=1.0)
+        due = scheduler.jobs["b"].due
+        scheduler.report("b", True)
+        self.assertEqual(scheduler.jobs["b"].period, 2.0)
+        self.assertEqual(scheduler.jobs["b"].due, due)
+        # Unknown job
+        scheduler.report("c", True)
+
+    def test_budget(self):
+        # 10 requests per second, 2 in a burst
+        scheduler = self.scheduler(budget=10, tick=0.1)
+        for key in "abcde":
+            self.add(scheduler, key, 1.0)
+        scheduler.run(1.0)
+        self.assertEqual(len(self.sent), 2)
+        self.assertEqual(scheduler.counters["delayed"], 1)
+        for now in (1.1, 1.2, 1.3):
+            scheduler.run(now)
+        # The late jobs were sent one per tick, the earliest due first
+        self.assertEqual(self.sent, ["a", "c", "e", "b", "d"])
+        self.assertEqual(scheduler.counters["delayed"], 3)
+        self.assertEqual(scheduler.counters["sent"], 5)
+
+    def test_tokens_do_not_pile_up(self):
+        scheduler = self.scheduler(budget=10, tick=0.1)
+        scheduler.run(100.0)
+        self.assertEqual(scheduler.tokens, 2.0)
+
+    def test_remove(self):
+        scheduler = self.scheduler()
+        self.add(scheduler, "a", 1.0)
+        self.add(scheduler, "b", 1.0)
+        scheduler.run(0.0)
+        scheduler.remove("a")
+        scheduler.remove("unknown")
+        self.run_until(scheduler, 3.0, step=0.1)
+        self.assertEqual(self.sent, ["a", "b", "b", "b"])
+        self.assertNotIn("a", scheduler.jobs)
+
+    def test_replace(self):
+        scheduler = self.scheduler()
+        self.add(scheduler, "a", 1.0)
+        scheduler.add("a", lambda: self.sent.append("new"), 2.0)
+        self.run_until(scheduler, 4.0, step=0.1)
+        # The job replaced has its own phase, and the old one is not sent
+        self.assertEqual(self.sent, ["new", "new"])
+
+
+if __name__ == "__main__":
+    unittest.main()
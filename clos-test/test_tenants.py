@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""Unit tests of the fabric-wide tenant registry of the VLAN policy.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_tenants.py
+"""
+
+import os
+import unittest
+
+import standins
+from standins import ServiceTest, mac
+
+standins.init_pox()
+
+from tenants import Tenants
+
+
+class TestTenants(ServiceTest):
+
+    def test_round_robin(self):
+        tenants = Tenants(3)
+        vlans = [tenants.assign(mac(host)) for host in range(1, 8)]
+        self.assertEqual(vlans, [1, 2, 3, 1, 2, 3, 1])
+        self.assertEqual(tenants.assign(mac(2)), 2)
+        self.assertEqual(tenants.getVLAN(mac(100)), -1)
+
+    def test_placement(self):
+        tenants = Tenants(4, n_cores=2)
+        self.assertEqual([tenants.core_of(v) for v in range(1, 5)],
+                         [1, 2, 1, 2])
+        tenants.place(3, 2)
+        self.assertEqual(tenants.core_of(3), 2)
+        tenants.place(3, 1)
+        self.assertEqual(tenants.placement, {})
+
+    def test_snapshot_restore(self):
+        tenants = Tenants(4, capacity=1 << 8, n_cores=2)
+        for host in range(1, 6):
+            tenants.assign(mac(host))
+        # Past the compact array
+        tenants.addToVLAN("02:00:00:00:00:01", 4)
+        tenants.place(1, 2)
+        path = os.path.join(self.directory, "tenants.bin")
+        tenants.snapshot(path)
+
+        restored = Tenants(4, n_cores=2)
+        restored.restore(path)
+        self.assertEqual(sorted(restored.items()), sorted(tenants.items()))
+        self.assertEqual(len(restored), 6)
+        self.assertEqual(restored.getVLAN("02:00:00:00:00:01"), 4)
+        self.assertEqual(restored.next_vlan, tenants.next_vlan)
+        self.assertEqual(restored.core_of(1), 2)
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+    def test_restore_drops_missing_cores(self):
+        tenants = Tenants(4, n_cores=4)
+        tenants.place(1, 4)
+        path = os.path.join(self.directory, "tenants.bin")
+        tenants.snapshot(path)
+
+        restored = Tenants(4, n_cores=2)
+        restored.restore(path)
+        self.assertEqual(restored.core_of(1), 1)
+
+    def test_restore_truncated(self):
+        tenants = Tenants(2)
+        tenants.assign(mac(1))
+        path = os.path.join(self.directory, "tenants.bin")
+        tenants.snapshot(path)
+        with open(path, "r+b") as f:
+            f.truncate(Tenants.SNAPSHOT_HEADER.size + 10)
+        with self.assertRaises(ValueError):
+            Tenants(2).restore(path)
+
+    def test_restore_other_number_of_vlans(self):
+        tenants = Tenants(4)
+        for host in range(1, 5):
+            tenants.assign(mac(host))
+        path = os.path.join(self.directory, "tenants.bin")
+        tenants.snapshot(path)
+        restored = Tenants(2)
+        with self.assertRaises(ValueError):
+            restored.restore(path)
+        self.assertEqual(len(restored), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Unit tests of the throughput estimator of the port statistics.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_throughput.py
+"""
+
+import unittest
+
+import standins
+
+standins.init_pox()
+
+from throughput import ThroughputEstimator
+
+
+class TestThroughputEstimator(unittest.TestCase):
+
+    def test_rate(self):
+        estimator = ThroughputEstimator()
+        estimator.add_sample(0.0, 0)
+        self.assertEqual(estimator.instantaneous(), 0.0)
+        estimator.add_sample(2.0, 250000)
+        # 250 kB in 2 s
+        self.assertAlmostEqual(estimator.instantaneous(), 1000.0)
+        self.assertAlmostEqual(estimator.smoothed(), 1000.0)
+
+    def test_wrap(self):
+        estimator = ThroughputEstimator(counter_bits=32)
+        top = (1 << 32) - 1000
+        estimator.add_sample(0.0, top)
+        estimator.add_sample(1.0, 24000)
+        # 1000 bytes before the wrap and 24000 after
+        self.assertAlmostEqual(estimator.instantaneous(), 200.0)
+
+    def test_reset(self):
+        estimator = ThroughputEstimator()
+        estimator.add_sample(0.0, 1000000)
+        estimator.add_sample(1.0, 2000000)
+        estimator.add_sample(2.0, 5000)
+        # No rate across the reset of the counter
+        self.assertEqual(estimator.count, 1)
+        self.assertEqual(estimator.instantaneous(), 0.0)
+        estimator.add_sample(3.0, 130000)
+        self.assertAlmostEqual(estimator.instantaneous(), 1000.0)
+
+    def test_reordered_sample(self):
+        estimator = ThroughputEstimator()
+        estimator.add_sample(1.0, 0)
+        estimator.add_sample(2.0, 125000)
+        estimator.add_sample(2.0, 999999)
+        estimator.add_sample(1.5, 999999)
+        self.assertEqual(estimator.count, 2)
+        self.assertAlmostEqual(estimator.instantaneous(), 1000.0)
+
+    def test_peak_over_ring(self):
+        estimator = ThroughputEstimator(size=3)
+        counter = 0
+        for second, rate in enumerate([5000, 1000, 2000, 3000]):
+            counter += rate * 125
+            estimator.add_sample(float(second + 1), counter)
+        # The rate of 5000 Kbps fell out of the ring buffer
+        self.assertAlmostEqual(estimator.peak(), 3000.0)
+
+    def test_resume(self):
+        estimator = ThroughputEstimator()
+        estimator.resume(10.0, 1000, 800.0)
+        self.assertEqual(estimator.last_update(), 10.0)
+        self.assertEqual(estimator.estimate("ewma"), 800.0)
+        estimator.add_sample(11.0, 1000 + 125000)
+        self.assertAlmostEqual(estimator.instantaneous(), 1000.0)
+
+    def test_unknown_estimate(self):
+        with self.assertRaises(ValueError):
+            ThroughputEstimator().estimate("median")
+
+
+if __name__ == "__main__":
+    unittest.main()
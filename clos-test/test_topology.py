@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""Unit tests of the roles of the switches and ports of the topologies.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_topology.py
+"""
+
+import unittest
+
+import standins
+
+standins.init_pox()
+
+from topology import (DOWNLINK, HOST, UNKNOWN, UPLINK, ClosTopology,
+                      FatTreeTopology, build_topology)
+
+
+class TestClosTopology(unittest.TestCase):
+    """Two core switches 1 and 2, edge switches 3 to 5 with two hosts each."""
+
+    def setUp(self):
+        self.topology = ClosTopology(2, 3, 2)
+
+    def test_core_switch(self):
+        ports = self.topology.switch(1)
+        self.assertTrue(ports.core)
+        self.assertEqual(ports.downlinks, [1, 2, 3])
+        self.assertEqual(ports.below, [1, 2, 3])
+        self.assertEqual((ports.host_ports, ports.uplinks), ([], []))
+        self.assertEqual(ports.down, {3: 1, 4: 2, 5: 3})
+        self.assertEqual(ports.edge_below, {1: 3, 2: 4, 3: 5})
+        self.assertEqual(ports.to_core, {})
+
+    def test_edge_switch(self):
+        ports = self.topology.switch(4)
+        self.assertFalse(ports.core)
+        self.assertEqual(ports.host_ports, [3, 4])
+        self.assertEqual(ports.below, [3, 4])
+        self.assertEqual(ports.uplinks, [1, 2])
+        self.assertEqual(ports.to_core, {1: 1, 2: 2})
+        self.assertEqual((ports.down, ports.edge_below), ({}, {}))
+        self.assertEqual(ports.role, [UNKNOWN, UPLINK, UPLINK, HOST, HOST])
+
+    def test_ports_outside_the_layout(self):
+        ports = self.topology.switch(4, [1, 2, 3, 4, 7, 0xfffe])
+        self.assertEqual(len(ports.role), 8)
+        self.assertEqual(ports.role_of(7), UNKNOWN)
+        self.assertEqual(ports.role_of(0xfffe), UNKNOWN)
+        self.assertEqual(ports.role_of(-1), UNKNOWN)
+        ports.add(9)
+        self.assertEqual(len(ports.role), 10)
+        # Special ports are not covered
+        ports.add(0xfffe)
+        self.assertEqual(len(ports.role), 10)
+        self.assertEqual(ports, self.topology.switch(4))
+
+    def test_links(self):
+        links = self.topology.links()
+        self.assertEqual(len(links), 6)
+        self.assertIn((3, 1, 1, 1), links)
+        self.assertIn((5, 2, 2, 3), links)
+        for edge, edge_port, core, core_port in links:
+            self.assertEqual(self.topology.switch(edge).to_core[core],
+                             edge_port)
+            self.assertEqual(self.topology.switch(core).down[edge],
+                             core_port)
+            self.assertEqual(self.topology.switch(core).edge_below[core_port],
+                             edge)
+
+    def test_host_location(self):
+        self.assertEqual(self.topology.host_location(1), (3, 3))
+        self.assertEqual(self.topology.host_location(2), (3, 4))
+        self.assertEqual(self.topology.host_location(6), (5, 4))
+
+
+class TestFatTreeTopology(unittest.TestCase):
+    """A 4-ary fat-tree: core switches 1 to 4, then pods of four switches.
+
+    Pod 0 has aggregation switches 5 and 6 and edge switches 7 and 8, pod 1
+    aggregation switches 9 and 10 and edge switches 11 and 12, and so on.
+    """
+
+    def setUp(self):
+        self.topology = FatTreeTopology(4)
+
+    def test_sizes(self):
+        topology = self.topology
+        self.assertEqual((topology.nCore, topology.nEdge, topology.nHosts),
+                         (4, 8, 2))
+        self.assertEqual(topology.coreSwitchIDs, [1, 2, 3, 4])
+        self.assertEqual(topology.aggregationSwitchIDs,
+                         [5, 6, 9, 10, 13, 14, 17, 18])
+        self.assertEqual(topology.edgeSwitchIDs,
+                         [7, 8, 11, 12, 15, 16, 19, 20])
+        for k in (0, 3):
+            with self.assertRaises(ValueError):
+                FatTreeTopology(k)
+
+    def test_core_switch(self):
+        ports = self.topology.switch(3)
+        self.assertTrue(ports.core)
+        self.assertEqual(ports.downlinks, [1, 2, 3, 4])
+        # Port p + 1 leads to pod p, and every edge switch of the pod
+        self.assertEqual(ports.down, {7: 1, 8: 1, 11: 2, 12: 2, 15: 3,
+                                      16: 3, 19: 4, 20: 4})
+        # Only the core switches of a two-tier topology face edge switches
+        self.assertEqual(ports.edge_below, {})
+        self.assertEqual(ports.to_core, {})
+
+    def test_aggregation_switches(self):
+        first = self.topology.switch(9)
+        self.assertFalse(first.core)
+        self.assertEqual(first.uplinks, [1, 2])
+        self.assertEqual(first.downlinks, [3, 4])
+        self.assertEqual(first.host_ports, [])
+        self.assertEqual(first.down, {11: 3, 12: 4})
+        self.assertEqual(first.to_core, {1: 1, 2: 2})
+        self.assertEqual(first.role, [UNKNOWN, UPLINK, UPLINK, DOWNLINK,
+                                      DOWNLINK])
+
+        # The second aggregation switch of a pod does not reach core
+        # switch 1, the root of the tree policy
+        second = self.topology.switch(10)
+        self.assertEqual(second.down, {11: 3, 12: 4})
+        self.assertEqual(second.to_core, {3: 1, 4: 2})
+        self.assertNotIn(1, second.to_core)
+
+    def test_edge_switch(self):
+        ports = self.topology.switch(12)
+        self.assertFalse(ports.core)
+        self.assertEqual(ports.host_ports, [3, 4])
+        self.assertEqual(ports.uplinks, [1, 2])
+        self.assertEqual(ports.downlinks, [])
+        # Every core switch, through the aggregation switch of its group
+        self.assertEqual(ports.to_core, {1: 1, 2: 1, 3: 2, 4: 2})
+        self.assertEqual((ports.down, ports.edge_below), ({}, {}))
+
+    def test_links(self):
+        topology = self.topology
+        links = topology.links()
+        # k^3/4 links between the edge and aggregation tiers, as many above
+        self.assertEqual(len(links), 32)
+        self.assertEqual(len(set(links)), 32)
+        self.assertIn((7, 1, 5, 3), links)
+        self.assertIn((8, 2, 6, 4), links)
+        self.assertIn((6, 1, 3, 1), links)
+        self.assertIn((18, 2, 4, 4), links)
+
+        aggregation = set(topology.aggregationSwitchIDs)
+        for lower, lower_port, upper, upper_port in links:
+            lower_ports = topology.switch(lower)
+            upper_ports = topology.switch(upper)
+            self.assertEqual(lower_ports.role_of(lower_port), UPLINK)
+            self.assertEqual(upper_ports.role_of(upper_port), DOWNLINK)
+            if lower in aggregation:
+                self.assertTrue(topology.is_core(upper))
+                self.assertEqual(lower_ports.to_core[upper], lower_port)
+                for edge in lower_ports.down:
+                    self.assertEqual(upper_ports.down[edge], upper_port)
+            else:
+                self.assertIn(upper, aggregation)
+                self.assertEqual(upper_ports.down[lower], upper_port)
+
+    def test_to_core_follows_the_links(self):
+        topology = self.topology
+        up = dict(((lower, port), upper)
+                  for lower, port, upper, _ in topology.links())
+        for edge in topology.edgeSwitchIDs:
+            for core, port in topology.switch(edge).to_core.items():
+                aggregation = up[(edge, port)]
+                self.assertEqual(
+                    up[(aggregation,
+                        topology.switch(aggregation).to_core[core])], core)
+
+    def test_host_location(self):
+        self.assertEqual(self.topology.host_location(1), (7, 3))
+        self.assertEqual(self.topology.host_location(4), (8, 4))
+        self.assertEqual(self.topology.host_location(16), (20, 4))
+
+
+class TestBuildTopology(unittest.TestCase):
+
+    def test_build_topology(self):
+        topology = build_topology("2", "3", "4")
+        self.assertIsInstance(topology, ClosTopology)
+        self.assertEqual((topology.nCore, topology.nEdge, topology.nHosts),
+                         (2, 3, 4))
+        self.assertIsInstance(build_topology(k="4"), FatTreeTopology)
+        with self.assertRaises(ValueError):
+            build_topology(2, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Unit tests of the ring buffer of the decisions of the controllers.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_tracing.py
+"""
+
+import os
+import unittest
+
+import standins
+from standins import ServiceTest, mac
+
+standins.init_pox()
+
+from pox.lib.addresses import EthAddr
+
+import tracing
+from tracing import Trace
+
+
+class TestTrace(ServiceTest):
+
+    def record(self, trace, src, dst, out_port, decision=tracing.FLOW):
+        trace.record(3, 4, EthAddr(mac(src)), EthAddr(mac(dst)), out_port,
+                     decision)
+
+    def test_records(self):
+        trace = Trace(4)
+        self.record(trace, 1, 2, 1, tracing.UPLINK)
+        self.record(trace, 2, 1, 4)
+        records = list(trace.records())
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0][1:], (3, 4, EthAddr(mac(1)).toRaw(),
+                                          EthAddr(mac(2)).toRaw(), 1,
+                                          tracing.UPLINK))
+        self.assertLessEqual(records[0][0], records[1][0])
+
+    def test_wrap_around(self):
+        trace = Trace(3)
+        for host in range(1, 8):
+            self.record(trace, host, 100, host)
+        self.assertEqual(trace.count, 7)
+        self.assertEqual(len(trace.buffer), 3 * Trace.RECORD.size)
+        # The last three records, oldest first
+        self.assertEqual([record[5] for record in trace.records()],
+                         [5, 6, 7])
+
+    def test_dump(self):
+        trace = Trace(2)
+        self.record(trace, 1, 2, 1, tracing.UPLINK)
+        self.record(trace, 2, 1, 0xfffb, tracing.FLOOD)
+        self.record(trace, 1, 3, 0xffff, tracing.DROP)
+        path = os.path.join(self.directory, "trace.txt")
+        self.assertEqual(trace.dump(path), 2)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        when, line = lines[0].split(" ", 1)
+        self.assertEqual(len(when.split(".")[1]), 6)
+        self.assertEqual(line, "s3 in=4 00:00:00:00:00:02 -> "
+                               "00:00:00:00:00:01 flood out=65531")
+        self.assertEqual(lines[1].split(" ", 1)[1],
+                         "s3 in=4 00:00:00:00:00:01 -> 00:00:00:00:00:03 "
+                         "drop out=65535")
+
+    def test_empty_dump(self):
+        path = os.path.join(self.directory, "trace.txt")
+        self.assertEqual(Trace(2).dump(path), 0)
+        with open(path) as f:
+            self.assertEqual(f.read(), "")
+
+    def test_mac_to_str(self):
+        self.assertEqual(tracing.mac_to_str(b"\x00\x1b\x21\xff\x00\x0a"),
+                         "00:1b:21:ff:00:0a")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""Unit tests of the selection of the least loaded uplink.
+
+They are run offline with the stand-ins of POX objects, without Mininet or
+Open vSwitch. POX must be importable, e.g.:
+
+    PYTHONPATH=~/pox python -m pytest clos-test
+    PYTHONPATH=~/pox python clos-test/test_uplinks.py
+"""
+
+import unittest
+
+import standins
+
+standins.init_pox()
+
+from uplinks import UplinkSelector
+
+
+class TestUplinkSelector(unittest.TestCase):
+
+    def test_least_loaded_first(self):
+        selector = UplinkSelector([1, 2, 3], flow_reservation=100.0)
+        selector.update({1: 500.0, 2: 50.0, 3: 300.0})
+        self.assertEqual(selector.select(), 2)
+        # 150 Kbps on port 2 now
+        self.assertEqual(selector.select(), 2)
+        self.assertEqual(selector.select(), 2)
+        self.assertEqual(selector.select(), 3)
+
+    def test_ties_go_to_the_lowest_port(self):
+        selector = UplinkSelector([3, 1, 2])
+        self.assertEqual([selector.select() for _ in range(3)], [1, 2, 3])
+
+    def test_reservations_decay(self):
+        selector = UplinkSelector([1, 2], flow_reservation=1000.0,
+                                  decay=0.5)
+        selector.select()
+        selector.update({1: 0.0})
+        self.assertAlmostEqual(selector.load(1), 500.0)
+        self.assertAlmostEqual(selector.load(2), 0.0)
+
+    def test_capacity(self):
+        selector = UplinkSelector([1, 2], flow_reservation=0.0,
+                                  capacities={1: 1000.0, 2: 10000.0})
+        selector.update({1: 400.0, 2: 2000.0})
+        # 40% of port 1 against 20% of port 2
+        self.assertEqual(selector.select(), 2)
+
+    def test_shift(self):
+        selector = UplinkSelector([1, 2], flow_reservation=0.0)
+        selector.update({1: 1000.0, 2: 400.0})
+        selector.shift(1, 2, 800.0)
+        self.assertEqual(selector.select(), 1)
+        selector.update({1: 1000.0, 2: 400.0})
+        self.assertEqual(selector.select(), 2)
+
+    def test_beyond(self):
+        selector = UplinkSelector([1, 2], flow_reservation=0.0,
+                                  capacities={1: 1000.0, 2: 1000.0})
+        selector.update({1: 100.0, 2: 300.0})
+        # The core switch behind port 1 is congested further on
+        self.assertEqual(selector.select(beyond={1: 0.9, 2: 0.1}), 2)
+
+    def test_ports_added_and_removed(self):
+        selector = UplinkSelector([1, 2])
+        selector.update({1: 100.0, 2: 200.0})
+        selector.remove_port(1)
+        self.assertEqual(selector.select(), 2)
+        selector.remove_port(2)
+        self.assertIsNone(selector.select())
+        selector.add_port(4)
+        self.assertEqual(selector.select(), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
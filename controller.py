@@ -0,0 +1,894 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to share the plumbing of the switch controllers, so
+# that a policy only implements how it forwards a packet
+
+
+from abc import ABCMeta, abstractmethod
+import time
+
+from pox.core import core
+import pox.openflow.libopenflow_01 as of
+from pox.lib.util import str_to_bool
+
+from proactive import edge_prefix_match, install_proactive, AGGREGATE_PRIORITY
+from topology import ClosTopology, UNKNOWN, HOST, UPLINK, build_topology
+from linkdiscovery import DiscoveredTopology
+from hosts import HostDirectory
+from flowtable import FlowTables
+from checkpoint import Checkpoint
+from metrics import Metrics
+import tracing
+
+
+log = core.getLogger()
+
+
+class Clos_Controller(object, metaclass=ABCMeta):
+    """Base of the controllers of a switch of a Clos topology.
+
+    An object of a subclass is created for each switch that connects. At
+    that time, the roles of the ports of the switch and the actions used to
+    flood packets are computed once, so that handling a packet classifies
+    its input port with a single indexed lookup.
+
+    The base class learns nothing and takes no decision: a policy implements
+    `act_like_switch`, called for each PacketIn with the role of its input
+    port, and uses the helpers of the base class to install flows, forward
+    and flood packets.
+
+    Arguments
+    ----------
+    switch_id : int
+        ID used to uniquely identify the switch in a topology
+    coreSwitchIDs : list of int
+        IDs of core switches in the topology
+    edgeSwitchIDs : list of int
+        IDs of edge switches in the topology
+    ports : SwitchPorts object
+        Roles of the ports of the switch
+    port_role : list of int
+        Role of each port of the switch, indexed by port number
+    host_ports : list of int
+        Ports of the switch connected to hosts
+    core_ports : list of int
+        Ports of the switch connected to the tier above, i.e. to the core
+        switches in a two-tier topology
+    flood_down : list of ofp_action_output
+        Actions sending a packet out of every port towards the hosts, i.e.
+        the host ports of an edge switch and the downlinks of the others
+    flood_to_all : list of ofp_action_output
+        Actions sending a packet out of every port but the input port
+    mac_to_port : dict of str: int
+        Dictionnary mapping MAC addresses of type pox.lib.addresses.EthAddr to ports
+    hosts : HostDirectory object
+        Fabric-wide directory of the location of the hosts
+    topology : ClosTopology, FatTreeTopology or DiscoveredTopology object
+        Layout of the fabric
+    flow_table : FlowTable object
+        Index of the flows installed in the switch
+    aggregate : bool
+        If True, flows are installed per destination instead of per pair of
+        hosts, and core switches aggregate the hosts of an edge switch
+    metrics : SwitchMetrics object
+        Counters of the controller, None if they are not exported
+    trace : Trace object
+        Fabric-wide ring buffer recording the decisions of the controllers,
+        None if they are not recorded
+    checkpoint : Checkpoint object
+        Fabric-wide checkpoint saving the MAC table of the switch, None if
+        the state is not saved
+    """
+
+    # Port of an edge switch towards the hosts of the other edge switches,
+    # None if the policy chooses it for each flow
+    REMOTE_PORT = None
+
+    def __init__(self, connection, nCore, nEdge, nHosts, hosts, flow_tables,
+                 aggregate=False, metrics=None, trace=None, topology=None,
+                 checkpoint=None):
+        """Initializes the Clos_Controller object.
+
+        Parameters
+        ----------
+        connection : pox.lib.revent.connection
+            Connection from the controller to the switch
+        nCore : int
+            Number of core switches in the Clos Topology
+        nEdge : int
+            Number of edge switches in the Clos Topology
+        nHosts : int
+            Number of hosts per edge switch in the Clos Topology
+        hosts : HostDirectory object
+            Fabric-wide directory of the location of the hosts
+        flow_tables : FlowTables object
+            Fabric-wide service tracking the flows installed in the switches
+        aggregate : bool
+            If True, install one flow per destination instead of one flow
+            per pair of hosts
+        metrics : Metrics object
+            Fabric-wide service exporting the counters of the controllers,
+            None to not record them
+        trace : Trace object
+            Fabric-wide ring buffer recording the decisions of the
+            controllers, None to not record them
+        topology : ClosTopology, FatTreeTopology or DiscoveredTopology
+            Layout of the fabric, the two-tier Clos topology of `nCore`,
+            `nEdge` and `nHosts` by default. The roles of the ports follow
+            the changes of a layout which is discovered.
+        checkpoint : Checkpoint object
+            Fabric-wide checkpoint of the state of the controllers. After a
+            restart, the MAC table of the switch is restored from it and
+            the flows kept by the switch are adopted. None to not save
+            the state.
+        """
+
+        self.connection = connection
+        self.nCore = nCore
+        self.nEdge = nEdge
+        self.nHosts = nHosts
+
+        self.switch_id = connection.dpid
+        if topology is None:
+            topology = ClosTopology(nCore, nEdge, nHosts)
+        self.topology = topology
+        self.coreSwitchIDs = topology.coreSwitchIDs
+        self.edgeSwitchIDs = topology.edgeSwitchIDs
+        self.ports = topology.switch(self.switch_id, connection.ports.keys())
+        self.port_role = self.ports.role
+        self._build_flood_actions()
+
+        # This binds our PacketIn event listener
+        connection.addListeners(self)
+        if hasattr(topology, "add_listener"):
+            # The layout is discovered and may change
+            topology.add_listener(self._topology_changed)
+
+        self.mac_to_port = {}
+        self.checkpoint = checkpoint
+        self._reconcile = False
+        if checkpoint is not None:
+            self.mac_to_port = checkpoint.register(connection)
+            # The first flow statistics of the switch list the flows it kept
+            self._reconcile = checkpoint.restored
+        self.hosts = hosts
+        self.metrics = None
+        if metrics is not None:
+            self.metrics = metrics.register(
+                connection, tables={"mac": self.mac_to_port})
+        self.flow_table = flow_tables.register(connection, self.metrics)
+        self.aggregate = aggregate
+        self.trace = trace
+
+    def _build_flood_actions(self):
+        """Computes once the sets of actions used to flood packets.
+
+        Each flood is then a single packet_out carrying several output
+        actions, instead of one packet_out per port.
+
+        Returns
+        -------
+        None
+        """
+
+        self.host_ports = self.ports.host_ports
+        self.core_ports = self.ports.uplinks
+        self.flood_down = [of.ofp_action_output(port=p)
+                           for p in self.ports.below]
+        # The switch itself excludes the input port when flooding
+        self.flood_to_all = [of.ofp_action_output(port=of.OFPP_FLOOD)]
+
+        return
+
+    def _topology_changed(self):
+        """Takes the new roles of the ports when the layout changes.
+
+        Returns
+        -------
+        None
+        """
+
+        ports = self.topology.switch(self.switch_id,
+                                     self.connection.ports.keys())
+        if ports != self.ports:
+            log.info("S{} - {} host ports, uplinks {}, downlinks {}".format(
+                self.switch_id, len(ports.host_ports), ports.uplinks,
+                ports.downlinks))
+            self._ports_changed(ports)
+        return
+
+    def _ports_changed(self, ports):
+        """Uses new roles for the ports of the switch.
+
+        Policies which derive state from the roles, e.g. their uplinks,
+        extend it to update that state.
+
+        Parameters
+        ----------
+        ports : SwitchPorts object
+            New roles of the ports of the switch
+
+        Returns
+        -------
+        None
+        """
+
+        self.ports = ports
+        self.port_role = ports.role
+        self._build_flood_actions()
+        return
+
+    def is_core(self):
+        """Determines whether the switch is a core switch.
+
+        Returns
+        -------
+        True if the switch is a core switch.
+        False otherwise.
+        """
+
+        return self.ports.core
+
+    def sent_from_core(self, port):
+        """Determines whether or not the packet was sent from a core switch.
+
+        Parameters
+        ----------
+        port : int
+            The receiving port of a given switch
+
+        Returns
+        -------
+        True if the port is associated with a core switch.
+        False otherwise.
+        """
+
+        return self.ports.role_of(port) == UPLINK
+
+    def resend_packet(self, packet_in, out_port):
+        """Instructs the switch to resend a packet that it had sent to us.
+
+        Parameters
+        ----------
+        packet_in : ofp_packet_in object
+            Packet which the switch had sent to the controller due to a table-miss
+        out_port : int
+            Port to send the packet out of
+
+        Returns
+        -------
+        None
+        """
+
+        # Add an action to send to the specified port
+        self.send_packet_out(packet_in, [of.ofp_action_output(port=out_port)])
+
+        return
+
+    def send_packet_out(self, packet_in, actions):
+        """Instructs the switch to apply actions to a packet it had sent to us.
+
+        Parameters
+        ----------
+        packet_in : ofp_packet_in object
+            Packet which the switch had sent to the controller due to a table-miss
+        actions : list of ofp_action_output
+            Actions to apply to the packet, e.g. outputs to several ports
+
+        Returns
+        -------
+        None
+        """
+
+        msg = of.ofp_packet_out()
+        msg.in_port = packet_in.in_port
+        if packet_in.buffer_id not in (None, of.NO_BUFFER):
+            # The switch kept the packet, no need to send it back
+            msg.buffer_id = packet_in.buffer_id
+        else:
+            msg.data = packet_in.data
+        msg.actions.extend(actions)
+
+        # Send message to switch
+        self.connection.send(msg)
+        if self.metrics is not None:
+            self.metrics.packet_out += 1
+
+        return
+
+    def send_flow_mod(self, msg, packet_in):
+        """Installs a flow and releases the packet that triggered it.
+
+        If the switch buffered the packet, the flow_mod refers to that buffer
+        and the switch applies the new flow to the packet, so one message both
+        installs the rule and forwards the packet. Otherwise, the packet is
+        sent back in a packet_out going through the flow table.
+
+        The flow is recorded in the flow table of the switch, which makes
+        room for it if the table is full.
+
+        Parameters
+        ----------
+        msg : ofp_flow_mod object
+            Flow to install
+        packet_in : ofp_packet_in object
+            Packet which the switch had sent to the controller due to a table-miss
+
+        Returns
+        -------
+        None
+        """
+
+        self.flow_table.install(msg)
+        if self.metrics is not None:
+            self.metrics.flow_mod += 1
+        if packet_in.buffer_id not in (None, of.NO_BUFFER):
+            msg.buffer_id = packet_in.buffer_id
+            self.connection.send(msg)
+        else:
+            self.connection.send(msg)
+            self.resend_packet(packet_in, of.OFPP_TABLE)
+
+        return
+
+    def lookup_port(self, address):
+        """Gives the port out of which to send a packet towards a host.
+
+        The ports learnt by the switch are used first. Otherwise, the location
+        of the host in the fabric-wide directory gives the port: edge switches
+        reach their own hosts directly, the switches above reach the edge
+        switches below them through their downlinks, and the other hosts are
+        reached through `REMOTE_PORT`.
+
+        Parameters
+        ----------
+        address : str
+            MAC address of the host
+
+        Returns
+        -------
+        int
+            Port towards the host or None if it cannot be determined
+        """
+
+        if address in self.mac_to_port:
+            return self.mac_to_port[address]
+
+        location = self.hosts.locate(address)
+        if location is None:
+            return None
+
+        switch_id, port = location
+        if switch_id == self.switch_id:
+            return port
+        return self.ports.down.get(switch_id, self.REMOTE_PORT)
+
+    def flow_match(self, packet, packet_in, out_port, uplink=False):
+        """Gives the match and priority of the flow forwarding a packet.
+
+        By default, flows match the pair of hosts. When aggregating, they
+        only match the destination, so that a switch holds one flow per host
+        instead of one per pair of hosts. The core switches of a two-tier
+        topology further match the IP and ARP traffic on the prefix of the
+        hosts of the edge switch behind `out_port`, if the addresses follow
+        the layout of the topology.
+
+        Parameters
+        ----------
+        packet : pox.lib.packet
+            Packet that the switch sent up to the controller
+        packet_in : ofp_packet_in object
+            OpenFlow message
+        out_port : int
+            Port out of which the flow sends the packets
+        uplink : bool
+            Whether the port was chosen by the policy among the uplinks
+
+        Returns
+        -------
+        (ofp_match object, int)
+            Match and priority of the flow
+        """
+
+        if not self.aggregate:
+            return (of.ofp_match(dl_src=packet.src, dl_dst=packet.dst),
+                    of.OFP_DEFAULT_PRIORITY)
+
+        edge_id = self.ports.edge_below.get(out_port)
+        if edge_id is not None:
+            match = edge_prefix_match(packet, edge_id, self.nCore,
+                                      self.nHosts)
+            if match is not None:
+                return match, AGGREGATE_PRIORITY
+        return of.ofp_match(dl_dst=packet.dst), of.OFP_DEFAULT_PRIORITY
+
+    def install_flow(self, packet, packet_in, out_port, uplink=False):
+        """Installs a flow in the switch table and forwards the packet.
+
+        Parameters
+        ----------
+        packet : pox.lib.packet
+            Packet that the switch sent up to the controller
+        packet_in : ofp_packet_in object
+            OpenFlow message
+        out_port : int
+            Port out of which to send the packet
+        uplink : bool
+            Whether the port was chosen by the policy among the uplinks
+
+        Returns
+        -------
+        None
+        """
+
+        msg = of.ofp_flow_mod()
+        msg.match, msg.priority = self.flow_match(packet, packet_in, out_port,
+                                                  uplink)
+        msg.actions.append(of.ofp_action_output(port=out_port))
+        self.send_flow_mod(msg, packet_in)
+        if self.trace is not None:
+            self.trace.record(self.switch_id, packet_in.in_port, packet.src,
+                              packet.dst, out_port,
+                              tracing.UPLINK if uplink else tracing.FLOW)
+
+        return
+
+    def flood(self, packet, packet_in, actions):
+        """Floods a packet without installing a flow.
+
+        Parameters
+        ----------
+        packet : pox.lib.packet
+            Packet that the switch sent up to the controller
+        packet_in : ofp_packet_in object
+            OpenFlow message
+        actions : list of ofp_action_output
+            Actions flooding the packet, e.g. `flood_down`
+
+        Returns
+        -------
+        None
+        """
+
+        self.send_packet_out(packet_in, actions)
+        if self.metrics is not None:
+            self.metrics.flood += 1
+        if self.trace is not None:
+            self.trace.record(self.switch_id, packet_in.in_port, packet.src,
+                              packet.dst, of.OFPP_FLOOD, tracing.FLOOD)
+
+        return
+
+    def flood_pod(self, packet, packet_in, out_port):
+        """Sends a packet up an uplink and down the other downlinks.
+
+        Used by the aggregation switches of a fat-tree for the packets whose
+        destination is unknown. The core switch above floods them to the
+        other pods only, so the other edge switches of the pod of the sender
+        are reached from here.
+
+        Parameters
+        ----------
+        packet : pox.lib.packet
+            Packet that the switch sent up to the controller
+        packet_in : ofp_packet_in object
+            OpenFlow message
+        out_port : int
+            Uplink out of which to send the packet
+
+        Returns
+        -------
+        None
+        """
+
+        actions = [of.ofp_action_output(port=p) for p in self.ports.downlinks
+                   if p != packet_in.in_port]
+        actions.append(of.ofp_action_output(port=out_port))
+        self.flood(packet, packet_in, actions)
+
+        return
+
+    def forget_flow_to(self, address):
+        """Removes the flow of the switch towards a host.
+
+        When flows only match the destination, the packets of a new host
+        towards known hosts follow the flows and the new host is never
+        learnt. Removing the flow towards the source of a packet that is
+        flooded because its destination is unknown makes the answer of the
+        destination come to the controller, which then learns it.
+
+        Parameters
+        ----------
+        address : EthAddr
+            MAC address of the host
+
+        Returns
+        -------
+        None
+        """
+
+        self.flow_table.delete(of.ofp_match(dl_dst=address))
+
+        return
+
+    def reconcile(self, stats):
+        """Adopts the flows the switch kept across a restart of the controller.
+
+        The flows are added to the flow table of the switch, so that their
+        removal and eviction are tracked. Flows sending the packets of a
+        host to a host port where it is no longer found, or out of a port
+        the switch no longer has, are deleted instead. Flows without a
+        cookie, e.g. the proactive ones, are left as they are.
+
+        Parameters
+        ----------
+        stats : list of ofp_flow_stats
+            Statistics of the flows of the switch
+
+        Returns
+        -------
+        None
+        """
+
+        adopted = deleted = 0
+        for stat in stats:
+            if not stat.cookie:
+                continue
+            stale = False
+            for action in stat.actions:
+                if not isinstance(action, of.ofp_action_output):
+                    continue
+                port = action.port
+                if port < of.OFPP_MAX and port not in self.connection.ports:
+                    stale = True
+                elif (self.ports.role_of(port) == HOST
+                      and stat.match.dl_dst is not None):
+                    known_port = self.lookup_port(str(stat.match.dl_dst))
+                    stale = known_port is not None and known_port != port
+                if stale:
+                    break
+
+            if stale:
+                self.flow_table.delete(stat.match, stat.priority)
+                deleted += 1
+            elif self.flow_table.adopt(stat):
+                adopted += 1
+        log.info("S{} - Adopted {} flows, deleted {} stale ones".format(
+            self.switch_id, adopted, deleted))
+        return
+
+    @abstractmethod
+    def act_like_switch(self, packet, packet_in, role):
+        """Decides what to do with a packet, the policy of the controller.
+
+        Parameters
+        ----------
+        packet : pox.lib.packet
+            Packet that the switch sent up to the controller
+        packet_in : ofp_packet_in object
+            OpenFlow message
+        role : int
+            Role of the input port of the packet, see topology
+
+        Returns
+        -------
+        None
+        """
+
+    def _handle_ConnectionDown(self, event):
+        """Stops following the layout once the switch disconnects.
+
+        Parameters
+        ----------
+        event : ConnectionDown
+            Event raised when the switch disconnects
+
+        Returns
+        -------
+        None
+        """
+
+        if hasattr(self.topology, "remove_listener"):
+            self.topology.remove_listener(self._topology_changed)
+        return
+
+    def _handle_FlowStatsReceived(self, event):
+        """Adopts the flows of the switch after a restart of the controller.
+
+        Parameters
+        ----------
+        event : FlowStatsReceived
+            Event raised when the switch replies to a FlowStatsRequest
+
+        Returns
+        -------
+        None
+        """
+
+        if self._reconcile:
+            self._reconcile = False
+            self.reconcile(event.stats)
+        return
+
+    def _handle_PortStatus(self, event):
+        """Covers the ports added to the switch in the table of port roles.
+
+        Parameters
+        ----------
+        event : PortStatus
+            Event raised when a port of the switch is added, removed or
+            modified
+
+        Returns
+        -------
+        None
+        """
+
+        self.ports.add(event.port)
+        return
+
+    def _handle_PacketIn(self, event):
+        """Handles packet in messages from the switch.
+
+        The packets coming in through a port whose role is unknown are
+        dropped instead of being handed to the policy.
+
+        Parameters
+        ----------
+        event : pox.lib.revent
+            Event that the controller handles from the connected switch
+
+        Returns
+        -------
+        None
+        """
+
+        packet = event.parsed
+        if not packet.parsed:
+            log.warning("Ignoring incomplete packet")
+            return
+
+        packet_in = event.ofp
+        in_port = packet_in.in_port
+        port_role = self.port_role
+        role = port_role[in_port] if in_port < len(port_role) else UNKNOWN
+        if role == UNKNOWN:
+            # The port is not in the layout, e.g. before the links of the
+            # switch are discovered: flooding the packet could loop through
+            # the fabric, so it is dropped
+            if self.trace is not None:
+                self.trace.record(self.switch_id, in_port, packet.src,
+                                  packet.dst, of.OFPP_NONE, tracing.DROP)
+            return
+        if self.metrics is None:
+            self.act_like_switch(packet, packet_in, role)
+            return
+
+        started = time.perf_counter()
+        self.act_like_switch(packet, packet_in, role)
+        self.metrics.handled(time.perf_counter() - started)
+
+        return
+
+
+class FabricServices(object):
+    """Services shared by the controllers of every switch of a policy.
+
+    The `launch` function of a policy creates a FabricServices object with
+    the options common to the policies, which builds the layout of the
+    fabric and the host directory. The policy then creates its own
+    services, e.g. its tenants or port statistics, and calls `start` with a
+    function creating the controller of a switch. `start` creates the
+    checkpoint, the flow tracking service, the metrics and the trace, and
+    controls the switches as they connect.
+
+    Arguments
+    ----------
+    policy : str
+        One of "tree", "vlan" or "adaptive"
+    topology : ClosTopology, FatTreeTopology or DiscoveredTopology
+        Layout of the fabric
+    discovery : bool
+        Whether the layout is discovered
+    proactive : bool
+        Whether the forwarding state is pushed to each switch when it
+        connects
+    hosts : HostDirectory object
+        Fabric-wide directory of the location of the hosts
+    checkpoint : Checkpoint object
+        Fabric-wide checkpoint of the state of the controllers, None if not
+        saved
+    flow_tables : FlowTables object
+        Fabric-wide service tracking the flows installed in the switches
+    metrics : Metrics object
+        Fabric-wide service exporting the counters of the controllers, None
+        if not recorded
+    trace : Trace object
+        Fabric-wide ring buffer of the decisions of the controllers, None if
+        not recorded
+    """
+
+    def __init__(self, policy, nCore=None, nEdge=None, nHosts=None, k=0,
+                 discovery=False, topology_file=None, proactive=False,
+                 table_capacity=0, eviction="lru", idle_timeout=0,
+                 hard_timeout=0, flow_stats_interval=0, metrics_file=None,
+                 metrics_port=0, metrics_address="127.0.0.1",
+                 metrics_interval=10, trace_records=0, trace_file="trace.txt",
+                 checkpoint_file=None, checkpoint_interval=10):
+        """Initializes the FabricServices object from the launch options.
+
+        Parameters
+        ----------
+        policy : str
+            One of "tree", "vlan" or "adaptive"
+        nCore : int
+            Number of core switches in the Clos Topology
+        nEdge : int
+            Number of edge switches in the Clos Topology
+        nHosts : int
+            Number of hosts per edge switch in the Clos Topology
+        k : int
+            Number of ports of the switches of a three-tier k-ary fat-tree,
+            which then replaces the two-tier Clos topology of nCore, nEdge
+            and nHosts. 0 for the two-tier topology.
+        discovery : bool
+            If True, the layout of the fabric is learnt from the links
+            between the switches, discovered with LLDP, instead of the
+            numbering of ClosTopo. nCore, nEdge, nHosts and k are then
+            unused.
+        topology_file : str
+            Path of a text file the discovered layout is saved to. It is
+            read at startup if it exists, so that the controllers do not
+            wait for the links to be discovered again.
+        proactive : bool
+            If True, the whole forwarding state is computed from the
+            topology and pushed to each switch when it connects, so that
+            packets between hosts of the topology never reach the controller
+        table_capacity : int
+            Maximum number of flows installed in each switch, 0 for no
+            limit. The flows least recently used, or which carried the
+            fewest bytes, are deleted to make room for new ones. Not
+            supported with `proactive`.
+        eviction : str
+            "lru" or "bytes", order in which flows are evicted
+        idle_timeout : int
+            Idle timeout of the flows in seconds, 0 for none
+        hard_timeout : int
+            Hard timeout of the flows in seconds, 0 for none
+        flow_stats_interval : int
+            Time interval in seconds between two flow statistics requests,
+            used to rank the flows for eviction, 0 to never request them.
+            The flows are only known to be used from their statistics, so
+            the "lru" eviction with a `table_capacity` needs them.
+        metrics_file : str
+            Path of a file rewritten every `metrics_interval` seconds with
+            the counters of the controllers in the Prometheus text format
+        metrics_port : int
+            TCP port serving the same metrics over HTTP at /metrics, 0 for
+            none
+        metrics_address : str
+            IP address the metrics are served on, the loopback interface by
+            default so that they are not exposed to the network, e.g.
+            "0.0.0.0" for all the interfaces
+        metrics_interval : int
+            Time interval in seconds between two writes of `metrics_file`
+        trace_records : int
+            Number of decisions of the controllers kept in a ring buffer, 0
+            to not record them. The buffer is written to `trace_file` when
+            the controller goes down.
+        trace_file : str
+            Path of the text file the recorded decisions are written to
+        checkpoint_file : str
+            Path of a file the MAC tables, the host directory, the state of
+            the policy and the flows are saved to every
+            `checkpoint_interval` seconds and when the controller goes down.
+            If it exists at startup, the controller resumes from it: the
+            switches keep their flows, which the controllers adopt, instead
+            of starting cold.
+        checkpoint_interval : int
+            Time interval in seconds between two saves of `checkpoint_file`
+        """
+
+        log.debug("Controller started with the following arguments:")
+        log.debug("nCore={}, nEdge={}, nHosts ={}".format(nCore, nEdge,
+                                                          nHosts))
+        self.policy = policy
+        self.proactive = str_to_bool(proactive)
+        self.discovery = str_to_bool(discovery)
+        if self.proactive and (int(k) or self.discovery):
+            raise ValueError("The proactive mode only supports the two-tier "
+                             "Clos topology")
+        if self.proactive and int(table_capacity):
+            # The pre-installed flows are not tracked by the flow tables
+            raise ValueError("A table capacity is not supported with the "
+                             "proactive mode")
+        if self.discovery:
+            self.topology = DiscoveredTopology(topology_file)
+            self.topology.start()
+        else:
+            self.topology = build_topology(nCore, nEdge, nHosts, k)
+
+        self.hosts = HostDirectory()
+
+        self._flow_options = (int(table_capacity), eviction,
+                              int(idle_timeout), int(hard_timeout),
+                              int(flow_stats_interval))
+        self._checkpoint_options = (checkpoint_file, int(checkpoint_interval))
+        self._metrics_options = (metrics_file, int(metrics_port),
+                                 metrics_address, int(metrics_interval))
+        self._trace_options = (int(trace_records), trace_file)
+        self.checkpoint = None
+        self.flow_tables = None
+        self.metrics = None
+        self.trace = None
+
+    def start(self, make, scheduler=None, tenants=None, port_stats=None,
+              aggregate=False):
+        """Creates the remaining services and controls the switches.
+
+        Parameters
+        ----------
+        make : callable
+            Function creating the controller of a switch from its connection
+        scheduler : StatsScheduler object
+            Scheduler of the statistics requests of the policy, which then
+            also sends the flow statistics requests
+        tenants : Tenants object
+            Tenant assignments of the policy, saved in the checkpoint
+        port_stats : PortStats object
+            Port statistics service of the policy, whose samples are saved
+            in the checkpoint
+        aggregate : bool
+            Whether the proactive rules are aggregated
+
+        Returns
+        -------
+        None
+        """
+
+        hosts = self.hosts
+        checkpoint_file, checkpoint_interval = self._checkpoint_options
+        generation = 0
+        if checkpoint_file is not None:
+            self.checkpoint = Checkpoint(checkpoint_file, hosts,
+                                         tenants=tenants,
+                                         port_stats=port_stats,
+                                         interval=checkpoint_interval)
+            generation = self.checkpoint.generation
+            core.addListenerByName("GoingDownEvent", self.checkpoint.save)
+        self.flow_tables = FlowTables(*self._flow_options,
+                                      scheduler=scheduler,
+                                      generation=generation)
+
+        (metrics_file, metrics_port, metrics_address,
+         metrics_interval) = self._metrics_options
+        if metrics_file is not None or metrics_port:
+            self.metrics = Metrics(self.policy, self.flow_tables,
+                                   metrics_file, metrics_port,
+                                   metrics_interval, address=metrics_address)
+            self.metrics.gauge("hosts", "Hosts in the host directory",
+                               lambda: len(hosts))
+
+        trace_records, trace_file = self._trace_options
+        if trace_records:
+            trace = self.trace = tracing.Trace(trace_records)
+
+            def dump_trace(event=None):
+                log.info("Wrote {} decisions to {}".format(
+                    trace.dump(trace_file), trace_file))
+
+            core.addListenerByName("GoingDownEvent", dump_trace)
+
+        def start_switch(event):
+            log.debug("Controlling %s" % (event.connection,))
+            if self.proactive:
+                metrics = None
+                if self.metrics is not None:
+                    # Registered again by the controller of the switch
+                    metrics = self.metrics.register(event.connection)
+                install_proactive(event.connection, self.policy,
+                                  self.topology.nCore, self.topology.nEdge,
+                                  self.topology.nHosts, aggregate, metrics)
+            make(event.connection)
+
+        core.openflow.addListenerByName("ConnectionUp", start_switch)
+        return
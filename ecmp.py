@@ -0,0 +1,201 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to spread the flows of an edge switch over its uplinks
+# without port statistics
+
+import hashlib
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+
+
+HASH_FIELDS = ("5tuple", "mac")
+
+_FIVE_TUPLE = struct.Struct("!IIBHH")
+
+
+def flow_key(packet, fields="5tuple"):
+    """Gives the bytes identifying the flow of a packet.
+
+    Parameters
+    ----------
+    packet : pox.lib.packet.ethernet
+        Packet of the flow
+    fields : str
+        "5tuple" to identify flows by IP addresses, protocol and transport
+        ports, "mac" to identify them by MAC addresses. Packets other than
+        IPv4 are always identified by MAC addresses.
+
+    Returns
+    -------
+    bytes
+        Key of the flow
+    """
+
+    if fields == "5tuple":
+        ip = packet.find("ipv4")
+        if ip is not None:
+            transport = packet.find("tcp") or packet.find("udp")
+            src_port = dst_port = 0
+            if transport is not None:
+                src_port, dst_port = transport.srcport, transport.dstport
+            return _FIVE_TUPLE.pack(ip.srcip.toUnsigned(),
+                                    ip.dstip.toUnsigned(), ip.protocol,
+                                    src_port, dst_port)
+    return packet.src.toRaw() + packet.dst.toRaw()
+
+
+class HashUplinkSelector(object):
+    """Selects the uplink of a flow by hashing its headers.
+
+    The uplinks are placed on a consistent-hash ring, each at `replicas`
+    points. A flow goes to the uplink of the first point following its hash
+    on the ring, so adding or removing an uplink only moves the flows of
+    about 1/n of the ring, with n uplinks. The ring is precomputed into a
+    table of `buckets` entries indexed by the hash of the flow, so that
+    selecting an uplink costs O(1) and needs no statistics.
+
+    Arguments
+    ----------
+    ports : list of int
+        Uplink ports of the edge switch
+    fields : str
+        Headers identifying a flow, one of HASH_FIELDS
+    replicas : int
+        Number of points of each uplink on the ring
+    ring : list of (int, int)
+        Points of the ring and their uplink port, sorted by point
+    table : array of int
+        Uplink port of each bucket of the hash space
+    """
+
+    RING_SIZE = 1 << 32
+
+    def __init__(self, ports, fields="5tuple", replicas=64, buckets=4096):
+        """Initializes the HashUplinkSelector object.
+
+        Parameters
+        ----------
+        ports : list of int
+            Uplink ports of the edge switch
+        fields : str
+            Headers identifying a flow, one of HASH_FIELDS
+        replicas : int
+            Number of points of each uplink on the ring
+        buckets : int
+            Number of entries of the precomputed table
+        """
+
+        if fields not in HASH_FIELDS:
+            raise ValueError("Unknown hash fields: {}".format(fields))
+
+        self.fields = fields
+        self.replicas = replicas
+        self.ports = []
+        self.ring = []
+        self.table = array('H', bytes(2 * buckets))
+        for port in ports:
+            self.ports.append(port)
+            self.ring.extend(self._points(port))
+        self._rebuild()
+
+    def _points(self, port):
+        """Gives the points of an uplink on the ring.
+
+        Parameters
+        ----------
+        port : int
+            Uplink port
+
+        Returns
+        -------
+        list of (int, int)
+            Points of the uplink and the port
+        """
+
+        points = []
+        for replica in range(self.replicas):
+            digest = hashlib.md5("{}-{}".format(port, replica).encode())
+            points.append((int.from_bytes(digest.digest()[:4], "big"), port))
+        return points
+
+    def _rebuild(self):
+        """Recomputes the uplink of every bucket from the ring.
+
+        Returns
+        -------
+        None
+        """
+
+        self.ring.sort()
+        if not self.ring:
+            return
+        points = [point for point, _ in self.ring]
+        step = self.RING_SIZE // len(self.table)
+        for bucket in range(len(self.table)):
+            # First point at or after the start of the bucket, wrapping
+            index = bisect_left(points, bucket * step) % len(points)
+            self.table[bucket] = self.ring[index][1]
+        return
+
+    def select(self, packet=None):
+        """Selects the uplink of the flow of a packet.
+
+        Parameters
+        ----------
+        packet : pox.lib.packet.ethernet
+            Packet of the flow
+
+        Returns
+        -------
+        int
+            Uplink port of the flow, None if no uplink is left
+        """
+
+        if not self.ports:
+            return None
+        key = flow_key(packet, self.fields)
+        return self.table[zlib.crc32(key) % len(self.table)]
+
+    def add_port(self, port):
+        """Adds an uplink, which takes about 1/n of the flows.
+
+        Parameters
+        ----------
+        port : int
+            Uplink port
+
+        Returns
+        -------
+        None
+        """
+
+        if port in self.ports:
+            return
+        self.ports.append(port)
+        self.ring.extend(self._points(port))
+        self._rebuild()
+        return
+
+    def remove_port(self, port):
+        """Removes an uplink, whose flows are spread over the others.
+
+        Removing the last uplink is allowed: no uplink is selected until
+        one is added again.
+
+        Parameters
+        ----------
+        port : int
+            Uplink port
+
+        Returns
+        -------
+        None
+        """
+
+        if port not in self.ports:
+            return
+        self.ports.remove(port)
+        self.ring = [entry for entry in self.ring if entry[1] != port]
+        self._rebuild()
+        return
@@ -0,0 +1,178 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to find the heavy flows of an edge switch and move
+# them away from congested uplinks
+
+
+class FlowRate(object):
+    """Rate of a flow, measured between two flow statistics.
+
+    Arguments
+    ----------
+    time : float
+        Time of the last statistics of the flow, in seconds
+    byte_count : int
+        Number of bytes of the flow in the last statistics
+    rate : float
+        Rate of the flow in Kbps between the last two statistics
+    elephant : bool
+        Whether the flow is currently considered as an elephant
+    moved_at : float
+        Time at which the flow was last moved to another uplink, None if
+        it never was
+    """
+
+    __slots__ = ("time", "byte_count", "rate", "elephant", "moved_at")
+
+    def __init__(self, time, byte_count):
+        self.time = time
+        self.byte_count = byte_count
+        self.rate = 0.0
+        self.elephant = False
+        self.moved_at = None
+
+
+class ElephantDetector(object):
+    """Finds the elephant flows of an edge switch from its flow statistics.
+
+    A flow becomes an elephant when its rate goes above `threshold` and
+    stays one until its rate goes below `release` times the threshold, so
+    that a flow whose rate oscillates around the threshold does not keep
+    changing state. A flow moved to another uplink is not moved again
+    before `hold_time` seconds, the time for the loads of the uplinks to
+    reflect the move.
+
+    Arguments
+    ----------
+    threshold : float
+        Rate in Kbps above which a flow becomes an elephant
+    release : float
+        Fraction of the threshold below which an elephant stops being one
+    hold_time : float
+        Minimum time in seconds between two moves of the same flow
+    margin : float
+        A flow of rate r is moved from an uplink to another only if the
+        load of the first exceeds the load of the second by more than
+        (1 + margin) * r
+    flows : dict of int: FlowRate
+        Rate of the flows of the switch, indexed by cookie
+    """
+
+    def __init__(self, threshold=1000.0, release=0.5, hold_time=10.0,
+                 margin=0.5):
+        """Initializes the ElephantDetector object.
+
+        Parameters
+        ----------
+        threshold : float
+            Rate in Kbps above which a flow becomes an elephant
+        release : float
+            Fraction of the threshold below which an elephant stops being one
+        hold_time : float
+            Minimum time in seconds between two moves of the same flow
+        margin : float
+            Load difference between two uplinks needed to move a flow,
+            relative to the rate of the flow
+        """
+
+        self.threshold = threshold
+        self.release = release
+        self.hold_time = hold_time
+        self.margin = margin
+        self.flows = {}
+
+    def update(self, now, byte_counts):
+        """Updates the rates of the flows from new flow statistics.
+
+        Flows missing from the statistics are forgotten.
+
+        Parameters
+        ----------
+        now : float
+            Time at which the statistics were received, in seconds
+        byte_counts : dict of int: int
+            Number of bytes of each flow, indexed by cookie
+
+        Returns
+        -------
+        None
+        """
+
+        flows = {}
+        for cookie, byte_count in byte_counts.items():
+            flow = self.flows.get(cookie)
+            if flow is None:
+                flows[cookie] = FlowRate(now, byte_count)
+                continue
+            flows[cookie] = flow
+
+            elapsed = now - flow.time
+            if elapsed <= 0:
+                continue
+            if byte_count >= flow.byte_count:
+                flow.rate = (byte_count - flow.byte_count) * 8 / elapsed / 10**3
+            flow.time = now
+            flow.byte_count = byte_count
+
+            if flow.rate > self.threshold:
+                flow.elephant = True
+            elif flow.rate < self.release * self.threshold:
+                flow.elephant = False
+        self.flows = flows
+        return
+
+    def elephants(self):
+        """Gives the current elephant flows.
+
+        Returns
+        -------
+        list of (int, float)
+            Cookie and rate in Kbps of the elephants, largest first
+        """
+
+        elephants = [(cookie, flow.rate) for cookie, flow in self.flows.items()
+                     if flow.elephant]
+        elephants.sort(key=lambda elephant: -elephant[1])
+        return elephants
+
+    def rebalance(self, now, ports, loads):
+        """Plans the moves of elephants from loaded uplinks to lighter ones.
+
+        Each elephant, largest first, is moved to the least loaded uplink
+        if the difference of load is large enough, and the loads are
+        updated as if the move had already happened.
+
+        Parameters
+        ----------
+        now : float
+            Current time, in seconds
+        ports : dict of int: int
+            Uplink port of each flow, indexed by cookie
+        loads : dict of int: float
+            Load in Kbps of each uplink port
+
+        Returns
+        -------
+        list of (int, int, int, float)
+            Cookie, current uplink, new uplink and rate in Kbps of the flows
+            to move
+        """
+
+        loads = dict(loads)
+        moves = []
+        for cookie, rate in self.elephants():
+            port = ports.get(cookie)
+            if port not in loads:
+                continue
+            flow = self.flows[cookie]
+            if (flow.moved_at is not None
+                    and now - flow.moved_at < self.hold_time):
+                continue
+
+            target = min(loads, key=loads.get)
+            if loads[port] - loads[target] <= (1 + self.margin) * rate:
+                continue
+            loads[port] -= rate
+            loads[target] += rate
+            flow.moved_at = now
+            moves.append((cookie, port, target, rate))
+        return moves
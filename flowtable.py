@@ -0,0 +1,559 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to keep track of the flows installed in the switches
+# and keep their flow tables within a capacity budget
+
+
+import heapq
+import itertools
+from collections import OrderedDict
+
+from pox.core import core
+import pox.openflow.libopenflow_01 as of
+
+from scheduler import StatsScheduler
+
+
+log = core.getLogger()
+
+EVICTION_POLICIES = ("lru", "bytes")
+
+
+class InstalledFlow(object):
+    """A flow installed by the controller in a switch.
+
+    Arguments
+    ----------
+    match : ofp_match object
+        Match of the flow
+    priority : int
+        Priority of the flow
+    cookie : int
+        Cookie identifying the flow in FlowRemoved and flow statistics
+    actions : list of ofp_action
+        Actions of the flow
+    byte_count : int
+        Number of bytes of the flow in the last statistics
+    """
+
+    __slots__ = ("match", "priority", "cookie", "actions", "byte_count")
+
+    def __init__(self, match, priority, cookie, actions=()):
+        self.match = match
+        self.priority = priority
+        self.cookie = cookie
+        self.actions = list(actions)
+        self.byte_count = 0
+
+
+class FlowTable(object):
+    """Index of the flows installed by the controller in one switch.
+
+    Flows are indexed by cookie, in the order they were last installed or
+    seen carrying traffic, so that the least recently used flow is first.
+    A second index by match and priority recognizes a flow installed again,
+    which replaces the previous one in the switch.
+
+    When the number of flows reaches the capacity of the table, a batch
+    of flows is deleted before installing a new one, so that the switch
+    never refuses a flow because its table is full.
+
+    Arguments
+    ----------
+    connection : pox.lib.revent.connection
+        Connection from the controller to the switch
+    flows : OrderedDict of int: InstalledFlow
+        Installed flows, indexed by cookie, least recently used first
+    by_match : dict of (bytes, int): int
+        Cookie of the installed flows, indexed by packed match and priority
+    capacity : int
+        Maximum number of flows installed by the controller, 0 for no limit
+    eviction : str
+        "lru" to evict the least recently used flows first, "bytes" to
+        evict the flows which carried the fewest bytes first. The use of
+        the flows is only known from the flow statistics.
+    idle_timeout : int
+        Idle timeout given to the flows that have none, 0 for none
+    hard_timeout : int
+        Hard timeout given to the flows that have none, 0 for none
+    counters : dict of str: int
+        Number of flows installed, evicted and removed by the switch, and of
+        flow_mods refused because the table was full
+    metrics : SwitchMetrics object
+        Counters of the controller of the switch, which count the flow_mods
+        modifying and deleting flows, None if they are not exported
+    """
+
+    # Fraction of the capacity evicted at once when the table is full
+    EVICTION_BATCH = 0.05
+
+    def __init__(self, connection, capacity=0, eviction="lru",
+                 idle_timeout=0, hard_timeout=0, generation=0, metrics=None):
+        """Initializes the FlowTable object.
+
+        Parameters
+        ----------
+        connection : pox.lib.revent.connection
+            Connection from the controller to the switch
+        capacity : int
+            Maximum number of flows installed by the controller, 0 for no limit
+        eviction : str
+            One of EVICTION_POLICIES
+        idle_timeout : int
+            Idle timeout given to the flows that have none, 0 for none
+        hard_timeout : int
+            Hard timeout given to the flows that have none, 0 for none
+        generation : int
+            Number of restarts of the controller, the upper 32 bits of the
+            cookies, so that they differ from the cookies of the flows
+            installed before a restart
+        metrics : SwitchMetrics object
+            Counters of the controller of the switch, None for none
+        """
+
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError("Unknown eviction policy: {}".format(eviction))
+
+        self.connection = connection
+        self.flows = OrderedDict()
+        self.by_match = {}
+        self.capacity = capacity
+        self.eviction = eviction
+        self.idle_timeout = idle_timeout
+        self.hard_timeout = hard_timeout
+        self.counters = dict(installed=0, evicted=0, removed=0, table_full=0)
+        self.metrics = metrics
+        self._next_cookie = (generation << 32) + 1
+        self._pending = OrderedDict()
+
+    def install(self, msg):
+        """Records a flow about to be sent to the switch.
+
+        The flow_mod is completed so that the switch reports the removal
+        of the flow, and given the default timeouts if it has none. If the
+        table is full, flows are evicted first.
+
+        Parameters
+        ----------
+        msg : ofp_flow_mod object
+            Flow to install, with command OFPFC_ADD
+
+        Returns
+        -------
+        None
+        """
+
+        key = (msg.match.pack(), msg.priority)
+        cookie = self.by_match.pop(key, None)
+        if cookie is not None:
+            # The switch replaces the previous flow without notice
+            del self.flows[cookie]
+        elif self.capacity and len(self.flows) >= self.capacity:
+            self.evict(max(1, int(self.capacity * self.EVICTION_BATCH)))
+
+        cookie = self._next_cookie
+        self._next_cookie += 1
+        msg.cookie = cookie
+        msg.flags |= of.OFPFF_SEND_FLOW_REM
+        if not msg.idle_timeout:
+            msg.idle_timeout = self.idle_timeout
+        if not msg.hard_timeout:
+            msg.hard_timeout = self.hard_timeout
+
+        self.flows[cookie] = InstalledFlow(msg.match, msg.priority, cookie,
+                                           msg.actions)
+        self.by_match[key] = cookie
+        self.counters["installed"] += 1
+
+        # Keep the last flow_mods to recognize the one a table-full error
+        # is about
+        self._pending[msg.xid] = cookie
+        if len(self._pending) > 64:
+            self._pending.popitem(last=False)
+        return
+
+    def adopt(self, stat):
+        """Records a flow the switch kept across a restart of the controller.
+
+        Adopted flows are the least recently used, as nothing is known of
+        their use until the next flow statistics.
+
+        Parameters
+        ----------
+        stat : ofp_flow_stats
+            Statistics of the flow, from the switch
+
+        Returns
+        -------
+        bool
+            False if a flow with the same match was installed since the
+            restart, True otherwise
+        """
+
+        key = (stat.match.pack(), stat.priority)
+        if key in self.by_match:
+            return False
+        flow = InstalledFlow(stat.match, stat.priority, stat.cookie,
+                             stat.actions)
+        flow.byte_count = stat.byte_count
+        self.flows[stat.cookie] = flow
+        self.flows.move_to_end(stat.cookie, last=False)
+        self.by_match[key] = stat.cookie
+        return True
+
+    def delete(self, match, priority=of.OFP_DEFAULT_PRIORITY):
+        """Deletes a flow from the switch.
+
+        Parameters
+        ----------
+        match : ofp_match object
+            Match of the flow
+        priority : int
+            Priority of the flow
+
+        Returns
+        -------
+        None
+        """
+
+        cookie = self.by_match.pop((match.pack(), priority), None)
+        if cookie is not None:
+            del self.flows[cookie]
+        self.connection.send(of.ofp_flow_mod(command=of.OFPFC_DELETE_STRICT,
+                                             match=match, priority=priority))
+        if self.metrics is not None:
+            self.metrics.flow_mod += 1
+        return
+
+    def modify(self, cookie, actions):
+        """Changes the actions of a flow installed in the switch.
+
+        The flow keeps its counters in the switch. If the switch removed it
+        meanwhile, the modification installs it again with the same cookie.
+
+        Parameters
+        ----------
+        cookie : int
+            Cookie of the flow
+        actions : list of ofp_action_output
+            New actions of the flow
+
+        Returns
+        -------
+        bool
+            False if the flow is not installed anymore, True otherwise
+        """
+
+        flow = self.flows.get(cookie)
+        if flow is None:
+            return False
+        msg = of.ofp_flow_mod(command=of.OFPFC_MODIFY_STRICT,
+                              match=flow.match, priority=flow.priority,
+                              cookie=cookie, flags=of.OFPFF_SEND_FLOW_REM,
+                              idle_timeout=self.idle_timeout,
+                              hard_timeout=self.hard_timeout)
+        msg.actions.extend(actions)
+        self.connection.send(msg)
+        if self.metrics is not None:
+            self.metrics.flow_mod += 1
+        flow.actions = list(actions)
+        return True
+
+    def evict(self, count):
+        """Deletes flows from the switch to make room for new ones.
+
+        Parameters
+        ----------
+        count : int
+            Number of flows to delete
+
+        Returns
+        -------
+        None
+        """
+
+        if self.eviction == "lru":
+            victims = list(itertools.islice(self.flows.values(), count))
+        else:
+            victims = heapq.nsmallest(count, self.flows.values(),
+                                      key=lambda flow: flow.byte_count)
+
+        for flow in victims:
+            self.delete(flow.match, flow.priority)
+        self.counters["evicted"] += len(victims)
+        log.debug("S{} - Evicted {} flows, {} left".format(
+            self.connection.dpid, len(victims), len(self.flows)))
+        return
+
+    def removed(self, cookie):
+        """Forgets a flow the switch removed.
+
+        Parameters
+        ----------
+        cookie : int
+            Cookie of the flow
+
+        Returns
+        -------
+        None
+        """
+
+        flow = self.flows.pop(cookie, None)
+        if flow is not None:
+            del self.by_match[(flow.match.pack(), flow.priority)]
+            self.counters["removed"] += 1
+        return
+
+    def refused(self, xid):
+        """Handles a flow_mod refused because the table of the switch is full.
+
+        The capacity is lowered to the number of flows the switch actually
+        holds and room is made for the next flows.
+
+        Parameters
+        ----------
+        xid : int
+            Transaction ID of the refused flow_mod
+
+        Returns
+        -------
+        None
+        """
+
+        self.counters["table_full"] += 1
+        cookie = self._pending.pop(xid, None)
+        if cookie is not None:
+            self.removed(cookie)
+        self.capacity = max(1, len(self.flows))
+        log.warning("S{} - Flow table full, capacity lowered to {}".format(
+            self.connection.dpid, self.capacity))
+        self.evict(max(1, int(self.capacity * self.EVICTION_BATCH)))
+        return
+
+    def update_usage(self, stats):
+        """Records the traffic of the flows from flow statistics.
+
+        Flows whose byte count increased become the most recently used.
+
+        Parameters
+        ----------
+        stats : list of ofp_flow_stats
+            Statistics of the flows of the switch
+
+        Returns
+        -------
+        None
+        """
+
+        for stat in stats:
+            flow = self.flows.get(stat.cookie)
+            if flow is not None and stat.byte_count != flow.byte_count:
+                flow.byte_count = stat.byte_count
+                self.flows.move_to_end(stat.cookie)
+        return
+
+    def __len__(self):
+        return len(self.flows)
+
+
+class FlowTables(object):
+    """Fabric-wide service tracking the flows installed in the switches.
+
+    A single FlowTables object is created for the whole controller and
+    shared by every switch controller, which registers its switch to get
+    the FlowTable of the switch. The service keeps the tables in sync with
+    the FlowRemoved and table-full errors of the switches.
+
+    Arguments
+    ----------
+    tables : dict of int: FlowTable
+        Flow table of every registered switch, indexed by switch ID
+    capacity : int
+        Maximum number of flows installed in each switch, 0 for no limit
+    eviction : str
+        One of EVICTION_POLICIES
+    idle_timeout : int
+        Idle timeout given to the flows that have none, 0 for none
+    hard_timeout : int
+        Hard timeout given to the flows that have none, 0 for none
+    stats_interval : int
+        Time interval between two flow statistics requests, used to rank
+        the flows for eviction. 0 to never request them.
+    scheduler : StatsScheduler object
+        Scheduler sending the flow statistics requests, None if they are
+        never requested
+    generation : int
+        Number of restarts of the controller, which keeps the cookies of
+        the flows of two runs apart
+
+    Notes
+    ----------
+    If `stats_interval` is not 0 and no scheduler is given, one is created,
+    which launches a pox.lib.recoco.Timer thread.
+    """
+
+    def __init__(self, capacity=0, eviction="lru", idle_timeout=0,
+                 hard_timeout=0, stats_interval=0, scheduler=None,
+                 generation=0):
+        """Initializes the FlowTables object.
+
+        Parameters
+        ----------
+        capacity : int
+            Maximum number of flows installed in each switch, 0 for no limit
+        eviction : str
+            One of EVICTION_POLICIES
+        idle_timeout : int
+            Idle timeout given to the flows that have none, 0 for none
+        hard_timeout : int
+            Hard timeout given to the flows that have none, 0 for none
+        stats_interval : int
+            Time interval between two flow statistics requests, 0 for none.
+            The "lru" eviction with a capacity needs them.
+        scheduler : StatsScheduler object
+            Scheduler shared with the other services polling the switches,
+            None to create one if needed
+        generation : int
+            Number of restarts of the controller, see Checkpoint
+        """
+
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError("Unknown eviction policy: {}".format(eviction))
+        if capacity and eviction == "lru" and not stats_interval:
+            # Only the flow statistics tell which flows are used
+            raise ValueError("The lru eviction needs flow statistics, see "
+                             "flow_stats_interval")
+
+        self.tables = {}
+        self.capacity = capacity
+        self.eviction = eviction
+        self.idle_timeout = idle_timeout
+        self.hard_timeout = hard_timeout
+        self.stats_interval = stats_interval
+        self.generation = generation
+
+        core.openflow.addListenerByName(
+            "FlowRemoved", self._handle_FlowRemoved)
+        core.openflow.addListenerByName("ErrorIn", self._handle_ErrorIn)
+        core.openflow.addListenerByName(
+            "FlowStatsReceived", self._handle_FlowStatsReceived)
+        core.openflow.addListenerByName(
+            "ConnectionDown", self._handle_ConnectionDown)
+        if stats_interval and scheduler is None:
+            scheduler = StatsScheduler()
+        self.scheduler = scheduler
+
+    def register(self, connection, metrics=None):
+        """Starts tracking the flows of a switch.
+
+        Parameters
+        ----------
+        connection : pox.lib.revent.connection
+            Connection from the controller to the switch
+        metrics : SwitchMetrics object
+            Counters of the controller of the switch, None for none
+
+        Returns
+        -------
+        FlowTable
+            Index of the flows of the switch
+        """
+
+        table = FlowTable(connection, self.capacity, self.eviction,
+                          self.idle_timeout, self.hard_timeout,
+                          self.generation, metrics)
+        self.tables[connection.dpid] = table
+        if self.stats_interval:
+            self.scheduler.add(("flow", connection.dpid),
+                               lambda: self._sendFlowStatsRequest(connection),
+                               self.stats_interval)
+        return table
+
+    def _sendFlowStatsRequest(self, connection):
+        """Sends a FlowStatsRequest to a switch.
+
+        Parameters
+        ----------
+        connection : pox.lib.revent.connection
+            Connection from the controller to the switch
+
+        Returns
+        -------
+        None
+        """
+
+        connection.send(of.ofp_stats_request(body=of.ofp_flow_stats_request()))
+        return
+
+    def _handle_FlowRemoved(self, event):
+        """Forgets a flow removed by a switch.
+
+        Parameters
+        ----------
+        event : FlowRemoved
+            Event raised when a switch removes a flow
+
+        Returns
+        -------
+        None
+        """
+
+        table = self.tables.get(event.dpid)
+        if table is not None:
+            table.removed(event.ofp.cookie)
+        return
+
+    def _handle_ErrorIn(self, event):
+        """Makes room in a switch that refused a flow because it is full.
+
+        Parameters
+        ----------
+        event : ErrorIn
+            Event raised when a switch reports an error
+
+        Returns
+        -------
+        None
+        """
+
+        table = self.tables.get(event.dpid)
+        if (table is not None
+                and event.ofp.type == of.OFPET_FLOW_MOD_FAILED
+                and event.ofp.code == of.OFPFMFC_ALL_TABLES_FULL):
+            table.refused(event.ofp.xid)
+        return
+
+    def _handle_FlowStatsReceived(self, event):
+        """Records the traffic of the flows of a switch.
+
+        Parameters
+        ----------
+        event : FlowStatsReceived
+            Event raised when a switch replies to a FlowStatsRequest
+
+        Returns
+        -------
+        None
+        """
+
+        table = self.tables.get(event.dpid)
+        if table is not None:
+            table.update_usage(event.stats)
+        return
+
+    def _handle_ConnectionDown(self, event):
+        """Stops tracking a switch that disconnected.
+
+        Parameters
+        ----------
+        event : ConnectionDown
+            Event raised when a switch disconnects
+
+        Returns
+        -------
+        None
+        """
+
+        self.tables.pop(event.dpid, None)
+        if self.scheduler is not None:
+            self.scheduler.remove(("flow", event.dpid))
+        return
@@ -0,0 +1,84 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to share the location of hosts between switches
+
+
+class HostDirectory(object):
+    """Fabric-wide directory of the location of the hosts.
+
+    A single HostDirectory object is created for the whole controller and
+    shared by every switch controller. An edge switch receiving a packet
+    from one of its host ports records where the source host lives, so that
+    any other switch can forward towards that host without flooding.
+
+    Arguments
+    ----------
+    locations : dict of str: (int, int)
+        Mapping of MAC addresses to the ID of the edge switch and the port
+        of that switch the host is connected to
+    """
+
+    def __init__(self):
+        """Initializes the HostDirectory object."""
+
+        self.locations = {}
+
+    def learn(self, address, switch_id, port):
+        """Records the location of a host.
+
+        Parameters
+        ----------
+        address : str
+            MAC address of the host
+        switch_id : int
+            ID of the edge switch the host is connected to
+        port : int
+            Port of the edge switch the host is connected to
+
+        Returns
+        -------
+        bool
+            True if the location is new or the host moved.
+            False otherwise.
+        """
+
+        location = (switch_id, port)
+        if self.locations.get(address) == location:
+            return False
+        self.locations[address] = location
+        return True
+
+    def locate(self, address):
+        """Gives the location of a host.
+
+        Parameters
+        ----------
+        address : str
+            MAC address of the host
+
+        Returns
+        -------
+        (int, int)
+            ID of the edge switch and port the host is connected to or
+            None if the host was never seen.
+        """
+
+        return self.locations.get(address)
+
+    def forget(self, address):
+        """Removes a host from the directory.
+
+        Parameters
+        ----------
+        address : str
+            MAC address of the host
+
+        Returns
+        -------
+        None
+        """
+
+        self.locations.pop(address, None)
+        return
+
+    def __len__(self):
+        return len(self.locations)
@@ -0,0 +1,661 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to learn the layout of a Clos topology from the links
+# between the switches, instead of assuming the numbering of ClosTopo
+
+
+import os
+
+from pox.core import core
+import pox.openflow.libopenflow_01 as of
+from pox.lib.packet.ethernet import ethernet
+from pox.lib.recoco import Timer
+
+from topology import SwitchPorts
+
+
+log = core.getLogger()
+
+
+def live_ports(ports):
+    """Gives the ports of a switch which can carry traffic.
+
+    A port with no carrier, e.g. a spare port with no cable, or disabled
+    by the administrator cannot lead to a host nor to another switch.
+
+    Parameters
+    ----------
+    ports : iterable of ofp_phy_port
+        Ports of the switch, e.g. the values of the ports of its connection
+
+    Returns
+    -------
+    list of int
+        Numbers of the ports up
+    """
+
+    return [port.port_no for port in ports
+            if not port.state & of.OFPPS_LINK_DOWN
+            and not port.config & of.OFPPC_PORT_DOWN]
+
+
+class DiscoveredTopology(object):
+    """Layout of a Clos topology learnt from the links between switches.
+
+    The links are discovered with LLDP by the openflow.discovery component
+    of POX. Only the ports up are considered, so that the spare ports of a
+    switch are not taken for host ports. The tiers of the switches follow
+    from the links: edge switches are the switches on which hosts were seen,
+    i.e. which sent up packets other than LLDP from a port leading to no
+    other switch. Until hosts are seen below them, the switches with such a
+    port are edge switches too, unless they are neighbours of a switch with
+    hosts, as edge switches are never linked together. The tier of the
+    other switches is their distance to the nearest edge switch, and the
+    switches with no neighbour in a higher tier are core switches. Core
+    switches are numbered from 1 in the order of their IDs, which is the
+    number of the VLAN going through them.
+
+    The layout offers the same methods as ClosTopology, so the controllers
+    use it the same way, and it tells them when it changes. It is saved to a
+    text file on every change so that a controller restarting has it at
+    once. The links read from that file are dropped if the switches do not
+    confirm them within a grace period. Once started, the changes arriving
+    within `settle` seconds, e.g. while a fabric comes up, are handled at
+    once: the layout is computed, saved and told to the listeners a single
+    time.
+
+    Arguments
+    ----------
+    path : str
+        Path of the file the layout is saved to, None to not save it
+    settle : float
+        Time in seconds during which the changes are gathered before the
+        layout is computed again, 0 to compute it on every change
+    peers : dict of (int, int): (int, int)
+        Switch ID and port at the other end of each link, by switch ID and
+        port, in both directions
+    switch_ports : dict of int: list of int
+        Ports up of each switch seen connecting
+    hosts_seen : dict of int: set of int
+        Ports leading to no other switch on which each switch sent up the
+        packets of a host, indexed by switch ID
+    nCore : int
+        Number of core switches
+    nEdge : int
+        Number of edge switches
+    nHosts : int
+        Highest number of host ports of an edge switch
+    coreSwitchIDs : list of int
+        IDs of the core switches
+    aggregationSwitchIDs : list of int
+        IDs of the switches between the edge and core switches
+    edgeSwitchIDs : list of int
+        IDs of the edge switches
+    """
+
+    def __init__(self, path=None):
+        """Initializes the DiscoveredTopology object.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file the layout is saved to, None to not save it.
+            It is read if it exists.
+        """
+
+        self.path = path
+        self.settle = 0
+        self._pending = False
+        self.peers = {}
+        self.switch_ports = {}
+        self.hosts_seen = {}
+        self._unconfirmed = set()
+        self._listeners = []
+        self._layout = {}
+        self.nCore = self.nEdge = self.nHosts = 0
+        self.coreSwitchIDs = []
+        self.aggregationSwitchIDs = []
+        self.edgeSwitchIDs = []
+
+        if path is not None and os.path.exists(path):
+            self.load(path)
+            log.info("Read {} links between {} switches from {}".format(
+                len(self.peers) // 2, len(self.switch_ports), path))
+
+    def __len__(self):
+        return len(self.peers) // 2
+
+    def start(self, grace=30, settle=0.5):
+        """Starts learning the links with the openflow.discovery component.
+
+        The component is launched if it is not already. If no layout was
+        read from a file, it drops the first packets of the switches until
+        it has had time to discover their links, so that the controllers do
+        not take links for host ports in the meantime.
+
+        Parameters
+        ----------
+        grace : float
+            Time in seconds after which the links read from the file which
+            were not discovered again are dropped
+        settle : float
+            Time in seconds during which the changes are gathered before the
+            layout is computed again
+
+        Returns
+        -------
+        None
+        """
+
+        self.settle = settle
+        if not core.hasComponent("openflow_discovery"):
+            import pox.openflow.discovery
+            pox.openflow.discovery.launch(eat_early_packets=not self.peers)
+
+        # Before the controllers of the switches, which need their ports
+        core.openflow.addListenerByName(
+            "ConnectionUp", self._handle_ConnectionUp, priority=1)
+        core.openflow.addListenerByName(
+            "PortStatus", self._handle_PortStatus, priority=1)
+        core.openflow.addListenerByName("PacketIn", self._handle_PacketIn)
+        core.openflow_discovery.addListenerByName(
+            "LinkEvent", self._handle_LinkEvent)
+        if self._unconfirmed:
+            Timer(grace, self.expire_unconfirmed)
+        return
+
+    def add_listener(self, callback):
+        """Calls a function each time the layout changes.
+
+        Parameters
+        ----------
+        callback : callable
+            Function called without argument
+
+        Returns
+        -------
+        None
+        """
+
+        self._listeners.append(callback)
+        return
+
+    def remove_listener(self, callback):
+        """Stops calling a function added with `add_listener`.
+
+        Parameters
+        ----------
+        callback : callable
+            Function to stop calling
+
+        Returns
+        -------
+        None
+        """
+
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+        return
+
+    def add_switch(self, switch_id, ports):
+        """Records the ports of a switch.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        ports : iterable of int
+            Ports up of the switch, special ports being ignored
+
+        Returns
+        -------
+        None
+        """
+
+        ports = sorted(p for p in ports if p < of.OFPP_MAX)
+        if self.switch_ports.get(switch_id) != ports:
+            self.switch_ports[switch_id] = ports
+            self._changed()
+        return
+
+    def add_link(self, switch1, port1, switch2, port2):
+        """Records a link between two switches.
+
+        Parameters
+        ----------
+        switch1, switch2 : int
+            IDs of the switches
+        port1, port2 : int
+            Ports of the link on each switch
+
+        Returns
+        -------
+        None
+        """
+
+        self._unconfirmed.discard((switch1, port1))
+        self._unconfirmed.discard((switch2, port2))
+        if self.peers.get((switch1, port1)) == (switch2, port2):
+            return
+        # Packets flooded by another switch before the link was discovered
+        # were not sent by hosts
+        for switch_id, port in ((switch1, port1), (switch2, port2)):
+            self.hosts_seen.get(switch_id, set()).discard(port)
+        self._drop(switch1, port1)
+        self._drop(switch2, port2)
+        self.peers[(switch1, port1)] = (switch2, port2)
+        self.peers[(switch2, port2)] = (switch1, port1)
+        self._changed()
+        return
+
+    def add_host(self, switch_id, port):
+        """Records a host seen on a port leading to no other switch.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        port : int
+            Port the packets of the host came in through
+
+        Returns
+        -------
+        None
+        """
+
+        if ((switch_id, port) in self.peers
+                or port not in self.switch_ports.get(switch_id, ())):
+            return
+        ports = self.hosts_seen.setdefault(switch_id, set())
+        first = not ports
+        ports.add(port)
+        if first:
+            # The switch may not have been taken for an edge switch
+            self._changed()
+        return
+
+    def remove_link(self, switch1, port1, switch2, port2):
+        """Forgets a link between two switches, in both directions.
+
+        Parameters
+        ----------
+        switch1, switch2 : int
+            IDs of the switches
+        port1, port2 : int
+            Ports of the link on each switch
+
+        Returns
+        -------
+        None
+        """
+
+        if self.peers.get((switch1, port1)) != (switch2, port2):
+            return
+        self._drop(switch1, port1)
+        self._changed()
+        return
+
+    def _drop(self, switch_id, port):
+        """Removes the link of a port, without telling the listeners.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        port : int
+            Port of the link
+
+        Returns
+        -------
+        None
+        """
+
+        peer = self.peers.pop((switch_id, port), None)
+        if peer is not None:
+            self.peers.pop(peer, None)
+        return
+
+    def expire_unconfirmed(self):
+        """Drops the links read from the file which were not discovered.
+
+        Returns
+        -------
+        None
+        """
+
+        if not self._unconfirmed:
+            return
+        log.info("Dropping {} links which were not discovered again".format(
+            len(self._unconfirmed)))
+        for switch_id, port in self._unconfirmed:
+            self._drop(switch_id, port)
+        self._unconfirmed.clear()
+        self._changed()
+        return
+
+    def _changed(self):
+        """Updates the layout now, or after `settle` seconds if not 0.
+
+        Returns
+        -------
+        None
+        """
+
+        if not self.settle:
+            self.update()
+        elif not self._pending:
+            self._pending = True
+            Timer(self.settle, self.update)
+        return
+
+    def update(self):
+        """Computes the layout again, saves it and tells the listeners.
+
+        Returns
+        -------
+        None
+        """
+
+        self._pending = False
+        self._compute()
+        if self.path is not None:
+            self.save(self.path)
+        for callback in list(self._listeners):
+            callback()
+        return
+
+    def _compute(self):
+        """Computes the tier and the port roles of every switch.
+
+        Returns
+        -------
+        None
+        """
+
+        neighbours = {}
+        for (switch_id, port), (peer, _) in self.peers.items():
+            neighbours.setdefault(switch_id, {})[port] = peer
+
+        # Edge switches have hosts, or ports up leading to no other switch
+        # while no host was seen on any of their neighbours
+        with_hosts = set(s for s, ports in self.hosts_seen.items()
+                         if s in neighbours
+                         and any(p not in neighbours[s] for p in ports))
+        edges = sorted(s for s, ports in self.switch_ports.items()
+                       if s in neighbours
+                       and any(p not in neighbours[s] for p in ports)
+                       and (s in with_hosts
+                            or not with_hosts.intersection(
+                                neighbours[s].values())))
+        tier = dict((s, 0) for s in edges)
+        frontier = edges
+        while frontier:
+            following = []
+            for switch_id in frontier:
+                for peer in neighbours[switch_id].values():
+                    if peer not in tier:
+                        tier[peer] = tier[switch_id] + 1
+                        following.append(peer)
+            frontier = following
+
+        cores = sorted(s for s in tier if tier[s] > 0 and all(
+            tier.get(peer, 0) <= tier[s] for peer in neighbours[s].values()))
+        core_index = dict((c, i + 1) for i, c in enumerate(cores))
+        self.coreSwitchIDs = cores
+        self.edgeSwitchIDs = edges
+        self.aggregationSwitchIDs = sorted(
+            s for s in tier if tier[s] > 0 and s not in core_index)
+        self.nCore = len(cores)
+        self.nEdge = len(edges)
+
+        def reachable(start, port, step):
+            # Switches reached from `start` through `port`, going only up
+            # (step 1) or only down (step -1) the tiers
+            first = neighbours[start][port]
+            seen = set([first])
+            stack = [first]
+            while stack:
+                switch_id = stack.pop()
+                for peer in neighbours[switch_id].values():
+                    if (peer not in seen
+                            and tier.get(peer) == tier[switch_id] + step):
+                        seen.add(peer)
+                        stack.append(peer)
+            return seen
+
+        layout = {}
+        for switch_id in tier:
+            host_ports, uplinks, downlinks = [], [], []
+            for port in self.switch_ports.get(switch_id, sorted(
+                    neighbours[switch_id])):
+                peer = neighbours[switch_id].get(port)
+                if peer is None:
+                    if tier[switch_id] == 0:
+                        host_ports.append(port)
+                elif tier.get(peer) == tier[switch_id] + 1:
+                    uplinks.append(port)
+                elif tier.get(peer) == tier[switch_id] - 1:
+                    downlinks.append(port)
+
+            down = {}
+            for port in downlinks:
+                for edge in reachable(switch_id, port, -1):
+                    if tier[edge] == 0:
+                        down.setdefault(edge, port)
+            to_core = {}
+            for port in uplinks:
+                for core_id in reachable(switch_id, port, 1):
+                    if core_id in core_index:
+                        to_core.setdefault(core_index[core_id], port)
+
+            layout[switch_id] = (switch_id in core_index, host_ports,
+                                 uplinks, downlinks, down, to_core)
+        self._layout = layout
+        self.nHosts = max([len(layout[e][1]) for e in edges] or [0])
+        return
+
+    def is_core(self, switch_id):
+        """Determines whether a switch is a core switch.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+
+        Returns
+        -------
+        bool
+            True if the switch is a core switch
+        """
+
+        return switch_id in self.coreSwitchIDs
+
+    def switch(self, switch_id, ports=()):
+        """Computes the roles of the ports of a switch.
+
+        The ports of a switch with no known link all have an unknown role.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        ports : iterable of int
+            Ports the switch has, e.g. those of its connection
+
+        Returns
+        -------
+        SwitchPorts
+            Roles of the ports of the switch
+        """
+
+        if switch_id not in self._layout:
+            return SwitchPorts(switch_id, False, ports=ports)
+        core_switch, host_ports, uplinks, downlinks, down, to_core = \
+            self._layout[switch_id]
+        return SwitchPorts(switch_id, core_switch, host_ports=host_ports,
+                           uplinks=uplinks, downlinks=downlinks,
+                           down=dict(down), to_core=dict(to_core),
+                           ports=ports)
+
+    def links(self):
+        """Gives the links between the switches.
+
+        Returns
+        -------
+        list of (int, int, int, int)
+            Switch ID and port of both ends of each link, lowest end first
+        """
+
+        return sorted(end + peer for end, peer in self.peers.items()
+                      if end < peer)
+
+    def save(self, path):
+        """Writes the ports of the switches and the links to a text file.
+
+        The file is written next to `path` then renamed, so that an existing
+        file is never left half written.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file
+
+        Returns
+        -------
+        None
+        """
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("# switch SWITCH_ID PORT...\n"
+                    "# link SWITCH_ID PORT SWITCH_ID PORT\n")
+            for switch_id in sorted(self.switch_ports):
+                f.write("switch {} {}\n".format(switch_id, " ".join(
+                    str(p) for p in self.switch_ports[switch_id])))
+            for link in self.links():
+                f.write("link {} {} {} {}\n".format(*link))
+        os.rename(tmp_path, path)
+        return
+
+    def load(self, path):
+        """Reads the ports of the switches and the links from a text file.
+
+        Each line holds "switch" followed by the ID and the ports of a
+        switch, or "link" followed by the ID and the port of both ends of a
+        link. Empty lines and lines starting with # are ignored. The links
+        read are unconfirmed until they are discovered.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file
+
+        Returns
+        -------
+        None
+        """
+
+        with open(path) as f:
+            for line_no, line in enumerate(f, 1):
+                fields = line.split()
+                if not fields or fields[0].startswith("#"):
+                    continue
+                try:
+                    values = [int(v) for v in fields[1:]]
+                    if fields[0] == "switch" and values:
+                        self.switch_ports[values[0]] = sorted(values[1:])
+                        continue
+                    if fields[0] == "link" and len(values) == 4:
+                        switch1, port1, switch2, port2 = values
+                        self.peers[(switch1, port1)] = (switch2, port2)
+                        self.peers[(switch2, port2)] = (switch1, port1)
+                        self._unconfirmed.update([(switch1, port1),
+                                                  (switch2, port2)])
+                        continue
+                except ValueError:
+                    pass
+                log.warning("{}:{}: invalid line".format(path, line_no))
+        self._compute()
+        return
+
+    def _handle_ConnectionUp(self, event):
+        """Records the ports of a switch connecting.
+
+        Parameters
+        ----------
+        event : ConnectionUp
+            Event raised when a switch connects
+
+        Returns
+        -------
+        None
+        """
+
+        self.add_switch(event.dpid,
+                        live_ports(event.connection.ports.values()))
+        return
+
+    def _handle_PortStatus(self, event):
+        """Follows a port of a switch going up or down.
+
+        Parameters
+        ----------
+        event : PortStatus
+            Event raised when a port of the switch is added, removed or
+            modified
+
+        Returns
+        -------
+        None
+        """
+
+        ports = set(self.switch_ports.get(event.dpid, ()))
+        desc = event.ofp.desc
+        if event.deleted or not live_ports([desc]):
+            ports.discard(desc.port_no)
+            self.hosts_seen.get(event.dpid, set()).discard(desc.port_no)
+        else:
+            ports.add(desc.port_no)
+        self.add_switch(event.dpid, ports)
+        return
+
+    def _handle_PacketIn(self, event):
+        """Records the host sending a packet from a port with no link.
+
+        Parameters
+        ----------
+        event : PacketIn
+            Event raised when a switch sends a packet up to the controller
+
+        Returns
+        -------
+        None
+        """
+
+        if event.port in self.hosts_seen.get(event.dpid, ()):
+            return
+        packet = event.parsed
+        if packet is None or packet.type == ethernet.LLDP_TYPE:
+            return
+        self.add_host(event.dpid, event.port)
+        return
+
+    def _handle_LinkEvent(self, event):
+        """Records a link discovered or lost by openflow.discovery.
+
+        Parameters
+        ----------
+        event : LinkEvent
+            Event raised when a link between two switches appears or times
+            out
+
+        Returns
+        -------
+        None
+        """
+
+        link = event.link
+        if event.added:
+            self.add_link(link.dpid1, link.port1, link.dpid2, link.port2)
+        elif event.removed:
+            self.remove_link(link.dpid1, link.port1, link.dpid2, link.port2)
+        return
@@ -0,0 +1,430 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to export counters of the controllers in the
+# Prometheus text format
+
+
+import os
+import threading
+from array import array
+from bisect import bisect_left
+
+from pox.core import core
+from pox.lib.recoco import Timer
+
+
+log = core.getLogger()
+
+# Upper bounds in seconds of the buckets of the PacketIn handling latency
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3,
+                   5e-3, 1e-2, 2.5e-2, 1e-1)
+
+
+class Histogram(object):
+    """Histogram of observed values with fixed buckets.
+
+    Arguments
+    ----------
+    bounds : tuple of float
+        Upper bounds of the buckets, increasing
+    counts : array of int
+        Number of values of each bucket, the last one counting the values
+        above every bound
+    total : float
+        Sum of the observed values
+    """
+
+    __slots__ = ("bounds", "counts", "total")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = array('Q', [0] * (len(bounds) + 1))
+        self.total = 0.0
+
+    def observe(self, value):
+        """Adds a value to the histogram.
+
+        Parameters
+        ----------
+        value : float
+            Observed value
+
+        Returns
+        -------
+        None
+        """
+
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        return
+
+
+class SwitchMetrics(object):
+    """Counters of the controller of one switch.
+
+    The controller increments the counters directly, so that recording an
+    event costs an attribute increment.
+
+    Arguments
+    ----------
+    packet_in : int
+        Number of PacketIns handled
+    flood : int
+        Number of packets flooded
+    flow_mod : int
+        Number of flow_mods sent, adding, modifying or deleting flows
+    packet_out : int
+        Number of packet_outs sent
+    stats_reply : int
+        Number of statistics replies received
+    latency : Histogram
+        Time spent handling each PacketIn, in seconds
+    tables : dict of str: sized object
+        Tables of the controller whose size is exported, e.g. its MAC table
+    """
+
+    __slots__ = ("packet_in", "flood", "flow_mod", "packet_out",
+                 "stats_reply", "latency", "tables")
+
+    def __init__(self, tables=None):
+        self.packet_in = 0
+        self.flood = 0
+        self.flow_mod = 0
+        self.packet_out = 0
+        self.stats_reply = 0
+        self.latency = Histogram()
+        self.tables = tables or {}
+
+    def handled(self, latency):
+        """Records a PacketIn and the time spent handling it.
+
+        Parameters
+        ----------
+        latency : float
+            Time spent handling the PacketIn, in seconds
+
+        Returns
+        -------
+        None
+        """
+
+        self.packet_in += 1
+        self.latency.observe(latency)
+        return
+
+
+class Metrics(object):
+    """Fabric-wide service exporting the counters of the switch controllers.
+
+    A single Metrics object is created for the whole controller and shared
+    by every switch controller, which registers its switch to get the
+    SwitchMetrics it updates. Statistics replies are counted by the service
+    itself, and the counters of the flow tables are read from the FlowTables
+    service when rendering. Fabric-wide values, e.g. the number of tenants,
+    are exported through gauges.
+
+    The metrics are rendered in the Prometheus text format, served over HTTP
+    and/or rewritten periodically to a file. They are rendered every
+    `interval` seconds by a timer of the POX thread, which owns the tables
+    of the controllers, and the HTTP server thread serves the last rendering
+    instead of reading the tables while they change.
+
+    Arguments
+    ----------
+    policy : str
+        Name of the policy, exported as a label
+    switches : dict of int: SwitchMetrics
+        Counters of every registered switch, indexed by switch ID
+    flow_tables : FlowTables object
+        Service whose flow table counters are exported, None for none
+    gauges : list of (str, str, callable)
+        Name, help and function giving the value of the fabric-wide gauges
+    path : str
+        Path of the file the metrics are written to, None for none
+    rendered : str
+        Last rendering of the metrics, served over HTTP
+
+    Notes
+    ----------
+    If `path` or `port` is given and `start_timer` is True, a
+    pox.lib.recoco.Timer is launched at initialization, calling `refresh`
+    every `interval` seconds. If `port` is given, an HTTP server thread
+    serves the metrics on `address`, the loopback interface by default.
+    """
+
+    def __init__(self, policy, flow_tables=None, path=None, port=0,
+                 interval=10, start_timer=True, address="127.0.0.1"):
+        """Initializes the Metrics object.
+
+        Parameters
+        ----------
+        policy : str
+            Name of the policy, exported as a label
+        flow_tables : FlowTables object
+            Service whose flow table counters are exported, None for none
+        path : str
+            Path of the file the metrics are written to, None for none
+        port : int
+            TCP port the metrics are served on at /metrics, 0 for none
+        interval : int
+            Time interval in seconds between two writes of the file
+        start_timer : bool
+            If False, no timer is started and `refresh` or `write` must be
+            called by the owner of the object
+        address : str
+            IP address the metrics are served on, "" for all the interfaces
+        """
+
+        self.policy = policy
+        self.switches = {}
+        self.flow_tables = flow_tables
+        self.gauges = []
+        self.path = path
+
+        core.openflow.addListenerByName(
+            "PortStatsReceived", self._handle_StatsReceived)
+        core.openflow.addListenerByName(
+            "FlowStatsReceived", self._handle_StatsReceived)
+        core.openflow.addListenerByName(
+            "ConnectionDown", self._handle_ConnectionDown)
+
+        self.rendered = self.render()
+        self._timer = None
+        if (path is not None or port) and start_timer:
+            self._timer = Timer(timeToWake=interval, callback=self.refresh,
+                                recurring=True)
+        self._server = None
+        if port:
+            self._serve(address, port)
+
+    def register(self, connection, tables=None):
+        """Starts recording the counters of a switch.
+
+        A switch registered again before it disconnects, e.g. by the
+        proactive mode then by its controller, keeps its counters.
+
+        Parameters
+        ----------
+        connection : pox.lib.revent.connection
+            Connection from the controller to the switch
+        tables : dict of str: sized object
+            Tables of the controller whose size is exported, by name
+
+        Returns
+        -------
+        SwitchMetrics
+            Counters of the switch, to be updated by its controller
+        """
+
+        metrics = self.switches.get(connection.dpid)
+        if metrics is None:
+            metrics = self.switches[connection.dpid] = SwitchMetrics()
+        if tables is not None:
+            metrics.tables = tables
+        return metrics
+
+    def gauge(self, name, help, value):
+        """Exports a fabric-wide value.
+
+        Parameters
+        ----------
+        name : str
+            Name of the metric, without the "clos_" prefix
+        help : str
+            Description of the metric
+        value : callable
+            Function giving the current value
+
+        Returns
+        -------
+        None
+        """
+
+        self.gauges.append((name, help, value))
+        return
+
+    def render(self):
+        """Gives the current metrics in the Prometheus text format.
+
+        Returns
+        -------
+        str
+            Metrics, one sample per line
+        """
+
+        lines = []
+
+        def family(name, kind, help, samples):
+            lines.append("# HELP clos_{} {}".format(name, help))
+            lines.append("# TYPE clos_{} {}".format(name, kind))
+            for labels, value in samples:
+                lines.append("clos_{}{{{}}} {}".format(
+                    name, ",".join('{}="{}"'.format(k, v) for k, v in labels),
+                    value))
+
+        switches = sorted(self.switches.items())
+        policy = ("policy", self.policy)
+
+        for name, help in (("packet_in", "PacketIns handled"),
+                           ("flood", "Packets flooded"),
+                           ("flow_mod", "Flow_mods sent"),
+                           ("packet_out", "Packet_outs sent"),
+                           ("stats_reply", "Statistics replies received")):
+            family(name + "_total", "counter", help,
+                   [((policy, ("dpid", dpid)), getattr(metrics, name))
+                    for dpid, metrics in switches])
+
+        lines.append("# HELP clos_packet_in_seconds Time spent handling a "
+                     "PacketIn")
+        lines.append("# TYPE clos_packet_in_seconds histogram")
+        for dpid, metrics in switches:
+            histogram = metrics.latency
+            labels = 'policy="{}",dpid="{}"'.format(self.policy, dpid)
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + ("+Inf",),
+                                    histogram.counts):
+                cumulative += count
+                lines.append('clos_packet_in_seconds_bucket{{{},le="{}"}} {}'
+                             .format(labels, bound, cumulative))
+            lines.append("clos_packet_in_seconds_sum{{{}}} {}".format(
+                labels, histogram.total))
+            lines.append("clos_packet_in_seconds_count{{{}}} {}".format(
+                labels, cumulative))
+
+        family("table_entries", "gauge", "Entries of the tables of the "
+               "switch controllers",
+               [((policy, ("dpid", dpid), ("table", table)), len(entries))
+                for dpid, metrics in switches
+                for table, entries in sorted(metrics.tables.items())])
+
+        if self.flow_tables is not None:
+            tables = sorted(self.flow_tables.tables.items())
+            family("flows", "gauge", "Flows installed by the controller",
+                   [((policy, ("dpid", dpid)), len(table))
+                    for dpid, table in tables])
+            for name in ("installed", "evicted", "removed", "table_full"):
+                family("flows_{}_total".format(name), "counter",
+                       "Flows {}".format(name.replace("_", " ")),
+                       [((policy, ("dpid", dpid)), table.counters[name])
+                        for dpid, table in tables])
+
+        for name, help, value in self.gauges:
+            family(name, "gauge", help, [((policy,), value())])
+
+        lines.append("")
+        return "\n".join(lines)
+
+    def refresh(self):
+        """Renders the metrics again, and writes them to the file if any.
+
+        Must be called from the POX thread, as the controllers.
+
+        Returns
+        -------
+        None
+        """
+
+        self.rendered = self.render()
+        if self.path is not None:
+            self.write(text=self.rendered)
+        return
+
+    def write(self, path=None, text=None):
+        """Writes the metrics to a file.
+
+        The file is written next to `path` then renamed, so that a reader
+        never sees it half written.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file, `path` of the service if None
+        text : str
+            Metrics to write, rendered now if None
+
+        Returns
+        -------
+        None
+        """
+
+        path = path or self.path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render() if text is None else text)
+        os.rename(tmp_path, path)
+        return
+
+    def _serve(self, address, port):
+        """Serves the metrics over HTTP in a background thread.
+
+        Parameters
+        ----------
+        address : str
+            IP address to listen on, "" for all the interfaces
+        port : int
+            TCP port to listen on
+
+        Returns
+        -------
+        None
+        """
+
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                # Rendered by the POX thread, see refresh
+                body = metrics.rendered.encode()
+                self.send_response(200)
+                self.send_header("Content-Type",
+                                 "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                return
+
+        self._server = HTTPServer((address, port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        log.info("Serving metrics on {}:{}".format(address or "*", port))
+        return
+
+    def _handle_StatsReceived(self, event):
+        """Counts a statistics reply of a switch.
+
+        Parameters
+        ----------
+        event : PortStatsReceived or FlowStatsReceived
+            Event raised when a switch replies to a statistics request
+
+        Returns
+        -------
+        None
+        """
+
+        metrics = self.switches.get(event.dpid)
+        if metrics is not None:
+            metrics.stats_reply += 1
+        return
+
+    def _handle_ConnectionDown(self, event):
+        """Stops exporting the counters of a switch that disconnected.
+
+        Parameters
+        ----------
+        event : ConnectionDown
+            Event raised when a switch disconnects
+
+        Returns
+        -------
+        None
+        """
+
+        self.switches.pop(event.dpid, None)
+        return
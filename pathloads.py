@@ -0,0 +1,391 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to score the paths through the core switches from
+# the load of all their links, not only the first one
+
+from pox.core import core
+
+
+log = core.getLogger()
+
+# Links followed at most from a switch down to an edge switch
+MAX_DEPTH = 4
+
+# Utilization of a path whose links are not all known, above that of any
+# known path, even overloaded, so that a path is not preferred for lacking
+# a link in the layout
+UNKNOWN_UTILIZATION = float("inf")
+
+
+def load_capacities(path):
+    """Loads the capacity of links from a text file.
+
+    Each line holds the ID of a switch, one of its ports and the capacity
+    in Mbps of the link going out of that port, separated by whitespace.
+    Empty lines and lines starting with # are ignored.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file
+
+    Returns
+    -------
+    dict of (int, int): float
+        Capacity in Kbps of the links, indexed by switch ID and port
+    """
+
+    capacities = {}
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                switch_id, port, mbps = line.split()
+                capacities[(int(switch_id), int(port))] = float(mbps) * 1000
+            except ValueError:
+                log.warning("{}:{}: invalid link capacity".format(
+                    path, line_no))
+    return capacities
+
+
+class PathLoads(object):
+    """Fabric-wide view of the load of the links along the paths of flows.
+
+    A flow leaving an edge switch goes up to a core switch, then down to
+    the edge switch of its destination. The least loaded uplink is not the
+    best path when several sources send to the same destination: the links
+    down from the core switches saturate while the uplinks of the sources
+    stay idle. The score of an uplink is thus the utilization of the most
+    utilized link of the best path through it to the destination.
+
+    The load of a link in one direction is measured at both ends, as the
+    transmit throughput of the port sending and the receive throughput of
+    the port receiving. The larger of the two is used, so that the load is
+    known as soon as either switch is polled. The utilization of a link is
+    its load divided by its capacity, so links of different speeds compare.
+    A path with a link missing from the layout, e.g. not discovered yet,
+    has the utilization UNKNOWN_UTILIZATION.
+
+    Like the uplinks of UplinkSelector, the links down from the core switch
+    of a path reserve `flow_reservation` for each flow placed on it until
+    the load shows in the statistics. The reservations are shared by the
+    switches, so that the flows placed between two polls towards the same
+    destination are spread over the core switches. A reservation decays
+    by `decay` at most once per new statistics of its port.
+
+    Arguments
+    ----------
+    port_stats : PortStats object
+        Fabric-wide service polling the switches for port statistics
+    topology : ClosTopology, FatTreeTopology or DiscoveredTopology
+        Layout of the fabric
+    capacity : float
+        Capacity in Kbps of the links missing from `capacities`
+    capacities : dict of (int, int): float
+        Capacity in Kbps of the link going out of a port, indexed by switch
+        ID and port
+    flow_reservation : float
+        Load in Kbps reserved on the links of a path for each flow placed on
+        it
+    decay : float
+        Fraction of a reservation kept when new statistics arrive
+    peers : dict of (int, int): (int, int)
+        Switch ID and port at the other end of each link, by switch ID and
+        port, in both directions
+    reserved : dict of (int, int): list
+        Load in Kbps reserved on a link and time of the statistics of its
+        port it was last decayed at, indexed by switch ID and port
+    """
+
+    def __init__(self, port_stats, topology, capacity=10000.0,
+                 capacities=None, flow_reservation=1000.0, decay=0.5):
+        """Initializes the PathLoads object.
+
+        Parameters
+        ----------
+        port_stats : PortStats object
+            Fabric-wide service polling the switches for port statistics
+        topology : ClosTopology, FatTreeTopology or DiscoveredTopology
+            Layout of the fabric, whose changes are followed if it is
+            discovered
+        capacity : float
+            Capacity in Kbps of the links missing from `capacities`, e.g.
+            the bandwidth of the links of ClosTopo
+        capacities : dict of (int, int): float
+            Capacity in Kbps of the link going out of a port, indexed by
+            switch ID and port
+        flow_reservation : float
+            Load in Kbps reserved on the links of a path for each flow
+            placed on it
+        decay : float
+            Fraction of a reservation kept when new statistics arrive
+        """
+
+        self.port_stats = port_stats
+        self.topology = topology
+        self.capacity = capacity
+        self.capacities = capacities or {}
+        self.flow_reservation = flow_reservation
+        self.decay = decay
+        self.reserved = {}
+        self._layout_changed()
+        if hasattr(topology, "add_listener"):
+            # The layout is discovered and may change
+            topology.add_listener(self._layout_changed)
+
+    def _layout_changed(self):
+        """Finds the links of the layout and forgets the paths computed.
+
+        Returns
+        -------
+        None
+        """
+
+        self.peers = {}
+        for switch1, port1, switch2, port2 in self.topology.links():
+            self.peers[(switch1, port1)] = (switch2, port2)
+            self.peers[(switch2, port2)] = (switch1, port1)
+        self._switches = {}
+        self._paths = {}
+        return
+
+    def _switch(self, switch_id):
+        """Gives the roles of the ports of a switch, computed once.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+
+        Returns
+        -------
+        SwitchPorts
+            Roles of the ports of the switch
+        """
+
+        ports = self._switches.get(switch_id)
+        if ports is None:
+            ports = self.topology.switch(switch_id)
+            self._switches[switch_id] = ports
+        return ports
+
+    def link_capacity(self, switch_id, port):
+        """Gives the capacity of the link going out of a port.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        port : int
+            Port of the switch
+
+        Returns
+        -------
+        float
+            Capacity in Kbps
+        """
+
+        return self.capacities.get((switch_id, port), self.capacity)
+
+    def link_load(self, switch_id, port):
+        """Gives the measured load of the link going out of a port.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        port : int
+            Port of the switch
+
+        Returns
+        -------
+        float
+            Larger of the transmit throughput of the port and the receive
+            throughput of the port at the other end, in Kbps
+        """
+
+        load = self.port_stats.get_throughput(switch_id, port)
+        peer = self.peers.get((switch_id, port))
+        if peer is not None:
+            load = max(load, self.port_stats.get_throughput(
+                peer[0], peer[1], received=True))
+        return load
+
+    def _reservation(self, switch_id, port):
+        """Gives the load reserved on a link, decayed by new statistics.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        port : int
+            Port of the switch
+
+        Returns
+        -------
+        float
+            Reserved load in Kbps
+        """
+
+        entry = self.reserved.get((switch_id, port))
+        if entry is None:
+            return 0.0
+        measured = self.port_stats.last_update(switch_id, port)
+        if measured != entry[1]:
+            entry[0] *= self.decay
+            entry[1] = measured
+        return entry[0]
+
+    def utilization(self, switch_id, port):
+        """Gives the utilization of the link going out of a port.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        port : int
+            Port of the switch
+
+        Returns
+        -------
+        float
+            Measured and reserved load divided by the capacity of the link
+        """
+
+        return ((self.link_load(switch_id, port)
+                 + self._reservation(switch_id, port))
+                / self.link_capacity(switch_id, port))
+
+    def _path_down(self, switch_id, edge_id):
+        """Gives the links from a switch down to an edge switch below it.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of a core or aggregation switch
+        edge_id : int
+            ID of an edge switch below it
+
+        Returns
+        -------
+        list of (int, int)
+            Switch ID and port of the links followed, in order, empty if
+            the edge switch is not below the switch
+        """
+
+        key = (switch_id, edge_id)
+        path = self._paths.get(key)
+        if path is None:
+            path = []
+            for _ in range(MAX_DEPTH):
+                if switch_id == edge_id:
+                    break
+                port = self._switch(switch_id).down.get(edge_id)
+                peer = self.peers.get((switch_id, port))
+                if peer is None:
+                    path = []
+                    break
+                path.append((switch_id, port))
+                switch_id = peer[0]
+            self._paths[key] = path
+        return path
+
+    def _utilization_from(self, switch_id, edge_id):
+        """Gives the utilization of the best path from a switch to an edge.
+
+        The switch is reached going up. If the edge switch is below it,
+        the path goes down. Otherwise, it goes up first through the uplink
+        whose path is the least utilized, as the switch would select it.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        edge_id : int
+            ID of the edge switch of the destination
+
+        Returns
+        -------
+        float
+            Utilization of the most utilized link of the path,
+            UNKNOWN_UTILIZATION if no path is known
+        """
+
+        ports = self._switch(switch_id)
+        if edge_id in ports.down:
+            return max([self.utilization(*link)
+                        for link in self._path_down(switch_id, edge_id)]
+                       or [UNKNOWN_UTILIZATION])
+
+        best = None
+        for port in ports.uplinks:
+            peer = self.peers.get((switch_id, port))
+            if peer is None:
+                continue
+            score = max(self.utilization(switch_id, port),
+                        self._utilization_from(peer[0], edge_id))
+            if best is None or score < best:
+                best = score
+        return UNKNOWN_UTILIZATION if best is None else best
+
+    def beyond(self, switch_id, ports, edge_id):
+        """Gives the utilization of the paths beyond uplinks of a switch.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        ports : iterable of int
+            Uplinks of the switch
+        edge_id : int
+            ID of the edge switch of the destination
+
+        Returns
+        -------
+        dict of int: float
+            Utilization of the most utilized link of the best path to the
+            edge switch from the other end of each uplink, indexed by port,
+            UNKNOWN_UTILIZATION for the uplinks whose link is not known
+        """
+
+        scores = {}
+        for port in ports:
+            peer = self.peers.get((switch_id, port))
+            if peer is None:
+                scores[port] = UNKNOWN_UTILIZATION
+            else:
+                scores[port] = self._utilization_from(peer[0], edge_id)
+        return scores
+
+    def reserve(self, switch_id, port, edge_id):
+        """Reserves a flow on the path down to its destination.
+
+        The links are only known if the edge switch is below the switch at
+        the other end of the uplink, e.g. a core switch. Otherwise, that
+        switch reserves the flow when it selects its own uplink.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        port : int
+            Uplink the flow was placed on
+        edge_id : int
+            ID of the edge switch of the destination
+
+        Returns
+        -------
+        None
+        """
+
+        peer = self.peers.get((switch_id, port))
+        if peer is None:
+            return
+        for link in self._path_down(peer[0], edge_id):
+            # Decays the reservation first if new statistics arrived
+            self._reservation(*link)
+            entry = self.reserved.setdefault(
+                link, [0.0, self.port_stats.last_update(*link)])
+            entry[0] += self.flow_reservation
+        return
@@ -0,0 +1,320 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to place the tenants of a VLAN Controller Policy on
+# the core switches from their traffic
+
+
+from pox.core import core
+from pox.lib.recoco import Timer
+
+
+log = core.getLogger()
+
+
+class TenantPlacement(object):
+    """Fabric-wide placement of the VLANs on the core switches.
+
+    A single TenantPlacement object is created for the whole controller and
+    shared by every switch controller. It replaces the round robin of
+    Tenants: a new host joins the VLAN with the least traffic of the core
+    switch with the least traffic, and the VLANs are moved from busy core
+    switches to quiet ones every `interval` seconds.
+
+    The traffic of a host is the throughput of the port of its edge switch
+    in both directions: the packets towards a host go through the core
+    switch of its VLAN, which the other edge switches learn from its
+    replies, and so do the packets of a host towards destinations its edge
+    switch did not learn. It does not depend on the core switch, so the
+    load of a VLAN is known right after it moved, and the next rebalancing
+    does not undo the previous one. A new host counts for
+    `host_reservation` until the port statistics of its edge switch show
+    its traffic.
+
+    Moves are bounded: at most `max_moves` VLANs move at each rebalancing,
+    and a VLAN only moves if it lowers the load of the busiest core switch
+    by more than `threshold` of that load and by more than `min_gain`.
+    A whole VLAN moves, so that the hosts of a tenant keep sharing a core
+    switch, and the listeners are told which VLANs moved so that the
+    switches only rewrite the flows of these VLANs.
+
+    Arguments
+    ----------
+    tenants : Tenants object
+        Fabric-wide registry associating hosts to a VLAN, and the VLANs
+        to a core switch
+    hosts : HostDirectory object
+        Fabric-wide directory of the location of the hosts
+    port_stats : PortStats object
+        Fabric-wide service polling the edge switches for port statistics
+    interval : int
+        Time interval in seconds between two rebalancings, 0 for none
+    max_moves : int
+        Maximum number of VLANs moved at each rebalancing
+    threshold : float
+        Fraction of the load of the busiest core switch a move must save
+    min_gain : float
+        Load in Kbps a move must save
+    host_reservation : float
+        Load in Kbps counted for a new host until its traffic is measured
+    pending : dict of str: (int, int, float)
+        ID of the edge switch and port of the new hosts, and the time of
+        the statistics of that port when they joined, indexed by MAC address
+    listeners : list of callable
+        Functions called with the VLANs moved after each rebalancing
+    moves : int
+        Number of VLANs moved since the start
+
+    Notes
+    ----------
+    If `interval` is not 0 and `start_timer` is True, a
+    pox.lib.recoco.Timer thread is launched at initialization, calling
+    `rebalance` every `interval` seconds.
+    """
+
+    def __init__(self, tenants, hosts, port_stats, interval=30, max_moves=1,
+                 threshold=0.1, min_gain=1000.0, host_reservation=1000.0,
+                 start_timer=True):
+        """Initializes the TenantPlacement object.
+
+        Parameters
+        ----------
+        tenants : Tenants object
+            Fabric-wide registry associating hosts to a VLAN
+        hosts : HostDirectory object
+            Fabric-wide directory of the location of the hosts
+        port_stats : PortStats object
+            Fabric-wide port statistics service, with which the edge
+            switches are registered
+        interval : int
+            Time interval in seconds between two rebalancings, 0 for none
+        max_moves : int
+            Maximum number of VLANs moved at each rebalancing
+        threshold : float
+            Fraction of the load of the busiest core switch a move must save
+        min_gain : float
+            Load in Kbps a move must save
+        host_reservation : float
+            Load in Kbps counted for a new host until its traffic is
+            measured
+        start_timer : bool
+            If False, no timer is started and `rebalance` must be called by
+            the owner of the object, e.g. a simulator
+        """
+
+        self.tenants = tenants
+        self.hosts = hosts
+        self.port_stats = port_stats
+        self.interval = interval
+        self.max_moves = max_moves
+        self.threshold = threshold
+        self.min_gain = min_gain
+        self.host_reservation = host_reservation
+        self.pending = {}
+        self.listeners = []
+        self.moves = 0
+        self._measured = None
+        self._measured_at = 0.0
+
+        self._timer = None
+        if interval and start_timer:
+            self._timer = Timer(timeToWake=interval, callback=self.rebalance,
+                                recurring=True)
+
+    def add_listener(self, callback):
+        """Calls a function each time VLANs move to other core switches.
+
+        Parameters
+        ----------
+        callback : callable
+            Function called with a dict giving the former and the new core
+            switch of each VLAN moved, indexed by VLAN ID
+
+        Returns
+        -------
+        None
+        """
+
+        self.listeners.append(callback)
+        return
+
+    def remove_listener(self, callback):
+        """Stops calling a function added with `add_listener`.
+
+        Parameters
+        ----------
+        callback : callable
+            Function to stop calling
+
+        Returns
+        -------
+        None
+        """
+
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+        return
+
+    def _measure(self):
+        """Sums the measured traffic of the hosts of every VLAN.
+
+        The sums are computed again at most once per polling interval,
+        so that a burst of new hosts does not go through the directory
+        for each of them.
+
+        Returns
+        -------
+        dict of int: float
+            Measured load in Kbps of each VLAN, indexed by VLAN ID
+        """
+
+        now = self.port_stats.clock()
+        if (self._measured is not None
+                and now - self._measured_at < self.port_stats.min_interval):
+            return self._measured
+
+        loads = dict((vlan_id, 0.0)
+                     for vlan_id in range(1, self.tenants.n_vlans + 1))
+        for address, (switch_id, port) in self.hosts.locations.items():
+            vlan_id = self.tenants.getVLAN(address)
+            if vlan_id in loads:
+                loads[vlan_id] += (
+                    self.port_stats.get_throughput(switch_id, port)
+                    + self.port_stats.get_throughput(switch_id, port,
+                                                     received=True))
+        self._measured = loads
+        self._measured_at = now
+        return loads
+
+    def vlan_loads(self):
+        """Gives the traffic of every VLAN.
+
+        Returns
+        -------
+        dict of int: float
+            Measured and reserved load in Kbps of each VLAN, indexed by VLAN
+            ID, 0 for the VLANs without hosts
+        """
+
+        loads = dict(self._measure())
+        for address, (switch_id, port, stamp) in list(self.pending.items()):
+            updated = self.port_stats.last_update(switch_id, port)
+            if updated != stamp and updated <= self._measured_at:
+                # The traffic of the host is in the measured load
+                del self.pending[address]
+                continue
+            vlan_id = self.tenants.getVLAN(address)
+            if vlan_id in loads:
+                loads[vlan_id] += self.host_reservation
+        return loads
+
+    def core_loads(self, vlan_loads):
+        """Gives the traffic going through every core switch.
+
+        Parameters
+        ----------
+        vlan_loads : dict of int: float
+            Load in Kbps of each VLAN, see `vlan_loads`
+
+        Returns
+        -------
+        dict of int: float
+            Load in Kbps of each core switch, indexed by its number
+        """
+
+        loads = dict((c, 0.0) for c in range(1, self.tenants.n_cores + 1))
+        for vlan_id, load in vlan_loads.items():
+            loads[self.tenants.core_of(vlan_id)] += load
+        return loads
+
+    def assign(self, address):
+        """Returns the VLAN ID of a host, assigning one if it has none.
+
+        A new host joins the least loaded VLAN of the least loaded core
+        switch. Ties go to the lowest number, so that hosts joining an idle
+        fabric are spread in a round robin fashion by their reservations.
+
+        Parameters
+        ----------
+        address : EthAddr, str or int
+            MAC address of a host
+
+        Returns
+        -------
+        int
+            The vlan_id associated to the address
+        """
+
+        vlan_id = self.tenants.getVLAN(address)
+        if vlan_id != -1:
+            return vlan_id
+
+        vlan_loads = self.vlan_loads()
+        core_loads = self.core_loads(vlan_loads)
+        target = min(core_loads, key=lambda c: (core_loads[c], c))
+        candidates = [v for v in vlan_loads
+                      if self.tenants.core_of(v) == target]
+        vlan_id = min(candidates or vlan_loads,
+                      key=lambda v: (vlan_loads[v], v))
+        self.tenants.addToVLAN(address, vlan_id)
+
+        location = self.hosts.locate(str(address))
+        if location is not None:
+            self.pending[str(address)] = location + (
+                self.port_stats.last_update(*location),)
+        return vlan_id
+
+    def rebalance(self):
+        """Moves VLANs from the busiest core switches to the quietest ones.
+
+        At each step, the VLAN of the busiest core switch whose load is the
+        closest to half the difference with the quietest core switch moves
+        there, if that lowers the load of the busiest core switch enough.
+        Each VLAN moves at most once per rebalancing.
+
+        Returns
+        -------
+        dict of int: (int, int)
+            Former and new core switch of each VLAN moved, indexed by VLAN ID
+        """
+
+        moved = {}
+        if self.tenants.n_cores < 2:
+            return moved
+
+        self._measured = None
+        vlan_loads = self.vlan_loads()
+        core_loads = self.core_loads(vlan_loads)
+        for _ in range(self.max_moves):
+            busiest = max(core_loads, key=lambda c: (core_loads[c], -c))
+            quietest = min(core_loads, key=lambda c: (core_loads[c], c))
+            gap = core_loads[busiest] - core_loads[quietest]
+
+            best = None
+            for vlan_id, load in vlan_loads.items():
+                if (vlan_id in moved or not 0 < load < gap
+                        or self.tenants.core_of(vlan_id) != busiest):
+                    continue
+                if best is None or abs(gap - 2*load) < abs(gap - 2*best[1]):
+                    best = (vlan_id, load)
+            if best is None:
+                break
+
+            vlan_id, load = best
+            # Either core switch may be the busiest after the move
+            gain = core_loads[busiest] - max(core_loads[busiest] - load,
+                                             core_loads[quietest] + load)
+            if (gain <= self.threshold * core_loads[busiest]
+                    or gain <= self.min_gain):
+                break
+
+            self.tenants.place(vlan_id, quietest)
+            core_loads[busiest] -= load
+            core_loads[quietest] += load
+            moved[vlan_id] = (busiest, quietest)
+            log.info("VLAN {} of {:.0f} Kbps moved from core switch {} to "
+                     "{}".format(vlan_id, load, busiest, quietest))
+
+        if moved:
+            self.moves += len(moved)
+            for callback in list(self.listeners):
+                callback(moved)
+        return moved
@@ -0,0 +1,270 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to share port statistics between the switches
+# of an Adaptive Routing Controller Policy
+
+
+import time
+
+from pox.core import core
+import pox.openflow.libopenflow_01 as of
+
+from throughput import ThroughputEstimator
+from scheduler import StatsScheduler
+
+
+log = core.getLogger()
+
+
+class PortStats(object):
+    """Fabric-wide port statistics service.
+
+    A single PortStats object is created for the whole controller and shared
+    by every switch controller. It owns the polling of the switches and the
+    computation of the throughput of their ports, so that each PortStatsReceived
+    event is processed exactly once, whatever the number of switches.
+
+    The requests are sent by a StatsScheduler, which spreads them over the
+    polling interval. A switch whose ports sent more than `active_rate`
+    Kbps in total is polled more often, down to every `min_interval`
+    seconds, and a quiet one less often, up to every `max_interval` seconds.
+
+    Arguments
+    ----------
+    time_interval : int
+        Initial time interval between two PortStatsRequests to a switch
+    min_interval : float
+        Shortest time interval between two PortStatsRequests to a switch
+    max_interval : float
+        Longest time interval between two PortStatsRequests to a switch
+    active_rate : float
+        Total rate in Kbps of the ports of a switch above which it is busy
+    scheduler : StatsScheduler object
+        Scheduler sending the PortStatsRequests
+    connections : dict of int: pox.lib.revent.connection
+        Connections of the registered switches, indexed by switch ID
+    port_throughput : dict of int: dict of int: ThroughputEstimator
+        Estimators of the transmit throughput of the ports of every
+        registered switch, indexed by switch ID then by port number
+    port_rx_throughput : dict of int: dict of int: ThroughputEstimator
+        Estimators of the receive throughput of the same ports
+    listeners : dict of int: callable
+        Functions called with the view of a switch each time its
+        statistics are updated, indexed by switch ID
+    clock : callable
+        Function giving the current time in seconds, used to timestamp
+        the statistics replies
+
+    Notes
+    ----------
+    If no scheduler is given, one is created, which launches a
+    pox.lib.recoco.Timer thread if `start_timer` is True.
+    """
+
+    def __init__(self, time_interval=1, clock=time.time, start_timer=True,
+                 scheduler=None, min_interval=None, max_interval=None,
+                 active_rate=100.0):
+        """Initializes the PortStats object.
+
+        Parameters
+        ----------
+        time_interval : int
+            Initial time interval between two PortStatsRequests to a switch
+        clock : callable
+            Function giving the current time in seconds
+        start_timer : bool
+            If False and no scheduler is given, no timer is started and the
+            `run` method of `scheduler` must be called by the owner of the
+            object, e.g. a simulator
+        scheduler : StatsScheduler object
+            Scheduler shared with the other services polling the switches,
+            None to create one
+        min_interval : float
+            Shortest time interval between two PortStatsRequests to a switch,
+            half of `time_interval` if None
+        max_interval : float
+            Longest time interval between two PortStatsRequests to a switch,
+            four times `time_interval` if None
+        active_rate : float
+            Total rate in Kbps of the ports of a switch above which it is busy
+        """
+
+        self.time_interval = time_interval
+        self.min_interval = (time_interval / 2.0 if min_interval is None
+                             else min_interval)
+        self.max_interval = (time_interval * 4.0 if max_interval is None
+                             else max_interval)
+        self.active_rate = active_rate
+        self.connections = {}
+        self.port_throughput = {}
+        self.port_rx_throughput = {}
+        self.listeners = {}
+        self.clock = clock
+
+        core.openflow.addListenerByName(
+            "PortStatsReceived", self._handle_PortStatsReceived)
+        core.openflow.addListenerByName(
+            "ConnectionDown", self._handle_ConnectionDown)
+        if scheduler is None:
+            scheduler = StatsScheduler(clock=clock, start_timer=start_timer)
+        self.scheduler = scheduler
+
+    def register(self, connection, listener=None):
+        """Starts polling a switch and returns its view of the port throughputs.
+
+        Parameters
+        ----------
+        connection : pox.lib.revent.connection
+            Connection from the controller to the switch
+        listener : callable
+            Function called with the view of the switch each time
+            its statistics are updated
+
+        Returns
+        -------
+        dict of int: ThroughputEstimator
+            Throughput estimator of each port of the switch. The dictionnary
+            is updated in place every time new statistics are received.
+        """
+
+        self.connections[connection.dpid] = connection
+        self.scheduler.add(("port", connection.dpid),
+                           lambda: self._sendPortStatsRequest(connection),
+                           self.time_interval, self.min_interval,
+                           self.max_interval)
+        if listener is not None:
+            self.listeners[connection.dpid] = listener
+        return self.port_throughput.setdefault(connection.dpid, {})
+
+    def get_throughput(self, switch_id, port, kind="ewma", received=False):
+        """Gives the current throughput of a link going out of `port`.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        port : int
+            The outgoing port of the switch
+        kind : str
+            Estimate to return, one of "instantaneous", "ewma" or "peak"
+        received : bool
+            If True, gives the throughput of the link coming in through
+            `port` instead
+
+        Returns
+        -------
+        float
+            Link throughput in Kbps, 0 if no statistics were received yet
+        """
+
+        views = self.port_rx_throughput if received else self.port_throughput
+        estimator = views.get(switch_id, {}).get(port)
+        if estimator is None:
+            return 0.0
+        return estimator.estimate(kind)
+
+    def last_update(self, switch_id, port):
+        """Gives the time of the last statistics of a port.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        port : int
+            Port of the switch
+
+        Returns
+        -------
+        float
+            Timestamp in seconds, None if no statistics were received yet
+        """
+
+        estimator = self.port_throughput.get(switch_id, {}).get(port)
+        if estimator is None:
+            return None
+        return estimator.last_update()
+
+    def _sendPortStatsRequest(self, connection):
+        """Sends a PortStatsRequest to a switch.
+
+        Parameters
+        ----------
+        connection : pox.lib.revent.connection
+            Connection from the controller to the switch
+
+        Returns
+        -------
+        None
+        """
+
+        connection.send(of.ofp_stats_request(body=of.ofp_port_stats_request()))
+        return
+
+    def _handle_PortStatsReceived(self, event):
+        """Computes the throughput of the ports of the replying switch.
+
+        Only the view of the switch that sent the statistics is updated, so
+        the work done per reply is proportional to its number of ports.
+        The samples are timestamped with the arrival time of the reply.
+        The load of the switch, which sets how often it is polled, is the
+        transmit throughput of its physical ports.
+
+        Parameters
+        ----------
+        event: PortStatsReceived
+            Event listening to PortStatsReceived from openflow
+
+        Returns
+        -------
+        None
+        """
+
+        view = self.port_throughput.get(event.dpid)
+        if view is None:
+            # Switch not registered with the service
+            return
+
+        rx_view = self.port_rx_throughput.setdefault(event.dpid, {})
+        now = self.clock()
+        total_rate = 0.0
+        for stat in event.stats:
+            if stat.port_no >= of.OFPP_MAX:
+                # OFPP_LOCAL and the other special ports carry no traffic
+                # of the fabric
+                continue
+            estimator = view.get(stat.port_no)
+            if estimator is None:
+                estimator = ThroughputEstimator(tau=2*self.time_interval)
+                view[stat.port_no] = estimator
+            estimator.add_sample(now, stat.tx_bytes)
+            total_rate += estimator.estimate("instantaneous")
+
+            estimator = rx_view.get(stat.port_no)
+            if estimator is None:
+                estimator = ThroughputEstimator(tau=2*self.time_interval)
+                rx_view[stat.port_no] = estimator
+            estimator.add_sample(now, stat.rx_bytes)
+        self.scheduler.report(("port", event.dpid),
+                              total_rate > self.active_rate)
+
+        listener = self.listeners.get(event.dpid)
+        if listener is not None:
+            listener(view)
+        return
+
+    def _handle_ConnectionDown(self, event):
+        """Stops polling a switch that disconnected.
+
+        Parameters
+        ----------
+        event : ConnectionDown
+            Event raised when a switch disconnects
+
+        Returns
+        -------
+        None
+        """
+
+        self.connections.pop(event.dpid, None)
+        self.listeners.pop(event.dpid, None)
+        self.scheduler.remove(("port", event.dpid))
+        return
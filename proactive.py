@@ -0,0 +1,534 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to pre-install the forwarding state of the policies
+# on a Clos Topology.
+#
+# The layout of the Clos Topology built by `clos-test/clostopo.py` with
+# autoSetMacs is fully deterministic:
+#   - core switches have IDs in [1, nCore]
+#   - edge switches have IDs in [nCore + 1, nCore + nEdge]
+#   - core switch c is on port c of every edge switch
+#   - the i-th edge switch (from 0) is on port i + 1 of every core switch
+#   - the hosts of an edge switch are on ports [nCore + 1, nCore + nHosts]
+#   - host number h (from 1) has MAC address h and IP address 10.0.0.h
+# The whole forwarding state can therefore be computed from
+# (nCore, nEdge, nHosts) and pushed when a switch connects.
+#
+# The IP addresses of the hosts of an edge switch are consecutive, so core
+# switches can also reach them with a few prefix rules instead of one rule
+# per host, which keeps their flow tables small in large fabrics.
+
+from pox.core import core
+import pox.openflow.libopenflow_01 as of
+from pox.lib.addresses import EthAddr
+
+
+log = core.getLogger()
+
+BROADCAST = "ff:ff:ff:ff:ff:ff"
+
+POLICIES = ("tree", "vlan", "adaptive")
+
+IP_BASE = 10 << 24
+IP_TYPE = 0x0800
+ARP_TYPE = 0x0806
+
+# Rules aggregating several hosts are less specific than per-host rules,
+# which take precedence over them
+AGGREGATE_PRIORITY = of.OFP_DEFAULT_PRIORITY - 1
+
+
+def host_mac(host):
+    """Gives the MAC address Mininet assigns to a host with autoSetMacs.
+
+    Parameters
+    ----------
+    host : int
+        Host number, starting from 1
+
+    Returns
+    -------
+    str
+        MAC address of the host
+    """
+
+    raw = "{:012x}".format(host)
+    return ":".join(raw[i:i+2] for i in range(0, 12, 2))
+
+
+def host_ip(host):
+    """Gives the IP address Mininet assigns to a host.
+
+    Parameters
+    ----------
+    host : int
+        Host number, starting from 1
+
+    Returns
+    -------
+    str
+        IP address of the host
+    """
+
+    return ip_to_str(IP_BASE + host)
+
+
+def ip_to_str(address):
+    """Formats an IPv4 address given as an integer in dotted notation."""
+
+    return ".".join(str((address >> shift) & 0xff) for shift in (24, 16, 8, 0))
+
+
+def ip_blocks(first, last):
+    """Splits a range of IPv4 addresses into the fewest prefixes.
+
+    Parameters
+    ----------
+    first : int
+        First address of the range
+    last : int
+        Last address of the range, included
+
+    Returns
+    -------
+    list of (int, int)
+        Network address and prefix length of each block
+    """
+
+    blocks = []
+    while first <= last:
+        # Largest aligned block starting at `first` that fits in the range
+        size = first & -first if first else 1 << 32
+        while size > last - first + 1:
+            size >>= 1
+        blocks.append((first, 33 - size.bit_length()))
+        first += size
+    return blocks
+
+
+def edge_prefixes(edge_id, nCore, nHosts):
+    """Gives the prefixes covering the IP addresses of an edge switch's hosts.
+
+    Parameters
+    ----------
+    edge_id : int
+        ID of the edge switch
+    nCore : int
+        Number of core switches in the Clos Topology
+    nHosts : int
+        Number of hosts per edge switch in the Clos Topology
+
+    Returns
+    -------
+    list of (int, int)
+        Network address and prefix length of each prefix
+    """
+
+    first_host = (edge_id - nCore - 1) * nHosts + 1
+    return ip_blocks(IP_BASE + first_host, IP_BASE + first_host + nHosts - 1)
+
+
+def worth_aggregating(edge_id, nCore, nHosts):
+    """Determines whether the hosts of an edge switch take fewer rules when
+    matched on their prefixes than one by one.
+
+    Each prefix takes a rule for IP and a rule for ARP. The addresses of
+    the hosts start at 10.0.0.1, so the hosts of an edge switch are rarely
+    aligned on a single prefix, and small edge switches are better matched
+    host by host.
+
+    Parameters
+    ----------
+    edge_id : int
+        ID of the edge switch
+    nCore : int
+        Number of core switches in the Clos Topology
+    nHosts : int
+        Number of hosts per edge switch in the Clos Topology
+
+    Returns
+    -------
+    bool
+        True if the prefixes take fewer rules
+    """
+
+    return 2 * len(edge_prefixes(edge_id, nCore, nHosts)) < nHosts
+
+
+def edge_prefix_for(address, edge_id, nCore, nHosts):
+    """Gives the prefix of an edge switch containing an IP address.
+
+    Parameters
+    ----------
+    address : int
+        IP address of a host
+    edge_id : int
+        ID of the edge switch the host is connected to
+    nCore : int
+        Number of core switches in the Clos Topology
+    nHosts : int
+        Number of hosts per edge switch in the Clos Topology
+
+    Returns
+    -------
+    str
+        Prefix in CIDR notation, or None if the address does not follow the
+        layout of the topology or if aggregating is not worth it
+    """
+
+    if not worth_aggregating(edge_id, nCore, nHosts):
+        return None
+    for network, length in edge_prefixes(edge_id, nCore, nHosts):
+        if address >> (32 - length) == network >> (32 - length):
+            return "{}/{}".format(ip_to_str(network), length)
+    return None
+
+
+def edge_prefix_match(packet, edge_id, nCore, nHosts):
+    """Gives a match aggregating the destination of a packet with the other
+    hosts of its edge switch.
+
+    Parameters
+    ----------
+    packet : pox.lib.packet.ethernet
+        IP or ARP packet towards a host
+    edge_id : int
+        ID of the edge switch the destination is connected to
+    nCore : int
+        Number of core switches in the Clos Topology
+    nHosts : int
+        Number of hosts per edge switch in the Clos Topology
+
+    Returns
+    -------
+    ofp_match object
+        Match on the prefix of the edge switch containing the destination,
+        or None if the packet cannot be aggregated
+    """
+
+    if packet.type == IP_TYPE:
+        address = packet.payload.dstip
+    elif packet.type == ARP_TYPE:
+        address = packet.payload.protodst
+    else:
+        return None
+
+    prefix = edge_prefix_for(address.toUnsigned(), edge_id, nCore, nHosts)
+    if prefix is None:
+        return None
+    return of.ofp_match(dl_type=packet.type, nw_dst=prefix)
+
+
+def host_location(host, nCore, nHosts):
+    """Gives the edge switch and port a host is connected to.
+
+    Parameters
+    ----------
+    host : int
+        Host number, starting from 1
+    nCore : int
+        Number of core switches in the Clos Topology
+    nHosts : int
+        Number of hosts per edge switch in the Clos Topology
+
+    Returns
+    -------
+    (int, int)
+        ID of the edge switch and port of the host on that switch
+    """
+
+    edge_index, host_index = divmod(host - 1, nHosts)
+    return nCore + 1 + edge_index, nCore + 1 + host_index
+
+
+def core_port_to_edge(edge_id, nCore):
+    """Gives the port of a core switch leading to an edge switch.
+
+    Parameters
+    ----------
+    edge_id : int
+        ID of the edge switch
+    nCore : int
+        Number of core switches in the Clos Topology
+
+    Returns
+    -------
+    int
+        Port of every core switch connected to the edge switch
+    """
+
+    return edge_id - nCore
+
+
+def host_vlan(host, nCore):
+    """Gives the VLAN of a host in the proactive mode.
+
+    The hosts are assigned to the VLANs in a round robin fashion by their
+    number, and VLAN i goes through core switch i. The VLAN policy registers
+    these assignments with its tenants, so that the packets reaching the
+    controller follow the same VLANs as the pre-installed rules.
+
+    Parameters
+    ----------
+    host : int
+        Host number, starting from 1
+    nCore : int
+        Number of core switches in the Clos Topology
+
+    Returns
+    -------
+    int
+        VLAN ID of the host, which is also the ID of its core switch
+    """
+
+    return (host - 1) % nCore + 1
+
+
+def uplink_for(policy, src, dst, nCore):
+    """Gives the core switch a policy uses between two hosts.
+
+    - tree: every flow goes through core switch 1, the root of the tree
+    - vlan: flows go through the core switch of the VLAN of the source, see
+      `host_vlan`, as with the reactive policy
+    - adaptive: flows are spread statically over the core switches
+      depending on both hosts, the load is then balanced reactively
+
+    Parameters
+    ----------
+    policy : str
+        One of "tree", "vlan" or "adaptive"
+    src : int
+        Source host number, starting from 1
+    dst : int
+        Destination host number, starting from 1
+    nCore : int
+        Number of core switches in the Clos Topology
+
+    Returns
+    -------
+    int
+        ID of the core switch, which is also the uplink port on edge switches
+    """
+
+    if policy == "tree":
+        return 1
+    elif policy == "vlan":
+        return host_vlan(src, nCore)
+    elif policy == "adaptive":
+        return (src + dst) % nCore + 1
+    raise ValueError("Unknown policy: {}".format(policy))
+
+
+def compute_rules(policy, switch_id, nCore, nEdge, nHosts, aggregate=False):
+    """Computes the forwarding rules of a switch.
+
+    Unicast traffic is matched on the destination MAC address, except for
+    the VLAN and adaptive policies on edge switches where the uplink also
+    depends on the source, which is identified by its input port. Only the
+    hosts of the topology are matched, so that the packets towards other
+    destinations still reach the controller.
+
+    Broadcast traffic always goes through core switch 1: the fabric is then
+    a tree for it, in which each edge switch sends it up once and core
+    switch 1 sends it down once to every other edge switch. Going up
+    through several core switches, it would reach the edge switches several
+    times and come back up, looping forever.
+
+    With `aggregate`, the tree and VLAN policies match the IP and ARP
+    traffic towards an edge switch on the prefixes of its hosts, on the
+    core switches and on the other edge switches. The "priority" key of a
+    rule, if any, is its priority and not a match field.
+
+    Parameters
+    ----------
+    policy : str
+        One of "tree", "vlan" or "adaptive"
+    switch_id : int
+        ID of the switch
+    nCore : int
+        Number of core switches in the Clos Topology
+    nEdge : int
+        Number of edge switches in the Clos Topology
+    nHosts : int
+        Number of hosts per edge switch in the Clos Topology
+    aggregate : bool
+        If True, aggregate the rules of several hosts where the layout of
+        the topology allows it
+
+    Returns
+    -------
+    list of (dict of str: object, list of int)
+        Match fields and output ports of each rule
+    """
+
+    rules = []
+    coreSwitchIDs = range(1, nCore + 1)
+    edgeSwitchIDs = range(nCore + 1, nCore + 1 + nEdge)
+    all_hosts = range(1, nEdge * nHosts + 1)
+
+    if switch_id in coreSwitchIDs:
+        edge_ports = [core_port_to_edge(e, nCore) for e in edgeSwitchIDs]
+        for host in all_hosts:
+            edge_id, _ = host_location(host, nCore, nHosts)
+            if aggregate and worth_aggregating(edge_id, nCore, nHosts):
+                continue
+            rules.append(({"dl_dst": host_mac(host)},
+                          [core_port_to_edge(edge_id, nCore)]))
+        for edge_id in edgeSwitchIDs:
+            if not (aggregate and worth_aggregating(edge_id, nCore, nHosts)):
+                continue
+            for network, length in edge_prefixes(edge_id, nCore, nHosts):
+                prefix = "{}/{}".format(ip_to_str(network), length)
+                for dl_type in (IP_TYPE, ARP_TYPE):
+                    rules.append(({"priority": AGGREGATE_PRIORITY,
+                                   "dl_type": dl_type, "nw_dst": prefix},
+                                  [core_port_to_edge(edge_id, nCore)]))
+        if switch_id == 1:
+            # Root of the tree the broadcast traffic follows
+            for in_port in edge_ports:
+                rules.append(({"in_port": in_port, "dl_dst": BROADCAST},
+                              [p for p in edge_ports if p != in_port]))
+        return rules
+
+    if switch_id not in edgeSwitchIDs:
+        log.warning("S{} is not part of the Clos Topology".format(switch_id))
+        return rules
+
+    host_ports = list(range(nCore + 1, nCore + nHosts + 1))
+    first_host = (switch_id - nCore - 1) * nHosts + 1
+    local_hosts = range(first_host, first_host + nHosts)
+
+    def by_prefix(edge_id):
+        return (aggregate and policy != "adaptive" and edge_id != switch_id
+                and worth_aggregating(edge_id, nCore, nHosts))
+
+    for host in all_hosts:
+        edge_id, port = host_location(host, nCore, nHosts)
+        if host in local_hosts:
+            rules.append(({"dl_dst": host_mac(host)}, [port]))
+        elif by_prefix(edge_id):
+            continue
+        elif policy == "tree":
+            rules.append(({"dl_dst": host_mac(host)},
+                          [uplink_for(policy, None, host, nCore)]))
+        else:
+            for src in local_hosts:
+                _, in_port = host_location(src, nCore, nHosts)
+                rules.append(({"in_port": in_port, "dl_dst": host_mac(host)},
+                              [uplink_for(policy, src, host, nCore)]))
+    for edge_id in edgeSwitchIDs:
+        if not by_prefix(edge_id):
+            continue
+        for network, length in edge_prefixes(edge_id, nCore, nHosts):
+            prefix = "{}/{}".format(ip_to_str(network), length)
+            for dl_type in (IP_TYPE, ARP_TYPE):
+                match = {"priority": AGGREGATE_PRIORITY, "dl_type": dl_type,
+                         "nw_dst": prefix}
+                if policy == "tree":
+                    rules.append((match, [1]))
+                    continue
+                for src in local_hosts:
+                    _, in_port = host_location(src, nCore, nHosts)
+                    rules.append((dict(match, in_port=in_port),
+                                  [uplink_for(policy, src, None, nCore)]))
+
+    for in_port in host_ports:
+        rules.append(({"in_port": in_port, "dl_dst": BROADCAST},
+                      [p for p in host_ports if p != in_port] + [1]))
+    rules.append(({"in_port": 1, "dl_dst": BROADCAST}, host_ports))
+
+    return rules
+
+
+def install_rules(connection, rules, metrics=None):
+    """Pushes forwarding rules to a switch.
+
+    Parameters
+    ----------
+    connection : pox.lib.revent.connection
+        Connection from the controller to the switch
+    rules : list of (dict of str: object, list of int)
+        Match fields and output ports of each rule, see `compute_rules`
+    metrics : SwitchMetrics object
+        Counters of the switch, None if they are not exported
+
+    Returns
+    -------
+    None
+    """
+
+    for fields, out_ports in rules:
+        msg = of.ofp_flow_mod()
+        for field, value in fields.items():
+            if field == "priority":
+                msg.priority = value
+                continue
+            if field in ("dl_src", "dl_dst"):
+                value = EthAddr(value)
+            setattr(msg.match, field, value)
+        for port in out_ports:
+            msg.actions.append(of.ofp_action_output(port=port))
+        connection.send(msg)
+    if metrics is not None:
+        metrics.flow_mod += len(rules)
+    return
+
+
+def install_proactive(connection, policy, nCore, nEdge, nHosts,
+                      aggregate=False, metrics=None):
+    """Pre-installs the whole forwarding state of a policy on a switch.
+
+    Parameters
+    ----------
+    connection : pox.lib.revent.connection
+        Connection from the controller to the switch
+    policy : str
+        One of "tree", "vlan" or "adaptive"
+    nCore : int
+        Number of core switches in the Clos Topology
+    nEdge : int
+        Number of edge switches in the Clos Topology
+    nHosts : int
+        Number of hosts per edge switch in the Clos Topology
+    aggregate : bool
+        If True, aggregate the rules of several hosts, see `compute_rules`
+    metrics : SwitchMetrics object
+        Counters of the switch, None if they are not exported
+
+    Returns
+    -------
+    None
+    """
+
+    rules = compute_rules(policy, connection.dpid, nCore, nEdge, nHosts,
+                          aggregate)
+    install_rules(connection, rules, metrics)
+    log.debug("S{} - Pre-installed {} {} flows".format(
+        connection.dpid, len(rules), policy))
+    return
+
+
+def table_sizes(policy, nCore, nEdge, nHosts, aggregate=False):
+    """Gives the number of pre-installed rules of every switch.
+
+    Parameters
+    ----------
+    policy : str
+        One of "tree", "vlan" or "adaptive"
+    nCore : int
+        Number of core switches in the Clos Topology
+    nEdge : int
+        Number of edge switches in the Clos Topology
+    nHosts : int
+        Number of hosts per edge switch in the Clos Topology
+    aggregate : bool
+        If True, aggregate the rules of several hosts, see `compute_rules`
+
+    Returns
+    -------
+    dict of int: int
+        Number of rules of each switch, by switch ID
+    """
+
+    return dict((switch_id, len(compute_rules(policy, switch_id, nCore, nEdge,
+                                              nHosts, aggregate)))
+                for switch_id in range(1, nCore + nEdge + 1))
@@ -0,0 +1,277 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to spread the statistics requests sent to the switches
+# over time and within a budget
+
+
+import heapq
+import time
+
+from pox.lib.recoco import Timer
+
+
+# Fractional part of the golden ratio. Phases that are multiples of it stay
+# evenly spread over the period, whatever the number of jobs.
+_GOLDEN = 0.6180339887498949
+
+
+class PollJob(object):
+    """A request sent periodically to a switch.
+
+    Arguments
+    ----------
+    key : hashable
+        Identifier of the job, e.g. a kind of request and a switch ID
+    send : callable
+        Function sending the request
+    period : float
+        Current time between two requests, in seconds
+    min_period : float
+        Shortest period, used while the switch is busy
+    max_period : float
+        Longest period, used while the switch is quiet
+    due : float
+        Time at which the next request is due
+    last_sent : float
+        Time at which the last request was sent, None if none was
+    seq : int
+        Version of the job in the heap of the scheduler, older entries
+        being stale
+    """
+
+    __slots__ = ("key", "send", "period", "min_period", "max_period", "due",
+                 "last_sent", "seq")
+
+    def __init__(self, key, send, period, min_period, max_period, due):
+        self.key = key
+        self.send = send
+        self.period = period
+        self.min_period = min_period
+        self.max_period = max_period
+        self.due = due
+        self.last_sent = None
+        self.seq = 0
+
+
+class StatsScheduler(object):
+    """Fabric-wide scheduler of the statistics requests sent to the switches.
+
+    A single StatsScheduler object is shared by the services polling the
+    switches. Instead of sending every request on the same timer tick, each
+    job is given its own phase within its period, so that requests and
+    replies are spread evenly over time.
+
+    The period of a job adapts to the activity the service reports for it:
+    it is halved, down to `min_period`, when the switch is busy and grows
+    by half, up to `max_period`, when it is quiet. The requests sent by all
+    jobs are limited to `budget` per second by a token bucket, late jobs
+    being sent first once tokens are available again.
+
+    Arguments
+    ----------
+    tick : float
+        Time between two runs of the scheduler, in seconds
+    budget : float
+        Maximum number of requests sent per second, 0 for no limit
+    clock : callable
+        Function giving the current time in seconds
+    jobs : dict of hashable: PollJob
+        Scheduled jobs, indexed by key
+    tokens : float
+        Number of requests that can be sent without exceeding the budget
+    counters : dict of str: int
+        Number of requests sent and of runs which postponed a due request
+        because of the budget
+
+    Notes
+    ----------
+    If `start_timer` is True, a pox.lib.recoco.Timer thread is launched at
+    initialization. This timer will call `run` every `tick` seconds.
+    """
+
+    def __init__(self, tick=0.1, budget=0, clock=time.time, start_timer=True):
+        """Initializes the StatsScheduler object.
+
+        Parameters
+        ----------
+        tick : float
+            Time between two runs of the scheduler, in seconds
+        budget : float
+            Maximum number of requests sent per second, 0 for no limit
+        clock : callable
+            Function giving the current time in seconds
+        start_timer : bool
+            If False, no timer is started and `run` must be called by the
+            owner of the object, e.g. a simulator
+        """
+
+        self.tick = tick
+        self.budget = budget
+        self.clock = clock
+        self.jobs = {}
+        self.tokens = self._burst()
+        self.counters = dict(sent=0, delayed=0)
+        self._heap = []
+        self._added = 0
+        self._seq = 0
+        self._last_run = clock()
+
+        self._timer = None
+        if start_timer:
+            self._timer = Timer(timeToWake=tick, callback=self.run,
+                                recurring=True)
+
+    def add(self, key, send, period, min_period=None, max_period=None):
+        """Schedules a request to be sent periodically.
+
+        The first request is sent after a fraction of the period which
+        differs for each job.
+
+        Parameters
+        ----------
+        key : hashable
+            Identifier of the job, replacing any job with the same key
+        send : callable
+            Function sending the request
+        period : float
+            Initial time between two requests, in seconds
+        min_period : float
+            Shortest period, `period` if None
+        max_period : float
+            Longest period, `period` if None
+
+        Returns
+        -------
+        None
+        """
+
+        phase = (self._added * _GOLDEN) % 1.0
+        self._added += 1
+        job = PollJob(key, send, period,
+                      period if min_period is None else min_period,
+                      period if max_period is None else max_period,
+                      self.clock() + phase * period)
+        self.jobs[key] = job
+        self._push(job)
+        return
+
+    def remove(self, key):
+        """Stops sending the requests of a job.
+
+        Parameters
+        ----------
+        key : hashable
+            Identifier of the job
+
+        Returns
+        -------
+        None
+        """
+
+        # The entries of the job in the heap become stale
+        self.jobs.pop(key, None)
+        return
+
+    def report(self, key, active):
+        """Adapts the period of a job to the activity of its switch.
+
+        Parameters
+        ----------
+        key : hashable
+            Identifier of the job
+        active : bool
+            Whether the last reply showed the switch busy
+
+        Returns
+        -------
+        None
+        """
+
+        job = self.jobs.get(key)
+        if job is None:
+            return
+
+        if active:
+            period = max(job.min_period, job.period / 2)
+        else:
+            period = min(job.max_period, job.period * 1.5)
+        if period == job.period:
+            return
+        job.period = period
+        if job.last_sent is not None:
+            job.due = job.last_sent + period
+            self._push(job)
+        return
+
+    def run(self, now=None):
+        """Sends the requests that are due, within the budget.
+
+        Parameters
+        ----------
+        now : float
+            Current time in seconds, given by the clock if None
+
+        Returns
+        -------
+        None
+        """
+
+        if now is None:
+            now = self.clock()
+        if self.budget:
+            self.tokens = min(self._burst(), self.tokens
+                              + (now - self._last_run) * self.budget)
+        self._last_run = now
+
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, seq, key = heap[0]
+            job = self.jobs.get(key)
+            if job is None or job.seq != seq:
+                # Removed or rescheduled job
+                heapq.heappop(heap)
+                continue
+            if self.budget:
+                if self.tokens < 1:
+                    self.counters["delayed"] += 1
+                    break
+                self.tokens -= 1
+
+            heapq.heappop(heap)
+            job.last_sent = now
+            job.due = now + job.period
+            self._push(job)
+            self.counters["sent"] += 1
+            job.send()
+        return
+
+    def _burst(self):
+        """Gives the maximum number of tokens of the budget.
+
+        One run can send the requests of a tick, plus one to absorb the
+        jitter of the timer.
+
+        Returns
+        -------
+        float
+            Maximum number of tokens
+        """
+
+        return self.budget * self.tick + 1
+
+    def _push(self, job):
+        """Adds the current due time of a job to the heap.
+
+        Parameters
+        ----------
+        job : PollJob
+            Job to schedule
+
+        Returns
+        -------
+        None
+        """
+
+        self._seq += 1
+        job.seq = self._seq
+        heapq.heappush(self._heap, (job.due, job.seq, job.key))
+        return
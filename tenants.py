@@ -1,43 +1,120 @@
+import os
+import struct
+import sys
+from array import array
 
 from pox.core import core
 
+
+log = core.getLogger()
+
+
+def mac_to_int(address):
+    """Converts a MAC address to an integer.
+
+    Parameters
+    ----------
+    address : EthAddr, str or int
+        MAC address of a host
+
+    Returns
+    -------
+    int
+        The 48 bits of the address as an integer
+    """
+
+    if isinstance(address, int):
+        return address
+    if hasattr(address, "toInt"):
+        # pox.lib.addresses.EthAddr
+        return address.toInt()
+    return int(address.replace(":", ""), 16)
+
+
 class Tenants(object):
     """Object holding information about hosts and tenants in a VLAN.
-    
+
+    A single Tenants object is shared by all the switches so that a host
+    belongs to the same tenant wherever it is seen.
+
+    MAC addresses are stored as integers. Addresses lower than `capacity`,
+    such as the ones Mininet assigns with autoSetMacs, are stored in a compact
+    array indexed by the address. Other addresses are stored in a dictionnary.
+    Both give the VLAN of a host in O(1).
+
+    Each VLAN goes through one core switch. By default, there are as many
+    VLANs as core switches and VLAN i goes through core switch i. With more
+    VLANs than core switches, they are spread over the core switches in a
+    round robin fashion, and a VLAN can be moved to another core switch with
+    `place`, e.g. by TenantPlacement.
+
     Arguments
     ----------
-    self.vlans: dict of EthAddr: int
-        Mapping of MAC_Address to vlan_id
-
+    n_vlans : int
+        Total number of different VLANs
+    dense : array of int
+        VLAN ID of the hosts whose address is lower than `capacity`,
+        0 if the host has no VLAN yet
+    sparse : dict of int: int
+        Mapping of the other MAC addresses to vlan_id
+    next_vlan : int
+        VLAN ID assigned to the next new host, in a round robin fashion
+    n_cores : int
+        Number of core switches the VLANs go through
+    placement : dict of int: int
+        Number of the core switch of the VLANs moved away from their
+        default one, indexed by VLAN ID
     """
-    def __init__(self, n_vlans):
-        """Initializes the Tree_Controller object.
+
+    SNAPSHOT_MAGIC = b"TNT3"
+    SNAPSHOT_HEADER = struct.Struct("!4sIIIQI")
+
+    def __init__(self, n_vlans, capacity=1 << 16, n_cores=None):
+        """Initializes the Tenants object.
 
         Parameters
         ----------
         n_vlans : int
             Total number of different VLANs
+        capacity : int
+            Number of addresses stored in the compact array
+        n_cores : int
+            Number of core switches the VLANs go through, `n_vlans` if None
         """
 
-        self.vlans = {}
         self.n_vlans = n_vlans
+        self.n_cores = n_vlans if n_cores is None else n_cores
+        self.placement = {}
+        self.capacity = capacity
+        self.dense = array('H', bytes(2 * capacity))
+        self.sparse = {}
+        self.next_vlan = 1
+        self._count = 0
 
     def addToVLAN(self, address, vlan_id):
-        """Adds a mapping from MAC address to vlan_id in the dictionnary.
+        """Adds a mapping from MAC address to vlan_id.
 
         Parameters
         ----------
-        address : EthAddr
+        address : EthAddr, str or int
             MAC_Address of a host
         vlan_id : int
             ID specifying to which tenant a host belongs
-        
+
         Returns
         ----------
         None
         """
 
-        self.vlans[address] = vlan_id
+        key = mac_to_int(address)
+        if key < self.capacity:
+            if self.dense[key] == 0:
+                self._count += 1
+            self.dense[key] = vlan_id
+        else:
+            if key not in self.sparse:
+                self._count += 1
+            self.sparse[key] = vlan_id
         return
 
     def getVLAN(self, address):
@@ -45,9 +122,9 @@ class Tenants(object):
 
         Parameters
         ----------
-        address : EthAddr
+        address : EthAddr, str or int
             MAC_Address of a host
-        
+
         Returns
         ----------
         int
@@ -55,7 +132,219 @@ class Tenants(object):
             -1 if None is found.
         """
 
-        if(address in self.vlans):
-            return self.vlans[address]
+        key = mac_to_int(address)
+        if key < self.capacity:
+            vlan_id = self.dense[key]
+            return vlan_id if vlan_id else -1
+        return self.sparse.get(key, -1)
+
+    def assign(self, address):
+        """Returns the VLAN ID of a host, assigning one if it has none.
+
+        New hosts are assigned to the VLANs in a round robin fashion.
+
+        Parameters
+        ----------
+        address : EthAddr, str or int
+            MAC_Address of a host
+
+        Returns
+        ----------
+        int
+            The vlan_id associated to the address
+        """
+
+        vlan_id = self.getVLAN(address)
+        if vlan_id == -1:
+            vlan_id = self.next_vlan
+            self.addToVLAN(address, vlan_id)
+            self.next_vlan = vlan_id % self.n_vlans + 1
+        return vlan_id
+
+    def core_of(self, vlan_id):
+        """Gives the core switch a VLAN goes through.
+
+        Parameters
+        ----------
+        vlan_id : int
+            ID of the VLAN
+
+        Returns
+        ----------
+        int
+            Number of the core switch, from 1 to `n_cores`
+        """
+
+        core = self.placement.get(vlan_id)
+        if core is None:
+            return (vlan_id - 1) % self.n_cores + 1
+        return core
+
+    def place(self, vlan_id, core):
+        """Moves a VLAN to a core switch.
+
+        Parameters
+        ----------
+        vlan_id : int
+            ID of the VLAN
+        core : int
+            Number of the core switch, from 1 to `n_cores`
+
+        Returns
+        ----------
+        None
+        """
+
+        if core == (vlan_id - 1) % self.n_cores + 1:
+            self.placement.pop(vlan_id, None)
         else:
-            return -1
\ No newline at end of file
+            self.placement[vlan_id] = core
+        return
+
+    def items(self):
+        """Gives the assignments of all the hosts.
+
+        Returns
+        ----------
+        generator of (int, int)
+            MAC address as an integer and VLAN ID of each host
+        """
+
+        for key, vlan_id in enumerate(self.dense):
+            if vlan_id:
+                yield key, vlan_id
+        for item in self.sparse.items():
+            yield item
+
+    def load(self, path):
+        """Loads tenant assignments from a text file.
+
+        Each line holds a MAC address and a VLAN ID separated by whitespace.
+        Empty lines and lines starting with # are ignored.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file
+
+        Returns
+        ----------
+        int
+            Number of assignments loaded
+        """
+
+        loaded = 0
+        with open(path) as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    address, vlan_id = line.split()
+                    vlan_id = int(vlan_id)
+                except ValueError:
+                    log.warning("{}:{}: invalid tenant assignment".format(
+                        path, line_no))
+                    continue
+                if not 1 <= vlan_id <= self.n_vlans:
+                    log.warning("{}:{}: VLAN {} out of range".format(
+                        path, line_no, vlan_id))
+                    continue
+                self.addToVLAN(address, vlan_id)
+                loaded += 1
+        return loaded
+
+    def snapshot(self, path):
+        """Writes all the assignments and the placement to a binary file.
+
+        The file is written next to `path` then renamed, so that an existing
+        snapshot is never left half written. The arrays are written in
+        network byte order, as the header, so that the snapshot can be
+        restored on a host of another endianness.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file
+
+        Returns
+        ----------
+        None
+        """
+
+        keys = array('Q', self.sparse.keys())
+        values = array('H', self.sparse.values())
+        placed = array('H', self.placement.keys())
+        cores = array('H', self.placement.values())
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.SNAPSHOT_HEADER.pack(
+                self.SNAPSHOT_MAGIC, self.n_vlans, self.next_vlan,
+                self.capacity, len(keys), len(placed)))
+            for data in (self.dense, keys, values, placed, cores):
+                if sys.byteorder == "little":
+                    data = array(data.typecode, data)
+                    data.byteswap()
+                data.tofile(f)
+        os.rename(tmp_path, path)
+        return
+
+    def restore(self, path):
+        """Reads the assignments and the placement written by `snapshot`.
+
+        The VLANs placed on a core switch that is not in the fabric anymore
+        go back to their default core switch. A snapshot of a fabric with
+        another number of VLANs is refused.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file
+
+        Returns
+        ----------
+        None
+        """
+
+        with open(path, "rb") as f:
+            header = f.read(self.SNAPSHOT_HEADER.size)
+            if len(header) < self.SNAPSHOT_HEADER.size:
+                raise ValueError("{} is cut short".format(path))
+            magic, n_vlans, next_vlan, capacity, n_sparse, n_placed = \
+                self.SNAPSHOT_HEADER.unpack(header)
+            if magic != self.SNAPSHOT_MAGIC:
+                raise ValueError("{} is not a tenants snapshot".format(path))
+            if n_vlans != self.n_vlans:
+                # The hosts would be in VLANs the fabric does not have, or
+                # leave some VLANs empty
+                raise ValueError("{} has {} VLANs instead of {}".format(
+                    path, n_vlans, self.n_vlans))
+
+            dense = array('H')
+            keys = array('Q')
+            values = array('H')
+            placed = array('H')
+            cores = array('H')
+            try:
+                for data, n in ((dense, capacity), (keys, n_sparse),
+                                (values, n_sparse), (placed, n_placed),
+                                (cores, n_placed)):
+                    data.fromfile(f, n)
+                    if sys.byteorder == "little":
+                        data.byteswap()
+            except EOFError:
+                raise ValueError("{} is cut short".format(path))
+
+        self.capacity = capacity
+        self.dense = dense
+        self.sparse = dict(zip(keys, values))
+        self.next_vlan = (next_vlan - 1) % self.n_vlans + 1
+        self.placement = {}
+        for vlan_id, core in zip(placed, cores):
+            if 1 <= core <= self.n_cores:
+                self.place(vlan_id, core)
+        self._count = len(self.sparse) + sum(1 for v in dense if v)
+        return
+
+    def __len__(self):
+        return self._count
@@ -0,0 +1,239 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to estimate link throughputs from port counters
+
+import math
+from array import array
+
+
+class ThroughputEstimator(object):
+    """Estimates the throughput of a switch port from its byte counter.
+
+    The last `size` samples of the counter are kept in a ring buffer backed by
+    compact arrays, together with the time at which each sample was taken.
+    Rates are computed from the actual time elapsed between two samples,
+    and a counter that went past its maximum value is handled as a wrap.
+
+    Arguments
+    ----------
+    size : int
+        Number of samples kept in the ring buffer
+    tau : float
+        Time constant of the EWMA in seconds
+    counter_max : int
+        Value after which the counter wraps back to 0
+    times : array of float
+        Ring buffer of the sample timestamps in seconds
+    counters : array of int
+        Ring buffer of the byte counter samples
+    rates : array of float
+        Ring buffer of the instantaneous rates in Kbps, `rates[i]` being the
+        rate between sample i - 1 and sample i
+    head : int
+        Index of the most recent sample in the ring buffer
+    count : int
+        Number of valid samples in the ring buffer
+    ewma : float
+        Exponentially weighted moving average of the rate in Kbps
+    """
+
+    def __init__(self, size=16, tau=2.0, counter_bits=64):
+        """Initializes the ThroughputEstimator object.
+
+        Parameters
+        ----------
+        size : int
+            Number of samples kept in the ring buffer
+        tau : float
+            Time constant of the EWMA in seconds. Samples older than `tau`
+            weigh less than 1/e in the average.
+        counter_bits : int
+            Width of the byte counter, 64 bits in OpenFlow 1.0
+        """
+
+        self.size = size
+        self.tau = float(tau)
+        self.counter_max = 1 << counter_bits
+
+        self.times = array('d', [0.0] * size)
+        self.counters = array('Q', [0] * size)
+        self.rates = array('d', [0.0] * size)
+        self.head = -1
+        self.count = 0
+        self.ewma = 0.0
+
+    def add_sample(self, timestamp, counter):
+        """Adds a sample of the byte counter and updates the rates.
+
+        A counter lower than the previous sample is interpreted as a wrap
+        if the previous sample was in the upper half of the counter range,
+        and as a reset of the counter (e.g. a switch reboot) otherwise.
+        No rate is computed across a reset.
+
+        Parameters
+        ----------
+        timestamp : float
+            Time at which the counter was read, in seconds
+        counter : int
+            Value of the byte counter
+
+        Returns
+        -------
+        None
+        """
+
+        if self.count == 0:
+            self._push(timestamp, counter, 0.0)
+            return
+
+        last_time = self.times[self.head]
+        last_counter = self.counters[self.head]
+        elapsed = timestamp - last_time
+        if elapsed <= 0:
+            # Duplicate or reordered reply
+            return
+
+        delta = counter - last_counter
+        if delta < 0:
+            if last_counter < self.counter_max // 2:
+                # Counter reset, restart the history from this sample
+                self.count = 0
+                self._push(timestamp, counter, 0.0)
+                return
+            delta += self.counter_max
+
+        rate = delta * 8 / elapsed / 10**3
+        if self.count == 1:
+            self.ewma = rate
+        else:
+            weight = 1 - math.exp(-elapsed / self.tau)
+            self.ewma += weight * (rate - self.ewma)
+        self._push(timestamp, counter, rate)
+        return
+
+    def resume(self, timestamp, counter, rate):
+        """Restarts from the last sample and rate of a previous estimator.
+
+        The sample is the reference of the next one, and the rate is the
+        estimate of every kind until then, e.g. after a restart of the
+        controller while the counters of the switch kept running.
+
+        Parameters
+        ----------
+        timestamp : float
+            Time at which the counter was read, in seconds
+        counter : int
+            Value of the byte counter
+        rate : float
+            Throughput in Kbps estimated until then
+
+        Returns
+        -------
+        None
+        """
+
+        self.count = 0
+        self._push(timestamp, counter, rate)
+        self.ewma = rate
+        # The rate stands for the samples before this one
+        self.count = 2
+        return
+
+    def _push(self, timestamp, counter, rate):
+        """Writes a sample at the head of the ring buffer.
+
+        Parameters
+        ----------
+        timestamp : float
+            Time at which the counter was read, in seconds
+        counter : int
+            Value of the byte counter
+        rate : float
+            Rate since the previous sample in Kbps
+
+        Returns
+        -------
+        None
+        """
+
+        self.head = (self.head + 1) % self.size
+        self.times[self.head] = timestamp
+        self.counters[self.head] = counter
+        self.rates[self.head] = rate
+        self.count = min(self.count + 1, self.size)
+        return
+
+    def instantaneous(self):
+        """Gives the rate between the last two samples.
+
+        Returns
+        -------
+        float
+            Throughput in Kbps, 0 if less than two samples were taken
+        """
+
+        if self.count < 2:
+            return 0.0
+        return self.rates[self.head]
+
+    def smoothed(self):
+        """Gives the exponentially weighted moving average of the rate.
+
+        Returns
+        -------
+        float
+            Throughput in Kbps, 0 if less than two samples were taken
+        """
+
+        if self.count < 2:
+            return 0.0
+        return self.ewma
+
+    def peak(self):
+        """Gives the highest rate seen over the samples in the ring buffer.
+
+        Returns
+        -------
+        float
+            Throughput in Kbps, 0 if less than two samples were taken
+        """
+
+        if self.count < 2:
+            return 0.0
+        # The rate of the oldest sample refers to a sample no longer kept
+        return max(self.rates[(self.head - i) % self.size]
+                   for i in range(self.count - 1))
+
+    def last_update(self):
+        """Gives the time of the most recent sample.
+
+        Returns
+        -------
+        float
+            Timestamp in seconds, None if no sample was taken
+        """
+
+        if self.count == 0:
+            return None
+        return self.times[self.head]
+
+    def estimate(self, kind="ewma"):
+        """Gives a throughput estimate of the given kind.
+
+        Parameters
+        ----------
+        kind : str
+            One of "instantaneous", "ewma" or "peak"
+
+        Returns
+        -------
+        float
+            Throughput in Kbps
+        """
+
+        if kind == "ewma":
+            return self.smoothed()
+        elif kind == "instantaneous":
+            return self.instantaneous()
+        elif kind == "peak":
+            return self.peak()
+        raise ValueError("Unknown throughput estimate: {}".format(kind))
@@ -0,0 +1,491 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to describe the role of the switches and ports of a
+# Clos topology once, instead of classifying them on every packet
+
+
+# Roles of the ports of a switch
+UNKNOWN = 0   # Port outside of the layout of the topology
+HOST = 1      # Port of an edge switch connected to a host
+UPLINK = 2    # Port connected to a switch of the tier above
+DOWNLINK = 3  # Port connected to a switch of the tier below
+
+# Ports from OFPP_MAX on are special ports, e.g. the local port
+MAX_PORT = 0xff00
+
+
+class SwitchPorts(object):
+    """Roles of the ports of one switch of a Clos topology.
+
+    Arguments
+    ----------
+    switch_id : int
+        ID of the switch
+    core : bool
+        Whether the switch is a core switch
+    role : list of int
+        Role of each port, indexed by port number, UNKNOWN for the ports
+        outside of the layout. It covers every port of the switch, so that
+        classifying the input port of a packet is a single indexed lookup.
+    host_ports : list of int
+        Ports connected to hosts, empty but for edge switches
+    uplinks : list of int
+        Ports connected to the tier above, empty for core switches
+    downlinks : list of int
+        Ports connected to the tier below, empty for edge switches
+    below : list of int
+        Ports leading towards the hosts, i.e. the host ports of an edge
+        switch and the downlinks of the other switches
+    down : dict of int: int
+        Port leading down to each edge switch below the switch, indexed by
+        the ID of the edge switch
+    to_core : dict of int: int
+        Uplink leading up to each core switch reachable through the
+        uplinks, indexed by the number of the core switch, from 1 to nCore,
+        which is also its ID in the numbering of ClosTopo
+    edge_below : dict of int: int
+        ID of the edge switch directly behind each downlink, for the core
+        switches of a two-tier topology only
+    """
+
+    __slots__ = ("switch_id", "core", "role", "host_ports", "uplinks",
+                 "downlinks", "below", "down", "to_core", "edge_below")
+
+    def __init__(self, switch_id, core, host_ports=(), uplinks=(),
+                 downlinks=(), down=None, to_core=None, edge_below=None,
+                 ports=()):
+        """Initializes the SwitchPorts object.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        core : bool
+            Whether the switch is a core switch
+        host_ports, uplinks, downlinks : iterable of int
+            Ports of each role
+        down : dict of int: int
+            Port leading down to each edge switch, by ID
+        to_core : dict of int: int
+            Uplink leading up to each core switch, by ID
+        edge_below : dict of int: int
+            ID of the edge switch behind each downlink of a two-tier core
+        ports : iterable of int
+            Ports the switch actually has, which may include ports outside
+            of the layout
+        """
+
+        self.switch_id = switch_id
+        self.core = core
+        self.host_ports = list(host_ports)
+        self.uplinks = list(uplinks)
+        self.downlinks = list(downlinks)
+        self.below = self.host_ports or self.downlinks
+        self.down = down or {}
+        self.to_core = to_core or {}
+        self.edge_below = edge_below or {}
+
+        size = max([0] + self.host_ports + self.uplinks + self.downlinks
+                   + [p for p in ports if p < MAX_PORT]) + 1
+        self.role = [UNKNOWN] * size
+        for role, role_ports in ((HOST, self.host_ports),
+                                 (UPLINK, self.uplinks),
+                                 (DOWNLINK, self.downlinks)):
+            for port in role_ports:
+                self.role[port] = role
+
+    def __eq__(self, other):
+        """Determines whether two tables give the same roles to the ports.
+
+        Parameters
+        ----------
+        other : SwitchPorts
+            Table to compare with
+
+        Returns
+        -------
+        bool
+            True if both tables describe the same layout of the switch
+        """
+
+        return (isinstance(other, SwitchPorts)
+                and self.switch_id == other.switch_id
+                and self.core == other.core
+                and self.host_ports == other.host_ports
+                and self.uplinks == other.uplinks
+                and self.downlinks == other.downlinks
+                and self.down == other.down
+                and self.to_core == other.to_core
+                and self.edge_below == other.edge_below)
+
+    def __ne__(self, other):
+        """Determines whether two tables give different roles to the ports.
+
+        Parameters
+        ----------
+        other : SwitchPorts
+            Table to compare with
+
+        Returns
+        -------
+        bool
+            True if the tables describe different layouts of the switch
+        """
+
+        return not self == other
+
+    def role_of(self, port):
+        """Gives the role of any port number, including special ones.
+
+        Parameters
+        ----------
+        port : int
+            Port number, e.g. from a PortStatus or an output action
+
+        Returns
+        -------
+        int
+            Role of the port
+        """
+
+        if 0 <= port < len(self.role):
+            return self.role[port]
+        return UNKNOWN
+
+    def add(self, port):
+        """Makes the table cover a port added to the switch.
+
+        The table is extended in place, so that references to it stay
+        valid.
+
+        Parameters
+        ----------
+        port : int
+            Port number
+
+        Returns
+        -------
+        None
+        """
+
+        if len(self.role) <= port < MAX_PORT:
+            self.role.extend([UNKNOWN] * (port + 1 - len(self.role)))
+        return
+
+
+class ClosTopology(object):
+    """Layout of the switches and ports of a two-tier Clos topology.
+
+    The switch IDs and ports are deterministic: core switches have IDs 1 to
+    nCore and edge switches the following nEdge IDs. Core switch c is
+    connected to port c of every edge switch, edge switch e to port
+    e - nCore of every core switch, and the hosts of an edge switch to its
+    ports nCore + 1 to nCore + nHosts.
+
+    Arguments
+    ----------
+    nCore : int
+        Number of core switches
+    nEdge : int
+        Number of edge switches
+    nHosts : int
+        Number of hosts per edge switch
+    coreSwitchIDs : list of int
+        IDs of the core switches
+    edgeSwitchIDs : list of int
+        IDs of the edge switches
+    """
+
+    def __init__(self, nCore, nEdge, nHosts):
+        """Initializes the ClosTopology object.
+
+        Parameters
+        ----------
+        nCore : int
+            Number of core switches
+        nEdge : int
+            Number of edge switches
+        nHosts : int
+            Number of hosts per edge switch
+        """
+
+        self.nCore = nCore
+        self.nEdge = nEdge
+        self.nHosts = nHosts
+        self.coreSwitchIDs = list(range(1, nCore + 1))
+        self.edgeSwitchIDs = list(range(nCore + 1, nCore + 1 + nEdge))
+
+    def is_core(self, switch_id):
+        """Determines whether a switch is a core switch.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+
+        Returns
+        -------
+        bool
+            True if the switch is a core switch
+        """
+
+        return 1 <= switch_id <= self.nCore
+
+    def switch(self, switch_id, ports=()):
+        """Computes the roles of the ports of a switch.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        ports : iterable of int
+            Ports the switch has, e.g. those of its connection
+
+        Returns
+        -------
+        SwitchPorts
+            Roles of the ports of the switch
+        """
+
+        if self.is_core(switch_id):
+            return SwitchPorts(
+                switch_id, True, downlinks=range(1, self.nEdge + 1),
+                down=dict((e, e - self.nCore) for e in self.edgeSwitchIDs),
+                edge_below=dict((e - self.nCore, e)
+                                for e in self.edgeSwitchIDs),
+                ports=ports)
+        return SwitchPorts(
+            switch_id, False,
+            host_ports=range(self.nCore + 1, self.nCore + self.nHosts + 1),
+            uplinks=self.coreSwitchIDs,
+            to_core=dict((c, c) for c in self.coreSwitchIDs), ports=ports)
+
+    def links(self):
+        """Gives the links between the switches.
+
+        Returns
+        -------
+        list of (int, int, int, int)
+            Switch ID and port of both ends of each link, edge switch first
+        """
+
+        return [(e, c, c, e - self.nCore)
+                for e in self.edgeSwitchIDs for c in self.coreSwitchIDs]
+
+    def host_location(self, host):
+        """Gives where a host is connected, hosts being numbered from 1.
+
+        Parameters
+        ----------
+        host : int
+            Number of the host
+
+        Returns
+        -------
+        (int, int)
+            ID of the edge switch and port the host is connected to
+        """
+
+        edge_index, host_index = divmod(host - 1, self.nHosts)
+        return self.edgeSwitchIDs[edge_index], self.nCore + 1 + host_index
+
+
+class FatTreeTopology(object):
+    """Layout of the switches and ports of a three-tier k-ary fat-tree.
+
+    The fabric has k pods, each of k/2 aggregation switches and k/2 edge
+    switches, and (k/2)^2 core switches. Every edge switch has k/2 hosts,
+    so the fabric holds k^3/4 hosts with switches of k ports.
+
+    Core switches have IDs 1 to (k/2)^2. Pod p then takes the next k IDs:
+    its aggregation switches first, then its edge switches. Core switch c
+    belongs to group (c - 1) // (k/2) and is connected by its port p + 1 to
+    the aggregation switch of pod p with the index of its group. Port u of
+    aggregation switch a leads up to core switch a * k/2 + u, and its port
+    k/2 + 1 + e down to edge switch e of its pod. Port a + 1 of an edge
+    switch leads up to aggregation switch a and its hosts are on ports
+    k/2 + 1 to k, like in the two-tier topology with nCore = k/2.
+
+    Arguments
+    ----------
+    k : int
+        Number of ports of the switches, even
+    nCore : int
+        Number of core switches
+    nEdge : int
+        Number of edge switches
+    nHosts : int
+        Number of hosts per edge switch
+    coreSwitchIDs : list of int
+        IDs of the core switches
+    aggregationSwitchIDs : list of int
+        IDs of the aggregation switches
+    edgeSwitchIDs : list of int
+        IDs of the edge switches
+    """
+
+    def __init__(self, k):
+        """Initializes the FatTreeTopology object.
+
+        Parameters
+        ----------
+        k : int
+            Number of ports of the switches, even and at least 2
+        """
+
+        if k < 2 or k % 2:
+            raise ValueError("k must be even and at least 2, not {}"
+                             .format(k))
+        self.k = k
+        half = k // 2
+        self.nCore = half * half
+        self.nEdge = k * half
+        self.nHosts = half
+        self.coreSwitchIDs = list(range(1, self.nCore + 1))
+        self.aggregationSwitchIDs = [self._pod_switch(p, a) for p in range(k)
+                                     for a in range(half)]
+        self.edgeSwitchIDs = [self._pod_switch(p, half + e) for p in range(k)
+                              for e in range(half)]
+
+    def _pod_switch(self, pod, index):
+        """Gives the ID of a switch of a pod.
+
+        Parameters
+        ----------
+        pod : int
+            Index of the pod, from 0
+        index : int
+            Index of the switch in the pod, from 0, the aggregation switches
+            coming first
+
+        Returns
+        -------
+        int
+            ID of the switch
+        """
+
+        return self.nCore + pod * self.k + index + 1
+
+    def is_core(self, switch_id):
+        """Determines whether a switch is a core switch.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+
+        Returns
+        -------
+        bool
+            True if the switch is a core switch
+        """
+
+        return 1 <= switch_id <= self.nCore
+
+    def switch(self, switch_id, ports=()):
+        """Computes the roles of the ports of a switch.
+
+        Parameters
+        ----------
+        switch_id : int
+            ID of the switch
+        ports : iterable of int
+            Ports the switch has, e.g. those of its connection
+
+        Returns
+        -------
+        SwitchPorts
+            Roles of the ports of the switch
+        """
+
+        half = self.k // 2
+        if self.is_core(switch_id):
+            return SwitchPorts(
+                switch_id, True, downlinks=range(1, self.k + 1),
+                down=dict((e, (e - self.nCore - 1) // self.k + 1)
+                          for e in self.edgeSwitchIDs),
+                ports=ports)
+
+        pod, index = divmod(switch_id - self.nCore - 1, self.k)
+        if index < half:
+            # Aggregation switch
+            return SwitchPorts(
+                switch_id, False, uplinks=range(1, half + 1),
+                downlinks=range(half + 1, self.k + 1),
+                down=dict((self._pod_switch(pod, half + e), half + 1 + e)
+                          for e in range(half)),
+                to_core=dict((index * half + u, u)
+                             for u in range(1, half + 1)),
+                ports=ports)
+        return SwitchPorts(
+            switch_id, False, host_ports=range(half + 1, self.k + 1),
+            uplinks=range(1, half + 1),
+            to_core=dict((c, (c - 1) // half + 1) for c in self.coreSwitchIDs),
+            ports=ports)
+
+    def links(self):
+        """Gives the links between the switches.
+
+        Returns
+        -------
+        list of (int, int, int, int)
+            Switch ID and port of both ends of each link, lower tier first
+        """
+
+        half = self.k // 2
+        links = []
+        for pod in range(self.k):
+            for a in range(half):
+                aggregation = self._pod_switch(pod, a)
+                for e in range(half):
+                    links.append((self._pod_switch(pod, half + e), a + 1,
+                                  aggregation, half + 1 + e))
+                for u in range(1, half + 1):
+                    links.append((aggregation, u, a * half + u, pod + 1))
+        return links
+
+    def host_location(self, host):
+        """Gives where a host is connected, hosts being numbered from 1.
+
+        Parameters
+        ----------
+        host : int
+            Number of the host
+
+        Returns
+        -------
+        (int, int)
+            ID of the edge switch and port the host is connected to
+        """
+
+        edge_index, host_index = divmod(host - 1, self.nHosts)
+        return (self.edgeSwitchIDs[edge_index],
+                self.k // 2 + 1 + host_index)
+
+
+def build_topology(nCore=None, nEdge=None, nHosts=None, k=0):
+    """Gives the layout of a fabric from the options of a controller.
+
+    Parameters
+    ----------
+    nCore : int or str
+        Number of core switches of a two-tier Clos topology
+    nEdge : int or str
+        Number of edge switches of a two-tier Clos topology
+    nHosts : int or str
+        Number of hosts per edge switch of a two-tier Clos topology
+    k : int or str
+        Number of ports of the switches of a three-tier fat-tree, 0 for a
+        two-tier Clos topology
+
+    Returns
+    -------
+    ClosTopology or FatTreeTopology
+        Layout of the fabric
+    """
+
+    if int(k):
+        return FatTreeTopology(int(k))
+    if None in (nCore, nEdge, nHosts):
+        raise ValueError("nCore, nEdge and nHosts are needed unless k is "
+                         "given")
+    return ClosTopology(int(nCore), int(nEdge), int(nHosts))
@@ -0,0 +1,141 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to record the decisions of the controllers at a
+# fixed cost per packet
+
+
+import struct
+import time
+
+
+# Decisions taken for a packet
+FLOW = 1      # A flow was installed and the packet released through it
+FLOOD = 2     # The packet was flooded
+FORWARD = 3   # The packet was sent out of a port without installing a flow
+UPLINK = 4    # A flow was installed towards a selected uplink
+DROP = 5      # The packet came in through a port outside of the layout
+
+DECISIONS = {FLOW: "flow", FLOOD: "flood", FORWARD: "forward",
+             UPLINK: "uplink", DROP: "drop"}
+
+
+def mac_to_str(raw):
+    """Formats a raw MAC address.
+
+    Parameters
+    ----------
+    raw : bytes
+        6 bytes of the address
+
+    Returns
+    -------
+    str
+        Address in the usual colon notation
+    """
+
+    return ":".join("{:02x}".format(byte) for byte in bytearray(raw))
+
+
+class Trace(object):
+    """Fabric-wide ring buffer of the decisions of the switch controllers.
+
+    Each decision is packed as a fixed-size binary record into a buffer
+    allocated once, the oldest records being overwritten when it is full.
+    Nothing is formatted until the buffer is dumped, so recording a decision
+    only costs packing a few integers. Controllers hold None instead of a
+    Trace when tracing is off, which costs a single test per packet.
+
+    Arguments
+    ----------
+    capacity : int
+        Number of records kept
+    buffer : bytearray
+        Records, `capacity` times `RECORD.size` bytes
+    count : int
+        Number of records written since the creation of the buffer
+    """
+
+    # Time, switch ID, input port, source and destination MAC addresses,
+    # output port and decision
+    RECORD = struct.Struct("!dQH6s6sHB")
+
+    def __init__(self, capacity=65536):
+        """Initializes the Trace object.
+
+        Parameters
+        ----------
+        capacity : int
+            Number of records kept
+        """
+
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * self.RECORD.size)
+        self.count = 0
+
+    def record(self, dpid, in_port, src, dst, out_port, decision):
+        """Records the decision taken for a packet.
+
+        Parameters
+        ----------
+        dpid : int
+            ID of the switch
+        in_port : int
+            Port the packet came in from
+        src : EthAddr
+            Source of the packet
+        dst : EthAddr
+            Destination of the packet
+        out_port : int
+            Port the packet is sent out of, e.g. OFPP_FLOOD
+        decision : int
+            One of the keys of DECISIONS
+
+        Returns
+        -------
+        None
+        """
+
+        self.RECORD.pack_into(
+            self.buffer, (self.count % self.capacity) * self.RECORD.size,
+            time.time(), dpid, in_port, src.toRaw(), dst.toRaw(), out_port,
+            decision)
+        self.count += 1
+        return
+
+    def records(self):
+        """Gives the records kept, oldest first.
+
+        Returns
+        -------
+        generator of tuple
+            Time, switch ID, input port, raw source and destination, output
+            port and decision of each record
+        """
+
+        first = max(0, self.count - self.capacity)
+        for i in range(first, self.count):
+            yield self.RECORD.unpack_from(
+                self.buffer, (i % self.capacity) * self.RECORD.size)
+
+    def dump(self, path):
+        """Writes the records kept to a text file, one per line.
+
+        Parameters
+        ----------
+        path : str
+            Path of the file
+
+        Returns
+        -------
+        int
+            Number of records written
+        """
+
+        written = 0
+        with open(path, "w") as f:
+            for when, dpid, in_port, src, dst, out_port, decision in \
+                    self.records():
+                f.write("{:.6f} s{} in={} {} -> {} {} out={}\n".format(
+                    when, dpid, in_port, mac_to_str(src), mac_to_str(dst),
+                    DECISIONS.get(decision, decision), out_port))
+                written += 1
+        return written
@@ -19,12 +19,16 @@
 
 from pox.core import core
 import pox.openflow.libopenflow_01 as of
+from pox.lib.util import str_to_bool
+
+from controller import Clos_Controller, FabricServices
+from topology import HOST
 
 
 log = core.getLogger()
 
 
-class Tree_Controller(object):
+class Tree_Controller(Clos_Controller):
     """Controller handling the network like a Spanning Tree
 
     A Tree_Controller object is created for each switch that connects.
@@ -34,23 +38,25 @@ class Tree_Controller(object):
 
     In this controller, the switch is designed to behave in a topology forming
     a Spanning Tree. That is, there will be only one root, i.e. one core switch.
+    In a fat-tree, edge switches only flood up their first uplink, to the
+    first aggregation switch of their pod, which leads to the root. The
+    other aggregation switches do not flood up at all.
+
+    The attributes common to the controllers are described in
+    Clos_Controller.
 
     Arguments
     ----------
-    switch_id : int
-        ID used to uniquely identify the switch in a topology
-
-    coreSwitchIDs : list of int
-        IDs of core switches in the topology
-
-    edgeSwitchIDs : list of int
-        IDs of edge switches in the topology
-
-    mac_to_port : dict of str: int
-        Dictionnary mapping MAC addresses of type pox.lib.addresses.EthAddr to ports
+    blocked : set of int
+        Uplinks of the switch out of which packets are not flooded
     """
 
-    def __init__(self, connection, nCore, nEdge, nHosts):
+    # Number of the core switch at the root of the tree
+    ROOT = 1
+
+    def __init__(self, connection, nCore, nEdge, nHosts, hosts, flow_tables,
+                 aggregate=False, metrics=None, trace=None, topology=None,
+                 checkpoint=None):
         """Initializes the Tree_Controller object.
 
         Parameters
@@ -64,26 +70,70 @@ class Tree_Controller(object):
             Number of edge switches in the Clos Topology 
         nHosts : int
             Number of hosts per edge switch in the Clos Topology 
+        hosts : HostDirectory object
+            Fabric-wide directory of the location of the hosts
+        flow_tables : FlowTables object
+            Fabric-wide service tracking the flows installed in the switches
+        aggregate : bool
+            If True, install one flow per destination instead of one flow
+            per pair of hosts
+        metrics : Metrics object
+            Fabric-wide service exporting the counters of the controllers,
+            None to not record them
+        trace : Trace object
+            Fabric-wide ring buffer recording the decisions of the
+            controllers, None to not record them
+        topology : ClosTopology or FatTreeTopology object
+            Layout of the fabric, the two-tier Clos topology by default
+        checkpoint : Checkpoint object
+            Fabric-wide checkpoint of the state of the controllers, None to
+            not save it
         """
 
-        self.connection = connection
-        self.nCore = nCore
-        self.nEdge = nEdge
-        self.nHosts = nHosts
+        super(Tree_Controller, self).__init__(
+            connection, nCore, nEdge, nHosts, hosts, flow_tables, aggregate,
+            metrics, trace, topology, checkpoint)
+
+        self.blocked = set()
+        self._activate_root()
 
-        self.switch_id = connection.dpid
-        self.coreSwitchIDs = list(range(1, self.nCore+1))
-        self.edgeSwitchIDs = list(
-            range(self.nCore + 1, self.nCore + 1 + self.nEdge))
+    def _activate_root(self):
+        """Keeps the uplink towards the root as the only way up the tree.
 
-        # We want to keep core switch s1
-        if(self.switch_id in self.edgeSwitchIDs):
-            self._activate_core(1)
+        Edge switches reach the other edge switches through the root,
+        whatever the numbering of the switches and ports. While the uplink
+        towards the root is not known, e.g. before its link is discovered,
+        every uplink is blocked, so that floods never loop through two core
+        switches. The aggregation switches of a fat-tree which do not lead
+        to the root block all their uplinks the same way.
 
-        # This binds our PacketIn event listener
-        connection.addListeners(self)
+        Returns
+        -------
+        None
+        """
+
+        self.REMOTE_PORT = self.ports.to_core.get(self.ROOT)
+        if self.core_ports or self.blocked:
+            self._activate_core(self.REMOTE_PORT)
+
+        return
 
-        self.mac_to_port = {}
+    def _ports_changed(self, ports):
+        """Uses new roles for the ports and moves the root uplink.
+
+        Parameters
+        ----------
+        ports : SwitchPorts object
+            New roles of the ports of the switch
+
+        Returns
+        -------
+        None
+        """
+
+        super(Tree_Controller, self)._ports_changed(ports)
+        self._activate_root()
+        return
 
     def _activate_core(self, coreSwitchPort):
         """Instructs the edge switch to block every port to a core switch except
@@ -92,57 +142,40 @@ class Tree_Controller(object):
         Port number between edge and core switches are in [1, nCore]
         Every core switch is connected to the same port on every edge switch
         E.g. core switch s1 will connect to port 1 on s3, s4 and s5.
+        The aggregation switches of a fat-tree block their uplinks the same
+        way, their first uplink leading to the core switch s1 for the first
+        aggregation switch of each pod.
+        Ports blocked before which are no longer to be blocked, e.g. once
+        the layout is discovered again, are unblocked.
 
         Parameters
         ----------
         coreSwitchPort : int
-            Port to the coreSwitch
+            Port to the coreSwitch, None to block every uplink
 
         Returns
         -------
         None
         """
 
-        ports_to_block = [p for p in range(1, self.nCore+1)
-                          if p != coreSwitchPort]
-        for port in ports_to_block:
-            log.debug(" S{} deactivating port {}".format(self.switch_id, port))
+        ports_to_block = set(p for p in self.core_ports
+                             if p != coreSwitchPort)
+        for port in sorted(ports_to_block ^ self.blocked):
+            block = port in ports_to_block
+            log.debug(" S{} {} port {}".format(
+                self.switch_id, "deactivating" if block else "activating",
+                port))
             msg = of.ofp_port_mod()
             msg.port_no = self.connection.ports[port].port_no
             msg.hw_addr = self.connection.ports[port].hw_addr
             msg.mask = of.OFPPC_NO_FLOOD
-            msg.config = of.OFPPC_NO_FLOOD
+            msg.config = of.OFPPC_NO_FLOOD if block else 0
             self.connection.send(msg)
+        self.blocked = ports_to_block
 
         return
 
-    def resend_packet(self, packet_in, out_port):
-        """Instructs the switch to resend a packet that it had sent to us.
-
-        Parameters
-        ----------
-        packet_in : ofp_packet_in object
-            Packet which the switch had sent to the controller due to a table-miss
-        out_port : int
-            Port to send the packet out of
-
-        Returns
-        -------
-        None
-        """
-        msg = of.ofp_packet_out()
-        msg.data = packet_in
-
-        # Add an action to send to the specified port
-        action = of.ofp_action_output(port=out_port)
-        msg.actions.append(action)
-
-        # Send message to switch
-        self.connection.send(msg)
-
-        return
-
-    def act_like_switch(self, packet, packet_in):
+    def act_like_switch(self, packet, packet_in, role):
         """Implement switch like behavior.
 
         Sends a packet out to a port depending on specific conditions and
@@ -155,6 +188,8 @@ class Tree_Controller(object):
             Packet that the switch sent up to the controller
         packet_in : ofp_packet_in object
             OpenFlow message
+        role : int
+            Role of the input port of the packet
 
         Returns
         -------
@@ -162,80 +197,54 @@ class Tree_Controller(object):
         """
 
         source = str(packet.src)
-        dest = str(packet.dst)
 
         # Learn the port for the source MAC
         self.mac_to_port[source] = packet_in.in_port
+        if role == HOST:
+            self.hosts.learn(source, self.switch_id, packet_in.in_port)
 
-        if dest in self.mac_to_port:
-            out_port = self.mac_to_port[dest]
-
+        out_port = self.lookup_port(str(packet.dst))
+        if out_port is not None:
             # Set fields to match received packet, with regards to source and
-            # destination MAC address.
-            msg = of.ofp_flow_mod()
-            msg.match.dl_src = packet.src
-            msg.match.dl_dst = packet.dst
-
-            # Send packet out the associated port
-            msg.actions.append(of.ofp_action_output(port=out_port))
-            self.connection.send(msg)
-            self.resend_packet(packet_in, out_port)
-            log.debug("  S{} - Installing flow: {} Port {} -> {} Port {}".format(
-                self.switch_id, source, packet_in.in_port, dest, out_port))
+            # destination MAC address, or only to the destination, and send
+            # the packet out the associated port
+            self.install_flow(packet, packet_in, out_port)
 
         else:
             # Flood the packet out to every port but the input port
-            self.resend_packet(packet_in, of.OFPP_FLOOD)
-            log.debug("  S{} - Flooding packet from {} {} to {}".format(
-                self.switch_id, source, packet_in.in_port, dest))
-
-        return
-
-    def _handle_PacketIn(self, event):
-        """Handles packet in messages from the switch.
-
-        Parameters
-        ----------
-        event : pox.lib.revent
-            Event that the controller handles from the connected switch
-
-        Returns
-        -------
-        None
-        """
-        packet = event.parsed
-        if not packet.parsed:
-            log.warning("Ignoring incomplete packet")
-            return
-
-        packet_in = event.ofp
-        self.act_like_switch(packet, packet_in)
+            self.flood(packet, packet_in, self.flood_to_all)
+            if self.aggregate and not self.ports.core:
+                self.forget_flow_to(packet.src)
 
         return
 
 
-def launch(nCore, nEdge, nHosts):
+def launch(aggregate=False, **options):
     """Starts the component when calling from the command line.
 
     Parameters
     ----------
-    nCore : int
-        Number of core switches in the Clos Topology
-    nEdge : int
-        Number of edge switches in the Clos Topology
-    nHosts : int
-        Number of hosts per edge switch in the Clos Topology
+    aggregate : bool
+        If True, flows are installed per destination instead of per pair of
+        hosts, and core switches match the hosts of an edge switch on a few
+        IP prefixes, so that flow tables grow linearly with the hosts
+    options : dict
+        Options common to the policies, e.g. nCore, nEdge and nHosts, see
+        controller.FabricServices
 
     Returns
     -------
     None    
     """
 
-    log.debug("Controller started with the following arguments:")
-    log.debug("nCore={}, nEdge={}, nHosts ={}".format(nCore, nEdge, nHosts))
+    aggregate = str_to_bool(aggregate)
+    fabric = FabricServices("tree", **options)
+    topology = fabric.topology
 
-    def start_switch(event):
-        log.debug("Controlling %s" % (event.connection,))
-        Tree_Controller(event.connection, int(nCore), int(nEdge), int(nHosts))
+    def make(connection):
+        Tree_Controller(connection, topology.nCore, topology.nEdge,
+                        topology.nHosts, fabric.hosts, fabric.flow_tables,
+                        aggregate, fabric.metrics, fabric.trace, topology,
+                        fabric.checkpoint)
 
-    core.openflow.addListenerByName("ConnectionUp", start_switch)
+    fabric.start(make, aggregate=aggregate)
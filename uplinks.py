@@ -0,0 +1,263 @@
+# Written for the course of Network Infrastructures at 2019/2020 at
+# University of Liege to select the least loaded uplink of an edge switch
+
+import heapq
+
+
+class UplinkSelector(object):
+    """Selects the least loaded uplink of an edge switch.
+
+    The load of an uplink is its last measured throughput plus a reservation
+    for the flows placed on it since that measure. Without the reservation,
+    every flow arriving between two statistics polls would be placed on the
+    same uplink. The reservations decay each time a new measure arrives, as
+    the placed flows start to appear in the measured throughput. Load moved
+    between uplinks, e.g. by rerouting a flow, is a correction of the
+    measure, which is dropped with the next measure as it shows the move.
+
+    Uplinks of different speeds are compared by their load divided by their
+    capacity. The score of an uplink may also account for the rest of the
+    path of the flow, e.g. the links down from the core switch it leads to:
+    the uplink is then scored by the most utilized link of the path.
+
+    The uplinks are kept in a heap ordered by load, so that selecting an
+    uplink costs O(log n) with n uplinks. Entries are invalidated lazily:
+    an entry is only used if its load is still the current load of its port.
+    Scores accounting for the rest of the path depend on the destination of
+    the flow, so they cannot be kept in the heap: they are deliberately
+    compared one by one, in O(n), n being at most the number of core
+    switches. The heap is still kept up to date for the next selections
+    without them.
+
+    Arguments
+    ----------
+    flow_reservation : float
+        Load in Kbps reserved on an uplink for each flow placed on it
+    decay : float
+        Fraction of the reservation kept when a new measure arrives
+    measured : dict of int: float
+        Last measured throughput in Kbps of each uplink port
+    reserved : dict of int: float
+        Load in Kbps reserved on each uplink port since the last measure
+    shifted : dict of int: float
+        Load in Kbps moved to, or away from if negative, each uplink port
+        since the last measure
+    capacity : dict of int: float
+        Capacity in Kbps of each uplink port, 1 if unknown
+    """
+
+    def __init__(self, ports, flow_reservation=1000.0, decay=0.5,
+                 capacities=None):
+        """Initializes the UplinkSelector object.
+
+        Parameters
+        ----------
+        ports : list of int
+            Uplink ports of the edge switch
+        flow_reservation : float
+            Load in Kbps reserved on an uplink for each flow placed on it
+        decay : float
+            Fraction of the reservation kept when a new measure arrives
+        capacities : dict of int: float
+            Capacity in Kbps of the uplink ports, None to compare their
+            loads alone
+        """
+
+        self.flow_reservation = flow_reservation
+        self.decay = decay
+        self.measured = dict((port, 0.0) for port in ports)
+        self.reserved = dict((port, 0.0) for port in ports)
+        self.shifted = dict((port, 0.0) for port in ports)
+        self.capacity = dict((port, 1.0) for port in ports)
+        self.capacity.update(capacities or {})
+        self._heap = []
+        self._rebuild()
+
+    def load(self, port):
+        """Gives the estimated load of an uplink.
+
+        Parameters
+        ----------
+        port : int
+            Uplink port
+
+        Returns
+        -------
+        float
+            Measured throughput plus reservations and moved load in Kbps,
+            never negative
+        """
+
+        return max(self.measured[port] + self.reserved[port]
+                   + self.shifted[port], 0.0)
+
+    def utilization(self, port):
+        """Gives the estimated load of an uplink relative to its capacity.
+
+        Parameters
+        ----------
+        port : int
+            Uplink port
+
+        Returns
+        -------
+        float
+            Estimated load divided by the capacity of the uplink
+        """
+
+        return self.load(port) / self.capacity[port]
+
+    def select(self, packet=None, beyond=None):
+        """Selects the least loaded uplink and reserves a flow on it.
+
+        Parameters
+        ----------
+        packet : pox.lib.packet.ethernet
+            Packet of the new flow, unused as the choice only depends
+            on the loads
+        beyond : dict of int: float
+            Utilization of the rest of the path through each uplink, e.g.
+            given by PathLoads.beyond, infinite if unknown so that the
+            uplink comes last. None to only score the uplinks.
+
+        Returns
+        -------
+        int
+            Uplink port with the lowest estimated utilization, None if no
+            uplink is left
+        """
+
+        if not self.measured:
+            return None
+        heap = self._heap
+        if beyond:
+            # O(n), as the scores depend on the destination. Paths of equal
+            # score, e.g. all unknown, go to the least utilized uplink
+            port = min(self.measured, key=lambda p: (
+                max(self.utilization(p), beyond.get(p, 0.0)),
+                self.utilization(p), p))
+            self.reserved[port] += self.flow_reservation
+            heapq.heappush(heap, (self.utilization(port), port))
+        else:
+            while heap[0][0] != self.utilization(heap[0][1]):
+                # Stale entry
+                heapq.heappop(heap)
+
+            port = heap[0][1]
+            self.reserved[port] += self.flow_reservation
+            heapq.heapreplace(heap, (self.utilization(port), port))
+
+        if len(heap) > 4 * len(self.measured):
+            self._rebuild()
+        return port
+
+    def update(self, measures):
+        """Updates the measured throughput of the uplinks.
+
+        The reservations of the updated uplinks decay by `decay`, and the
+        load moved to or away from them is dropped.
+
+        Parameters
+        ----------
+        measures : dict of int: float
+            Measured throughput in Kbps of uplink ports
+
+        Returns
+        -------
+        None
+        """
+
+        for port, throughput in measures.items():
+            if port not in self.measured:
+                continue
+            self.measured[port] = throughput
+            self.reserved[port] *= self.decay
+            self.shifted[port] = 0.0
+        self._rebuild()
+        return
+
+    def shift(self, old_port, new_port, load):
+        """Moves load from an uplink to another, e.g. a rerouted flow.
+
+        The move is accounted for until the next measure of each uplink.
+
+        Parameters
+        ----------
+        old_port : int
+            Uplink port the load leaves
+        new_port : int
+            Uplink port the load goes to
+        load : float
+            Load in Kbps
+
+        Returns
+        -------
+        None
+        """
+
+        if old_port in self.measured and new_port in self.measured:
+            self.shifted[old_port] -= load
+            self.shifted[new_port] += load
+            self._rebuild()
+        return
+
+    def add_port(self, port, capacity=1.0):
+        """Adds an uplink, with no load.
+
+        Parameters
+        ----------
+        port : int
+            Uplink port
+        capacity : float
+            Capacity in Kbps of the uplink, 1 if the loads are compared
+            alone
+
+        Returns
+        -------
+        None
+        """
+
+        if port not in self.measured:
+            self.measured[port] = 0.0
+            self.reserved[port] = 0.0
+            self.shifted[port] = 0.0
+            self.capacity[port] = capacity
+            self._rebuild()
+        return
+
+    def remove_port(self, port):
+        """Removes an uplink, which is not selected anymore.
+
+        Removing the last uplink is allowed: no uplink is selected until
+        one is added again.
+
+        Parameters
+        ----------
+        port : int
+            Uplink port
+
+        Returns
+        -------
+        None
+        """
+
+        if port in self.measured:
+            del self.measured[port]
+            del self.reserved[port]
+            del self.shifted[port]
+            del self.capacity[port]
+            self._rebuild()
+        return
+
+    def _rebuild(self):
+        """Rebuilds the heap from the current loads, dropping stale entries.
+
+        Returns
+        -------
+        None
+        """
+
+        self._heap = [(self.utilization(port), port)
+                      for port in self.measured]
+        heapq.heapify(self._heap)
+        return
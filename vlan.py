@@ -17,16 +17,27 @@
 # University of Liege to implement a VLAN Controller Policy
 
 
+import os
+
 from pox.core import core
 import pox.openflow.libopenflow_01 as of
+from pox.lib.util import str_to_bool
+from pox.lib.recoco import Timer
 
 from tenants import Tenants
+from placement import TenantPlacement
+from proactive import AGGREGATE_PRIORITY, host_mac, host_vlan
+from controller import Clos_Controller, FabricServices
+from topology import HOST, UPLINK, DOWNLINK
+from portstats import PortStats
+from scheduler import StatsScheduler
+import tracing
 
 
 log = core.getLogger()
 
 
-class VLAN_Controller(object):
+class VLAN_Controller(Clos_Controller):
     """Controller handling the network like a VLAN
 
     A VLAN_Controller object is created for each switch that connects.
@@ -42,24 +53,28 @@ class VLAN_Controller(object):
     is h1 will be sent through core switch with switch_id = 1 and a packet which 
     destination is h2 will be sent through core switch with switch_id = 2.
 
+    The attributes common to the controllers are described in
+    Clos_Controller.
+
     Arguments
     ----------
-    switch_id : int
-        ID used to uniquely identify the switch in a topology
-    coreSwitchIDs : list of int
-        IDs of core switches in the topology
-    edgeSwitchIDs : list of int
-        IDs of edge switches in the topology
     tenants: Tenants object
-        Object associating host to a tenant i.e. a core switch
-    vlan_id: int
-        ID determining to which VLAN a host belongs to. There are
-        `nCore` VLANs and `vlan_id` is initialized to 1.
-    mac_to_port : dict of str: int
-        Dictionnary mapping MAC addresses of type pox.lib.addresses.EthAddr to ports
+        Object associating host to a tenant i.e. a core switch.
+        It is shared by all the switches. There are `nCore` VLANs by
+        default, VLAN i going through core switch i.
+    placement : TenantPlacement object
+        Fabric-wide service assigning the new hosts and moving the VLANs
+        from their traffic, None to assign them in a round robin fashion
+        and never move them
+
+    In a fat-tree, the aggregation switches forward the packets coming
+    from below like the edge switches forward the packets of their hosts,
+    up to the core switch of the tenant of the source.
     """
 
-    def __init__(self, connection, nCore, nEdge, nHosts):
+    def __init__(self, connection, nCore, nEdge, nHosts, hosts, tenants,
+                 flow_tables, aggregate=False, metrics=None, trace=None,
+                 topology=None, checkpoint=None, placement=None):
         """Initializes the VLAN_Controller object.
 
         Parameters
@@ -73,124 +88,159 @@ class VLAN_Controller(object):
             Number of edge switches in the Clos Topology 
         nHosts : int
             Number of hosts per edge switch in the Clos Topology 
+        hosts : HostDirectory object
+            Fabric-wide directory of the location of the hosts
+        tenants : Tenants object
+            Fabric-wide registry associating hosts to a tenant
+        flow_tables : FlowTables object
+            Fabric-wide service tracking the flows installed in the switches
+        aggregate : bool
+            If True, install one flow per host instead of one flow per pair
+            of hosts
+        metrics : Metrics object
+            Fabric-wide service exporting the counters of the controllers,
+            None to not record them
+        trace : Trace object
+            Fabric-wide ring buffer recording the decisions of the
+            controllers, None to not record them
+        topology : ClosTopology or FatTreeTopology object
+            Layout of the fabric, the two-tier Clos topology by default
+        checkpoint : Checkpoint object
+            Fabric-wide checkpoint of the state of the controllers, None to
+            not save it
+        placement : TenantPlacement object
+            Fabric-wide service placing the VLANs on the core switches from
+            their traffic, None for the round robin of `tenants`
         """
 
-        self.connection = connection
-        self.nCore = nCore
-        self.nEdge = nEdge
-        self.nHosts = nHosts
-
-        self.switch_id = connection.dpid
-        self.coreSwitchIDs = list(range(1, self.nCore+1))
-        self.edgeSwitchIDs = list(
-            range(self.nCore + 1, self.nCore + 1 + self.nEdge))
-
-        self.tenants = Tenants(n_vlans=nCore)
-        self.vlan_id = 1
-
-        # This binds our PacketIn event listener
-        connection.addListeners(self)
-
-        self.mac_to_port = {}
-
-    def is_core(self):
-        """Determines whether the switch is a core switch.
+        self.tenants = tenants
+        self.placement = placement
+        super(VLAN_Controller, self).__init__(
+            connection, nCore, nEdge, nHosts, hosts, flow_tables, aggregate,
+            metrics, trace, topology, checkpoint)
+        if placement is not None:
+            placement.add_listener(self._tenants_moved)
+            if self.ports.host_ports:
+                # The traffic of the hosts is measured on their ports
+                placement.port_stats.register(connection)
+
+    def _tenants_moved(self, moved):
+        """Sends the traffic of the VLANs moved through their new core switch.
+
+        The packets towards a host go through the uplink the switch learnt
+        it behind, and the packets of a host towards an unknown destination
+        through the uplink to the core switch of its VLAN. The entries of
+        the MAC table and the flows going up through the former core switch
+        of a VLAN moved are changed to the uplink to its new core switch.
+        The flows are modified in place, so that they keep their counters
+        and the packets of the other flows are not disturbed. An uplink
+        still leading to the new core switch, e.g. through the same
+        aggregation switch of a fat-tree, is left as it is.
 
-        The switch IDs in a Clos Network are deterministic, i.e. a core
-        switch will have IDs ranging from [1, nCore + 1]
         Parameters
         ----------
-        None
+        moved : dict of int: (int, int)
+            Former and new core switch of each VLAN moved, indexed by VLAN ID
 
         Returns
         -------
-        True if the switch is a core switch.
-        False otherwise.
+        None
         """
-        if self.switch_id in self.coreSwitchIDs:
-            return True
-        return False
-
-    def sent_from_core(self, port):
-        """Determines whether or not the packet was sent from a core switch.
-
-        The ports in a Clos Network are deterministic, i.e. an edge
-        switch will receive a packet on port `port` from core switch
-        with ID `port`.
-
-        Parameters
-        ----------
-        port : int
-            The receiving port of a given switch
 
-        Returns
-        -------
-        True if the port is associated with a core switch.
-        False otherwise.
-        """
-        return port in self.coreSwitchIDs
+        def new_uplink(address, port):
+            # Uplink to the new core switch of the VLAN of a host, if the
+            # switch reached it through the former one
+            move = moved.get(self.tenants.getVLAN(address))
+            if move is None or self.ports.to_core.get(move[0]) != port:
+                return None
+            return self.ports.to_core.get(move[1])
+
+        uplinks = set(self.ports.uplinks)
+        for address, port in list(self.mac_to_port.items()):
+            if port in uplinks:
+                out_port = new_uplink(address, port)
+                if out_port is not None:
+                    self.mac_to_port[address] = out_port
+
+        rewritten = 0
+        for flow in list(self.flow_table.flows.values()):
+            outputs = [action.port for action in flow.actions
+                       if isinstance(action, of.ofp_action_output)]
+            if len(outputs) != 1 or outputs[0] not in uplinks:
+                continue
+            # A flow towards a host learnt follows its destination, the
+            # others the VLAN of their source
+            address = flow.match.dl_dst
+            if address is None or str(address) not in self.mac_to_port:
+                address = flow.match.dl_src
+            if address is None:
+                continue
+            out_port = new_uplink(address, outputs[0])
+            if out_port is None or out_port == outputs[0]:
+                continue
+            if self.flow_table.modify(flow.cookie,
+                                      [of.ofp_action_output(port=out_port)]):
+                rewritten += 1
+        if rewritten:
+            log.info("S{} - Moved {} flows of VLANs {} to their new core "
+                     "switch".format(self.switch_id, rewritten,
+                                     sorted(moved)))
+        return
 
-    def resend_packet(self, packet_in, out_port):
-        """Instructs the switch to resend a packet that it had sent to us.
+    def _handle_ConnectionDown(self, event):
+        """Stops following the placement once the switch disconnects.
 
         Parameters
         ----------
-        packet_in : ofp_packet_in object
-            Packet which the switch had sent to the controller due to a table-miss
-        out_port : int
-            Port to send the packet out of
+        event : ConnectionDown
+            Event raised when the switch disconnects
 
         Returns
         -------
         None
         """
-        msg = of.ofp_packet_out()
-        msg.data = packet_in
-
-        # Add an action to send to the specified port
-        action = of.ofp_action_output(port=out_port)
-        msg.actions.append(action)
-
-        # Send message to switch
-        self.connection.send(msg)
 
+        super(VLAN_Controller, self)._handle_ConnectionDown(event)
+        if self.placement is not None:
+            self.placement.remove_listener(self._tenants_moved)
         return
 
-    def _install_flow(self, source,  destination, packet_in):
-        """Installs a flow in a switch table.
+    def flow_match(self, packet, packet_in, out_port, uplink=False):
+        """Gives the match and priority of the flow forwarding a packet.
+
+        By default, flows match the pair of hosts. When aggregating, the
+        flows of an edge switch towards the core switch of a tenant only
+        match the source, as the tenant only depends on the source, and the
+        other flows only match the destination. Core switches further match
+        the IP and ARP traffic on the prefix of the hosts of the edge switch
+        behind `out_port`, if the addresses follow the layout of the
+        topology. A switch then holds one flow per host instead of one per
+        pair of hosts.
 
         Parameters
         ----------
-        source : EhtAddr
-            Source of the packet
-        destination : EhtAddr
-            Destination of the packet
+        packet : pox.lib.packet
+            Packet that the switch sent up to the controller
         packet_in : ofp_packet_in object
             OpenFlow message
+        out_port : int
+            Port out of which the flow sends the packets
+        uplink : bool
+            Whether the flow sends the packets to the core switch of the
+            tenant of their source
 
         Returns
         -------
-        int
-            Port out of which to send the packet
+        (ofp_match object, int)
+            Match and priority of the flow
         """
+        if self.aggregate and uplink:
+            # Less specific than the flows towards the local hosts
+            return of.ofp_match(dl_src=packet.src), AGGREGATE_PRIORITY
+        return super(VLAN_Controller, self).flow_match(packet, packet_in,
+                                                       out_port)
 
-        # Add to dictionnary
-        # Send packet out the associated port
-        out_port = self.mac_to_port[str(destination)]
-
-        log.debug("  S{} - Installing flow: {} Port {} -> {} Port {}".format(
-            self.switch_id, str(source), packet_in.in_port, str(destination), out_port))
-
-        # Set fields to match received packet
-        msg = of.ofp_flow_mod()
-        msg.match.dl_src = source
-        msg.match.dl_dst = destination
-        msg.actions.append(of.ofp_action_output(port=out_port))
-        self.connection.send(msg)
-
-        return out_port
-
-    def act_like_switch(self, packet, packet_in):
+    def act_like_switch(self, packet, packet_in, role):
         """Implement switch like behavior.
 
         Sends a packet out to a port depending on specific conditions and
@@ -208,6 +258,12 @@ class VLAN_Controller(object):
         3. Switch is an edge switch and gets a packet from a host:
             - If host has no tenant yet, assign him a tenant
             - Then, forward the packet towards the tenant (core switch)
+        4. Switch is an aggregation switch and gets a packet from below:
+            - Forward the packet towards the tenant of the source and
+              flood it to the other edge switches of the pod
+
+        A destination unknown to the switch but learnt by another edge switch
+        is found in the fabric-wide host directory and is not flooded.
 
         Parameters
         ----------
@@ -215,6 +271,8 @@ class VLAN_Controller(object):
             Packet that the switch sent up to the controller
         packet_in : ofp_packet_in object
             OpenFlow message
+        role : int
+            Role of the input port of the packet
 
         Returns
         -------
@@ -223,90 +281,191 @@ class VLAN_Controller(object):
 
         source = str(packet.src)
         dest = str(packet.dst)
-        log.debug(" S{} - {}".format(self.switch_id, packet))
-
         self.mac_to_port[source] = packet_in.in_port
-
-        if dest in self.mac_to_port:
-            out_port = self._install_flow(packet.src, packet.dst, packet_in)
-            self.resend_packet(packet_in, out_port)
-
-        else:
-            if self.is_core():
-                # Flood the packet out to the edge switch ports
-                self.resend_packet(packet_in, of.OFPP_FLOOD)
-                log.debug("  S{} - Flooding packet from {} {} to edge switch ports".format(
-                    self.switch_id, source, packet_in.in_port))
-
-            # Switch is an edge switch and gets a packet from a core
-            elif self.sent_from_core(packet_in.in_port):
-                ports = [port for port in range(
-                    1, self.nCore + self.nHosts + 1) if port not in self.coreSwitchIDs]
-                for p in ports:
-                    self.resend_packet(packet_in, out_port=p)
-                log.debug("  S{} - Flooding packet from {} {} to host ports :{}".format(
-                    self.switch_id, source, packet_in.in_port, ports))
-
-            # Switch is an edge switch and gets a packet from a host
+        if role == HOST:
+            self.hosts.learn(source, self.switch_id, packet_in.in_port)
+
+        out_port = self.lookup_port(dest)
+        if out_port is not None:
+            self.install_flow(packet, packet_in, out_port)
+
+        # Switch gets a packet from the tier above
+        elif role == UPLINK:
+            self.flood(packet, packet_in, self.flood_down)
+            if self.aggregate:
+                self.forget_flow_to(packet.src)
+
+        # Switch is an edge switch and gets a packet from a host, or an
+        # aggregation switch and gets a packet from an edge switch
+        elif role == HOST or (role == DOWNLINK and self.core_ports):
+            # If host has no tenant yet, assign him a tenant
+            if self.placement is not None:
+                vlan = self.placement.assign(packet.src)
+            else:
+                vlan = self.tenants.assign(packet.src)
+            out_port_to_tenant = self.ports.to_core.get(
+                self.tenants.core_of(vlan))
+
+            if out_port_to_tenant is None:
+                # The core switch of the tenant is not reachable (yet)
+                self.flood(packet, packet_in, self.flood_to_all)
+            elif self.hosts.locate(dest) is not None:
+                # The destination is known in the fabric, no need to
+                # come back to the controller for the next packets
+                self.install_flow(packet, packet_in, out_port_to_tenant,
+                                  uplink=True)
+            elif role == DOWNLINK:
+                self.flood_pod(packet, packet_in, out_port_to_tenant)
+                if self.aggregate:
+                    self.forget_flow_to(packet.src)
             else:
-                out_port_to_tenant = self.tenants.getVLAN(packet.src)
-                # If host has no tenant yet, assign him a tenant
-                if out_port_to_tenant == -1:
-                    self.tenants.addToVLAN(packet.src, out_port=self.vlan_id)
-                    out_port_to_tenant = self.vlan_id
-                    self.vlan_id = (self.vlan_id) % self.tenants.n_vlans + 1
-
                 self.resend_packet(packet_in, out_port=out_port_to_tenant)
-                log.debug("  S{} - Forwarding packet from {} {} out to port {}".format(
-                    self.switch_id, source, packet_in.in_port, out_port_to_tenant))
-
-        return
+                if self.aggregate:
+                    self.forget_flow_to(packet.src)
+                if self.trace is not None:
+                    self.trace.record(self.switch_id, packet_in.in_port,
+                                      packet.src, packet.dst,
+                                      out_port_to_tenant, tracing.FORWARD)
 
-    def _handle_PacketIn(self, event):
-        """Handles packet in messages from the switch.
-
-        Parameters
-        ----------
-        event : pox.lib.revent
-            Event that the controller handles from the connected switch
-
-        Returns
-        -------
-        None
-        """
-        packet = event.parsed
-        if not packet.parsed:
-            log.warning("Ignoring incomplete packet")
-            return
-
-        packet_in = event.ofp
-        self.act_like_switch(packet, packet_in)
+        else:
+            # Flood the packet out to the edge switch ports
+            self.flood(packet, packet_in, self.flood_to_all)
 
         return
 
 
-def launch(nCore, nEdge, nHosts):
+def launch(tenants_file=None, snapshot=None, snapshot_interval=60,
+           aggregate=False, vlans=0, placement="roundrobin", stats_interval=1,
+           stats_budget=0, rebalance_interval=30, rebalance_moves=1, rebalance_threshold=0.1,
+           **options):
     """Starts the component when calling from the command line.
 
     Parameters
     ----------
-    nCore : int
-        Number of core switches in the Clos Topology
-    nEdge : int
-        Number of edge switches in the Clos Topology
-    nHosts : int
-        Number of hosts per edge switch in the Clos Topology
+    tenants_file : str
+        Path of a text file assigning hosts to tenants, one
+        "MAC_ADDRESS VLAN_ID" pair per line. Not supported in the proactive
+        mode.
+    snapshot : str
+        Path of a binary snapshot of the tenant assignments. It is restored
+        at startup if it exists, and rewritten every `snapshot_interval`
+        seconds and when the controller goes down. Not supported in the
+        proactive mode.
+    snapshot_interval : int
+        Time interval in seconds between two snapshots
+    aggregate : bool
+        If True, flows are installed per host instead of per pair of hosts,
+        and core switches match the hosts of an edge switch on a few IP
+        prefixes, so that flow tables grow linearly with the hosts
+    vlans : int
+        Number of VLANs the hosts are assigned to, 0 for one per core
+        switch. With more VLANs than core switches, the VLANs are spread
+        over the core switches and a busy core switch can hand some of
+        them over to a quiet one.
+    placement : str
+        "roundrobin" to assign the new hosts to the VLANs in turn and never
+        move the VLANs, or "traffic" to assign them to the least loaded
+        core switch and move whole VLANs from busy core switches to quiet
+        ones, from the traffic the hosts send
+    stats_interval : int
+        Initial time interval in seconds between two PortStatsRequests to an
+        edge switch, with the "traffic" placement
+    stats_budget : float
+        Maximum number of statistics requests sent per second to the whole
+        fabric, 0 for no limit
+    rebalance_interval : int
+        Time interval in seconds between two rebalancings of the VLANs over
+        the core switches, 0 to never move them
+    rebalance_moves : int
+        Maximum number of VLANs moved at each rebalancing
+    rebalance_threshold : float
+        Fraction of the load of the busiest core switch a move must save
+    options : dict
+        Options common to the policies, e.g. nCore, nEdge and nHosts, see
+        controller.FabricServices. The checkpoint also saves the tenant
+        assignments.
 
     Returns
     -------
     None    
     """
 
-    log.debug("Controller started with the following arguments:")
-    log.debug("nCore={}, nEdge={}, nHosts ={}".format(nCore, nEdge, nHosts))
-
-    def start_switch(event):
-        log.debug("Controlling %s" % (event.connection,))
-        VLAN_Controller(event.connection, int(nCore), int(nEdge), int(nHosts))
-
-    core.openflow.addListenerByName("ConnectionUp", start_switch)
+    aggregate = str_to_bool(aggregate)
+    if placement not in ("roundrobin", "traffic"):
+        raise ValueError("Unknown placement: {}".format(placement))
+    fabric = FabricServices("vlan", **options)
+    topology = fabric.topology
+    vlans = int(vlans)
+    if (vlans or placement == "traffic") and fabric.proactive:
+        raise ValueError("The VLANs are only placed on the core switches "
+                         "in the reactive mode")
+    if fabric.proactive and (tenants_file is not None
+                             or snapshot is not None):
+        # The hosts are in the VLANs of the proactive rules, see below
+        raise ValueError("Tenant files and snapshots are not supported in "
+                         "the proactive mode")
+
+    # A single tenant registry is shared by all the switches
+    tenants = Tenants(n_vlans=vlans or max(topology.nCore, 1),
+                      n_cores=max(topology.nCore, 1))
+    if fabric.discovery:
+        # There is a VLAN per core switch discovered, unless their number
+        # is given
+        def count_vlans():
+            tenants.n_cores = max(topology.nCore, 1)
+            if not vlans:
+                tenants.n_vlans = tenants.n_cores
+
+        topology.add_listener(count_vlans)
+    if fabric.proactive:
+        # The packets reaching the controller follow the same VLANs as the
+        # pre-installed rules
+        for host in range(1, topology.nEdge * topology.nHosts + 1):
+            tenants.addToVLAN(host_mac(host), host_vlan(host, topology.nCore))
+
+    # A single statistics scheduler sends the port and flow statistics
+    # requests of all the switches
+    scheduler = StatsScheduler(budget=float(stats_budget))
+    port_stats = None
+    tenant_placement = None
+    if placement == "traffic":
+        port_stats = PortStats(time_interval=float(stats_interval),
+                               scheduler=scheduler)
+        tenant_placement = TenantPlacement(
+            tenants, fabric.hosts, port_stats,
+            interval=int(rebalance_interval), max_moves=int(rebalance_moves),
+            threshold=float(rebalance_threshold))
+
+    def make(connection):
+        VLAN_Controller(connection, topology.nCore, topology.nEdge,
+                        topology.nHosts, fabric.hosts, tenants,
+                        fabric.flow_tables, aggregate, fabric.metrics,
+                        fabric.trace, topology, fabric.checkpoint,
+                        tenant_placement)
+
+    fabric.start(make, scheduler=scheduler, tenants=tenants,
+                 port_stats=port_stats, aggregate=aggregate)
+
+    if fabric.metrics is not None:
+        fabric.metrics.gauge("tenants", "Hosts assigned to a tenant",
+                             lambda: len(tenants))
+        if tenant_placement is not None:
+            fabric.metrics.gauge("tenant_moves",
+                                 "VLANs moved to another core switch",
+                                 lambda: tenant_placement.moves)
+
+    if snapshot is not None and os.path.exists(snapshot):
+        tenants.restore(snapshot)
+        log.info("Restored {} tenant assignments from {}".format(
+            len(tenants), snapshot))
+    if tenants_file is not None:
+        log.info("Loaded {} tenant assignments from {}".format(
+            tenants.load(tenants_file), tenants_file))
+
+    if snapshot is not None:
+        def save_snapshot(event=None):
+            tenants.snapshot(snapshot)
+
+        Timer(timeToWake=int(snapshot_interval), callback=save_snapshot,
+              recurring=True)
+        core.addListenerByName("GoingDownEvent", save_snapshot)